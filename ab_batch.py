@@ -0,0 +1,322 @@
+"""
+Headless batch analysis of experiment snapshots.
+
+Runs the same pipeline as the dashboard (multivariate z-tests + MCC, Bayesian,
+revenue significance, SRM, guardrails, segments) over many
+"Download Inputs (.json)" snapshots in a process pool and writes one
+consolidated summary — one row per variation vs control.
+
+    python ab_batch.py snapshots/ -o summary.csv
+    python ab_batch.py "exports/**/*.json" -o summary.parquet --workers 8
+    python ab_batch.py snapshots/ --pdf-dir reports/     # + one PDF per experiment and a portfolio summary
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ab_engine import analyze_snapshot
+
+
+OUTPUT_FORMATS = (".csv", ".parquet", ".jsonl")
+PORTFOLIO_PDF  = "portfolio_summary.pdf"
+
+
+# -----------------------------------------------
+# INPUT DISCOVERY
+# -----------------------------------------------
+def find_snapshots(patterns):
+    """Expand directories (recursively) and glob patterns into a sorted, de-duplicated file list."""
+    paths = set()
+    for pat in patterns:
+        if os.path.isdir(pat):
+            paths.update(glob.glob(os.path.join(pat, "**", "*.json"), recursive=True))
+        else:
+            paths.update(p for p in glob.glob(pat, recursive=True) if os.path.isfile(p))
+    return sorted(paths)
+
+def snapshot_keys(paths):
+    """
+    Unique fallback name per snapshot: its path relative to the deepest
+    directory holding all of them, without ".json" ("a/experiment_snapshot").
+    """
+    if not paths:
+        return []
+    abs_paths = [os.path.abspath(p) for p in paths]
+    root = os.path.commonpath([os.path.dirname(p) for p in abs_paths])
+    return [os.path.splitext(os.path.relpath(p, root))[0].replace(os.sep, "/") for p in abs_paths]
+
+def pdf_stem(name):
+    """File-system-safe stem for an experiment's PDF report."""
+    return re.sub(r"[^\w.-]+", "_", name).strip("._") or "experiment"
+
+def unique_name(name, taken, suffix="{name} ({i})"):
+    """name, or name (2), name (3), ... — the first not in taken (compared case-insensitively); adds it to taken."""
+    out, i = name, 2
+    while out.lower() in taken:
+        out, i = suffix.format(name=name, i=i), i + 1
+    taken.add(out.lower())
+    return out
+
+
+# -----------------------------------------------
+# PER-EXPERIMENT WORKER
+# -----------------------------------------------
+def summarize_results(experiment, res, path=None):
+    """Flatten one analyze_snapshot() result into summary rows (one per variation)."""
+    mv, bayes, rev_sig = res["mv"], res["bayes"], res["rev_sig"]
+    ctrl_m   = res["ctrl_m"]
+    active_g = [g for g in res["guardrail_results"] if not g.get("skip")]
+    active_s = [s for s in res["segment_results"] if not s.get("skip")]
+    base = {
+        "experiment":           experiment,
+        "path":                 path,
+        "n_groups":             len(res["groups"]),
+        "p_global":             mv["p_global"],
+        "correction":           mv["correction"],
+        "winner":               mv["winner"],
+        "p_srm":                res["p_srm"],
+        "srm_detected":         res["p_srm"] < 0.01,
+        "guardrails_checked":   len(active_g),
+        "guardrails_violated":  sum(1 for g in active_g if g["violated"]),
+        "segments_checked":     len(active_s),
+        "segments_var_leading": sum(1 for s in active_s if s["uplift_cr"] > 0),
+        "duration_issues":      sum(1 for c in res["duration_checks"] if c["level"] != "pass"),
+    }
+    seq = res.get("sequential")
+    if seq is not None:
+        base.update(seq_look=seq["look"], seq_fraction=seq["fraction"], seq_z_bound=seq["z_bound"])
+    seq_decision = {r["name"]: r["decision"] for r in seq["arms"]} if seq is not None else {}
+    avi = res.get("always_valid")
+    avi_p = dict(zip(avi["names"][1:], zip(avi["cr"]["p"], avi["rpv"]["p"]))) if avi else {}
+    cuped = res.get("cuped")
+    rev_delta = res.get("rev_delta")
+    delta = dict(zip(rev_delta["names"][1:], zip(rev_delta["rpv"], rev_delta["aov"]))) if rev_delta else {}
+    cuped_p = dict(zip(cuped["names"][1:], zip(cuped["cr"]["p_adjusted"], cuped["rpv"]["p_adjusted"]))) if cuped else {}
+    qte = res.get("rev_qte")
+    qte_median = ({f: qte[f][qte["quantile"].index(0.5)] for f in ("diff", "p")}
+                  if qte and 0.5 in qte["quantile"] else {})
+    rows = []
+    for pw, m in zip(mv["pairwise"], mv["metrics"][1:]):
+        is_best = m["name"] == res["best_m"]["name"]
+        row = dict(base)
+        row.update({
+            "variation":         pw["name"],
+            "users_c":           ctrl_m["users"],
+            "conv_c":            ctrl_m["conv"],
+            "users_v":           m["users"],
+            "conv_v":            m["conv"],
+            "cr_c":              ctrl_m["cr"],
+            "cr_v":              m["cr"],
+            "uplift_cr":         pw["uplift_cr"],
+            "uplift_rpv":        pw["uplift_rpv"],
+            "uplift_aov":        pw["uplift_aov"],
+            "z_stat":            pw["z_stat"],
+            "p_raw":             pw["p_raw"],
+            "p_adjusted":        pw["p_adjusted"],
+            "significant":       pw["significant"],
+            "prob_best":         bayes["prob_best"][pw["name"]],
+            "expected_loss":     bayes["expected_loss"][pw["name"]],
+            "is_winner":         pw["name"] == mv["winner"],
+            "seq_decision":      seq_decision.get(pw["name"]),
+            "avi_p_cr":          avi_p.get(pw["name"], (math.nan, math.nan))[0],
+            "avi_p_rpv":         avi_p.get(pw["name"], (math.nan, math.nan))[1],
+            "cuped_p_cr":        cuped_p.get(pw["name"], (math.nan, math.nan))[0],
+            "cuped_p_rpv":       cuped_p.get(pw["name"], (math.nan, math.nan))[1],
+            # Revenue tests are run for the best variation only, as in the dashboard
+            "rpv_mw_p":          rev_sig["rpv"]["mw_p"]         if is_best else math.nan,
+            "rpv_boot_ci_low":   rev_sig["rpv"]["boot_ci_low"]  if is_best else math.nan,
+            "rpv_boot_ci_high":  rev_sig["rpv"]["boot_ci_high"] if is_best else math.nan,
+            "rpv_sig":           bool(rev_sig["rpv"]["sig"])    if is_best else None,
+            "aov_mw_p":          rev_sig["aov"]["mw_p"]         if is_best else math.nan,
+            "aov_sig":           bool(rev_sig["aov"]["sig"])    if is_best else None,
+            "revenue_source":    rev_sig.get("source")          if is_best else None,
+            "aov_median_diff":   qte_median.get("diff", math.nan) if is_best else math.nan,
+            "aov_median_p":      qte_median.get("p", math.nan)    if is_best else math.nan,
+            # Delta-method revenue inference is cheap enough for every variation
+            "rpv_delta_p":       delta[pw["name"]][0]["p"]       if pw["name"] in delta else math.nan,
+            "rpv_delta_ci_low":  delta[pw["name"]][0]["ci_low"]  if pw["name"] in delta else math.nan,
+            "rpv_delta_ci_high": delta[pw["name"]][0]["ci_high"] if pw["name"] in delta else math.nan,
+            "aov_delta_p":       delta[pw["name"]][1]["p"]       if pw["name"] in delta else math.nan,
+            "aov_delta_ci_low":  delta[pw["name"]][1]["ci_low"]  if pw["name"] in delta else math.nan,
+            "aov_delta_ci_high": delta[pw["name"]][1]["ci_high"] if pw["name"] in delta else math.nan,
+        })
+        rows.append(row)
+    return rows
+
+def analyze_file(path, key=None, pdf_path=None):
+    """
+    Worker entry point. Never raises — returns (path, rows, error, pdf_error),
+    where error means the snapshot could not be analysed (no rows) and
+    pdf_error that only its PDF report failed (rows are kept).
+    The experiment is named by the snapshot's experiment_id, else key — its
+    path relative to the common input directory, from snapshot_keys — else
+    (called without a key) the file name; run_batch makes names unique.
+    With pdf_path, also writes the PDF report there; charts render in this
+    worker (the pool already spreads experiments over the cores).
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        if not isinstance(snapshot, dict):
+            raise ValueError("snapshot is not a JSON object")
+        experiment = (str(snapshot.get("experiment_id") or "").strip() or key
+                      or os.path.splitext(os.path.basename(path))[0])
+        res  = analyze_snapshot(snapshot)
+        rows = summarize_results(experiment, res, path)
+    except Exception as e:
+        return path, [], f"{type(e).__name__}: {e}", None
+    if pdf_path is not None:
+        try:
+            from ab_report import generate_snapshot_report
+            pdf = generate_snapshot_report(res, hypothesis=snapshot.get("hyp_smart") or "", workers=1)
+            with open(pdf_path, "wb") as f:
+                f.write(pdf)
+        except Exception as e:
+            return path, rows, None, f"{type(e).__name__}: {e}"
+    return path, rows, None, None
+
+
+# -----------------------------------------------
+# OUTPUT
+# -----------------------------------------------
+def write_summary(rows, out_path):
+    import pandas as pd
+    df  = pd.DataFrame(rows)
+    ext = os.path.splitext(out_path)[1].lower()
+    if ext == ".csv":
+        df.to_csv(out_path, index=False)
+    elif ext == ".parquet":
+        df.to_parquet(out_path, index=False)   # needs pyarrow or fastparquet
+    elif ext == ".jsonl":
+        df.to_json(out_path, orient="records", lines=True)
+    else:
+        raise ValueError(f"Unsupported output format '{ext}' — use one of {', '.join(OUTPUT_FORMATS)}")
+
+def _progress(done, total, t0, n_failed, stream=sys.stderr):
+    elapsed = time.perf_counter() - t0
+    rate    = done / elapsed if elapsed > 0 else 0.0
+    stream.write(f"\r[{done:>{len(str(total))}}/{total}] {done / total:6.1%} · "
+                 f"{rate:7.1f} exp/s · {n_failed} failed")
+    stream.flush()
+
+
+# -----------------------------------------------
+# DRIVER
+# -----------------------------------------------
+def run_batch(paths, workers=None, chunksize=None, progress=True, pdf_dir=None):
+    """
+    Analyse every snapshot in paths across a process pool, optionally writing
+    a PDF report per snapshot into pdf_dir. Snapshots without an
+    experiment_id are named by their path relative to the common input
+    directory (snapshot_keys), so same-named files in different directories
+    stay apart; names that still collide (a repeated experiment_id, compared
+    case-insensitively) get " (2)", " (3)", ... in path order. Reports are
+    written under a temporary name and then moved to
+    <pdf_stem(experiment)>.pdf, de-duplicated the same way and never
+    PORTFOLIO_PDF; each row's "pdf_report" holds the file name, or None if
+    the report failed.
+    Returns (rows, failures, pdf_failures): (path, error) tuples for snapshots
+    that could not be analysed, and for analysed ones whose PDF failed.
+    """
+    workers   = workers or os.cpu_count() or 1
+    chunksize = chunksize or max(1, len(paths) // (workers * 8))
+    rows, failures, pdf_failures = [], [], []
+    t0 = time.perf_counter()
+    keys      = snapshot_keys(paths)
+    tmp_paths = [None] * len(paths)
+    if pdf_dir is not None:
+        os.makedirs(pdf_dir, exist_ok=True)
+        tmp_paths = [os.path.join(pdf_dir, f".part-{os.getpid()}-{i}.pdf") for i in range(len(paths))]
+    taken, taken_pdf = set(), {os.path.splitext(PORTFOLIO_PDF)[0].lower()}
+    if workers == 1:
+        results = map(analyze_file, paths, keys, tmp_paths)
+        pool    = None
+    else:
+        pool    = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(analyze_file, paths, keys, tmp_paths, chunksize=chunksize)
+    try:
+        for done, ((path, file_rows, err, pdf_err), tmp) in enumerate(zip(results, tmp_paths), 1):
+            if err:
+                failures.append((path, err))
+            if pdf_err:
+                pdf_failures.append((path, pdf_err))
+            if file_rows:
+                name = unique_name(file_rows[0]["experiment"], taken)
+                pdf  = None
+                if tmp is not None and not pdf_err and os.path.exists(tmp):
+                    pdf = unique_name(pdf_stem(name), taken_pdf, "{name}_{i}") + ".pdf"
+                    os.replace(tmp, os.path.join(pdf_dir, pdf))
+                for r in file_rows:
+                    r["experiment"] = name
+                    if pdf_dir is not None:
+                        r["pdf_report"] = pdf
+            rows.extend(file_rows)
+            if progress and (done == len(paths) or done % max(1, len(paths) // 100) == 0):
+                _progress(done, len(paths), t0, len(failures))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        for tmp in tmp_paths:
+            if tmp is not None and os.path.exists(tmp):
+                os.remove(tmp)
+    if progress and paths:
+        sys.stderr.write("\n")
+    return rows, failures, pdf_failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-analyse A/B test snapshots without the UI.")
+    parser.add_argument("inputs", nargs="+", help="Snapshot files, directories, or glob patterns.")
+    parser.add_argument("-o", "--output", default="ab_batch_summary.csv",
+                        help=f"Summary file; format from extension ({', '.join(OUTPUT_FORMATS)}).")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Worker processes (default: all cores).")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Snapshots handed to a worker at a time.")
+    parser.add_argument("--pdf-dir", default=None,
+                        help=f"Also write one PDF report per experiment and {PORTFOLIO_PDF} here.")
+    parser.add_argument("-q", "--quiet", action="store_true", help="No progress output.")
+    args = parser.parse_args(argv)
+
+    if os.path.splitext(args.output)[1].lower() not in OUTPUT_FORMATS:
+        parser.error(f"output must end in one of {', '.join(OUTPUT_FORMATS)}")
+    paths = find_snapshots(args.inputs)
+    if not paths:
+        parser.error("no snapshot files matched")
+
+    t0 = time.perf_counter()
+    rows, failures, pdf_failures = run_batch(paths, args.workers, args.chunksize, progress=not args.quiet,
+                               pdf_dir=args.pdf_dir)
+    elapsed = time.perf_counter() - t0
+    if rows:
+        write_summary(rows, args.output)
+
+    analysed = len({r["path"] for r in rows})
+    print(f"Analysed {analysed}/{len(paths)} experiments in {elapsed:.2f}s "
+          f"({len(paths) / elapsed:.1f} exp/s) → {args.output if rows else 'no output'}")
+    if args.pdf_dir is not None:
+        from ab_report import generate_portfolio_report
+        summary = os.path.join(args.pdf_dir, PORTFOLIO_PDF)
+        with open(summary, "wb") as f:
+            f.write(generate_portfolio_report(rows, failures))
+        n_pdf = len({r["pdf_report"] for r in rows} - {None})
+        print(f"PDF reports: {n_pdf} in {args.pdf_dir} "
+              f"({n_pdf / elapsed * 60:.1f} reports/min) + {summary}")
+    if failures:
+        print(f"{len(failures)} failed:")
+        for path, err in failures:
+            print(f"  {path}: {err}")
+    if pdf_failures:
+        print(f"{len(pdf_failures)} analysed but PDF report failed:")
+        for path, err in pdf_failures:
+            print(f"  {path}: {err}")
+    return 1 if failures or pdf_failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2047 @@
+"""
+Statistical core of the A/B Test Analyzer.
+
+Pure functions only — no Streamlit, no plotting. Imported by the dashboard
+(ab_test_analyzer.py) and by the headless batch runner (ab_batch.py).
+SciPy and statsmodels are imported inside the functions that use them, so
+`import ab_engine` only pays for NumPy.
+"""
+import json
+import datetime
+import functools
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# -----------------------------------------------
+# JSON HELPERS
+# -----------------------------------------------
+class NumpyEncoder(json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, np.integer):
+            return int(o)
+        if isinstance(o, np.floating):
+            return float(o)
+        if isinstance(o, np.ndarray):
+            return o.tolist()
+        if isinstance(o, np.bool_):
+            return bool(o)
+        return super().default(o)
+
+
+# -----------------------------------------------
+# CONSTANTS
+# -----------------------------------------------
+BAYESIAN_SAMPLES  = 50_000
+BAYESIAN_QUAD_POINTS = 2_048   # grid size for exact A/B/n P(best) / expected loss
+BOOTSTRAP_SAMPLES = 10_000
+BOOTSTRAP_MAX_BYTES = 128 * 1024 ** 2   # memory ceiling for one chunk of bootstrap resamples
+RECONSTRUCT_SUPPORT = 1_024   # quantile points standing in for converters' order values
+SKETCH_ACCURACY = 0.01        # relative error of an order value in the log-bucket sketch
+QTE_QUANTILES = (0.10, 0.25, 0.50, 0.75, 0.90)   # order-value quantiles compared by quantile_treatment_effects
+INC_STATS = ("users", "conv", "rev", "rev_sq", "prod")   # per-arm running sums of the incremental state
+ANALYSIS_CACHE_SIZE = 256   # max cached analysis results (LRU eviction)
+RNG_SEED = 42   # root entropy mixed into every keyed random stream
+CONF_ALPHA = {"90%": 0.10, "95%": 0.05, "99%": 0.01}
+VARIATION_FIELDS = ("users", "conv", "rev", "prod")   # per-arm inputs, besides the name
+BAYESIAN_MC_MAX_BYTES = 256 * 1024 ** 2   # memory ceiling for one chunk of posterior draws
+SEQ_MODES = {"group_sequential": "Group-sequential (planned looks)", "always_valid": "Always-valid (continuous)"}
+SEQ_SPENDING = {"obrien_fleming": "O'Brien-Fleming", "pocock": "Pocock"}   # Lan-DeMets spending functions
+SEQ_GRID_POINTS = 401   # odd; Simpson grid for the recursive boundary integration
+SEQ_MAX_Z = 8.0   # continuation grid half-width cap (z); mass beyond is below 1e-15
+AVI_STATS = ("users", "conv", "rev", "rev_sq")   # per-arm sufficient statistics of the always-valid state
+CUPED_FIELDS = ("pre_sum", "pre_sum_sq", "pre_cross_conv", "pre_cross_rev")   # per-arm covariate aggregates
+
+
+# -----------------------------------------------
+# INPUT DEFAULTS & SNAPSHOT FORMAT
+# -----------------------------------------------
+DEFAULT_INPUTS = {
+    "experiment_id": "",   # key in the snapshot history (ab_store.py)
+    "num_variations": 1,
+    # Control
+    "users_c": 5000, "conv_c": 500, "rev_c": 25000.0, "prod_c": 750,
+    "rev_sq_c": 0.0,   # optional Σ revenue² over users, for analytic revenue CIs (0 = unknown)
+    # Variations — one column per field, one row per arm (any number of arms)
+    "variations": {"name": ["Variation A"], "users": [5000], "conv": [600],
+                   "rev": [33000.0], "prod": [1000], "rev_sq": [0.0]},
+    "days": 14, "conf_level": "95%", "mc_method": "holm", "primary_goal": "Maximize CR",
+    "all_pairs": False,
+    "start_date": None,
+    # Group-sequential monitoring: design + users per arm at each recorded look
+    "seq_spending": "obrien_fleming", "seq_looks": 5, "seq_max_users": 10000, "seq_history": [],
+    # Monitoring mode for the Stopping tab, and the always-valid (mSPRT) state at the last recorded look
+    "seq_mode": "group_sequential", "avi_state": None,
+    # CUPED: pre-experiment covariate aggregates per arm (columnar over CUPED_FIELDS, Control first)
+    "cuped": None,
+    "p_traffic": 50000, "p_base_cr": 2.5, "p_base_aov": 75.0,
+    "p_mde": 5.0, "p_vol": "Medium (Standard E-com)", "p_var_red": 0.0,
+    "s1_uc": 2000, "s1_cc": 100, "s1_uv": 2000, "s1_cv": 110,
+    "s2_uc": 3000, "s2_cc": 400, "s2_uv": 3000, "s2_cv": 420,
+    # Guardrail metrics
+    "num_guardrails": 1,
+    "g0_name": "Bounce Rate",       "g0_ctrl": 45.0, "g0_var": 0.0, "g0_threshold": 5.0, "g0_dir": "lower is better",
+    "g1_name": "Session Duration",  "g1_ctrl": 0.0,  "g1_var": 0.0, "g1_threshold": 5.0, "g1_dir": "higher is better",
+    "g2_name": "Add-to-Cart Rate",  "g2_ctrl": 0.0,  "g2_var": 0.0, "g2_threshold": 5.0, "g2_dir": "higher is better",
+    # Segment breakdown
+    "num_segments": 1,
+    "seg0_name": "Mobile",   "seg1_name": "Desktop",   "seg2_name": "Segment 3", "seg3_name": "Segment 4",
+    "seg0_uc": 0, "seg0_cc": 0, "seg0_rc": 0.0, "seg0_uv": 0, "seg0_cv": 0, "seg0_rv": 0.0,
+    "seg1_uc": 0, "seg1_cc": 0, "seg1_rc": 0.0, "seg1_uv": 0, "seg1_cv": 0, "seg1_rv": 0.0,
+    "seg2_uc": 0, "seg2_cc": 0, "seg2_rc": 0.0, "seg2_uv": 0, "seg2_cv": 0, "seg2_rv": 0.0,
+    "seg3_uc": 0, "seg3_cc": 0, "seg3_rc": 0.0, "seg3_uv": 0, "seg3_cv": 0, "seg3_rv": 0.0,
+}
+
+SAVE_KEYS = [
+    "experiment_id", "num_variations",
+    "users_c","conv_c","rev_c","prod_c","rev_sq_c",
+    "variations",
+    "days","conf_level","mc_method","primary_goal","all_pairs",
+    "seq_spending","seq_looks","seq_max_users","seq_history","seq_mode","avi_state",
+    "cuped",
+    # Sample-size calculator inputs (preserved in snapshots)
+    "p_traffic","p_base_cr","p_base_aov","p_mde","p_vol","p_var_red",
+    "s1_uc","s1_cc","s1_uv","s1_cv",
+    "s2_uc","s2_cc","s2_uv","s2_cv",
+    # Guardrail metrics
+    "num_guardrails",
+    "g0_name","g0_ctrl","g0_var","g0_threshold","g0_dir",
+    "g1_name","g1_ctrl","g1_var","g1_threshold","g1_dir",
+    "g2_name","g2_ctrl","g2_var","g2_threshold","g2_dir",
+    # Segment breakdown
+    "num_segments",
+    "seg0_name","seg0_uc","seg0_cc","seg0_rc","seg0_uv","seg0_cv","seg0_rv",
+    "seg1_name","seg1_uc","seg1_cc","seg1_rc","seg1_uv","seg1_cv","seg1_rv",
+    "seg2_name","seg2_uc","seg2_cc","seg2_rc","seg2_uv","seg2_cv","seg2_rv",
+    "seg3_name","seg3_uc","seg3_cc","seg3_rc","seg3_uv","seg3_cv","seg3_rv",
+]
+
+
+# -----------------------------------------------
+# INPUT DIGESTS & RANDOM STREAMS
+# -----------------------------------------------
+def _canonical(obj):
+    """JSON-ready stand-in for obj; arrays are replaced by a digest of their bytes."""
+    if isinstance(obj, np.ndarray):
+        buf = np.ascontiguousarray(obj)
+        return {"__ndarray__": hashlib.sha256(buf.tobytes()).hexdigest(),
+                "dtype": buf.dtype.str, "shape": list(buf.shape)}
+    if isinstance(obj, ArmTable):
+        return {"__arms__": _canonical(obj.columns())}
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v) for v in obj]
+    return obj
+
+def input_digest(*parts):
+    """SHA-256 hex digest of arbitrary (JSON-able or NumPy) inputs, stable across processes."""
+    payload = json.dumps(_canonical(parts), sort_keys=True, cls=NumpyEncoder)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def seed_for(name, *inputs):
+    """
+    SeedSequence for one computation, keyed on its name and inputs. The same
+    inputs always give the same stream — in the dashboard, the PDF, the batch
+    runner or any worker process — so Monte Carlo results are reproducible
+    and safe to cache. Use .spawn(k) for independent sub-streams.
+    """
+    return np.random.SeedSequence([RNG_SEED, int(input_digest(name, *inputs)[:32], 16)])
+
+def rng_for(name, *inputs):
+    """Generator on the keyed stream seed_for(name, *inputs)."""
+    return np.random.default_rng(seed_for(name, *inputs))
+
+def rng_streams(name, *inputs, n=2):
+    """n independent Generators spawned from seed_for(name, *inputs), e.g. one per arm."""
+    return [np.random.default_rng(s) for s in seed_for(name, *inputs).spawn(n)]
+
+
+# -----------------------------------------------
+# ANALYSIS CACHE
+# -----------------------------------------------
+class AnalysisCache:
+    """
+    Bounded LRU cache of analysis results, keyed on a canonical hash of the
+    function name and its inputs. Because keys are content-addressed, a loaded
+    snapshot that swaps every input simply maps to a different entry.
+    Cached results are shared between reruns — treat them as read-only.
+    """
+    def __init__(self, maxsize=ANALYSIS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits    = 0
+        self.misses  = 0
+        self._data   = OrderedDict()
+        self._lock   = threading.Lock()
+
+    @staticmethod
+    def make_key(name, *args, **kwargs):
+        return input_digest(name, args, kwargs)
+
+    def get_or_compute(self, name, fn, *args, **kwargs):
+        key = self.make_key(name, *args, **kwargs)
+        hit, result = self.lookup(key)
+        if not hit:
+            result = fn(*args, **kwargs)
+            self.store(key, result)
+        return result
+
+    def lookup(self, key):
+        """(True, value) for a cached key, else (False, None). Counts the hit or miss."""
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return True, self._data[key]
+            self.misses += 1
+            return False, None
+
+    def store(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._data), "maxsize": self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+
+# -----------------------------------------------
+# HELPERS
+# -----------------------------------------------
+def safe_divide(n, d, fallback=0.0):
+    return n / d if d != 0 else fallback
+
+def calculate_uplift(ctrl, var):
+    return safe_divide((var - ctrl) * 100, ctrl)
+
+def safe_divide_array(n, d, fallback=0.0):
+    """Element-wise safe_divide over arrays."""
+    n, d = np.broadcast_arrays(np.asarray(n, dtype=float), np.asarray(d, dtype=float))
+    return np.divide(n, d, out=np.full(n.shape, fallback), where=d != 0)
+
+def calculate_uplift_array(ctrl, var):
+    """Element-wise calculate_uplift (percent) over arrays."""
+    return safe_divide_array((np.asarray(var, dtype=float) - ctrl) * 100, ctrl)
+
+
+# -----------------------------------------------
+# ARMS  (columnar, any number of groups)
+# -----------------------------------------------
+def variation_label(i):
+    """Default name of variation i: Variation A … Z, AA, AB, …"""
+    letters = ""
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        letters = chr(65 + r) + letters
+    return f"Variation {letters}"
+
+class ArmTable:
+    """
+    Control plus any number of variations, one NumPy column per field
+    (users, conv, rev, prod) and a parallel list of names. Row 0 is Control.
+    The engine's vectorised paths work on the columns; to_groups() gives the
+    list-of-dicts form the dashboard and reports iterate over.
+    """
+    __slots__ = ("names", "users", "conv", "rev", "prod")
+
+    def __init__(self, names, users, conv, rev, prod):
+        self.names = [str(n) for n in names]
+        self.users = np.asarray(users)
+        self.conv  = np.asarray(conv)
+        self.rev   = np.asarray(rev, dtype=float)
+        self.prod  = np.asarray(prod)
+        if not (len(self.names) == len(self.users) == len(self.conv) == len(self.rev) == len(self.prod)):
+            raise ValueError("ArmTable columns must all have one entry per arm")
+
+    @classmethod
+    def from_groups(cls, groups):
+        return cls([g["name"] for g in groups], [g["users"] for g in groups], [g["conv"] for g in groups],
+                   [g["rev"] for g in groups], [g["prod"] for g in groups])
+
+    @classmethod
+    def coerce(cls, groups):
+        """groups as an ArmTable (groups may already be one, or a list of group dicts)."""
+        return groups if isinstance(groups, cls) else cls.from_groups(groups)
+
+    def __len__(self):
+        return len(self.names)
+
+    def columns(self):
+        return {"name": self.names, "users": self.users, "conv": self.conv, "rev": self.rev, "prod": self.prod}
+
+    def to_groups(self):
+        cols = [self.users.tolist(), self.conv.tolist(), self.rev.tolist(), self.prod.tolist()]
+        return [{"name": n, "users": u, "conv": c, "rev": r, "prod": p}
+                for n, u, c, r, p in zip(self.names, *cols)]
+
+
+# -----------------------------------------------
+# SRM TEST  (supports N groups)
+# -----------------------------------------------
+def perform_srm_test(observed, expected_split=None):
+    from scipy.stats import chisquare
+    n = len(observed)
+    if expected_split is None:
+        expected_split = [1 / n] * n
+    total    = sum(observed)
+    expected = [total * p for p in expected_split]
+    stat, p  = chisquare(observed, f_exp=expected)
+    return stat, p
+
+
+# -----------------------------------------------
+# DURATION ANALYSIS
+# -----------------------------------------------
+def analyze_test_duration(days, start_date=None):
+    """
+    Runs multiple business-cycle checks on the test duration.
+    Returns a list of check dicts:
+      {"id": str, "level": "pass"|"warning"|"error", "label": str, "msg": str}
+    start_date: datetime.date or None. When provided, enables day-of-week bias detection.
+    """
+    _DOW = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    full_weeks = days // 7
+    remainder  = days % 7
+    checks = []
+
+    # 1. Minimum duration / novelty
+    if days < 7:
+        checks.append({"id": "too_short", "level": "error",
+                        "label": "Too Short",
+                        "msg": f"{days} day{'s' if days != 1 else ''} is below the 7-day minimum — results are unreliable."})
+    elif days < 14:
+        checks.append({"id": "novelty", "level": "warning",
+                        "label": "Novelty Risk",
+                        "msg": f"{days} days — users may still be reacting to the change. Industry standard is 14+ days."})
+    else:
+        checks.append({"id": "duration_ok", "level": "pass",
+                        "label": "Duration OK",
+                        "msg": f"{days} days ({full_weeks} full week{'s' if full_weeks != 1 else ''})."})
+
+    # 2. Seasonality risk for very long tests
+    if days > 90:
+        checks.append({"id": "long_running", "level": "warning",
+                        "label": "Seasonality Risk",
+                        "msg": f"{days} days is a long test. Results may be contaminated by seasonal trends unrelated to the change."})
+
+    # 3. Business week integrity
+    if days >= 7 and remainder != 0:
+        checks.append({"id": "incomplete_weeks", "level": "warning",
+                        "label": "Incomplete Weeks",
+                        "msg": (f"{days} days = {full_weeks} full week{'s' if full_weeks != 1 else ''}"
+                                f" + {remainder} extra day{'s' if remainder != 1 else ''}."
+                                f" Partial weeks introduce day-of-week bias.")})
+    elif days >= 14:
+        checks.append({"id": "weeks_ok", "level": "pass",
+                        "label": "Full Weeks",
+                        "msg": f"{full_weeks} complete week{'s' if full_weeks != 1 else ''} — no day-of-week bias."})
+
+    # 4. Day-of-week alignment (only when start date is provided)
+    if start_date is not None:
+        end_date  = start_date + datetime.timedelta(days=days - 1)
+        start_dow = start_date.weekday()   # 0 = Monday
+        end_dow   = end_date.weekday()     # 6 = Sunday
+        if start_dow == 0 and end_dow == 6:
+            checks.append({"id": "dow_ok", "level": "pass",
+                            "label": "Week Alignment",
+                            "msg": f"Started {_DOW[start_dow]}, ended {_DOW[end_dow]} — perfect Mon→Sun alignment."})
+        else:
+            checks.append({"id": "dow_bias", "level": "warning",
+                            "label": "Day-of-Week Bias",
+                            "msg": (f"Test ran {_DOW[start_dow]} → {_DOW[end_dow]}. "
+                                    f"Ideal window is Mon → Sun. Partial week coverage may skew results.")})
+
+    return checks
+
+
+# -----------------------------------------------
+# GUARDRAIL METRICS ENGINE
+# -----------------------------------------------
+def evaluate_guardrails(guardrails):
+    """
+    guardrails: list of dicts — name, ctrl_val, var_val, threshold, direction.
+    direction: "lower is better" | "higher is better"
+    Returns list of result dicts with violated flag.
+    """
+    results = []
+    for g in guardrails:
+        ctrl = g["ctrl_val"]
+        var  = g["var_val"]
+        if ctrl == 0:
+            results.append({
+                "name": g["name"], "ctrl": ctrl, "var": var,
+                "delta_pct": 0.0, "violated": False, "skip": True,
+            })
+            continue
+        delta_pct = ((var - ctrl) / ctrl) * 100
+        if g["direction"] == "lower is better":
+            violated = delta_pct > g["threshold"]
+        else:
+            violated = delta_pct < -g["threshold"]
+        results.append({
+            "name":      g["name"],
+            "ctrl":      ctrl,
+            "var":       var,
+            "delta_pct": delta_pct,
+            "threshold": g["threshold"],
+            "direction": g["direction"],
+            "violated":  violated,
+            "skip":      False,
+        })
+    return results
+
+
+# -----------------------------------------------
+# SEGMENT BREAKDOWN ENGINE
+# -----------------------------------------------
+def analyze_segments(segments, alpha):
+    """
+    segments: list of dicts — name, uc, cc, rc, uv, cv, rv.
+    Returns one result dict per segment. No MCC — exploratory consistency check.
+    The z-tests for all segments run as one pooled_ztest call.
+    """
+    live = [s for s in segments if s["uc"] != 0 and s["uv"] != 0]
+    if live:
+        uc, cc, uv, cv = (np.array([s[k] for s in live], dtype=float) for k in ("uc", "cc", "uv", "cv"))
+        z_all, p_all = pooled_ztest(cc, uc, cv, uv)
+        tests = iter(zip(z_all.tolist(), p_all.tolist()))
+    results = []
+    for s in segments:
+        uc, cc, rc = s["uc"], s["cc"], s["rc"]
+        uv, cv, rv = s["uv"], s["cv"], s["rv"]
+        if uc == 0 or uv == 0:
+            results.append({"name": s["name"], "skip": True})
+            continue
+        ctrl_cr  = min(safe_divide(cc, uc), 1.0)
+        var_cr   = min(safe_divide(cv, uv), 1.0)
+        ctrl_rpv = safe_divide(rc, uc)
+        var_rpv  = safe_divide(rv, uv)
+        z_stat, p_val = next(tests)
+        if not np.isfinite(p_val):
+            p_val = 1.0
+        results.append({
+            "name":        s["name"],
+            "ctrl_cr":     ctrl_cr,
+            "var_cr":      var_cr,
+            "ctrl_rpv":    ctrl_rpv,
+            "var_rpv":     var_rpv,
+            "uplift_cr":   calculate_uplift(ctrl_cr, var_cr),
+            "uplift_rpv":  calculate_uplift(ctrl_rpv, var_rpv),
+            "z_stat":      z_stat if np.isfinite(z_stat) else 0.0,
+            "p_value":     p_val,
+            "significant": p_val <= alpha,
+            "ctrl_users":  uc,
+            "var_users":   uv,
+            "ctrl_conv":   cc,
+            "var_conv":    cv,
+            "skip":        False,
+        })
+    return results
+
+
+# -----------------------------------------------
+# MULTI-VARIANT STATISTICAL ENGINE
+# -----------------------------------------------
+def pooled_ztest(count1, nobs1, count2, nobs2):
+    """
+    Two-sided pooled two-proportion z-test, element-wise over arrays — the
+    same statistic as statsmodels' proportions_ztest([count1, count2],
+    [nobs1, nobs2]). Degenerate inputs give NaN/inf rather than raising.
+    """
+    from scipy.special import ndtr
+    c1, n1, c2, n2 = (np.asarray(x, dtype=float) for x in (count1, nobs1, count2, nobs2))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p_pool = (c1 + c2) / (n1 + n2)
+        std    = np.sqrt(p_pool * (1 - p_pool) * (1 / n1 + 1 / n2))
+        z      = (c1 / n1 - c2 / n2) / std
+    return z, 2 * ndtr(-np.abs(z))
+
+def chi2_omnibus(conv, users):
+    """
+    Pearson chi-square test of independence on the arms × (converted, not
+    converted) table over the last axis — chi2_contingency's statistic and
+    p-value, Yates-corrected for two arms — for one experiment or a stack of
+    them. Tables chi2_contingency rejects (a negative cell, a zero expected
+    count) give (0.0, 1.0).
+    """
+    from scipy.special import chdtrc
+    conv  = np.asarray(conv, dtype=float)
+    users = np.asarray(users, dtype=float)
+    obs   = np.stack([conv, users - conv], axis=-1)   # (..., n_arms, 2)
+    dof   = conv.shape[-1] - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = obs.sum(axis=-1, keepdims=True) * obs.sum(axis=-2, keepdims=True) \
+                   / obs.sum(axis=(-2, -1), keepdims=True)
+        invalid  = (obs < 0).any(axis=(-2, -1)) | ~np.isfinite(expected).all(axis=(-2, -1)) \
+                   | (expected == 0).any(axis=(-2, -1))
+        if dof == 1:
+            diff = expected - obs
+            obs  = obs + np.minimum(0.5, np.abs(diff)) * np.sign(diff)
+        stat = ((obs - expected) ** 2 / expected).sum(axis=(-2, -1))
+    if dof < 1:
+        return np.zeros(stat.shape), np.ones(stat.shape)
+    stat = np.where(invalid, 0.0, stat)
+    return stat, np.where(invalid, 1.0, chdtrc(dof, stat))
+
+def p_adjust(pvals, alpha, method="holm"):
+    """
+    multipletests(pvals, alpha, method) reject flags and adjusted p-values
+    for holm, bonferroni and fdr_bh, computed over the last axis so each row
+    of a 2-D array is its own family. Other methods go to statsmodels (1-D).
+    Returns (reject, p_adjusted).
+    """
+    p = np.asarray(pvals, dtype=float)
+    n = p.shape[-1]
+    if n == 0:
+        return np.zeros(p.shape, dtype=bool), p.copy()
+    if method == "bonferroni":
+        return p <= alpha / n, np.minimum(p * n, 1.0)
+    if method not in ("holm", "fdr_bh"):
+        from statsmodels.stats.multitest import multipletests
+        reject, p_adj, _, _ = multipletests(p, alpha=alpha, method=method)
+        return reject, p_adj
+    order = np.argsort(p, axis=-1)
+    ps    = np.take_along_axis(p, order, axis=-1)
+    if method == "holm":
+        steps  = np.arange(n, 0, -1)
+        reject = ~np.logical_or.accumulate(ps > alpha / steps, axis=-1)
+        adj    = np.maximum.accumulate(ps * steps, axis=-1)
+    else:
+        ecdf   = np.arange(1, n + 1) / n
+        reject = np.logical_or.accumulate((ps <= ecdf * alpha)[..., ::-1], axis=-1)[..., ::-1]
+        adj    = np.minimum.accumulate((ps / ecdf)[..., ::-1], axis=-1)[..., ::-1]
+    out_reject = np.empty(p.shape, dtype=bool)
+    out_adj    = np.empty(p.shape)
+    np.put_along_axis(out_reject, order, reject, axis=-1)
+    np.put_along_axis(out_adj, order, np.minimum(adj, 1.0), axis=-1)
+    return out_reject, out_adj
+
+def multivariate_arrays(users, conv, rev, prod, alpha, mc_method):
+    """
+    Numeric core of run_multivariate_analysis over the last axis: the arms
+    (Control first) of one experiment, or shape (experiments, arms) for a
+    stack of experiments with the same number of arms. Returns a dict of
+    arrays — per-arm metrics and uplifts vs Control (..., arms), pooled
+    z-tests with MCC per variation (..., arms − 1) and the omnibus
+    chi-square (...).
+    """
+    users = np.asarray(users, dtype=float)
+    conv  = np.asarray(conv, dtype=float)
+    rev   = np.asarray(rev, dtype=float)
+    prod  = np.asarray(prod, dtype=float)
+
+    cr  = np.minimum(safe_divide_array(conv, users), 1.0)   # clamp: conv can't exceed users
+    aov = safe_divide_array(rev, conv)
+    rpv = safe_divide_array(rev, users)
+    apo = safe_divide_array(prod, conv)
+    apu = safe_divide_array(prod, users)
+    ctrl_cr = safe_divide_array(conv[..., :1], users[..., :1])   # unclamped, as the uplift baseline
+
+    chi2_g, p_global = chi2_omnibus(conv, users)
+    z_stat, p_raw    = pooled_ztest(conv[..., :1], users[..., :1], conv[..., 1:], users[..., 1:])
+    # Replace NaN/inf p-values (from degenerate inputs like conv > users) with 1.0
+    reject, p_adj = p_adjust(np.where(np.isfinite(p_raw), p_raw, 1.0), alpha, mc_method)
+    return {
+        "cr": cr, "aov": aov, "rpv": rpv, "apo": apo, "apu": apu,
+        "uplift_cr":  calculate_uplift_array(ctrl_cr, cr),
+        "uplift_aov": calculate_uplift_array(aov[..., :1], aov),
+        "uplift_rpv": calculate_uplift_array(rpv[..., :1], rpv),
+        "uplift_apo": calculate_uplift_array(apo[..., :1], apo),
+        "chi2_global": chi2_g, "p_global": p_global,
+        "z_stat": z_stat, "p_raw": p_raw, "p_adjusted": p_adj, "significant": reject,
+    }
+
+def run_multivariate_analysis(groups, alpha, mc_method, primary_goal="Maximize CR"):
+    """
+    groups: list of dicts — name, users, conv, rev, prod — or an ArmTable.
+    Returns omnibus chi-square, pairwise comparisons with MCC, per-group
+    metrics, and the name of the winner (if any). The numbers come from
+    multivariate_arrays, in one pass over all arms.
+
+    Multiple comparison correction options:
+      holm       – Holm-Bonferroni  (controls FWER, recommended default)
+      bonferroni – Bonferroni        (most conservative)
+      fdr_bh     – Benjamini-Hochberg (controls FDR, best for exploratory)
+    """
+    arms = ArmTable.coerce(groups)
+    a    = multivariate_arrays(arms.users, arms.conv, arms.rev, arms.prod, alpha, mc_method)
+
+    # --- Per-group metrics ---
+    cols = [arms.users.tolist(), arms.conv.tolist()] + [x.tolist() for x in (
+            a["cr"], a["cr"] * 100, a["aov"], a["rpv"], a["apo"], a["apu"],
+            a["uplift_cr"], a["uplift_aov"], a["uplift_rpv"])]
+    metrics = [
+        {"name": name, "users": u, "conv": c, "cr": r, "cr_pct": r_pct, "aov": av, "rpv": v, "apo": po, "apu": pu,
+         "uplift_cr": ucr, "uplift_aov": uaov, "uplift_rpv": urpv}
+        for name, u, c, r, r_pct, av, v, po, pu, ucr, uaov, urpv in zip(arms.names, *cols)
+    ]
+
+    # --- Pairwise: each variation vs control, corrected for multiple comparisons ---
+    pairwise = [
+        {"name": name, "z_stat": z, "p_raw": p, "p_adjusted": pa, "significant": sig,
+         "uplift_cr": ucr, "uplift_aov": uaov, "uplift_rpv": urpv, "uplift_apo": uapo}
+        for name, z, p, pa, sig, ucr, uaov, urpv, uapo in zip(
+            arms.names[1:], *(a[k].tolist() for k in ("z_stat", "p_raw", "p_adjusted", "significant")),
+            *(a[k][1:].tolist() for k in ("uplift_cr", "uplift_aov", "uplift_rpv", "uplift_apo")))
+    ]
+
+    # --- Winner selection — behaviour driven by primary_goal ---
+    #
+    # "Maximize CR":      Only variants with CR uplift > 0 qualify.
+    #                     Tiebreaker: RPV → AOV → lowest APO.
+    #
+    # "Maximize Revenue": Only variants with RPV uplift > 0 qualify.
+    #                     A lower-CR variant can win if it earns more per visitor.
+    #                     Tiebreaker: CR → AOV → lowest APO.
+    #
+    # "Balanced":         Composite score = 0.4 × uplift_cr + 0.6 × uplift_rpv.
+    #                     Variant must be significant and have positive composite score.
+    #                     Tiebreaker: AOV → lowest APO.
+
+    _composite = lambda x: 0.4 * x["uplift_cr"] + 0.6 * x["uplift_rpv"]
+
+    if primary_goal == "Maximize Revenue":
+        sig_winners   = [pw for pw in pairwise if pw["significant"] and pw["uplift_rpv"] > 0]
+        clean_winners = [pw for pw in sig_winners if pw["uplift_cr"] >= 0]
+        _winner_key   = lambda x: (x["uplift_rpv"], x["uplift_cr"], x["uplift_aov"], -x["uplift_apo"])
+    elif primary_goal == "Balanced":
+        sig_winners   = [pw for pw in pairwise if pw["significant"] and _composite(pw) > 0]
+        clean_winners = [pw for pw in sig_winners if pw["uplift_cr"] >= 0 and pw["uplift_rpv"] >= 0]
+        _winner_key   = lambda x: (_composite(x), x["uplift_aov"], -x["uplift_apo"])
+    else:  # "Maximize CR" (default)
+        sig_winners   = [pw for pw in pairwise if pw["significant"] and pw["uplift_cr"] > 0]
+        clean_winners = [pw for pw in sig_winners if pw["uplift_rpv"] >= 0]
+        _winner_key   = lambda x: (x["uplift_cr"], x["uplift_rpv"], x["uplift_aov"], -x["uplift_apo"])
+
+    winner = (
+        max(clean_winners, key=_winner_key)["name"]
+        if clean_winners
+        else (max(sig_winners, key=_winner_key)["name"] if sig_winners else None)
+    )
+    # Flag if winner was chosen despite the "other" metric being negative
+    winner_rpv_negative = (
+        winner is not None and not clean_winners and bool(sig_winners)
+    )
+
+    return {
+        "chi2_global": float(a["chi2_global"]), "p_global": float(a["p_global"]),
+        "pairwise": pairwise, "metrics": metrics,
+        "winner": winner, "winner_rpv_negative": winner_rpv_negative,
+        "correction": mc_method,
+        "n_comparisons": len(arms) - 1,
+    }
+
+
+def run_all_pairs_analysis(groups, alpha, mc_method):
+    """
+    Every arm against every other arm: k(k−1)/2 pooled z-tests as one
+    broadcast over the arms, with MCC applied across the whole matrix rather
+    than per row. Returns the arm names and (k, k) arrays where [i, j] tests
+    row arm i against column arm j — z_stat and uplift_cr are positive when
+    the row converts better. Both triangles hold the same tests; the diagonal
+    is NaN (not significant).
+    """
+    arms  = ArmTable.coerce(groups)
+    users = arms.users.astype(float)
+    conv  = arms.conv.astype(float)
+    k     = len(arms)
+    cr    = np.minimum(safe_divide_array(conv, users), 1.0)
+
+    z_stat, p_raw = pooled_ztest(conv[:, None], users[:, None], conv[None, :], users[None, :])
+    iu = np.triu_indices(k, 1)
+    p_tri = p_raw[iu]
+    reject_tri, p_adj_tri = p_adjust(np.where(np.isfinite(p_tri), p_tri, 1.0), alpha, mc_method)
+
+    p_adj       = np.full((k, k), np.nan)
+    significant = np.zeros((k, k), dtype=bool)
+    p_adj[iu]       = p_adj_tri
+    p_adj.T[iu]     = p_adj_tri
+    significant[iu]   = reject_tri
+    significant.T[iu] = reject_tri
+    diag = np.diag_indices(k)
+    z_stat[diag] = p_raw[diag] = np.nan
+    uplift_cr = calculate_uplift_array(cr[None, :], cr[:, None])
+    uplift_cr[diag] = np.nan
+    return {
+        "names": arms.names, "z_stat": z_stat, "p_raw": p_raw, "p_adjusted": p_adj,
+        "significant": significant, "uplift_cr": uplift_cr,
+        "correction": mc_method, "n_comparisons": len(p_tri),
+    }
+
+def all_pairs_table(all_pairs):
+    """
+    The significant cells of run_all_pairs_analysis as rows, one per pair,
+    oriented winner-first and sorted by adjusted p-value.
+    """
+    i, j = np.nonzero(np.triu(all_pairs["significant"], 1))
+    up   = all_pairs["uplift_cr"][i, j]
+    flip = up < 0
+    win, lose = np.where(flip, j, i), np.where(flip, i, j)
+    names = all_pairs["names"]
+    rows = [{"better": names[w], "worse": names[lo], "uplift_cr": float(all_pairs["uplift_cr"][w, lo]),
+             "z_stat": float(abs(all_pairs["z_stat"][w, lo])), "p_raw": float(all_pairs["p_raw"][w, lo]),
+             "p_adjusted": float(all_pairs["p_adjusted"][w, lo])}
+            for w, lo in zip(win.tolist(), lose.tolist())]
+    return sorted(rows, key=lambda r: r["p_adjusted"])
+
+
+# -----------------------------------------------
+# PORTFOLIO  (many experiments in one stacked pass)
+# -----------------------------------------------
+def _portfolio_column(table, name, n, default=None):
+    if name in table:
+        return list(table[name])
+    if default is None:
+        raise KeyError(f"portfolio table needs a '{name}' column")
+    return [default] * n
+
+def analyze_portfolio(table, alpha=0.05, mc_method="holm", control_label="Control"):
+    """
+    Multivariate statistics for many experiments at once. table is columnar
+    (a dict of sequences or a DataFrame), one row per arm: experiment, arm,
+    users, conv, rev, optional prod and shared_control. An experiment's
+    control is its arm named control_label (case-insensitive), else its first
+    row; more than one such arm (e.g. two snapshots merged under one
+    experiment name) raises ValueError. An experiment that names another in
+    shared_control uses that experiment's control for every one of its own
+    rows, which are then all variations — a shared control population is
+    entered once. A missing users, conv or rev column raises KeyError, and an
+    empty (NaN) cell in one raises ValueError; missing prod counts as 0.
+
+    Experiments with the same number of arms go through multivariate_arrays
+    as one stack. On top of each experiment's own correction (mc_method),
+    Benjamini-Hochberg runs across every variation-vs-control comparison of
+    the portfolio; it stays valid under the positive dependence that shared
+    controls create. Returns {"comparisons": ..., "experiments": ...}, both
+    columnar; comparisons are ranked — portfolio-significant first, then by
+    CR uplift.
+    """
+    n        = len(table["experiment"])
+    exp_col  = [str(e) for e in table["experiment"]]
+    arm_col  = [str(a) for a in table["arm"]]
+    vals     = {f: np.asarray(_portfolio_column(table, f, n), dtype=float) for f in ("users", "conv", "rev")}
+    for f, v in vals.items():
+        bad = np.flatnonzero(np.isnan(v))
+        if len(bad):
+            raise ValueError(f"portfolio column '{f}' is empty for experiment '{exp_col[bad[0]]}' "
+                             f"({len(bad)} row(s))")
+    vals["prod"] = np.nan_to_num(np.asarray(_portfolio_column(table, "prod", n, 0), dtype=float))
+    shared   = [("" if s is None or (isinstance(s, float) and np.isnan(s)) else str(s))
+                for s in _portfolio_column(table, "shared_control", n, "")]
+
+    rows_of = {}
+    for i, e in enumerate(exp_col):
+        rows_of.setdefault(e, []).append(i)
+    own_ctrl = {}
+    for e, rows in rows_of.items():
+        named = [i for i in rows if arm_col[i].lower() == control_label.lower()]
+        if len(named) > 1:
+            raise ValueError(f"experiment '{e}' has {len(named)} arms named '{control_label}' — "
+                             f"are two experiments listed under one name?")
+        own_ctrl[e] = named[0] if named else rows[0]
+    arm_rows = {}                          # experiment → row indices, control first
+    for e, rows in rows_of.items():
+        ref = next((shared[i] for i in rows if shared[i]), "")
+        if ref:
+            if ref not in own_ctrl or next((shared[i] for i in rows_of[ref] if shared[i]), ""):
+                raise ValueError(f"experiment '{e}' shares the control of '{ref}', which has no control of its own")
+            arm_rows[e] = [own_ctrl[ref]] + rows
+        else:
+            arm_rows[e] = [own_ctrl[e]] + [i for i in rows if i != own_ctrl[e]]
+
+    by_size = {}
+    for e, rows in arm_rows.items():
+        if len(rows) >= 2:
+            by_size.setdefault(len(rows), []).append(e)
+    comp = {k: [] for k in ("experiment", "arm", "control_users", "control_conv", "users", "conv", "cr_c", "cr_v",
+                            "uplift_cr", "uplift_rpv", "z_stat", "p_raw", "p_adjusted", "significant")}
+    exps = {k: [] for k in ("experiment", "n_arms", "users", "chi2_global", "p_global", "shared_control")}
+    for k, names in by_size.items():
+        idx = np.array([arm_rows[e] for e in names])                 # (experiments, arms)
+        a   = multivariate_arrays(vals["users"][idx], vals["conv"][idx], vals["rev"][idx], vals["prod"][idx],
+                                  alpha, mc_method)
+        exps["experiment"] += names
+        exps["n_arms"]     += [k] * len(names)
+        exps["users"]      += vals["users"][idx].sum(axis=1).tolist()
+        exps["chi2_global"] += a["chi2_global"].tolist()
+        exps["p_global"]   += a["p_global"].tolist()
+        exps["shared_control"] += [next((shared[i] for i in arm_rows[e][1:] if shared[i]), "") or None for e in names]
+        comp["experiment"] += [e for e in names for _ in range(k - 1)]
+        comp["arm"]        += [arm_col[i] for i in idx[:, 1:].ravel()]
+        comp["control_users"] += np.repeat(vals["users"][idx[:, 0]], k - 1).tolist()
+        comp["control_conv"]  += np.repeat(vals["conv"][idx[:, 0]], k - 1).tolist()
+        comp["users"]      += vals["users"][idx[:, 1:]].ravel().tolist()
+        comp["conv"]       += vals["conv"][idx[:, 1:]].ravel().tolist()
+        comp["cr_c"]       += np.repeat(a["cr"][:, 0], k - 1).tolist()
+        comp["cr_v"]       += a["cr"][:, 1:].ravel().tolist()
+        comp["uplift_cr"]  += a["uplift_cr"][:, 1:].ravel().tolist()
+        comp["uplift_rpv"] += a["uplift_rpv"][:, 1:].ravel().tolist()
+        for key in ("z_stat", "p_raw", "p_adjusted", "significant"):
+            comp[key] += a[key].ravel().tolist()
+
+    p_raw = np.asarray(comp["p_raw"], dtype=float)
+    reject, p_bh = p_adjust(np.where(np.isfinite(p_raw), p_raw, 1.0), alpha, "fdr_bh")
+    comp["p_portfolio"]           = p_bh.tolist()
+    comp["significant_portfolio"] = reject.tolist()
+    order = np.lexsort((-np.nan_to_num(np.asarray(comp["uplift_cr"], dtype=float), nan=-np.inf), ~reject))
+    comp  = {key: [v[i] for i in order] for key, v in comp.items()}
+    comp["rank"] = list(range(1, len(order) + 1))
+    return {"comparisons": comp, "experiments": exps, "alpha": alpha, "correction": mc_method,
+            "n_comparisons": len(order)}
+
+
+# -----------------------------------------------
+# BAYESIAN  (supports N groups)
+# -----------------------------------------------
+def _beta_param_arrays(arms):
+    """Beta(conv + 1, non-conv + 1) posterior parameters for every arm, as two float arrays."""
+    conv = arms.conv.astype(float)
+    return conv + 1, np.maximum(arms.users - conv, 0) + 1
+
+def _prob_beta_greater(a, b, c, d):
+    """
+    Exact P(X > Y) for X ~ Beta(c, d), Y ~ Beta(a, b) (Evan Miller's closed form).
+    Requires integer first shape parameters — always true for Beta(conv+1, non-conv+1).
+    Sums over the smaller of the two so the cost is O(min(a, c)).
+    """
+    from scipy.special import betaln
+    if c > a:
+        return 1.0 - _prob_beta_greater(c, d, a, b)
+    i     = np.arange(int(c), dtype=float)
+    terms = (betaln(a + i, b + d) - np.log(d + i)
+             - betaln(1 + i, d) - betaln(a, b))
+    return float(np.clip(np.exp(terms).sum(), 0.0, 1.0))
+
+def _expected_loss_pair(a, b, c, d):
+    """Exact E[max(X - Y, 0)] for X ~ Beta(c, d), Y ~ Beta(a, b) — the loss of choosing Y."""
+    mean_x = c / (c + d)
+    mean_y = a / (a + b)
+    loss = (mean_x * _prob_beta_greater(a, b, c + 1, d)
+            - mean_y * _prob_beta_greater(a + 1, b, c, d))
+    return max(float(loss), 0.0)
+
+def _bayesian_quadrature(params, n_points=BAYESIAN_QUAD_POINTS):
+    """
+    Deterministic P(best) and expected loss for N Beta posteriors by numerical integration:
+      P(k best)  = ∫ f_k(x) · Π_{j≠k} F_j(x) dx
+      E[loss_k]  = E[max_j X_j] − E[X_k],  E[max] = ∫ (1 − Π_j F_j(x)) dx
+    params is a pair of arrays (a, b). The grid only spans
+    where the maximum lives: from the highest "mean − 20 sd" up to the highest
+    "mean + 20 sd". Arms whose posterior lies wholly below it are out of
+    contention (P(best) = 0, F = 1 on the grid) and skip the integration, so
+    cost grows with the arms near the top, not the total arm count.
+    """
+    from scipy.special import betaln, betainc, xlogy, xlog1py
+    from scipy.integrate import trapezoid
+
+    a, b = (np.asarray(p, dtype=float) for p in params)
+    mean = a / (a + b)
+    sd   = np.sqrt(a * b / ((a + b) ** 2 * (a + b + 1)))
+    lo   = max(float((mean - 20 * sd).max()), 0.0)
+    hi   = min(float((mean + 20 * sd).max()), 1.0)
+    live = mean + 20 * sd >= lo
+    al, bl = a[live][:, None], b[live][:, None]
+    x    = np.linspace(lo, hi, n_points)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_cdf = np.log(betainc(al, bl, x))              # (n_live, n_points)
+        pdf     = np.exp(xlogy(al - 1, x) + xlog1py(bl - 1, -x) - betaln(al, bl))
+        log_prod = log_cdf.sum(axis=0)
+        others   = np.exp(log_prod - log_cdf, where=np.isfinite(log_cdf),
+                          out=np.zeros_like(log_cdf))
+    pdf       = np.nan_to_num(pdf, nan=0.0, posinf=0.0)
+    prob_best = np.zeros(len(a))
+    prob_best[live] = trapezoid(pdf * others, x, axis=1)
+    prob_best = np.clip(prob_best / prob_best.sum(), 0.0, 1.0)
+    e_max     = lo + trapezoid(1.0 - np.exp(log_prod), x)
+    exp_loss  = np.maximum(e_max - mean, 0.0)
+    return prob_best, exp_loss
+
+def _bayesian_monte_carlo(params, n_samples=BAYESIAN_SAMPLES, rng=None, max_bytes=BAYESIAN_MC_MAX_BYTES):
+    """
+    P(best) and expected loss from n_samples joint posterior draws, generated
+    in chunks of at most max_bytes so memory stays flat for many arms.
+    """
+    a, b = (np.asarray(p, dtype=float) for p in params)
+    rng   = rng or rng_for("bayesian_mc", a, b, n_samples)
+    k     = len(a)
+    chunk = max(1, min(n_samples, max_bytes // (8 * k)))
+    wins  = np.zeros(k, dtype=np.int64)
+    loss  = np.zeros(k)
+    for start in range(0, n_samples, chunk):
+        arr   = rng.beta(a, b, size=(min(chunk, n_samples - start), k))   # (chunk, n_groups)
+        wins += np.bincount(np.argmax(arr, axis=1), minlength=k)
+        loss += (arr.max(axis=1, keepdims=True) - arr).sum(axis=0)
+    return wins / n_samples, loss / n_samples
+
+def calculate_bayesian_multivariate(groups, method="exact"):
+    """
+    Beta-posterior analysis for all groups (list of dicts or an ArmTable)
+    simultaneously. Returns prob_best and expected_loss per group.
+
+    method:
+      exact        – closed form for two groups, numerical integration for A/B/n.
+                     Deterministic; no sampling noise between reruns.
+      monte_carlo  – BAYESIAN_SAMPLES joint draws (original behaviour).
+    Falls back to Monte Carlo if the exact path fails on degenerate inputs.
+    """
+    arms   = ArmTable.coerce(groups)
+    params = _beta_param_arrays(arms)
+    prob_best = exp_loss = None
+    if method == "exact":
+        try:
+            if len(arms) == 2:
+                (ac, av), (bc, bv) = params
+                p_v       = _prob_beta_greater(ac, bc, av, bv)
+                prob_best = np.array([1.0 - p_v, p_v])
+                exp_loss  = np.array([_expected_loss_pair(ac, bc, av, bv),
+                                      _expected_loss_pair(av, bv, ac, bc)])
+            else:
+                prob_best, exp_loss = _bayesian_quadrature(params)
+            if not (np.all(np.isfinite(prob_best)) and np.all(np.isfinite(exp_loss))):
+                prob_best = exp_loss = None
+        except (ValueError, FloatingPointError, OverflowError):
+            prob_best = exp_loss = None
+    if prob_best is None:
+        prob_best, exp_loss = _bayesian_monte_carlo(params)
+    return {
+        "prob_best":     dict(zip(arms.names, prob_best.tolist())),
+        "expected_loss": dict(zip(arms.names, exp_loss.tolist())),
+    }
+
+# Keep 2-group version for bootstrap tab
+def calculate_bayesian_risk(ac, bc, av, bv, method="exact"):
+    if method == "exact":
+        p_win = _prob_beta_greater(ac, bc, av, bv)
+        lv    = _expected_loss_pair(av, bv, ac, bc)
+        lc    = _expected_loss_pair(ac, bc, av, bv)
+        return p_win, lv, lc
+    rng_c, rng_v = rng_streams("bayesian_risk", ac, bc, av, bv, BAYESIAN_SAMPLES)
+    s_c   = rng_c.beta(ac, bc, BAYESIAN_SAMPLES)
+    s_v   = rng_v.beta(av, bv, BAYESIAN_SAMPLES)
+    p_win = float(np.mean(s_v > s_c))
+    lv    = float(np.mean(np.maximum(s_c - s_v, 0)))
+    lc    = float(np.mean(np.maximum(s_v - s_c, 0)))
+    return p_win, lv, lc
+
+
+# -----------------------------------------------
+# REVENUE SIGNIFICANCE
+# -----------------------------------------------
+# Per-user revenue is zero-inflated (95–99% of visitors buy nothing), so samples
+# are held sparse: the non-zero values, optional multiplicities, and a count of
+# zero-revenue users. Nothing below ever expands the zeros.
+def sparse_revenue(values, n_users, counts=None):
+    """
+    Compact per-user revenue: non-zero values (each occurring counts[i] times,
+    default once) plus how many of n_users had none. Memory scales with
+    converters, not visitors.
+    """
+    values = np.asarray(values, dtype=float)
+    counts = np.ones(len(values), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+    keep   = (values != 0) & (counts > 0)
+    values, counts = values[keep], counts[keep]
+    return {"values": values, "counts": counts, "n_zero": max(int(n_users) - int(counts.sum()), 0)}
+
+def _nonzero_part(sp):
+    """The converters of a sparse sample only (AOV sample); a single zero if there are none."""
+    return {"values": sp["values"], "counts": sp["counts"], "n_zero": 0 if len(sp["values"]) else 1}
+
+def _sparse_ties(sp, with_zero=True):
+    """(distinct values, counts) of a sparse sample; the zeros form one tie group."""
+    uniq, inv = np.unique(sp["values"], return_inverse=True)
+    counts    = np.bincount(inv, weights=sp["counts"], minlength=len(uniq)).astype(np.int64)
+    if with_zero and sp["n_zero"]:
+        at     = np.searchsorted(uniq, 0.0)
+        uniq   = np.insert(uniq, at, 0.0)
+        counts = np.insert(counts, at, sp["n_zero"])
+    return uniq, counts
+
+def reconstruct_revenue(n_users, n_conv, total_rev, n_support=RECONSTRUCT_SUPPORT):
+    """
+    Sparse per-user revenue consistent with aggregates: n_conv converters whose
+    order values follow a log-normal (sigma 0.8) with mean total_rev / n_conv,
+    represented by up to n_support equal-probability quantiles rather than
+    n_conv random draws. Directional only — real values come from event logs.
+    """
+    n_users = max(int(n_users), 1)
+    n_conv  = min(int(n_conv), n_users)   # conv can never exceed users — clamp defensively
+    if n_conv <= 0 or total_rev <= 0:
+        return sparse_revenue([], n_users)
+    k      = min(n_conv, n_support)
+    counts = np.full(k, n_conv // k, dtype=np.int64)
+    counts[:n_conv % k] += 1
+    # Quantile midpoints of each block of converters, so blocks of unequal size stay unbiased
+    edges  = np.concatenate([[0], np.cumsum(counts)])
+    q      = (edges[:-1] + edges[1:]) / 2 / n_conv
+    from scipy.special import ndtri
+    sigma  = 0.8
+    mu     = np.log(total_rev / n_conv) - (sigma ** 2) / 2
+    vals   = np.exp(mu + sigma * ndtri(q))
+    vals  *= total_rev / (vals @ counts)
+    return sparse_revenue(vals, n_users, counts)
+
+def _multinomial_sums(k, uniq, counts, rng, max_bytes=BOOTSTRAP_MAX_BYTES):
+    """Sums of resamples of k[i] draws from the values uniq with frequencies counts."""
+    out   = np.empty(len(k))
+    chunk = int(np.clip(max_bytes // max(8 * len(uniq), 1), 1, max(len(k), 1)))
+    for start in range(0, len(k), chunk):
+        w = rng.multinomial(k[start:start + chunk], counts / counts.sum())   # (chunk, n_unique)
+        out[start:start + chunk] = w @ uniq
+    return out
+
+def _index_sums(k, values, rng, max_bytes=BOOTSTRAP_MAX_BYTES):
+    """Sums of resamples of k[i] uniform draws from values, drawn as flat index blocks."""
+    m     = len(values)
+    out   = np.empty(len(k))
+    chunk = int(np.clip(max_bytes // (12 * max(m, 1)), 1, max(len(k), 1)))   # uint32 index + value
+    idx_t = np.uint32 if m < 2 ** 32 else np.int64
+    for start in range(0, len(k), chunk):
+        ks   = k[start:start + chunk]
+        ends = np.cumsum(ks)
+        cs   = np.cumsum(np.take(values, rng.integers(0, m, size=int(ends[-1]), dtype=idx_t)))
+        cs   = np.concatenate([[0.0], cs])
+        out[start:start + len(ks)] = cs[ends] - cs[ends - ks]
+    return out
+
+def bootstrap_sparse_means(sp, n_boot, rng, max_bytes=BOOTSTRAP_MAX_BYTES):
+    """
+    Bootstrap means of a sparse sample without expanding its zeros.
+
+    A resample of n users holds k ~ Binomial(n, m/n) of the m converters, and
+    given k those are a resample of the converters' values alone — so each
+    resample costs O(m) (or O(distinct values) when they are mostly ties),
+    never O(n).
+    """
+    uniq, counts = _sparse_ties(sp, with_zero=False)
+    m = int(counts.sum())
+    n = m + sp["n_zero"]
+    if n == 0:
+        return np.full(n_boot, np.nan)
+    if m == 0:
+        return np.zeros(n_boot)
+    k = rng.binomial(n, m / n, size=n_boot)        # converters in each resample
+    if len(uniq) * 8 < m:                          # a binomial draw costs ~8 index draws
+        return _multinomial_sums(k, uniq, counts, rng, max_bytes) / n
+    return _index_sums(k, np.repeat(uniq, counts), rng, max_bytes) / n
+
+def sparse_mannwhitney(a, b):
+    """
+    Two-sided Mann-Whitney U p-value for two sparse samples, computed from tie
+    counts (normal approximation with tie and continuity correction — the same
+    as scipy's method="asymptotic"). The zero block is one tie group, so it is
+    never expanded.
+    """
+    from scipy.special import ndtr
+    ua, ca = _sparse_ties(a)
+    ub, cb = _sparse_ties(b)
+    uniq   = np.union1d(ua, ub)
+    ta     = np.zeros(len(uniq)); ta[np.searchsorted(uniq, ua)] = ca
+    tb     = np.zeros(len(uniq)); tb[np.searchsorted(uniq, ub)] = cb
+    t      = ta + tb
+    n1, n2 = ta.sum(), tb.sum()
+    n      = n1 + n2
+    if n1 == 0 or n2 == 0:
+        return 1.0
+    avg_rank = np.cumsum(t) - (t - 1) / 2           # mid-rank of each tie group
+    u1    = ta @ avg_rank - n1 * (n1 + 1) / 2
+    u     = max(u1, n1 * n2 - u1)
+    tie   = (t ** 3 - t).sum() / (n * (n - 1))
+    sigma = np.sqrt(n1 * n2 / 12 * ((n + 1) - tie))
+    if sigma == 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / sigma
+    return float(min(2 * ndtr(-z), 1.0))
+
+def _sparse_mean(sp):
+    return safe_divide(sp["values"] @ sp["counts"], int(sp["counts"].sum()) + sp["n_zero"])
+
+def _log1p_sparse(sp):
+    return {"values": np.log1p(sp["values"]), "counts": sp["counts"], "n_zero": sp["n_zero"]}
+
+def _revenue_result(mw_p, diffs, observed_diff, alpha):
+    """Significance summary for one revenue metric."""
+    ci_l = float(np.percentile(diffs, alpha / 2 * 100))
+    ci_h = float(np.percentile(diffs, (1 - alpha / 2) * 100))
+    bp   = min(float(np.mean(diffs <= 0) * 2) if observed_diff >= 0 else float(np.mean(diffs >= 0) * 2), 1.0)
+    return {
+        "mw_p": mw_p, "mw_sig": mw_p <= alpha,
+        "boot_p": bp, "boot_sig": bp <= alpha,
+        "boot_ci_low": ci_l, "boot_ci_high": ci_h,
+        "sig": (mw_p <= alpha) or (bp <= alpha),
+    }
+
+def test_revenue_significance_sparse(ctrl, var, alpha=0.05, n_boot=2000,
+                                     max_bytes=BOOTSTRAP_MAX_BYTES, source="observed"):
+    """
+    Mann-Whitney U and log-transformed bootstrap for AOV and RPV on sparse
+    per-user revenue (see sparse_revenue). RPV uses every user, AOV only the
+    converters (revenue per converter).
+    """
+    streams = rng_streams("revenue", ctrl, var, n_boot, n=4)   # one per metric and arm
+    results = {}
+    for (label, ac, av), (rng_c, rng_v) in zip([
+        ("aov", _nonzero_part(ctrl), _nonzero_part(var)),
+        ("rpv", ctrl, var),
+    ], (streams[:2], streams[2:])):
+        mw_p  = sparse_mannwhitney(ac, av)
+        diffs = (np.expm1(bootstrap_sparse_means(_log1p_sparse(av), n_boot, rng_v, max_bytes)) -
+                 np.expm1(bootstrap_sparse_means(_log1p_sparse(ac), n_boot, rng_c, max_bytes)))
+        results[label] = _revenue_result(mw_p, diffs, _sparse_mean(av) - _sparse_mean(ac), alpha)
+    results["source"] = source
+    return results
+
+def test_revenue_significance(uc, cc, rc, uv, cv, rv, alpha=0.05, n_boot=2000,
+                              max_bytes=BOOTSTRAP_MAX_BYTES):
+    """Revenue tests from aggregates, on distributions reconstructed by reconstruct_revenue."""
+    return test_revenue_significance_sparse(
+        reconstruct_revenue(uc, cc, rc), reconstruct_revenue(uv, cv, rv),
+        alpha, n_boot, max_bytes, source="reconstructed",
+    )
+
+def revenue_values_from_state(state, groups):
+    """
+    Sparse per-user revenue for each group from a snapshot's optional
+    "revenue_values" block ({"c": [...], "v0": [...]} of non-zero per-user
+    revenue), else from its "revenue_sketch" block (sketch_order_values per
+    arm, as written by ab_ingest.py) — those samples carry "source":
+    "sketch". Groups whose values no longer agree with the typed aggregates
+    (inputs edited after loading) are left out.
+    """
+    raw    = state.get("revenue_values") or {}
+    sketch = state.get("revenue_sketch") or {}
+    if sketch.get("accuracy", SKETCH_ACCURACY) != SKETCH_ACCURACY:
+        sketch = {}   # bucketed with another gamma
+    out = {}
+    for i, g in enumerate(groups):
+        key  = "c" if i == 0 else f"v{i - 1}"
+        vals = raw.get(key)
+        if vals is not None:
+            sp = sparse_revenue(vals, g["users"])
+            if len(sp["values"]) <= min(g["conv"], g["users"]) and \
+                    np.isclose(sp["values"].sum(), g["rev"], rtol=1e-6, atol=0.01):
+                out[g["name"]] = sp
+        elif sketch.get(key):
+            sp = sketch_sparse(sketch[key], g["users"])
+            if sp["counts"].sum() <= min(g["conv"], g["users"]) and \
+                    np.isclose(sp["values"] @ sp["counts"], g["rev"], rtol=SKETCH_ACCURACY, atol=0.01):
+                out[g["name"]] = {**sp, "source": "sketch"}
+    return out
+
+def compare_revenue(ctrl_g, var_g, alpha, revenue_values=None, n_boot=2000):
+    """
+    Revenue tests for var_g vs ctrl_g — on observed values when both are
+    available ("source" is "sketch" if either came from an order-value sketch).
+    """
+    revenue_values = revenue_values or {}
+    if ctrl_g["name"] in revenue_values and var_g["name"] in revenue_values:
+        ctrl, var = revenue_values[ctrl_g["name"]], revenue_values[var_g["name"]]
+        source = "sketch" if "sketch" in (ctrl.get("source"), var.get("source")) else "observed"
+        return test_revenue_significance_sparse(ctrl, var, alpha, n_boot, source=source)
+    return test_revenue_significance(ctrl_g["users"], ctrl_g["conv"], ctrl_g["rev"],
+                                     var_g["users"], var_g["conv"], var_g["rev"],
+                                     alpha=alpha, n_boot=n_boot)
+
+# Quantiles of the converters' order values come from their log-bucket sketch
+# (sketch_order_values): exact data is sketched first, a snapshot's sketch is
+# used as-is. Bootstrap replicates redraw each bucket's count as a Poisson, so
+# each costs O(buckets) — a few hundred — whatever the number of orders.
+def sketch_quantiles(sketch, quantiles):
+    """Order values at the given quantiles (0–1) of a sketch, each within SKETCH_ACCURACY; NaN if empty."""
+    counts = np.asarray(sketch["count"], dtype=float)
+    q      = np.asarray(quantiles, dtype=float)
+    if counts.sum() <= 0:
+        return np.full(q.shape, np.nan)
+    rep = _sketch_values(sketch["index"])
+    at  = np.searchsorted(np.cumsum(counts), q * (counts.sum() - 1), side="right")
+    return rep[np.minimum(at, len(rep) - 1)]
+
+def order_value_summary(sp):
+    """
+    Box-plot statistics of a sparse sample's converters (order values) from
+    its sketch: quartiles, Tukey whiskers (the most extreme values within
+    1.5 × IQR of the quartiles), mean and count. None without converters.
+    """
+    sketch = sketch_order_values(sp["values"], sp["counts"])
+    if not sketch["index"]:
+        return None
+    rep        = _sketch_values(sketch["index"])
+    q1, med, q3 = sketch_quantiles(sketch, (0.25, 0.5, 0.75)).tolist()
+    iqr        = q3 - q1
+    inside     = rep[(rep >= q1 - 1.5 * iqr) & (rep <= q3 + 1.5 * iqr)]
+    return {"q1": q1, "median": med, "q3": q3, "lower": float(inside.min()), "upper": float(inside.max()),
+            "mean": float(safe_divide(sp["values"] @ sp["counts"], sp["counts"].sum())),
+            "n": int(sp["counts"].sum())}
+
+def _bootstrap_sketch_quantiles(sketch, quantiles, n_boot, rng, max_bytes=BOOTSTRAP_MAX_BYTES):
+    """
+    (n_boot, len(quantiles)) quantiles of Poisson-bootstrap resamples of a
+    sketch's values: each bucket's count is redrawn as Poisson(count).
+    """
+    counts = np.asarray(sketch["count"], dtype=float)
+    rep    = _sketch_values(sketch["index"])
+    q      = np.asarray(quantiles, dtype=float)
+    out    = np.empty((n_boot, len(q)))
+    chunk  = int(np.clip(max_bytes // (16 * len(counts) * max(len(q), 1)), 1, n_boot))
+    for start in range(0, n_boot, chunk):
+        cum  = np.cumsum(rng.poisson(counts, size=(min(chunk, n_boot - start), len(counts))), axis=1)  # (chunk, buckets)
+        rank = q * np.maximum(cum[:, -1:] - 1, 0)                                                      # (chunk, quantiles)
+        at   = (cum[:, :, None] <= rank[:, None, :]).sum(axis=1)
+        out[start:start + len(cum)] = rep[np.minimum(at, len(rep) - 1)]
+    return out
+
+def quantile_treatment_effects(ctrl, var, alpha=0.05, quantiles=QTE_QUANTILES, n_boot=2000,
+                               max_bytes=BOOTSTRAP_MAX_BYTES):
+    """
+    Difference in converters' order-value quantiles, variation − control, for
+    two sparse samples: per quantile the values, difference, relative uplift,
+    a percentile-bootstrap CI and bootstrap p-value (as _revenue_result).
+    Columnar; None when either arm has no converters. Values are within
+    SKETCH_ACCURACY of the exact quantiles.
+    """
+    sk = [sketch_order_values(sp["values"], sp["counts"]) for sp in (ctrl, var)]
+    if not (sk[0]["index"] and sk[1]["index"]):
+        return None
+    rng_c, rng_v = rng_streams("qte", sk, list(quantiles), n_boot)
+    qc, qv = (sketch_quantiles(s, quantiles) for s in sk)
+    diffs  = (_bootstrap_sketch_quantiles(sk[1], quantiles, n_boot, rng_v, max_bytes) -
+              _bootstrap_sketch_quantiles(sk[0], quantiles, n_boot, rng_c, max_bytes))
+    obs    = qv - qc
+    p      = np.minimum(np.where(obs >= 0, (diffs <= 0).mean(axis=0), (diffs >= 0).mean(axis=0)) * 2, 1.0)
+    return {"quantile": list(quantiles), "control": qc.tolist(), "variation": qv.tolist(), "diff": obs.tolist(),
+            "uplift": [calculate_uplift(c, v) for c, v in zip(qc.tolist(), qv.tolist())],
+            "ci_low":  np.percentile(diffs, alpha / 2 * 100, axis=0).tolist(),
+            "ci_high": np.percentile(diffs, (1 - alpha / 2) * 100, axis=0).tolist(),
+            "p": p.tolist(), "sig": (p <= alpha).tolist()}
+
+def compare_quantiles(ctrl_g, var_g, alpha, revenue_values=None, n_boot=2000):
+    """quantile_treatment_effects for var_g vs ctrl_g on observed or sketched values; None for aggregates only."""
+    revenue_values = revenue_values or {}
+    if ctrl_g["name"] not in revenue_values or var_g["name"] not in revenue_values:
+        return None
+    return quantile_treatment_effects(revenue_values[ctrl_g["name"]], revenue_values[var_g["name"]], alpha,
+                                      n_boot=n_boot)
+
+# Analytic alternative: RPV is a mean over users and AOV the ratio Σrevenue /
+# Σconverted, so with Σrevenue² per arm the delta method gives their variances
+# directly — no resampling.
+def _delta_metric(mean_c, var_c, mean_v, var_v, crit):
+    """Difference, normal CI, z, p and log-ratio uplift CI for one metric from two means and their variances."""
+    diff = mean_v - mean_c
+    se   = math.sqrt(var_c + var_v)
+    z    = -diff / se if 0 < se < math.inf else 0.0
+    p    = math.erfc(abs(z) / math.sqrt(2)) if 0 < se < math.inf else 1.0
+    if mean_c > 0 and mean_v > 0:
+        log_r  = math.log(mean_v / mean_c)
+        se_log = math.sqrt(var_v / mean_v ** 2 + var_c / mean_c ** 2)
+        up_ci  = (math.expm1(log_r - crit * se_log) * 100, math.expm1(log_r + crit * se_log) * 100)
+    else:
+        up_ci  = (math.nan, math.nan)
+    return {"mean": [mean_c, mean_v], "diff": diff, "se": se, "ci_low": diff - crit * se, "ci_high": diff + crit * se,
+            "z_stat": z, "p": p, "uplift": calculate_uplift(mean_c, mean_v),
+            "uplift_ci_low": up_ci[0], "uplift_ci_high": up_ci[1]}
+
+def test_revenue_significance_delta(uc, cc, rc, qc, uv, cv, rv, qv, alpha=0.05):
+    """
+    Analytic counterpart of test_revenue_significance for one variation: the
+    same aggregates plus Σrevenue² per group (qc, qv), in plain floats — a
+    few microseconds. Var(RPV) is the per-user variance / n; Var(AOV) =
+    (Σr² − (Σr)²/c) / c², the delta method for the ratio Σrevenue / Σconverted
+    (revenue is only non-zero for converters). Per metric: the difference
+    with its normal CI and two-sided p-value, z (control − variation, as
+    pooled_ztest) and the relative uplift with a CI from the delta method on
+    the log ratio. Fewer than two users (RPV) or converters (AOV) in an arm
+    give an infinite variance.
+    """
+    from scipy.special import ndtri
+    crit = float(ndtri(1 - alpha / 2))
+    out  = {}
+    for metric, (nc, nv) in (("rpv", (uc, uv)), ("aov", (cc, cv))):
+        mean_c, mean_v = safe_divide(rc, nc), safe_divide(rv, nv)
+        var_c = max(qc - rc * mean_c, 0.0) / ((nc - 1) * nc if metric == "rpv" else nc * nc) if nc > 1 else math.inf
+        var_v = max(qv - rv * mean_v, 0.0) / ((nv - 1) * nv if metric == "rpv" else nv * nv) if nv > 1 else math.inf
+        out[metric] = _delta_metric(mean_c, var_c, mean_v, var_v, crit)
+        out[metric]["sig"] = out[metric]["p"] <= alpha
+    return out
+
+def compare_revenue_delta(groups, alpha, revenue_values=None, rev_sq=None):
+    """
+    Delta-method RPV / AOV results for every variation vs Control: {"names",
+    "rpv": [...], "aov": [...], "source"}, one result per variation. Σrevenue²
+    per arm comes from revenue_sum_squares; "source" is "sums" when every
+    arm's is entered or observed, else "reconstructed". No multiplicity
+    correction, like the bootstrap tests.
+    """
+    groups = ArmTable.coerce(groups).to_groups()
+    revenue_values = revenue_values or {}
+    known = [bool(q) or g["name"] in revenue_values for q, g in zip(rev_sq or [0.0] * len(groups), groups)]
+    q     = revenue_sum_squares(groups, revenue_values, rev_sq)
+    c     = groups[0]
+    res   = [test_revenue_significance_delta(c["users"], min(c["conv"], c["users"]), c["rev"], q[0],
+                                             g["users"], min(g["conv"], g["users"]), g["rev"], q_v, alpha)
+             for g, q_v in zip(groups[1:], q[1:])]
+    return {"names": [g["name"] for g in groups],
+            "rpv": [r["rpv"] for r in res], "aov": [r["aov"] for r in res],
+            "source": "sums" if all(known) else "reconstructed"}
+
+
+# -----------------------------------------------
+# POWER & SAMPLE SIZE  (vectorised)
+# -----------------------------------------------
+def cohens_h(p1, p2):
+    """Effect size for two proportions (same as statsmodels proportion_effectsize, unsigned)."""
+    p1, p2 = np.asarray(p1, dtype=float), np.asarray(p2, dtype=float)
+    return np.abs(2 * np.arcsin(np.sqrt(np.clip(p2, 0, 1))) - 2 * np.arcsin(np.sqrt(np.clip(p1, 0, 1))))
+
+def two_sample_power(effect_size, nobs1, alpha, ratio=1.0):
+    """
+    Power of a two-sided two-sample z-test — the closed form behind
+    NormalIndPower.power, broadcast over any shape of effect_size × nobs1.
+    """
+    from scipy.special import ndtr, ndtri
+    es    = np.abs(np.asarray(effect_size, dtype=float))
+    n1    = np.asarray(nobs1, dtype=float)
+    nobs  = n1 * ratio / (1 + ratio)            # harmonic combination of nobs1 and nobs1 * ratio
+    crit  = ndtri(1 - alpha / 2)
+    shift = es * np.sqrt(nobs)
+    return ndtr(shift - crit) + ndtr(-shift - crit)
+
+def required_sample_size(effect_size, alpha, power=0.8, ratio=1.0, variance_reduction=0.0):
+    """
+    Users per group (nobs1) for a two-sided z-test to reach `power`. Vectorised.
+    Ignores the negligible far-tail term; agrees with NormalIndPower.solve_power
+    to its solver tolerance (a few parts per million). Also used for RPV (Cohen's d), where the normal
+    approximation to the t-test is within ~1 user per group at realistic sizes.
+    variance_reduction (0–1) is the share of variance CUPED is expected to
+    remove; the required n shrinks by the same factor.
+    """
+    from scipy.special import ndtri
+    es = np.abs(np.asarray(effect_size, dtype=float))
+    z  = ndtri(1 - alpha / 2) + ndtri(power)
+    with np.errstate(divide="ignore"):
+        nobs = (z / es) ** 2
+    return nobs * (1 + ratio) / ratio * (1 - variance_reduction)
+
+def power_grid(base_cr, mdes, sample_sizes, alpha, variance_reduction=0.0):
+    """
+    Power for every (MDE, sample size) pair in one expression.
+    base_cr and mdes are in %, sample_sizes are users per group; with a CUPED
+    variance_reduction (0–1) each user counts as 1 / (1 − variance_reduction).
+    Returns an array of shape (len(mdes), len(sample_sizes)).
+    """
+    p1 = base_cr / 100.0
+    p2 = p1 * (1 + np.asarray(mdes, dtype=float)[:, None] / 100.0)
+    n  = np.asarray(sample_sizes, dtype=float)[None, :] / (1 - variance_reduction)
+    return two_sample_power(cohens_h(p1, p2), n, alpha)
+
+def required_n_table(base_cr, mdes, alpha, power=0.8, daily_traffic=None, variance_reduction=0.0):
+    """
+    Inverse view of power_grid: users per group needed to detect each MDE.
+    When daily_traffic (all groups combined, two-arm test) is given, adds days needed.
+    """
+    p1 = base_cr / 100.0
+    p2 = p1 * (1 + np.asarray(mdes, dtype=float) / 100.0)
+    n  = required_sample_size(cohens_h(p1, p2), alpha, power, variance_reduction=variance_reduction)
+    rows = []
+    for mde, n_i in zip(mdes, n):
+        row = {"mde": float(mde), "users_per_group": float(np.ceil(n_i)) if np.isfinite(n_i) else float("inf")}
+        if daily_traffic:
+            row["days"] = safe_divide(row["users_per_group"] * 2, daily_traffic)
+        rows.append(row)
+    return rows
+
+
+# -----------------------------------------------
+# GROUP-SEQUENTIAL TESTING  (Lan-DeMets alpha spending)
+# -----------------------------------------------
+def alpha_spending(t, alpha, spending="obrien_fleming"):
+    """
+    Cumulative two-sided alpha spent by information fraction t (Lan-DeMets),
+    symmetric: each side spends half of it, as in gsDesign / ldbounds.
+      obrien_fleming – 4 − 4Φ(z_{α/4} / √t)   (spends almost nothing early)
+      pocock         – α · ln(1 + (e − 1) t)   (spends evenly)
+    """
+    from scipy.special import ndtr, ndtri
+    t = np.clip(np.asarray(t, dtype=float), 0.0, 1.0)
+    if spending == "obrien_fleming":
+        with np.errstate(divide="ignore"):
+            return 4 * ndtr(ndtri(alpha / 4) / np.sqrt(t))
+    if spending == "pocock":
+        return alpha * np.log(1 + (np.e - 1) * t)
+    raise ValueError(f"Unknown spending function '{spending}' — use one of {', '.join(SEQ_SPENDING)}")
+
+def _simpson_weights(grid):
+    w = np.ones(len(grid))
+    w[1:-1:2], w[2:-1:2] = 4.0, 2.0
+    return w * (grid[1] - grid[0]) / 3
+
+@functools.lru_cache(maxsize=512)
+def _sequential_design(fractions, alpha, spending):
+    """
+    Boundaries for looks at fractions (a tuple), plus the sub-density of the
+    score process S(t) = Z·√t on the continuation region after the last look
+    — the recursive integration of Armitage, McPherson & Rowe. Built from the
+    cached design for fractions[:-1], so each new look costs one step and a
+    repeated look costs nothing.
+    """
+    from scipy.optimize import brentq
+    from scipy.special import ndtr, ndtri
+    t     = fractions[-1]
+    prev  = fractions[:-1]
+    spend = float(alpha_spending(t, alpha, spending) - (alpha_spending(prev[-1], alpha, spending) if prev else 0.0))
+    if not prev:
+        bound = -ndtri(spend / 2) if spend > 0 else np.inf
+        grid  = np.linspace(-1, 1, SEQ_GRID_POINTS) * min(bound, SEQ_MAX_Z) * np.sqrt(t)
+        dens  = np.exp(-grid ** 2 / (2 * t)) / np.sqrt(2 * np.pi * t)
+        return (bound,), grid, dens
+
+    bounds, grid, dens = _sequential_design(prev, alpha, spending)
+    mass = _simpson_weights(grid) * dens
+    sd   = np.sqrt(t - prev[-1])
+
+    def crossing(z):
+        # P(continued so far, |Z(t)| ≥ z at this look)
+        b = z * np.sqrt(t)
+        return float(mass @ (ndtr((-b - grid) / sd) + ndtr((grid - b) / sd)))
+
+    if spend <= 0 or crossing(SEQ_MAX_Z) >= spend:
+        bound = np.inf if spend <= 0 else SEQ_MAX_Z
+    else:
+        bound = brentq(lambda z: crossing(z) - spend, 0.0, SEQ_MAX_Z, xtol=1e-10)
+    new_grid = np.linspace(-1, 1, SEQ_GRID_POINTS) * min(bound, SEQ_MAX_Z) * np.sqrt(t)
+    step     = (new_grid[:, None] - grid[None, :]) / sd
+    new_dens = (np.exp(-step ** 2 / 2) / (sd * np.sqrt(2 * np.pi))) @ mass
+    return bounds + (bound,), new_grid, new_dens
+
+def sequential_boundaries(fractions, alpha, spending="obrien_fleming"):
+    """
+    Two-sided group-sequential boundaries at the given information fractions
+    (strictly increasing, in (0, 1]; a look at 1 spends the rest of alpha).
+    Boundaries depend only on the design, so they are cached per
+    (fractions, alpha, spending). Returns per-look lists: fraction, z_bound,
+    nominal_p (two-sided p a look needs to stop) and alpha_spent (cumulative).
+    """
+    from scipy.special import ndtr
+    fr = tuple(round(float(t), 9) for t in fractions)
+    if not fr or fr[0] <= 0 or fr[-1] > 1 or any(b <= a for a, b in zip(fr, fr[1:])):
+        raise ValueError("Information fractions must be strictly increasing and within (0, 1]")
+    if spending not in SEQ_SPENDING:
+        raise ValueError(f"Unknown spending function '{spending}' — use one of {', '.join(SEQ_SPENDING)}")
+    bounds = np.array(_sequential_design(fr, float(alpha), spending)[0])
+    return {
+        "fraction":    list(fr),
+        "z_bound":     bounds.tolist(),
+        "nominal_p":   (2 * ndtr(-bounds)).tolist(),
+        "alpha_spent": alpha_spending(fr, alpha, spending).tolist(),
+    }
+
+def information_fractions(look_users, max_users):
+    """
+    Information fraction of each look — users per arm at the look over the
+    planned maximum, capped at 1. Looks that add no users are dropped, and
+    nothing past the first look at full information is kept.
+    """
+    fractions = []
+    for n in look_users:
+        t = min(float(n) / max_users, 1.0) if max_users > 0 else 0.0
+        if t > 0 and (not fractions or t > fractions[-1]):
+            fractions.append(t)
+        if fractions and fractions[-1] >= 1.0:
+            break
+    return fractions
+
+def evaluate_sequential(groups, history, max_users, alpha, spending="obrien_fleming"):
+    """
+    Group-sequential check of every variation against Control at the current
+    look. history lists users per arm at earlier recorded looks; the current
+    data (mean users per arm) is the latest look. Alpha is split evenly over
+    the variations (Bonferroni) and spent per comparison with the chosen
+    spending function. Each variation gets a decision:
+      stop_efficacy – z ≥ boundary (variation better)
+      stop_harm     – z ≤ −boundary (variation worse)
+      stop_final    – full information reached without crossing
+      continue      – otherwise
+    Returns None when no planned maximum is set or no users have arrived.
+    """
+    arms  = ArmTable.coerce(groups)
+    users = arms.users.astype(float)
+    now   = float(users.mean()) if len(users) else 0.0
+    looks = [n for n in history if n < now] + [now]
+    fractions = information_fractions(looks, max_users)
+    if not fractions or len(arms) < 2:
+        return None
+    alpha_arm = alpha / (len(arms) - 1)
+    design    = sequential_boundaries(fractions, alpha_arm, spending)
+    bound     = design["z_bound"][-1]
+    final     = fractions[-1] >= 1.0
+    conv      = arms.conv.astype(float)
+    # Positive z = variation converts better than Control
+    z, p = pooled_ztest(conv[1:], users[1:], conv[0], users[0])
+    rows = []
+    for name, zi, pi in zip(arms.names[1:], z.tolist(), p.tolist()):
+        zi = zi if np.isfinite(zi) else 0.0
+        if zi >= bound:
+            decision = "stop_efficacy"
+        elif zi <= -bound:
+            decision = "stop_harm"
+        else:
+            decision = "stop_final" if final else "continue"
+        rows.append({"name": name, "z_stat": zi, "p_raw": pi if np.isfinite(pi) else 1.0,
+                     "decision": decision})
+    return {
+        "look":          len(fractions),
+        "fraction":      fractions[-1],
+        "final":         final,
+        "z_bound":       bound,
+        "nominal_p":     design["nominal_p"][-1],
+        "alpha_per_arm": alpha_arm,
+        "spending":      spending,
+        "design":        design,
+        "arms":          rows,
+    }
+
+
+# -----------------------------------------------
+# ALWAYS-VALID INFERENCE  (mixture SPRT)
+# -----------------------------------------------
+# The state is plain JSON so it travels in snapshots: cumulative sufficient
+# statistics per arm (columnar, Control first) plus, per metric, each
+# variation's running p-value minimum and confidence-sequence bounds.
+def msprt(diff, var, tau2, alpha):
+    """
+    Normal-mixture SPRT (mixing N(0, tau2) over the true difference) for an
+    estimated difference with variance var. Returns the one-look p-value 1/Λ
+    and the half-width of the 1 − alpha confidence sequence around diff.
+    Vectorised; var of 0 gives (1, inf).
+    """
+    diff, var = np.asarray(diff, dtype=float), np.asarray(var, dtype=float)
+    ok = var > 0
+    v  = np.where(ok, var, 1.0)
+    r  = v + tau2
+    log_lr = 0.5 * np.log(v / r) + diff ** 2 * tau2 / (2 * v * r)
+    p    = np.where(ok, np.minimum(np.exp(-log_lr), 1.0), 1.0)
+    half = np.where(ok, np.sqrt(2 * v * r / tau2 * (np.log(1 / alpha) + 0.5 * np.log(r / v))), np.inf)
+    return p, half
+
+def always_valid_tau(base_cr_pct, base_aov, mde_pct):
+    """
+    Mixing scales (tau_cr, tau_rpv) from the planned baseline and MDE — the
+    absolute CR and RPV differences the test was sized for. Fixed before the
+    data arrive; a poor choice costs power, never validity.
+    """
+    tau_cr = base_cr_pct / 100 * abs(mde_pct) / 100
+    return tau_cr, tau_cr * base_aov
+
+def always_valid_init(names, tau_cr, tau_rpv):
+    """Empty state for these arms (Control first): no users, no looks yet."""
+    return {"names": list(names), "tau": {"cr": float(tau_cr), "rpv": float(tau_rpv)}, "looks": 0,
+            "stats": {f: [0.0] * len(names) for f in AVI_STATS}, "cr": None, "rpv": None}
+
+def _bound_list(a):
+    return [float(x) if np.isfinite(x) else None for x in a]
+
+def always_valid_update(state, deltas, alpha):
+    """
+    Fold new data into an always-valid state in O(1) per arm: the cumulative
+    statistics grow by deltas (columnar users / conv / rev / rev_sq, same
+    arms as state), the mSPRT is evaluated on the new totals, and each
+    variation's running p-value minimum and confidence-sequence intersection
+    move. Alpha is split evenly over the variations. Returns a new state.
+    """
+    stats = {f: np.asarray(state["stats"][f], dtype=float) + np.asarray(deltas[f], dtype=float) for f in AVI_STATS}
+    n     = stats["users"]
+    k     = len(n) - 1
+    cr    = np.clip(safe_divide_array(stats["conv"], n), 0.0, 1.0)
+    rpv   = safe_divide_array(stats["rev"], n)
+    var   = {"cr":  safe_divide_array(cr * (1 - cr), n),
+             "rpv": safe_divide_array(np.maximum(safe_divide_array(stats["rev_sq"], n) - rpv ** 2, 0.0), n)}
+    out = {"names": state["names"], "tau": state["tau"], "looks": state["looks"] + 1,
+           "stats": {f: stats[f].tolist() for f in AVI_STATS}}
+    for metric, mean in (("cr", cr), ("rpv", rpv)):
+        diff    = mean[1:] - mean[0]
+        p, half = msprt(diff, var[metric][1:] + var[metric][0], state["tau"][metric] ** 2, alpha / max(k, 1))
+        prev    = state.get(metric) or {"p": [1.0] * k, "lo": [None] * k, "hi": [None] * k}
+        lo_prev = np.array([-np.inf if x is None else x for x in prev["lo"]])
+        hi_prev = np.array([np.inf if x is None else x for x in prev["hi"]])
+        out[metric] = {
+            "diff": diff.tolist(),
+            "p":    np.minimum(prev["p"], p).tolist(),
+            "lo":   _bound_list(np.maximum(lo_prev, diff - half)),
+            "hi":   _bound_list(np.minimum(hi_prev, diff + half)),
+        }
+    return out
+
+def revenue_sum_squares(groups, revenue_values=None, rev_sq=None):
+    """
+    Σ revenue² over users for each group — the entered value (rev_sq, one per
+    group, 0 = unknown) first, then observed per-user revenue, otherwise the
+    log-normal reconstruction the revenue tests use.
+    """
+    revenue_values = revenue_values or {}
+    out = []
+    for g, q in zip(groups, rev_sq or [0.0] * len(groups)):
+        if q:
+            out.append(float(q))
+            continue
+        sp = revenue_values.get(g["name"]) or reconstruct_revenue(g["users"], g["conv"], g["rev"])
+        out.append(float(sp["values"] ** 2 @ sp["counts"]))
+    return out
+
+def always_valid_sync(state, groups, alpha, tau_cr, tau_rpv, revenue_values=None, rev_sq=None):
+    """
+    Bring state up to the current cumulative aggregates: everything since the
+    last update is one new look. Without a state, for different arms, or when
+    totals went down (data re-pulled or reset) a fresh state is started with
+    tau_cr / tau_rpv; otherwise the state keeps its own tau. Unchanged data
+    add no look.
+    """
+    arms   = ArmTable.coerce(groups)
+    totals = {"users": arms.users.astype(float), "conv": arms.conv.astype(float), "rev": arms.rev,
+              "rev_sq": np.array(revenue_sum_squares(arms.to_groups(), revenue_values, rev_sq))}
+    fresh = (not state or state.get("names") != arms.names
+             or any(np.any(totals[f] < np.asarray(state["stats"][f]) - 1e-9) for f in ("users", "conv", "rev")))
+    if fresh:
+        state = always_valid_init(arms.names, tau_cr, tau_rpv)
+    deltas = {f: totals[f] - np.asarray(state["stats"][f], dtype=float) for f in AVI_STATS}
+    if state["looks"] and not any(np.any(deltas[f] != 0) for f in ("users", "conv", "rev")):
+        return state
+    return always_valid_update(state, deltas, alpha)
+
+def always_valid_summary(state, alpha):
+    """Per-variation rows of an always-valid state: estimate, CS bounds, p-value and significance per metric."""
+    k   = len(state["names"]) - 1
+    cut = alpha / max(k, 1)
+    rows = []
+    for i, name in enumerate(state["names"][1:]):
+        row = {"name": name}
+        for metric in ("cr", "rpv"):
+            m = state[metric]
+            row.update({f"{metric}_diff": m["diff"][i], f"{metric}_lo": m["lo"][i], f"{metric}_hi": m["hi"][i],
+                        f"{metric}_p": m["p"][i], f"{metric}_sig": m["p"][i] <= cut})
+        rows.append(row)
+    return rows
+
+
+# -----------------------------------------------
+# CUPED  (regression adjustment on a pre-experiment covariate)
+# -----------------------------------------------
+# Works from per-arm sums only — n, Σy, Σy², Σx, Σx², Σxy — so cost and memory
+# are O(arms) however many users there are. For CR, y is the 0/1 conversion
+# (Σy = Σy² = conversions); for RPV, y is revenue per user.
+def cuped_arrays(n, y, y_sq, x, x_sq, xy, alpha, mc_method="holm"):
+    """
+    CUPED for one metric over the arms (Control first). θ is the pooled
+    within-arm slope of y on x; each arm's mean is shifted by −θ·(x̄_arm − x̄),
+    which leaves its expectation unchanged because x predates assignment.
+    Returns per-arm raw and adjusted means, and per variation the adjusted
+    difference vs Control with its normal CI, z-test (control − variation,
+    as pooled_ztest) and MCC, next to the unadjusted difference and standard
+    error. variance_reduction = 1 − Var(y − θx) / Var(y), the pooled squared
+    correlation of x and y.
+    """
+    from scipy.special import ndtr, ndtri
+    n, y, y_sq, x, x_sq, xy = (np.asarray(a, dtype=float) for a in (n, y, y_sq, x, x_sq, xy))
+    c_yy = y_sq - y * safe_divide_array(y, n)           # within-arm centred sums
+    c_xx = x_sq - x * safe_divide_array(x, n)
+    c_xy = xy   - x * safe_divide_array(y, n)
+    s_yy, s_xx, s_xy = c_yy.sum(), c_xx.sum(), c_xy.sum()
+    theta = safe_divide(s_xy, s_xx) if s_xx > 0 else 0.0
+
+    mean  = safe_divide_array(y, n)
+    adj   = mean - theta * (safe_divide_array(x, n) - safe_divide(x.sum(), n.sum()))
+    dof   = np.maximum(n - 1, 1) * np.maximum(n, 1)
+    v_raw = np.maximum(c_yy, 0.0) / dof                  # variance of each arm's mean
+    v_adj = np.maximum(c_yy - 2 * theta * c_xy + theta ** 2 * c_xx, 0.0) / dof
+
+    diff  = adj[1:] - adj[0]
+    se    = np.sqrt(v_adj[1:] + v_adj[0])
+    z     = safe_divide_array(-diff, se)
+    p_raw = 2 * ndtr(-np.abs(z))
+    reject, p_adj = p_adjust(p_raw, alpha, mc_method)
+    half  = ndtri(1 - alpha / 2) * se
+    return {
+        "theta": theta,
+        "variance_reduction": safe_divide(s_xy ** 2, s_xx * s_yy) if s_xx > 0 and s_yy > 0 else 0.0,
+        "mean": mean, "mean_adj": adj,
+        "diff_raw": mean[1:] - mean[0], "se_raw": np.sqrt(v_raw[1:] + v_raw[0]),
+        "diff": diff, "se": se, "ci_low": diff - half, "ci_high": diff + half,
+        "uplift": calculate_uplift_array(adj[:1], adj)[1:],
+        "z_stat": z, "p_raw": p_raw, "p_adjusted": p_adj, "significant": reject,
+    }
+
+def cuped_from_state(state, n_arms):
+    """
+    Per-arm covariate aggregates from a snapshot's "cuped" block as float
+    arrays over CUPED_FIELDS, or None when absent, all zero, or entered for
+    a different number of arms than the experiment now has.
+    """
+    raw = state.get("cuped")
+    if not raw or any(len(raw.get(f) or []) != n_arms for f in CUPED_FIELDS):
+        return None
+    cov = {f: np.asarray([0.0 if v is None else v for v in raw[f]], dtype=float) for f in CUPED_FIELDS}
+    return cov if cov["pre_sum_sq"].any() else None
+
+def run_cuped_analysis(groups, covariates, alpha, mc_method="holm", revenue_values=None, rev_sq=None):
+    """
+    CUPED-adjusted CR and RPV of every variation vs Control. covariates holds
+    one entry per arm (Control first) for a pre-experiment covariate x per
+    user: pre_sum (Σx), pre_sum_sq (Σx²), pre_cross_conv (Σx over converters,
+    i.e. Σx·converted) and pre_cross_rev (Σx·revenue). Σrevenue² is rev_sq
+    where entered, else from revenue_sum_squares. Returns {"names", "cr", "rpv"} with cuped_arrays
+    results as lists.
+    """
+    arms = ArmTable.coerce(groups)
+    if any(len(covariates[f]) != len(arms) for f in CUPED_FIELDS):
+        raise ValueError("CUPED covariates need one entry per arm, Control first")
+    conv   = np.minimum(arms.conv, arms.users).astype(float)
+    rev_sq = revenue_sum_squares(arms.to_groups(), revenue_values, rev_sq)
+    out = {"names": arms.names}
+    for metric, y, y_sq, xy in (("cr",  conv,     conv,   covariates["pre_cross_conv"]),
+                                ("rpv", arms.rev, rev_sq, covariates["pre_cross_rev"])):
+        res = cuped_arrays(arms.users, y, y_sq, covariates["pre_sum"], covariates["pre_sum_sq"], xy,
+                           alpha, mc_method)
+        out[metric] = {k: v.tolist() if isinstance(v, np.ndarray) else float(v) for k, v in res.items()}
+    return out
+
+
+# -----------------------------------------------
+# SIMPSON'S PARADOX
+# -----------------------------------------------
+def check_simpsons_paradox(seg1, seg2):
+    cr_c1  = safe_divide(seg1["conv_c"], seg1["users_c"])
+    cr_v1  = safe_divide(seg1["conv_v"], seg1["users_v"])
+    up1    = calculate_uplift(cr_c1, cr_v1)
+    cr_c2  = safe_divide(seg2["conv_c"], seg2["users_c"])
+    cr_v2  = safe_divide(seg2["conv_v"], seg2["users_v"])
+    up2    = calculate_uplift(cr_c2, cr_v2)
+    agg_cc = seg1["conv_c"]  + seg2["conv_c"]
+    agg_uc = seg1["users_c"] + seg2["users_c"]
+    agg_cv = seg1["conv_v"]  + seg2["conv_v"]
+    agg_uv = seg1["users_v"] + seg2["users_v"]
+    up_agg = calculate_uplift(safe_divide(agg_cc, agg_uc), safe_divide(agg_cv, agg_uv))
+    paradox = (up1 > 0 and up2 > 0 and up_agg < 0) or (up1 < 0 and up2 < 0 and up_agg > 0)
+    return paradox, up1, up2, up_agg
+
+
+# -----------------------------------------------
+# CR BOOTSTRAP
+# -----------------------------------------------
+def simulate_cr_bootstrap(uc, cc, uv, cv, n_samples=BOOTSTRAP_SAMPLES, rng=None):
+    """
+    Parametric bootstrap of control / variation CR. Returns (sim_c, sim_v) as fractions.
+    Draws from streams keyed on the inputs unless an rng is given.
+    """
+    rng_c, rng_v = (rng, rng) if rng is not None else rng_streams("cr_bootstrap", uc, cc, uv, cv, n_samples)
+    pc    = float(np.clip(safe_divide(cc, uc), 0.0, 1.0))
+    pv    = float(np.clip(safe_divide(cv, uv), 0.0, 1.0))
+    sim_c = rng_c.binomial(uc, pc, n_samples) / uc
+    sim_v = rng_v.binomial(uv, pv, n_samples) / uv
+    return sim_c, sim_v
+
+
+# -----------------------------------------------
+# INCREMENTAL ANALYSIS  (daily deltas)
+# -----------------------------------------------
+# Every result the dashboard shows is a function of per-arm sums that add up
+# across days: counts and revenue for the z-tests, chi-square and Bayesian
+# posteriors; Poisson-bootstrap replicate sums for the revenue CIs; a
+# log-bucket sketch of order values for Mann-Whitney. Folding in one more
+# day costs O(that day's data) — never O(everything so far).
+_SKETCH_LOG_GAMMA = np.log((1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY))
+
+def sketch_order_values(values, counts=None):
+    """
+    Mergeable sketch of positive order values: bucket i counts the values in
+    (γ^(i−1), γ^i], so each is known within SKETCH_ACCURACY relative error.
+    Columnar {"index": [...], "count": [...]}, sorted by index.
+    """
+    values = np.asarray(values, dtype=float)
+    counts = np.ones(len(values), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+    keep   = (values > 0) & (counts > 0)
+    idx    = np.ceil(np.log(values[keep]) / _SKETCH_LOG_GAMMA).astype(np.int64)
+    uniq, inv = np.unique(idx, return_inverse=True)
+    return {"index": uniq.tolist(), "count": np.bincount(inv, weights=counts[keep]).astype(np.int64).tolist()}
+
+def merge_sketches(a, b, sign=1):
+    """a + b (or a − b with sign=-1), bucket by bucket; empty buckets are dropped."""
+    idx = np.concatenate([np.asarray(a["index"], dtype=np.int64), np.asarray(b["index"], dtype=np.int64)])
+    cnt = np.concatenate([np.asarray(a["count"], dtype=np.int64), sign * np.asarray(b["count"], dtype=np.int64)])
+    uniq, inv = np.unique(idx, return_inverse=True)
+    tot  = np.bincount(inv, weights=cnt, minlength=len(uniq)).astype(np.int64)
+    keep = tot != 0
+    return {"index": uniq[keep].tolist(), "count": tot[keep].tolist()}
+
+def _sketch_values(index):
+    """Representative value of each bucket: within SKETCH_ACCURACY of everything in it."""
+    return 2 * np.exp(np.asarray(index, dtype=float) * _SKETCH_LOG_GAMMA) / (1 + np.exp(_SKETCH_LOG_GAMMA))
+
+def sketch_sparse(sketch, n_users):
+    """
+    Sparse per-user revenue (see sparse_revenue) with each bucket at its
+    representative value. Both arms share bucket values, so ranks across
+    arms are exact up to ties within a bucket.
+    """
+    return sparse_revenue(_sketch_values(sketch["index"]), n_users, sketch["count"])
+
+def incremental_init(names, n_boot=2000):
+    """Empty incremental state for these arms (Control first)."""
+    k = len(names)
+    return {"names": list(names), "n_boot": int(n_boot), "updates": 0,
+            "stats":  {f: [0.0] * k for f in INC_STATS},
+            "sketch": [{"index": [], "count": []} for _ in range(k)],
+            # Poisson-bootstrap replicate sums per arm: weighted users, converters and Σ w·log1p(value)
+            "boot":   {b: np.zeros((k, int(n_boot))).tolist() for b in ("w_users", "w_conv", "s_log")}}
+
+def incremental_update(state, deltas, order_values=None):
+    """
+    Fold new data into an incremental state: deltas holds the new users /
+    conv / rev / prod per arm (columnar, same arms as state). order_values is
+    an optional per-arm list of the new orders' sketches (sketch_order_values);
+    arms without one get their day reconstructed from the aggregates. Each
+    bootstrap replicate weights every new user by an independent Poisson(1) —
+    the resampling that stays exact when replicates are built day by day.
+    Cost grows with the day's distinct sketch buckets, not with totals.
+    Returns a new state.
+    """
+    names  = state["names"]
+    d      = {f: np.asarray(deltas[f], dtype=float) for f in ("users", "conv", "rev", "prod")}
+    stats  = {f: np.asarray(state["stats"][f], dtype=float) for f in INC_STATS}
+    boot   = {b: np.array(v, dtype=float) for b, v in state["boot"].items()}
+    sketch = list(state["sketch"])
+    order_values = order_values or [None] * len(names)
+    streams = rng_streams("incremental", names, state["updates"], deltas, n=len(names))
+    for i, rng in enumerate(streams):
+        day = order_values[i]
+        if day is None:
+            sp  = reconstruct_revenue(d["users"][i], d["conv"][i], d["rev"][i])
+            day = sketch_order_values(sp["values"], sp["counts"])
+        sp  = sketch_sparse(day, d["users"][i])
+        m   = int(sp["counts"].sum())
+        w   = rng.poisson(sp["counts"], size=(state["n_boot"], len(sp["counts"])))   # n_boot × day buckets
+        boot["w_conv"][i]  += w.sum(axis=1)
+        boot["w_users"][i] += w.sum(axis=1) + rng.poisson(max(d["users"][i] - m, 0), state["n_boot"])
+        boot["s_log"][i]   += w @ np.log1p(sp["values"])
+        stats["rev_sq"][i] += sp["values"] ** 2 @ sp["counts"]
+        sketch[i] = merge_sketches(sketch[i], day)
+    for f in ("users", "conv", "rev", "prod"):
+        stats[f] += d[f]
+    return {"names": names, "n_boot": state["n_boot"], "updates": state["updates"] + 1,
+            "stats": {f: stats[f].tolist() for f in INC_STATS}, "sketch": sketch,
+            "boot": {b: v.tolist() for b, v in boot.items()}}
+
+def incremental_sync(state, groups, revenue_values=None, n_boot=2000):
+    """
+    Bring state (None to start) up to the cumulative aggregates in groups:
+    the difference is one new update. Observed revenue (revenue_values, as
+    from revenue_values_from_state) is sketched and its new buckets taken as
+    the day's orders. Different arms, or totals that went down, start over.
+    """
+    arms     = ArmTable.coerce(groups)
+    revenue_values = revenue_values or {}
+    totals   = {"users": arms.users, "conv": arms.conv, "rev": arms.rev, "prod": arms.prod}
+    sketches = [sketch_order_values(revenue_values[n]["values"], revenue_values[n]["counts"])
+                if n in revenue_values else None for n in arms.names]
+    if state is not None and state["names"] == arms.names:
+        deltas = {f: np.asarray(totals[f], dtype=float) - state["stats"][f] for f in totals}
+        days   = [None if s is None else merge_sketches(s, old, sign=-1) for s, old in zip(sketches, state["sketch"])]
+        if all(np.all(v >= -1e-9) for v in deltas.values()) and \
+                all(d is None or min(d["count"], default=0) >= 0 for d in days):
+            if not any(np.any(v != 0) for v in deltas.values()):
+                return state
+            return incremental_update(state, deltas, days)
+    return incremental_update(incremental_init(arms.names, n_boot), totals, sketches)
+
+def incremental_results(state, alpha=0.05, mc_method="holm", primary_goal="Maximize CR"):
+    """
+    Dashboard results from an incremental state alone: the multivariate
+    z-tests, Bayesian P(best), SRM, and the revenue tests (sketch
+    Mann-Whitney, Poisson-bootstrap CIs) for the best variation vs Control.
+    Cost depends on arms and n_boot, not on users.
+    """
+    tot  = {f: np.asarray(state["stats"][f], dtype=float) for f in INC_STATS}
+    arms = ArmTable(state["names"], tot["users"].astype(np.int64), tot["conv"].astype(np.int64), tot["rev"], tot["prod"])
+    mv   = run_multivariate_analysis(arms, alpha, mc_method, primary_goal)
+    best_m = select_best_variation(mv)
+    c, v   = 0, state["names"].index(best_m["name"])
+    boot   = {b: np.asarray(state["boot"][b], dtype=float) for b in ("w_users", "w_conv", "s_log")}
+    rev_sig = {}
+    for label, w, n in (("aov", boot["w_conv"], tot["conv"]), ("rpv", boot["w_users"], tot["users"])):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = np.expm1(np.where(w > 0, boot["s_log"] / w, 0.0))
+        sp = [sketch_sparse(state["sketch"][i], tot["users"][i]) for i in (c, v)]
+        if label == "aov":
+            sp = [_nonzero_part(x) for x in sp]
+        rev_sig[label] = _revenue_result(sparse_mannwhitney(*sp), means[v] - means[c],
+                                         safe_divide(tot["rev"][v], n[v]) - safe_divide(tot["rev"][c], n[c]), alpha)
+    rev_sig["source"] = "incremental"
+    _, p_srm = perform_srm_test(arms.users.tolist())
+    return {"alpha": alpha, "groups": arms.to_groups(), "mv": mv, "bayes": calculate_bayesian_multivariate(arms),
+            "p_srm": p_srm, "ctrl_m": mv["metrics"][0], "best_m": best_m, "rev_sig": rev_sig}
+
+
+# -----------------------------------------------
+# SNAPSHOT PIPELINE
+# -----------------------------------------------
+def variations_from_state(state):
+    """
+    Columnar variation inputs ({"name": [...], "users": [...], ...}) from a
+    session-state-like mapping. Every row of "variations" is an active arm;
+    older snapshots with flat users_v0 … prod_v2 keys and num_variations are
+    converted. Missing or duplicate names fall back to variation_label(i).
+    The optional "rev_sq" column (Σ revenue² per arm) is 0 where not given.
+    """
+    if "users_v0" in state:
+        n    = int(state.get("num_variations", 1))
+        cols = {f: [state[f"{f}_v{i}"] for i in range(n)] for f in VARIATION_FIELDS}
+        cols["name"]   = [variation_label(i) for i in range(n)]
+        cols["rev_sq"] = [0.0] * n
+    else:
+        raw  = state.get("variations") or DEFAULT_INPUTS["variations"]
+        n    = len(raw["users"])
+        cols = {f: list(raw[f]) for f in VARIATION_FIELDS}
+        cols["name"]   = list(raw.get("name") or [None] * n)
+        cols["rev_sq"] = [float(q) if q is not None and np.isfinite(q) else 0.0
+                          for q in (list(raw.get("rev_sq") or []) + [0.0] * n)[:n]]
+    seen = {"Control"}
+    for i, name in enumerate(cols["name"]):
+        name = str(name).strip() if name is not None else ""
+        if not name or name in seen:
+            name = variation_label(i)
+        while name in seen:
+            name += "*"
+        seen.add(name)
+        cols["name"][i] = name
+    return {"name": cols["name"], **{f: cols[f] for f in VARIATION_FIELDS}, "rev_sq": cols["rev_sq"]}
+
+def arms_from_state(state):
+    """ArmTable of Control + every variation in a session-state-like mapping."""
+    v = variations_from_state(state)
+    return ArmTable(["Control"] + v["name"], *([state[f"{f}_c"]] + v[f] for f in VARIATION_FIELDS))
+
+def rev_sq_from_state(state, groups):
+    """
+    Entered Σ revenue² per arm (Control first; rev_sq_c and the variations'
+    rev_sq column), with 0 for arms where it is missing or can no longer be
+    right — below (Σ revenue)² / conversions, e.g. after the revenue was
+    edited. None when no arm has one.
+    """
+    entered = [state.get("rev_sq_c") or 0.0] + variations_from_state(state)["rev_sq"]
+    out = [float(q) if q and q >= g["rev"] ** 2 / max(g["conv"], 1) * (1 - 1e-9) else 0.0
+           for q, g in zip(entered, groups)]
+    return out if any(out) else None
+
+def groups_from_state(state):
+    """Build the groups list (Control + active variations) from a session-state-like mapping."""
+    return arms_from_state(state).to_groups()
+
+def guardrail_inputs_from_state(state):
+    return [
+        {
+            "name":      state[f"g{i}_name"],
+            "ctrl_val":  float(state[f"g{i}_ctrl"]),
+            "var_val":   float(state[f"g{i}_var"]),
+            "threshold": float(state[f"g{i}_threshold"]),
+            "direction": state[f"g{i}_dir"],
+        }
+        for i in range(int(state.get("num_guardrails", 1)))
+    ]
+
+def segment_inputs_from_state(state):
+    return [
+        {
+            "name": state[f"seg{i}_name"],
+            "uc":   int(state[f"seg{i}_uc"]),
+            "cc":   int(state[f"seg{i}_cc"]),
+            "rc":   float(state[f"seg{i}_rc"]),
+            "uv":   int(state[f"seg{i}_uv"]),
+            "cv":   int(state[f"seg{i}_cv"]),
+            "rv":   float(state[f"seg{i}_rv"]),
+        }
+        for i in range(int(state.get("num_segments", 1)))
+    ]
+
+def select_best_variation(mv):
+    """
+    Metrics dict used for the bootstrap / revenue comparison: the declared winner,
+    else the highest-CR variation, else Control (single-group edge case).
+    """
+    if mv["winner"]:
+        return next(m for m in mv["metrics"] if m["name"] == mv["winner"])
+    if len(mv["metrics"]) > 1:
+        return max(mv["metrics"][1:], key=lambda m: m["cr"])
+    return mv["metrics"][0]
+
+def analyze_snapshot(snapshot):
+    """
+    Run the full dashboard pipeline on a snapshot dict (as written by
+    "Download Inputs (.json)"). Missing keys fall back to DEFAULT_INPUTS.
+    Returns the same objects the dashboard renders.
+    """
+    state  = {**DEFAULT_INPUTS, **{k: v for k, v in snapshot.items() if v is not None}}
+    alpha  = CONF_ALPHA[state["conf_level"]]
+    arms   = arms_from_state(state)
+    groups = arms.to_groups()
+
+    mv     = run_multivariate_analysis(arms, alpha, state["mc_method"], state["primary_goal"])
+    if state["all_pairs"] and len(arms) > 2:
+        mv["all_pairs"] = run_all_pairs_analysis(arms, alpha, state["mc_method"])
+    bayes  = calculate_bayesian_multivariate(arms)
+    srm_stat, p_srm = perform_srm_test([g["users"] for g in groups])
+
+    ctrl_m = mv["metrics"][0]
+    best_m = select_best_variation(mv)
+    best_g = next(g for g in groups if g["name"] == best_m["name"])
+    revenue_values = revenue_values_from_state(state, groups)
+    rev_sq  = rev_sq_from_state(state, groups)
+    rev_sig = compare_revenue(groups[0], best_g, alpha, revenue_values)
+    rev_qte = compare_quantiles(groups[0], best_g, alpha, revenue_values)
+    rev_delta = compare_revenue_delta(arms, alpha, revenue_values, rev_sq)
+    # Sequential monitoring only for snapshots that carry a design
+    sequential = (evaluate_sequential(arms, state["seq_history"], state["seq_max_users"], alpha, state["seq_spending"])
+                  if snapshot.get("seq_max_users") else None)
+    always_valid = None
+    if snapshot.get("avi_state") or snapshot.get("seq_mode") == "always_valid":
+        always_valid = always_valid_sync(state["avi_state"], arms, alpha,
+                                         *always_valid_tau(state["p_base_cr"], state["p_base_aov"], state["p_mde"]),
+                                         revenue_values, rev_sq)
+    covariates = cuped_from_state(state, len(arms))
+    cuped = (run_cuped_analysis(arms, covariates, alpha, state["mc_method"], revenue_values, rev_sq)
+             if covariates is not None else None)
+    start_date = state.get("start_date")
+    if isinstance(start_date, str):
+        start_date = datetime.date.fromisoformat(start_date)
+    return {
+        "alpha":             alpha,
+        "groups":            groups,
+        "mv":                mv,
+        "bayes":             bayes,
+        "srm_stat":          srm_stat,
+        "p_srm":             p_srm,
+        "ctrl_m":            ctrl_m,
+        "best_m":            best_m,
+        "rev_sig":           rev_sig,
+        "rev_delta":         rev_delta,
+        "rev_qte":           rev_qte,
+        "guardrail_results": evaluate_guardrails(guardrail_inputs_from_state(state)),
+        "segment_results":   analyze_segments(segment_inputs_from_state(state), alpha),
+        "duration_checks":   analyze_test_duration(int(state["days"]), start_date),
+        "sequential":        sequential,
+        "always_valid":      always_valid,
+        "cuped":             cuped,
+        # Report settings, so a PDF can be built from this result alone
+        "days":              int(state["days"]),
+        "conf_level":        state["conf_level"],
+        "primary_goal":      state["primary_goal"],
+        "start_date":        start_date,
+    }
@@ -0,0 +1,429 @@
+"""
+Streaming ingestion of raw experiment event logs.
+
+Reads exposure and order logs (CSV, gzipped CSV or Parquet) in fixed-size
+chunks and folds them into the per-group aggregates the dashboard works on:
+distinct users, converting users, revenue and products per arm, plus the
+per-segment Control-vs-variation inputs, and each converter's revenue for
+tests on observed values (raw, or as a log-bucket sketch of a few kB per
+arm). Files are never loaded whole — peak memory is one chunk plus ~12
+bytes per distinct exposed user (hash and segment code) and ~20 per
+converter (plus its revenue), whatever the number of rows.
+
+    python ab_ingest.py exposures.parquet --orders orders.csv.gz -o snapshot.json
+    python ab_ingest.py "logs/exp_*.csv" --orders "logs/ord_*.csv" --segment-col device
+
+The written snapshot loads in the dashboard ("Load Snapshot") and in ab_batch.py.
+"""
+import argparse
+import glob
+import json
+import sys
+import time
+
+import numpy as np
+
+from ab_engine import (NumpyEncoder, DEFAULT_INPUTS, SAVE_KEYS, SKETCH_ACCURACY, VARIATION_FIELDS,
+                       sketch_order_values, variation_label)
+
+
+INGEST_CHUNK_ROWS   = 1_000_000   # rows per chunk read from disk
+COMPACT_MIN_PENDING = 1_000_000   # user hashes buffered before a set is re-compacted
+MAX_SNAPSHOT_SEGMENTS = 4         # segment slots in the snapshot format (seg0..seg3)
+PARQUET_EXTENSIONS  = (".parquet", ".pq")
+
+
+# -----------------------------------------------
+# CHUNKED READERS
+# -----------------------------------------------
+def iter_chunks(path, columns, chunk_rows=INGEST_CHUNK_ROWS, id_col=None):
+    """
+    Yield DataFrames of at most chunk_rows rows holding only `columns`.
+    The id column is read as text so that CSV and Parquet logs of the same
+    experiment hash identical user IDs to identical keys.
+    """
+    import pandas as pd
+    if path.lower().endswith(PARQUET_EXTENSIONS):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=list(columns)):
+            if id_col is not None:
+                idx   = batch.schema.get_field_index(id_col)
+                batch = batch.set_column(idx, id_col, batch.column(idx).cast(pa.string()))
+            yield batch.to_pandas()
+    else:
+        dtype = {id_col: str} if id_col is not None else None
+        yield from pd.read_csv(path, usecols=list(columns), dtype=dtype, chunksize=chunk_rows)
+
+def hash_ids(values):
+    """64-bit hashes of user IDs. Collisions are negligible below ~10^8 distinct users."""
+    import pandas as pd
+    return pd.util.hash_pandas_object(pd.Series(values, copy=False), index=False).to_numpy()
+
+
+# -----------------------------------------------
+# DISTINCT-USER SETS
+# -----------------------------------------------
+class _UserSet:
+    """
+    Sorted, de-duplicated user hashes for one arm, with the segment code each
+    user was first seen in and, with values=True, a per-user value summed over
+    duplicates (revenue for converters; val is None otherwise, so exposure sets
+    cost no more than the hash and segment). New keys are buffered and merged
+    in one np.unique pass once the buffer outgrows the set, so merging stays
+    amortised O(n log n).
+    """
+    def __init__(self, values=False):
+        self.keys     = np.empty(0, dtype=np.uint64)
+        self.seg      = np.empty(0, dtype=np.int32)
+        self.val      = np.empty(0) if values else None
+        self._pending = []
+        self._n_pending = 0
+
+    def add(self, keys, seg, val=None):
+        if self.val is not None and val is None:
+            val = np.zeros(len(keys))
+        self._pending.append((keys, seg, val))
+        self._n_pending += len(keys)
+        if self._n_pending > max(len(self.keys), COMPACT_MIN_PENDING):
+            self.compact()
+
+    def compact(self):
+        if not self._pending:
+            return
+        keys = np.concatenate([self.keys] + [k for k, _, _ in self._pending])
+        seg  = np.concatenate([self.seg]  + [s for _, s, _ in self._pending])
+        # return_index gives the first occurrence — existing keys come first, so they keep their segment
+        self.keys, first, inv = np.unique(keys, return_index=True, return_inverse=True)
+        self.seg  = seg[first]
+        if self.val is not None:
+            val      = np.concatenate([self.val] + [v for _, _, v in self._pending])
+            self.val = np.bincount(inv, weights=val, minlength=len(self.keys))
+        self._pending, self._n_pending = [], 0
+
+    def lookup(self, keys):
+        """(found mask, segment code) for each key. Call compact() first."""
+        pos   = np.searchsorted(self.keys, keys)
+        pos   = np.minimum(pos, max(len(self.keys) - 1, 0))
+        found = self.keys[pos] == keys if len(self.keys) else np.zeros(len(keys), dtype=bool)
+        return found, self.seg[pos] if len(self.keys) else np.zeros(len(keys), dtype=np.int32)
+
+    def __len__(self):
+        self.compact()
+        return len(self.keys)
+
+
+# -----------------------------------------------
+# INCREMENTAL AGGREGATOR
+# -----------------------------------------------
+class EventLogAggregator:
+    """
+    Folds exposure and order chunks into per-arm / per-segment aggregates.
+    Feed every exposure chunk before the first order chunk: orders are
+    attributed to the arm (and segment) the user was exposed in, and orders
+    from users with no exposure are counted as unattributed and dropped.
+    A user exposed to several arms is counted in each; see stats["multi_arm_users"].
+    """
+    def __init__(self, user_col="user_id", arm_col="variant", segment_col=None,
+                 revenue_col="revenue", products_col=None, time_col=None):
+        self.user_col, self.arm_col, self.segment_col = user_col, arm_col, segment_col
+        self.revenue_col, self.products_col, self.time_col = revenue_col, products_col, time_col
+        self.arms       = {}   # arm label -> index
+        self.segments   = {}   # segment label -> code
+        self._exposed   = []   # _UserSet per arm
+        self._converted = []   # _UserSet per arm
+        self._rev       = np.zeros((0, 0))   # (arm, segment) revenue totals
+        self._prod      = np.zeros((0, 0))   # (arm, segment) product totals
+        self._t_min = self._t_max = None
+        self.stats = {"exposure_rows": 0, "order_rows": 0, "unattributed_orders": 0,
+                      "exposure_seconds": 0.0, "order_seconds": 0.0}
+
+    @property
+    def exposure_columns(self):
+        return [c for c in (self.user_col, self.arm_col, self.segment_col, self.time_col) if c]
+
+    @property
+    def order_columns(self):
+        return [c for c in (self.user_col, self.revenue_col, self.products_col) if c]
+
+    def _codes(self, values, mapping):
+        """Map labels to stable integer codes, registering unseen labels."""
+        import pandas as pd
+        codes, uniques = pd.factorize(pd.Series(values, copy=False).astype(str), sort=False)
+        remap = np.array([mapping.setdefault(u, len(mapping)) for u in uniques], dtype=np.int32)
+        return remap[codes] if len(remap) else codes.astype(np.int32)
+
+    def _grow(self):
+        n_arm, n_seg = len(self.arms), max(len(self.segments), 1)
+        while len(self._exposed) < n_arm:
+            self._exposed.append(_UserSet())
+            self._converted.append(_UserSet(values=True))
+        if self._rev.shape != (n_arm, n_seg):
+            rev, prod = np.zeros((n_arm, n_seg)), np.zeros((n_arm, n_seg))
+            rev[:self._rev.shape[0], :self._rev.shape[1]]   = self._rev
+            prod[:self._prod.shape[0], :self._prod.shape[1]] = self._prod
+            self._rev, self._prod = rev, prod
+
+    def add_exposures(self, df):
+        t0   = time.perf_counter()
+        keys = hash_ids(df[self.user_col])
+        arm  = self._codes(df[self.arm_col], self.arms)
+        seg  = (self._codes(df[self.segment_col], self.segments) if self.segment_col
+                else np.zeros(len(df), dtype=np.int32))
+        self._grow()
+        for a in np.unique(arm):
+            m = arm == a
+            k, first = np.unique(keys[m], return_index=True)
+            self._exposed[a].add(k, seg[m][first])
+        if self.time_col:
+            import pandas as pd
+            ts = pd.to_datetime(df[self.time_col], errors="coerce")
+            lo, hi = ts.min(), ts.max()
+            if pd.notna(lo):
+                self._t_min = lo if self._t_min is None else min(self._t_min, lo)
+                self._t_max = hi if self._t_max is None else max(self._t_max, hi)
+        self.stats["exposure_rows"]    += len(df)
+        self.stats["exposure_seconds"] += time.perf_counter() - t0
+
+    def add_orders(self, df):
+        t0   = time.perf_counter()
+        keys = hash_ids(df[self.user_col])
+        rev  = np.nan_to_num(df[self.revenue_col].to_numpy(dtype=float))
+        prod = (df[self.products_col].to_numpy(dtype=float) if self.products_col
+                else np.ones(len(df)))
+        unattributed = np.ones(len(df), dtype=bool)
+        for a, users in enumerate(self._exposed):
+            users.compact()
+            found, seg = users.lookup(keys)
+            found &= unattributed   # first matching arm wins for multi-arm users
+            if not found.any():
+                continue
+            unattributed &= ~found
+            k, first, inv = np.unique(keys[found], return_index=True, return_inverse=True)
+            self._converted[a].add(k, seg[found][first], np.bincount(inv, weights=rev[found]))
+            n_seg = self._rev.shape[1]
+            self._rev[a]  += np.bincount(seg[found], weights=rev[found],  minlength=n_seg)
+            self._prod[a] += np.bincount(seg[found], weights=prod[found], minlength=n_seg)
+        self.stats["order_rows"]          += len(df)
+        self.stats["unattributed_orders"] += int(unattributed.sum())
+        self.stats["order_seconds"]       += time.perf_counter() - t0
+
+    # ---- results ------------------------------------------------------
+    def _arm_order(self, control):
+        labels = {str(l).lower(): l for l in self.arms}
+        if str(control).lower() not in labels:
+            raise ValueError(f"Control arm '{control}' not found in exposures "
+                             f"(arms seen: {', '.join(map(str, self.arms)) or 'none'})")
+        ctrl = labels[str(control).lower()]
+        return [ctrl] + sorted(l for l in self.arms if l != ctrl)
+
+    def _counts(self, label):
+        a = self.arms[label]
+        n_seg = self._rev.shape[1]
+        exp, conv = self._exposed[a], self._converted[a]
+        exp.compact(); conv.compact()
+        return (np.bincount(exp.seg,  minlength=n_seg),
+                np.bincount(conv.seg, minlength=n_seg),
+                self._rev[a], self._prod[a])
+
+    def groups(self, control="control"):
+        """Groups list in the engine's format, Control first, then variations by arm label."""
+        out = []
+        for i, label in enumerate(self._arm_order(control)):
+            users, conv, rev, prod = self._counts(label)
+            name = "Control" if i == 0 else variation_label(i - 1)
+            out.append({"name": name, "users": int(users.sum()), "conv": int(conv.sum()),
+                        "rev": float(rev.sum()), "prod": int(round(prod.sum()))})
+        return out
+
+    def arm_labels(self, control="control"):
+        """Group name -> raw arm label, in groups() order."""
+        return {g["name"]: label for g, label in zip(self.groups(control), self._arm_order(control))}
+
+    def segment_inputs(self, control="control", variation=None):
+        """Per-segment Control-vs-variation inputs (variation defaults to the first non-control arm)."""
+        if not self.segment_col:
+            return []
+        order = self._arm_order(control)
+        if len(order) < 2:
+            return []
+        var = order[1] if variation is None else variation
+        uc, cc, rc, _ = self._counts(order[0])
+        uv, cv, rv, _ = self._counts(var)
+        return [{"name": name, "uc": int(uc[code]), "cc": int(cc[code]), "rc": float(rc[code]),
+                 "uv": int(uv[code]), "cv": int(cv[code]), "rv": float(rv[code])}
+                for name, code in sorted(self.segments.items(), key=lambda kv: kv[1])]
+
+    def revenue_sum_squares(self, control="control"):
+        """Σ revenue² over each arm's users (per-user revenue summed over orders), in groups() order."""
+        out = []
+        for label in self._arm_order(control):
+            conv = self._converted[self.arms[label]]
+            conv.compact()
+            out.append(float(conv.val @ conv.val))
+        return out
+
+    def revenue_values(self, control="control"):
+        """
+        Non-zero revenue per converting user for each arm, keyed by snapshot
+        suffix ("c", "v0", ...) — the "revenue_values" block of a snapshot.
+        """
+        out = {}
+        for i, label in enumerate(self._arm_order(control)):
+            conv = self._converted[self.arms[label]]
+            conv.compact()
+            out["c" if i == 0 else f"v{i - 1}"] = conv.val[conv.val != 0]
+        return out
+
+    def revenue_sketches(self, control="control"):
+        """
+        Order-value sketch (sketch_order_values) of each arm's per-user revenue,
+        keyed like revenue_values — the "revenue_sketch" block of a snapshot.
+        Sketches of disjoint partitions of users add with merge_sketches.
+        """
+        out = {"accuracy": SKETCH_ACCURACY}
+        for key, vals in self.revenue_values(control).items():
+            out[key] = sketch_order_values(vals)
+        return out
+
+    def date_range(self):
+        """(start_date, days) from the time column, or (None, None)."""
+        if self._t_min is None:
+            return None, None
+        return self._t_min.date(), max(1, (self._t_max.normalize() - self._t_min.normalize()).days + 1)
+
+    def summary_stats(self):
+        s = dict(self.stats)
+        s["arms"]           = len(self.arms)
+        s["distinct_users"] = sum(len(u) for u in self._exposed)
+        s["duplicate_exposures"] = s["exposure_rows"] - s["distinct_users"]
+        if len(self._exposed) > 1:
+            all_keys = np.concatenate([u.keys for u in self._exposed])
+            s["multi_arm_users"] = int(len(all_keys) - len(np.unique(all_keys)))
+        else:
+            s["multi_arm_users"] = 0
+        for kind in ("exposure", "order"):
+            sec = s[f"{kind}_seconds"]
+            s[f"{kind}_rows_per_sec"] = s[f"{kind}_rows"] / sec if sec > 0 else 0.0
+        return s
+
+    def to_snapshot(self, control="control", variation=None, revenue_values=True, **settings):
+        """
+        Snapshot dict in the "Download Inputs (.json)" format. settings override
+        analysis options (conf_level, mc_method, ...). The per-user revenue
+        sketch is always included, so revenue tests run on observed values
+        (within SKETCH_ACCURACY) instead of reconstructed ones; with
+        revenue_values the exact values are added too. Any number of arms.
+        """
+        groups = self.groups(control)
+        snap = {k: DEFAULT_INPUTS[k] for k in SAVE_KEYS if k in DEFAULT_INPUTS}
+        ctrl, variations = groups[0], groups[1:]
+        snap.update({f"{f}_c": ctrl[f] for f in VARIATION_FIELDS})
+        snap["num_variations"] = len(variations)
+        snap["variations"] = {"name": [g["name"] for g in variations],
+                              **{f: [g[f] for g in variations] for f in VARIATION_FIELDS}}
+        if self.stats["order_rows"]:
+            rev_sq = self.revenue_sum_squares(control)
+            snap["rev_sq_c"], snap["variations"]["rev_sq"] = rev_sq[0], rev_sq[1:]
+        segs = self.segment_inputs(control, variation)[:MAX_SNAPSHOT_SEGMENTS]
+        if segs:
+            snap["num_segments"] = len(segs)
+            for i, s in enumerate(segs):
+                snap.update({f"seg{i}_{k}": v for k, v in s.items()})
+        start_date, days = self.date_range()
+        if days:
+            snap["days"], snap["start_date"] = days, start_date.isoformat()
+        if self.stats["order_rows"]:
+            snap["revenue_sketch"] = self.revenue_sketches(control)
+        if revenue_values and self.stats["order_rows"]:
+            snap["revenue_values"] = self.revenue_values(control)
+        snap.update(settings)
+        return snap
+
+
+# -----------------------------------------------
+# DRIVER
+# -----------------------------------------------
+def _expand(patterns):
+    paths = []
+    for pat in patterns:
+        matched = sorted(glob.glob(pat)) or [pat]
+        paths.extend(p for p in matched if p not in paths)
+    return paths
+
+def _progress(kind, rows, seconds, stream=sys.stderr):
+    rate = rows / seconds if seconds > 0 else 0.0
+    stream.write(f"\r{kind}: {rows:>13,} rows · {rate:>11,.0f} rows/s")
+    stream.flush()
+
+def ingest_event_logs(exposure_paths, order_paths=(), chunk_rows=INGEST_CHUNK_ROWS,
+                      progress=False, **columns):
+    """
+    Stream exposure then order files through an EventLogAggregator and return it.
+    columns: user_col, arm_col, segment_col, revenue_col, products_col, time_col.
+    """
+    agg = EventLogAggregator(**columns)
+    for kind, paths, cols, add in (
+        ("exposures", exposure_paths, agg.exposure_columns, agg.add_exposures),
+        ("orders",    order_paths,    agg.order_columns,    agg.add_orders),
+    ):
+        for path in paths:
+            for chunk in iter_chunks(path, cols, chunk_rows, id_col=agg.user_col):
+                add(chunk)
+                if progress:
+                    key = kind[:-1] if kind == "exposures" else "order"
+                    _progress(kind, agg.stats[f"{key}_rows"], agg.stats[f"{key}_seconds"])
+        if progress and paths:
+            sys.stderr.write("\n")
+    return agg
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate raw exposure / order logs into an A/B test snapshot.")
+    parser.add_argument("exposures", nargs="+", help="Exposure log files or glob patterns (CSV, CSV.gz, Parquet).")
+    parser.add_argument("--orders", nargs="*", default=[], help="Order log files or glob patterns.")
+    parser.add_argument("-o", "--output", default="experiment_snapshot.json", help="Snapshot JSON to write.")
+    parser.add_argument("--control", default="control", help="Arm label of the control group (case-insensitive).")
+    parser.add_argument("--segment-variation", default=None,
+                        help="Arm compared with control in the segment breakdown (default: first variation).")
+    parser.add_argument("--user-col", default="user_id")
+    parser.add_argument("--arm-col", default="variant")
+    parser.add_argument("--segment-col", default=None)
+    parser.add_argument("--revenue-col", default="revenue")
+    parser.add_argument("--products-col", default=None, help="Items per order (default: each order row counts 1).")
+    parser.add_argument("--time-col", default=None, help="Exposure timestamp; sets days / start_date.")
+    parser.add_argument("--no-revenue-values", action="store_true",
+                        help="Omit exact per-user revenue from the snapshot (kB instead of MB; revenue tests use the "
+                             "order-value sketch).")
+    parser.add_argument("--chunk-rows", type=int, default=INGEST_CHUNK_ROWS)
+    parser.add_argument("-q", "--quiet", action="store_true", help="No progress output.")
+    args = parser.parse_args(argv)
+
+    agg = ingest_event_logs(
+        _expand(args.exposures), _expand(args.orders), chunk_rows=args.chunk_rows,
+        progress=not args.quiet,
+        user_col=args.user_col, arm_col=args.arm_col, segment_col=args.segment_col,
+        revenue_col=args.revenue_col, products_col=args.products_col, time_col=args.time_col,
+    )
+    try:
+        snapshot = agg.to_snapshot(args.control, args.segment_variation,
+                                   revenue_values=not args.no_revenue_values)
+    except (ValueError, KeyError) as e:
+        parser.exit(1, f"error: {e}\n")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=2, cls=NumpyEncoder)
+
+    s = agg.summary_stats()
+    print(f"Exposures: {s['exposure_rows']:,} rows ({s['exposure_rows_per_sec']:,.0f} rows/s) → "
+          f"{s['distinct_users']:,} users in {s['arms']} arms, {s['duplicate_exposures']:,} duplicates")
+    print(f"Orders:    {s['order_rows']:,} rows ({s['order_rows_per_sec']:,.0f} rows/s), "
+          f"{s['unattributed_orders']:,} unattributed")
+    if s["multi_arm_users"]:
+        print(f"⚠ {s['multi_arm_users']:,} users were exposed to more than one arm")
+    for name, label in agg.arm_labels(args.control).items():
+        print(f"  {name:<12} = {label}")
+    print(f"→ {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Portfolio view of many concurrent experiments.
+
+Reads one table of experiments and arms (CSV, Parquet or JSONL, one row per
+arm) — or builds it from saved snapshots — and runs analyze_portfolio: the
+dashboard's z-tests, chi-square and correction for every experiment in a
+few stacked array passes, Benjamini-Hochberg across the whole portfolio,
+and a ranked list of variations.
+
+    python ab_portfolio.py arms.csv -o ranked.csv
+    python ab_portfolio.py snapshots/ --alpha 0.1 -o ranked.parquet
+    python ab_portfolio.py arms.parquet --control-label baseline --top 20
+
+Table columns: experiment, arm, users, conv, rev, optional prod and
+shared_control (the experiment whose control this one shares).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from ab_batch import OUTPUT_FORMATS, find_snapshots, snapshot_keys, write_summary
+from ab_engine import DEFAULT_INPUTS, analyze_portfolio, arms_from_state
+
+
+TABLE_FORMATS = (".csv", ".parquet", ".jsonl")
+
+
+# -----------------------------------------------
+# INPUT
+# -----------------------------------------------
+def read_table(path):
+    """One-row-per-arm portfolio table from CSV, Parquet or JSONL (a path, or an open file with a .name)."""
+    import pandas as pd
+    ext = os.path.splitext(getattr(path, "name", path))[1].lower()
+    if ext == ".csv":
+        return pd.read_csv(path, dtype={"experiment": str, "arm": str, "shared_control": str})
+    if ext == ".parquet":
+        return pd.read_parquet(path)
+    if ext == ".jsonl":
+        return pd.read_json(path, lines=True, dtype={"experiment": str, "arm": str})
+    raise ValueError(f"Unsupported table format '{ext}' — use one of {', '.join(TABLE_FORMATS)}")
+
+def table_from_snapshots(paths):
+    """
+    Portfolio table from dashboard snapshots — one experiment per file, named
+    by its experiment_id, else its path relative to the common input
+    directory (snapshot_keys). A later file repeating an experiment_id is
+    not merged into the first: it is skipped as a failure. Returns (table,
+    failures) where failures lists (path, error) for files that could not be
+    read or were skipped.
+    """
+    cols = {k: [] for k in ("experiment", "arm", "users", "conv", "rev", "prod")}
+    failures = []
+    seen = {}   # experiment name -> path it came from
+    for path, key in zip(paths, snapshot_keys(paths)):
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            if not isinstance(snapshot, dict):
+                raise ValueError("snapshot is not a JSON object")
+            arms = arms_from_state({**DEFAULT_INPUTS, **{k: v for k, v in snapshot.items() if v is not None}})
+        except Exception as e:
+            failures.append((path, f"{type(e).__name__}: {e}"))
+            continue
+        name = str(snapshot.get("experiment_id") or "").strip() or key
+        if name in seen:
+            failures.append((path, f"duplicate experiment '{name}' (already read from {seen[name]})"))
+            continue
+        seen[name] = path
+        cols["experiment"] += [name] * len(arms)
+        cols["arm"]        += arms.names
+        for field in ("users", "conv", "rev", "prod"):
+            cols[field] += getattr(arms, field).tolist()
+    return cols, failures
+
+
+# -----------------------------------------------
+# OUTPUT
+# -----------------------------------------------
+def print_ranking(result, top, stream=sys.stdout):
+    c = result["comparisons"]
+    stream.write(f"{'rank':>5}  {'experiment':<28}{'arm':<18}{'CR uplift':>11}{'p (exp.)':>11}"
+                 f"{'p (portf.)':>12}  sig\n")
+    for i in range(min(top, result["n_comparisons"])):
+        stream.write(f"{c['rank'][i]:>5}  {c['experiment'][i][:27]:<28}{c['arm'][i][:17]:<18}"
+                     f"{c['uplift_cr'][i]:>+10.2f}%{c['p_adjusted'][i]:>11.4f}{c['p_portfolio'][i]:>12.4f}  "
+                     f"{'yes' if c['significant_portfolio'][i] else ''}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank the variations of many experiments with portfolio-wide FDR.")
+    parser.add_argument("inputs", nargs="+", help="One arms table (CSV / Parquet / JSONL), or snapshot files / directories.")
+    parser.add_argument("-o", "--output", default=None,
+                        help=f"Write the ranked comparisons ({', '.join(OUTPUT_FORMATS)}).")
+    parser.add_argument("--alpha", type=float, default=0.05, help="Significance level (default 0.05).")
+    parser.add_argument("--mc-method", default="holm", choices=("holm", "bonferroni", "fdr_bh"),
+                        help="Correction within each experiment (default holm).")
+    parser.add_argument("--control-label", default="Control", help="Arm name of each experiment's control.")
+    parser.add_argument("--top", type=int, default=25, help="Rows of the ranking to print.")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    failures = []
+    if len(args.inputs) == 1 and os.path.splitext(args.inputs[0])[1].lower() in TABLE_FORMATS:
+        table = read_table(args.inputs[0])
+    else:
+        paths = find_snapshots(args.inputs)
+        if not paths:
+            parser.error("no snapshot files matched")
+        table, failures = table_from_snapshots(paths)
+    t1 = time.perf_counter()
+    try:
+        result = analyze_portfolio(table, args.alpha, args.mc_method, args.control_label)
+    except (KeyError, ValueError) as e:
+        parser.exit(1, f"error: {e}\n")
+    t2 = time.perf_counter()
+
+    n_sig = sum(result["comparisons"]["significant_portfolio"])
+    print(f"{len(result['experiments']['experiment'])} experiments, {result['n_comparisons']} comparisons, "
+          f"{n_sig} significant at FDR {args.alpha:g} — loaded in {t1 - t0:.2f}s, analysed in {(t2 - t1) * 1e3:.0f} ms")
+    print_ranking(result, args.top)
+    if args.output:
+        write_summary([dict(zip(result["comparisons"], row)) for row in zip(*result["comparisons"].values())],
+                      args.output)
+        print(f"→ {args.output}")
+    for path, err in failures:
+        print(f"skipped {path}: {err}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1197 @@
+"""
+Report generation for the A/B Test Analyzer: rule-based Smart Analysis,
+LLM analysis and the PDF export.
+
+Heavy optional dependencies (openai, reportlab, matplotlib) are imported
+inside the functions that need them, so importing this module is cheap.
+"""
+import io
+import os
+import json
+import datetime
+import colorsys
+import functools
+import threading
+import re as _re
+from contextlib import contextmanager
+
+import numpy as np
+
+from ab_engine import AnalysisCache, NumpyEncoder, simulate_cr_bootstrap
+
+
+# -----------------------------------------------
+# CHART STYLE
+# -----------------------------------------------
+# Fixed colours for Control, Var A, Var B, Var C; further arms get generated hues
+GROUP_COLORS   = ["#1f77b4", "#2ca02c", "#ff7f0e", "#9467bd"]
+CHART_MAX_ARMS = 12   # per-arm charts show Control + the top CHART_MAX_ARMS − 1 variations by CR
+
+def group_color(i):
+    """Colour of group i: GROUP_COLORS, then golden-angle hues so any arm count stays distinct."""
+    if i < len(GROUP_COLORS):
+        return GROUP_COLORS[i]
+    r, g, b = colorsys.hls_to_rgb((0.13 + (i - len(GROUP_COLORS)) * 0.618034) % 1.0, 0.45, 0.6)
+    return f"#{round(r * 255):02x}{round(g * 255):02x}{round(b * 255):02x}"
+
+def chart_arm_indices(values, limit=CHART_MAX_ARMS):
+    """
+    Rows a per-arm chart shows: every arm up to `limit`, else Control plus
+    the limit − 1 variations with the highest `values`, in their original order.
+    """
+    if len(values) <= limit:
+        return list(range(len(values)))
+    top = np.argsort(-np.asarray(values[1:], dtype=float), kind="stable")[:limit - 1] + 1
+    return [0] + sorted(top.tolist())
+
+def top_arms_note(shown, total):
+    """Title suffix when a chart shows only some of the arms."""
+    return f" (top {shown - 1} of {total - 1} variations)" if total > shown else ""
+
+# Light matplotlib theme for PDF charts, optimised for print.
+# Passed to plt.rc_context — never applied globally.
+PDF_CHART_RC = {
+    # Figure & axes backgrounds
+    "figure.facecolor":  "white",    "axes.facecolor":   "#f8f8f8",
+    "savefig.facecolor": "white",
+    # Text & labels
+    "text.color":        "#1a1d24",  "axes.labelcolor":  "#1a1d24",
+    "axes.titlecolor":   "#1a1d24",
+    "axes.titlesize":    13,         "axes.labelsize":   11,
+    "axes.titlepad":     14,
+    # Ticks
+    "xtick.color":       "#1a1d24",  "ytick.color":      "#1a1d24",
+    "xtick.labelsize":   10,         "ytick.labelsize":  10,
+    # Grid
+    "axes.grid":         True,       "grid.color":       "#dddddd",
+    "grid.linewidth":    0.7,        "grid.alpha":       1.0,
+    # Spines
+    "axes.edgecolor":    "#cccccc",  "axes.linewidth":   0.8,
+    "axes.spines.top":   False,      "axes.spines.right": False,
+    # Legend
+    "legend.facecolor":  "white",    "legend.edgecolor": "#cccccc",
+    "legend.labelcolor": "#1a1d24",  "legend.fontsize":  10,
+    # Layout
+    "figure.dpi":        120,
+}
+PDF_CHART_FORMAT = "vector"   # "vector" (reportlab drawings) or "png" (raster at PDF_CHART_DPI)
+PDF_CHART_DPI    = 110
+CHART_CACHE_SIZE = 64   # rendered PDF charts kept in memory, keyed on their data
+
+
+# -----------------------------------------------
+# AI ANALYSIS
+# -----------------------------------------------
+def get_ai_analysis(api_key, hypothesis, metrics, provider="OpenAI", conf_level="95%", segment_results=None):
+    if not api_key:
+        return "Please enter a valid API Key to generate this analysis."
+    # Use None for OpenAI so the SDK uses its own default endpoint (future-proof)
+    base_url   = "https://api.deepseek.com" if provider == "DeepSeek" else None
+    model_name = "deepseek-reasoner"         if provider == "DeepSeek" else "gpt-4o"
+    prompt = f"""You are an expert CRO analyst writing a structured A/B/n test report for a business stakeholder.
+
+EXPERIMENT CONFIGURATION
+- Confidence Level: {conf_level}
+- Hypothesis: "{hypothesis}"
+
+EXPERIMENT DATA
+{json.dumps(metrics, indent=2, cls=NumpyEncoder)}
+
+INSTRUCTIONS
+Write in Markdown using exactly these sections. Do not restate the hypothesis as a heading — weave it into the Executive Summary opening sentence. If multiple variants are present, compare each vs control and identify a clear winner or explain why none qualifies.
+
+## Executive Summary
+One paragraph. State what was tested, whether any variant won, the best CR uplift, significance, and financial impact per visitor.
+
+## Trade-off Analysis
+CR vs AOV vs RPV across all variants. Identify clean wins, volume-vs-value trade-offs, or net negatives. Note whether MCC affected any conclusions.
+
+## Risk Assessment
+Bayesian probability and expected loss per variant. Factor in duration, SRM status, and number of variants tested.
+
+## Visual Insights
+
+### Strategic Matrix
+Where each variant sits on CR vs AOV quadrant and what it means strategically.
+
+### Product Metrics
+Basket size trends (APO, APU) across all groups and behavioural implications.
+
+### Revenue Charts
+RPV and AOV side by side — what the combination tells us about revenue quality per variant.
+
+### CR Comparison
+Contextualise each variant's uplift given sample size and base rate.
+
+### Bayesian Posterior
+Overlapping Beta distributions — overlap degree, certainty, and probability each variant is best.
+
+### Bootstrap Distribution
+Histogram of resampled CR differences — centre, CI bounds, zero-crossing implications.
+
+### Box Plot
+Median, IQR spread, and stability across groups.
+
+## Recommendation
+One paragraph. Ship / do not ship / run longer for each variant. Name a winner if one exists. End with one concrete next step."""
+
+    active_segs = [s for s in (segment_results or []) if not s.get("skip")]
+    if active_segs:
+        seg_lines = "\n".join(
+            f"  - {s['name']}: Ctrl CR {s['ctrl_cr']*100:.2f}% → Var CR {s['var_cr']*100:.2f}% "
+            f"(CR {s['uplift_cr']:+.2f}%, RPV {s['uplift_rpv']:+.2f}%, p={s['p_value']:.4f})"
+            for s in active_segs
+        )
+        prompt += f"""
+
+## Segment Breakdown
+For each segment below, comment on whether the result holds, whether there are meaningful differences across audiences, and any risk of the aggregate result masking a losing segment.
+
+Segment data (Control vs Best Variation):
+{seg_lines}"""
+
+    try:
+        import openai
+        client   = openai.OpenAI(api_key=api_key, base_url=base_url)
+        response = client.chat.completions.create(
+            model=model_name,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7,
+        )
+        return response.choices[0].message.content
+    except Exception as e:
+        return f"**Error connecting to AI provider:** {e}"
+
+
+# -----------------------------------------------
+# SMART ANALYSIS  (rule-based)
+# -----------------------------------------------
+def revenue_source_note(source):
+    """What the revenue tests ran on, by rev_sig["source"] (see ab_engine.compare_revenue)."""
+    if source == "observed":
+        return "Runs on observed per-user revenue from the loaded event logs."
+    if source == "sketch":
+        return "Runs on the loaded order-value sketch — observed per-user revenue, each value within 1%."
+    return "Distributions are reconstructed from aggregates — treat as directional signals."
+
+def generate_smart_analysis(hypothesis, mv_results, bayes_mv, metrics_payload, alpha_val, segment_results=None):
+    report = []
+    conf_pct = f"{(1 - alpha_val) * 100:.0f}%"
+
+    # ── CRITICAL: SRM blocks all further analysis ──────────────────────────
+    if metrics_payload["p_srm"] < 0.01:
+        report.append("### CRITICAL — Sample Ratio Mismatch")
+        report.append(
+            f"SRM p = **{metrics_payload['p_srm']:.4f}**. Traffic split is uneven — "
+            "**all results below are unreliable.** Fix randomisation before drawing any conclusions."
+        )
+        return "\n\n".join(report)
+
+    n_vars       = mv_results["n_comparisons"]
+    winner       = mv_results["winner"]
+    p_glob       = mv_results["p_global"]
+    primary_goal = metrics_payload.get("primary_goal", "Maximize CR")
+    rev_sig      = metrics_payload.get("rev_sig", {})
+    guardrails   = metrics_payload.get("guardrail_results", [])
+    all_metrics  = metrics_payload.get("metrics", [])
+
+    # ── HEADLINE ────────────────────────────────────────────────────────────
+    if n_vars == 1:
+        pw = mv_results["pairwise"][0]
+        p_display = f"{pw['p_adjusted']:.4f}" if np.isfinite(pw['p_adjusted']) else "—"
+        if pw["significant"] and pw["uplift_cr"] > 0:
+            headline = "WINNER — Statistically Significant Positive Result"
+            summary  = f"Variation outperforms Control at {conf_pct} confidence (p_adj = {p_display})."
+        elif pw["significant"] and pw["uplift_cr"] < 0:
+            headline = "LOSER — Statistically Significant Negative Result"
+            summary  = f"Variation is significantly worse than Control (p_adj = {p_display}). Do not ship."
+        else:
+            headline = "INCONCLUSIVE — No Clear Winner"
+            summary  = f"Cannot reject the null hypothesis (p_adj = {p_display}). More data needed."
+    else:
+        if winner:
+            headline = f"MULTI-VARIANT WINNER — {winner}"
+            summary  = (
+                f"Omnibus test confirms a significant difference (χ² p = {p_glob:.4f}). "
+                f"**{winner}** is the strongest performer after {mv_results['correction'].upper()} correction."
+            )
+        elif p_glob <= alpha_val:
+            headline = "SIGNIFICANT DIFFERENCE — No Positive Winner"
+            summary  = (
+                f"Omnibus test significant (p = {p_glob:.4f}) but no variant shows a "
+                "significant positive uplift after correction."
+            )
+        else:
+            headline = "MULTI-VARIANT INCONCLUSIVE"
+            summary  = f"No significant overall difference (omnibus p = {p_glob:.4f})."
+
+    report.append(f"### {headline}")
+    report.append(summary)
+    if hypothesis:
+        report.append(f"**Hypothesis:** _{hypothesis}_")
+    report.append(f"_Optimisation goal: **{primary_goal}** · Confidence level: **{conf_pct}**_")
+
+    # ── DATA HEALTH ─────────────────────────────────────────────────────────
+    report.append("### Data Health & Validity")
+    days = metrics_payload["days"]
+    dur_status = "WARNING:" if days < 14 else "PASS:"
+    dur_note   = f"Only {days} days — too short for reliable results." if days < 7 else \
+                 f"{days} days — watch for novelty effects." if days < 14 else \
+                 f"{days} days — healthy duration."
+    report.append(f"- **{dur_status}** Duration: {dur_note}")
+    report.append(f"- **PASS:** SRM test (p = {metrics_payload['p_srm']:.4f}) — traffic split is even.")
+    if n_vars > 1:
+        report.append(
+            f"- **INFO:** {mv_results['correction'].upper()} multiple comparison correction "
+            f"applied across {n_vars} pairwise comparisons."
+        )
+
+    # ── PAIRWISE RESULTS ────────────────────────────────────────────────────
+    report.append("### Pairwise Results vs Control")
+    for pw in mv_results["pairwise"]:
+        sig   = "Significant" if pw["significant"] else "Not Significant"
+        cr_d  = "▲" if pw["uplift_cr"]  >= 0 else "▼"
+        rpv_d = "▲" if pw["uplift_rpv"] >= 0 else "▼"
+        aov_d = "▲" if pw["uplift_aov"] >= 0 else "▼"
+        p_display = f"{pw['p_adjusted']:.4f}" if np.isfinite(pw['p_adjusted']) else "—"
+        report.append(
+            f"- **{pw['name']}** [{sig}] — "
+            f"CR {cr_d}{pw['uplift_cr']:+.2f}% | "
+            f"RPV {rpv_d}{pw['uplift_rpv']:+.2f}% | "
+            f"AOV {aov_d}{pw['uplift_aov']:+.2f}% | "
+            f"p_adj = {p_display}"
+        )
+
+    # ── PRODUCT VELOCITY ────────────────────────────────────────────────────
+    if len(all_metrics) > 1:
+        report.append("### Product Velocity")
+        for m in all_metrics[1:]:
+            apo_d = "▲" if m.get("uplift_apo", 0) >= 0 else "▼"
+            note  = ""
+            if abs(m.get("uplift_apo", 0)) > 10:
+                if m["uplift_apo"] < 0 and m["uplift_rpv"] >= 0:
+                    note = " — fewer items, same or higher revenue: better per-item margin."
+                elif m["uplift_apo"] > 0 and m["uplift_rpv"] >= 0:
+                    note = " — more items per order with higher revenue: basket expansion."
+                elif m["uplift_apo"] > 0 and m["uplift_rpv"] < 0:
+                    note = " — more items per order but lower revenue: possible discounting risk."
+            apo_val = m.get("uplift_apo", 0)
+            report.append(
+                f"- **{m['name']}**: {m['apo']:.2f} items/order "
+                f"({apo_d}{apo_val:+.1f}% vs Control){note}"
+            )
+
+    # ── REVENUE SIGNALS ─────────────────────────────────────────────────────
+    if rev_sig:
+        report.append("### Revenue Signals")
+        report.append(f"_{revenue_source_note(rev_sig.get('source'))}_")
+        for label, display in [("rpv", "Revenue Per Visitor"), ("aov", "Average Order Value")]:
+            r = rev_sig.get(label, {})
+            if not r:
+                continue
+            overall = "Significant" if r.get("sig") else "Not significant"
+            mw_p    = f"{r['mw_p']:.4f}" if np.isfinite(r.get("mw_p", float("nan"))) else "—"
+            ci_l    = r.get("boot_ci_low",  0)
+            ci_h    = r.get("boot_ci_high", 0)
+            ci_note = "CI entirely positive — gain is consistent." if ci_l > 0 else \
+                      "CI entirely negative — loss is consistent." if ci_h < 0 else \
+                      "CI crosses zero — result is uncertain."
+            report.append(
+                f"- **{display}:** {overall} (Mann-Whitney p = {mw_p}) · "
+                f"Bootstrap CI: ${ci_l:.3f} to ${ci_h:.3f} · {ci_note}"
+            )
+
+    # ── BAYESIAN ASSESSMENT ─────────────────────────────────────────────────
+    report.append("### Bayesian Assessment")
+    best_bayes = max(bayes_mv["prob_best"], key=bayes_mv["prob_best"].get)
+    for name, prob in bayes_mv["prob_best"].items():
+        loss = bayes_mv["expected_loss"].get(name, 0)
+        tag  = " ← highest probability" if name == best_bayes else ""
+        interp = ""
+        if prob >= 0.95:
+            interp = "Strong Bayesian evidence."
+        elif prob >= 0.80:
+            interp = "Moderate evidence — worth monitoring."
+        elif prob >= 0.60:
+            interp = "Weak signal — inconclusive."
+        else:
+            interp = "No meaningful advantage."
+        report.append(
+            f"- **{name}**: {prob*100:.1f}% P(best) | "
+            f"Expected loss if wrong: {loss*100:.4f}%{tag} — {interp}"
+        )
+
+    # ── GUARDRAIL STATUS ────────────────────────────────────────────────────
+    active_guards = [g for g in guardrails if not g.get("skip")]
+    if active_guards:
+        report.append("### Guardrail Metrics")
+        any_violated = any(g["violated"] for g in active_guards)
+        if any_violated:
+            report.append("**WARNING: One or more guardrail metrics are violated.**")
+        else:
+            report.append("All guardrail metrics are within acceptable thresholds.")
+        for g in active_guards:
+            status = "VIOLATED" if g["violated"] else "PASS"
+            d = "▲" if g["delta_pct"] > 0 else "▼"
+            report.append(
+                f"- **{g['name']}** [{status}]: {d}{abs(g['delta_pct']):.1f}% change "
+                f"(limit ±{g['threshold']}%, {g['direction']})"
+            )
+
+    # ── SEGMENT BREAKDOWN ────────────────────────────────────────────────────
+    active_segs = [s for s in (segment_results or []) if not s.get("skip")]
+    if active_segs:
+        report.append("### Segment Breakdown")
+        wins  = sum(1 for s in active_segs if s["uplift_cr"] > 0)
+        total = len(active_segs)
+        if wins > total / 2:
+            report.append(f"Variation leads in **{wins}/{total}** segments — result is consistent.")
+        elif wins == total / 2:
+            report.append(f"Variation leads in **{wins}/{total}** segments — mixed result.")
+        else:
+            report.append(
+                f"Variation leads in only **{wins}/{total}** segments — "
+                "aggregate uplift may not generalise across all audiences."
+            )
+        for s in active_segs:
+            sig_tag = " [Sig]" if s["significant"] else ""
+            cr_d  = "▲" if s["uplift_cr"]  >= 0 else "▼"
+            rpv_d = "▲" if s["uplift_rpv"] >= 0 else "▼"
+            report.append(
+                f"- **{s['name']}**{sig_tag}: "
+                f"CR {cr_d}{s['uplift_cr']:+.2f}% | "
+                f"RPV {rpv_d}{s['uplift_rpv']:+.2f}% | "
+                f"p = {s['p_value']:.4f}"
+            )
+
+    # ── STRATEGIC CONCLUSION ────────────────────────────────────────────────
+    report.append("### Strategic Conclusion")
+    if winner:
+        pw_w         = next(p for p in mv_results["pairwise"] if p["name"] == winner)
+        cr_up        = pw_w["uplift_cr"]
+        rpv_up       = pw_w["uplift_rpv"]
+        aov_up       = pw_w["uplift_aov"]
+        guards_ok    = not any(g["violated"] for g in active_guards) if active_guards else True
+        guard_note   = " Guardrail check: PASS." if guards_ok and active_guards else \
+                       " **Guardrail check: FAILED — review secondary metrics before shipping.**" if active_guards else ""
+
+        if cr_up > 0 and rpv_up > 0 and aov_up >= 0:
+            verdict = f"**[SHIP] {winner} — Growth Engine.** CR, RPV, and AOV all positive."
+        elif cr_up > 0 and rpv_up > 0 and aov_up < 0:
+            verdict = f"**[SHIP WITH CAUTION] {winner} — Volume Play.** CR and RPV up, but AOV down — higher conversion from lower-value orders."
+        elif cr_up <= 0 and rpv_up > 0:
+            verdict = f"**[REVIEW] {winner} — Quality Play.** Lower CR but higher RPV — fewer, higher-value conversions. Consistent with '{primary_goal}' goal."
+        elif cr_up > 0 and rpv_up < 0:
+            verdict = f"**[REVIEW] {winner} — Volume Play.** CR up but RPV down — watch margin impact before shipping."
+        else:
+            verdict = f"**[REVIEW] {winner} — Mixed Signals.** Review all metrics before deciding."
+        report.append(verdict + guard_note)
+    else:
+        report.append(
+            "**[DO NOT SHIP]** No variant qualifies on current data. "
+            "Consider running longer to accumulate statistical power, or revisit the hypothesis."
+        )
+
+    return "\n\n".join(report)
+
+
+# -----------------------------------------------
+# PDF CHARTS
+# -----------------------------------------------
+# Each chart is a pure function of plain data → matplotlib Figure, converted to
+# a reportlab Drawing (vector, the default) or PNG bytes, so it can be cached
+# on its inputs and rendered in a worker process. Figures are built with the
+# object API (no pyplot state); rcParams are process-global, so renders within
+# one process take _STYLE_LOCK while PDF_CHART_RC is applied.
+_STYLE_LOCK  = threading.Lock()
+_chart_cache = AnalysisCache(maxsize=CHART_CACHE_SIZE)
+_chart_pool  = None
+_chart_pool_lock = threading.Lock()
+
+@contextmanager
+def _pdf_style():
+    import matplotlib
+    with _STYLE_LOCK, matplotlib.rc_context(PDF_CHART_RC):
+        yield
+
+def _new_axes(figsize):
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize)
+    return fig, fig.add_subplot()
+
+def _figure_png(fig):
+    b = io.BytesIO()
+    fig.savefig(b, format="png", bbox_inches="tight", dpi=PDF_CHART_DPI)
+    return b.getvalue()
+
+# The PDF core fonts are WinAnsi-encoded: no U+2212 minus sign
+_CORE_FONT_TEXT = str.maketrans({"\u2212": "-"})
+
+@functools.lru_cache(maxsize=None)
+def _drawing_renderer():
+    """
+    matplotlib renderer that records a figure as reportlab shapes. Built on
+    first use so importing this module does not import matplotlib. Text is
+    set in Helvetica and measured with its metrics; text outside WinAnsi
+    (and mathtext) is drawn as glyph outlines instead.
+    """
+    from matplotlib.backend_bases import RendererBase
+    from matplotlib.font_manager import weight_dict
+    from matplotlib.path import Path as MplPath
+    from reportlab.graphics.shapes import Drawing, Group, Path, String
+    from reportlab.lib.colors import Color
+    from reportlab.pdfbase.pdfmetrics import getAscentDescent, stringWidth
+
+    caps  = {"butt": 0, "round": 1, "projecting": 2}
+    joins = {"miter": 0, "round": 1, "bevel": 2}
+
+    def core_text(s):
+        t = s.translate(_CORE_FONT_TEXT)
+        try:
+            t.encode("cp1252")
+        except UnicodeEncodeError:
+            return None
+        return t
+
+    def core_font(prop):
+        weight = prop.get_weight()
+        bold   = (weight_dict.get(weight, 400) if isinstance(weight, str) else weight) >= 600
+        italic = prop.get_style() != "normal"
+        return "Helvetica" + {(False, False): "", (True, False): "-Bold",
+                              (False, True): "-Oblique", (True, True): "-BoldOblique"}[bold, italic]
+
+    class DrawingRenderer(RendererBase):
+        def __init__(self, width, height):
+            super().__init__()
+            self.width, self.height = width, height
+            self.root    = Group()
+            self.bounds  = None
+            self._clip   = None    # (extents, group) of the last clipped shape
+
+        def flipy(self):
+            return False
+
+        def get_canvas_width_height(self):
+            return self.width, self.height
+
+        def _add(self, node, bounds, gc=None):
+            clip = gc.get_clip_rectangle() if gc is not None else None
+            if clip is None:
+                self.root.add(node)
+            else:
+                ext = tuple(clip.extents)
+                if self._clip is None or self._clip[0] != ext:
+                    x0, y0, x1, y1 = ext
+                    box = Path(isClipPath=1, fillColor=None, strokeColor=None)
+                    box.moveTo(x0, y0); box.lineTo(x1, y0); box.lineTo(x1, y1); box.lineTo(x0, y1)
+                    box.closePath()
+                    self._clip = (ext, Group(box))
+                    self.root.add(self._clip[1])
+                self._clip[1].add(node)
+                bounds = (max(bounds[0], ext[0]), max(bounds[1], ext[1]),
+                          min(bounds[2], ext[2]), min(bounds[3], ext[3]))
+                if bounds[0] > bounds[2] or bounds[1] > bounds[3]:
+                    return
+            if clip is None:
+                self._clip = None
+            b = self.bounds
+            self.bounds = bounds if b is None else (min(b[0], bounds[0]), min(b[1], bounds[1]),
+                                                    max(b[2], bounds[2]), max(b[3], bounds[3]))
+
+        def draw_path(self, gc, path, transform, rgbFace=None):
+            stroke_rgba = gc.get_rgb()
+            lw          = gc.get_linewidth()
+            stroke      = lw > 0 and stroke_rgba[3] > 0
+            if rgbFace is not None:
+                fill_alpha = gc.get_alpha() if gc.get_forced_alpha() else (rgbFace[3] if len(rgbFace) > 3 else 1.0)
+                fill = Color(*rgbFace[:3]) if fill_alpha > 0 else None
+            else:
+                fill, fill_alpha = None, 1.0
+            if not stroke and fill is None:
+                return
+            p = Path(fillColor=fill, fillOpacity=fill_alpha,
+                     strokeColor=Color(*stroke_rgba[:3]) if stroke else None,
+                     strokeOpacity=stroke_rgba[3], strokeWidth=lw,
+                     strokeLineCap=caps[gc.get_capstyle()], strokeLineJoin=joins[gc.get_joinstyle()],
+                     autoclose="svg")
+            offset, dashes = gc.get_dashes()
+            if stroke and dashes:
+                p.strokeDashArray = (offset or 0, list(dashes))
+            last = (0.0, 0.0)
+            for verts, code in path.iter_segments(transform, remove_nans=True):
+                if code == MplPath.MOVETO:
+                    p.moveTo(*verts)
+                elif code == MplPath.LINETO:
+                    p.lineTo(*verts)
+                elif code == MplPath.CURVE3:
+                    (cx, cy), (x, y) = verts[:2], verts[2:]
+                    p.curveTo(last[0] + 2 / 3 * (cx - last[0]), last[1] + 2 / 3 * (cy - last[1]),
+                              x + 2 / 3 * (cx - x), y + 2 / 3 * (cy - y), x, y)
+                elif code == MplPath.CURVE4:
+                    p.curveTo(*verts)
+                elif code == MplPath.CLOSEPOLY:
+                    p.closePath()
+                    continue
+                last = tuple(verts[-2:])
+            if not p.points:
+                return
+            xs, ys = p.points[0::2], p.points[1::2]
+            pad    = lw / 2 if stroke else 0.0
+            self._add(p, (min(xs) - pad, min(ys) - pad, max(xs) + pad, max(ys) + pad), gc)
+
+        def draw_text(self, gc, x, y, s, prop, angle, ismath=False, mtext=None):
+            text = None if ismath else core_text(s)
+            if text is None:
+                return super().draw_text(gc, x, y, s, prop, angle, ismath, mtext)
+            rgba = gc.get_rgb()
+            node = Group(String(0, 0, text, fontName=core_font(prop), fontSize=prop.get_size_in_points(),
+                                fillColor=Color(*rgba[:3]), fillOpacity=rgba[3]))
+            node.translate(x, y)
+            if angle:
+                node.rotate(angle)
+            self._add(node, node.getBounds())
+
+        def get_text_width_height_descent(self, s, prop, ismath):
+            text = None if ismath else core_text(s)
+            if text is None:
+                return super().get_text_width_height_descent(s, prop, ismath)
+            font, size = core_font(prop), prop.get_size_in_points()
+            ascent, descent = getAscentDescent(font, size)
+            return stringWidth(text, font, size), ascent - descent, -descent
+
+        def drawing(self, pad):
+            x0, y0, x1, y1 = self.bounds or (0, 0, self.width, self.height)
+            self.root.translate(pad - x0, pad - y0)
+            return Drawing(x1 - x0 + 2 * pad, y1 - y0 + 2 * pad, self.root)
+
+    return DrawingRenderer
+
+def _figure_drawing(fig):
+    """
+    Record fig as a reportlab Drawing in points, cropped to its content with
+    the same padding as bbox_inches="tight" — in one draw pass.
+    """
+    import matplotlib
+    fig.set_dpi(72)                   # one display unit == one point
+    fig.patch.set_visible(False)      # the page is white already; crop to the ink
+    w, h     = fig.get_size_inches() * 72
+    renderer = _drawing_renderer()(w, h)
+    fig.draw(renderer)
+    return renderer.drawing(pad=matplotlib.rcParams["savefig.pad_inches"] * 72)
+
+def _chart_cr_bars(names, cr_pct, colors=None, n_total=0):
+    fig, ax    = _new_axes((10, 4))
+    colors     = colors or [group_color(i) for i in range(len(names))]
+    ctrl_val   = cr_pct[0]
+    bar_colors = [colors[i] if (i == 0 or v >= ctrl_val) else "#d62728" for i, v in enumerate(cr_pct)]
+    bars = ax.bar(names, cr_pct, color=bar_colors, alpha=0.85)
+    mx   = max(cr_pct) if max(cr_pct) > 0 else 1
+    ax.set_ylim(0, mx * 1.18)
+    ax.set_title("Conversion Rate by Group" + top_arms_note(len(names), n_total))
+    ax.set_ylabel("CR %")
+    for bar, v in zip(bars, cr_pct):
+        ax.text(bar.get_x() + bar.get_width() / 2, v + mx * 0.01,
+                f"{v:.2f}%", ha="center", va="bottom", fontweight="bold", fontsize=9 if len(names) <= 6 else 7)
+    if len(names) > 6:
+        ax.tick_params(axis="x", labelrotation=30, labelsize=8)
+    return fig
+
+def _chart_strategic_matrix(names, cr_pct, aov, colors=None, n_total=0):
+    fig, ax = _new_axes((9, 5))
+    colors  = colors or [group_color(i) for i in range(len(names))]
+    for i, (name, cr, a) in enumerate(zip(names, cr_pct, aov)):
+        ax.scatter(cr, a, color=colors[i], s=180 if len(names) <= 6 else 90, label=name, zorder=5)
+        if i > 0:
+            ax.annotate("", xy=(cr, a), xytext=(cr_pct[0], aov[0]),
+                        arrowprops=dict(arrowstyle="->", color=colors[i], lw=1.5, ls="--"))
+    ax.axvline(cr_pct[0], color="#888", ls=":", alpha=0.4)
+    ax.axhline(aov[0],    color="#888", ls=":", alpha=0.4)
+    ax.set_title("Strategic Matrix: CR vs AOV" + top_arms_note(len(names), n_total))
+    ax.set_xlabel("Conversion Rate (%)")
+    ax.set_ylabel("Average Order Value ($)")
+    ax.legend(fontsize=None if len(names) <= 6 else 7, ncol=1 if len(names) <= 6 else 2)
+    return fig
+
+def _chart_posteriors(names, conv, users, colors=None, n_total=0):
+    from scipy.stats import beta
+    fig, ax = _new_axes((11, 4))
+    colors  = colors or [group_color(i) for i in range(len(names))]
+    for i, (name, c, u) in enumerate(zip(names, conv, users)):
+        d_ = beta(c + 1, max(u - c, 0) + 1)
+        x_ = np.linspace(d_.ppf(0.001), d_.ppf(0.999), 1000)
+        ax.plot(x_, d_.pdf(x_), label=name, color=colors[i], lw=2)
+        ax.fill_between(x_, d_.pdf(x_), 0, alpha=0.15, color=colors[i])
+    ax.set_title("Bayesian Posterior Distributions" + top_arms_note(len(names), n_total))
+    ax.set_xlabel("Conversion Rate")
+    ax.set_ylabel("Probability Density")
+    ax.legend(fontsize=None if len(names) <= 6 else 7, ncol=1 if len(names) <= 6 else 2)
+    return fig
+
+def _chart_bootstrap(users_c, conv_c, users_v, conv_v, name_v):
+    # Same keyed streams as the dashboard's Bootstrap tab, so the two agree
+    sim_c, sim_v = simulate_cr_bootstrap(users_c, conv_c, users_v, conv_v)
+    diffs = sim_v - sim_c
+    ci_l  = float(np.percentile(diffs, 2.5))
+    ci_h  = float(np.percentile(diffs, 97.5))
+    fig, ax = _new_axes((10, 4))
+    ax.hist(diffs, bins=60, color="#ff7f0e", edgecolor="#cccccc", alpha=0.85)
+    ax.axvline(ci_l, color="#E73B37", ls="--", lw=1.5, label="95% CI")
+    ax.axvline(ci_h, color="#E73B37", ls="--", lw=1.5)
+    ax.axvline(0,    color="#555555", lw=1.2, ls=":",  label="No effect")
+    ax.set_title(f"Bootstrap CR Difference ({name_v} − Control)")
+    ax.set_xlabel("Difference in Conversion Rate")
+    ax.set_ylabel("Frequency")
+    ax.legend()
+    return fig
+
+def _chart_segments(seg_names, ctrl_cr, var_cr, name_v):
+    x = np.arange(len(seg_names))
+    w = 0.35
+    fig, ax = _new_axes((max(6, len(seg_names) * 1.8), 4))
+    ax.bar(x - w/2, ctrl_cr, w, label="Control", color=group_color(0))
+    for xi, (v, c) in enumerate(zip(var_cr, ctrl_cr)):
+        ax.bar(xi + w/2, v, w, color=group_color(1) if v >= c else "#d62728")
+    ax.bar([], [], color=group_color(1), label=name_v)
+    ax.set_xticks(x)
+    ax.set_xticklabels(seg_names)
+    ax.set_title("Segment Breakdown — Conversion Rate")
+    ax.set_ylabel("CR (%)")
+    ax.legend(fontsize=8)
+    return fig
+
+CHART_RENDERERS = {
+    "cr_bars":          _chart_cr_bars,
+    "strategic_matrix": _chart_strategic_matrix,
+    "posteriors":       _chart_posteriors,
+    "bootstrap":        _chart_bootstrap,
+    "segments":         _chart_segments,
+}
+
+def render_chart(kind, data, fmt=PDF_CHART_FORMAT):
+    """
+    Render one chart to a reportlab Drawing (fmt="vector") or PNG bytes
+    (fmt="png"). Worker entry point — module-level so it pickles.
+    """
+    with _pdf_style():
+        fig = CHART_RENDERERS[kind](**data)
+        return _figure_drawing(fig) if fmt == "vector" else _figure_png(fig)
+
+def chart_flowable(chart, width, height):
+    """
+    Flowable for a rendered chart. PNGs are stretched to width × height as
+    before; drawings are scaled to fit inside it, keeping their aspect.
+    """
+    if isinstance(chart, bytes):
+        from reportlab.platypus import Image
+        return Image(io.BytesIO(chart), width=width, height=height)
+    from reportlab.graphics.shapes import Drawing, Group
+    scale = min(width / chart.width, height / chart.height)
+    # A new wrapper per use: the cached drawing is shared between reports
+    d = Drawing(chart.width * scale, chart.height * scale,
+                Group(*chart.contents, transform=(scale, 0, 0, scale, 0, 0)))
+    d.hAlign = "CENTER"
+    return d
+
+def _get_chart_pool():
+    """
+    Long-lived process pool, so workers import matplotlib once rather than per
+    report. It is created once at os.cpu_count() workers and shared by every
+    report; each report limits its own in-flight charts (see render_charts).
+    """
+    global _chart_pool
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+    with _chart_pool_lock:
+        if _chart_pool is None:
+            # spawn: forking a process that runs a web server's threads is not safe
+            _chart_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                              mp_context=multiprocessing.get_context("spawn"))
+        return _chart_pool
+
+def _discard_chart_pool(pool):
+    """Drop a broken pool so the next report starts a fresh one."""
+    global _chart_pool
+    with _chart_pool_lock:
+        if _chart_pool is pool:
+            _chart_pool = None
+
+def render_charts(specs, workers=None, progress=None, fmt=PDF_CHART_FORMAT):
+    """
+    Render [(kind, data), ...] in fmt (see render_chart), in order. Charts
+    already rendered for the same data come from the chart cache; the rest
+    go to the shared process pool, at most `workers` (default: all CPUs) in
+    flight at a time, or are rendered in-process when workers == 1 or only
+    one chart is missing.
+    progress(done, total) is called as charts complete.
+    """
+    from concurrent.futures import FIRST_COMPLETED, wait
+    from concurrent.futures.process import BrokenProcessPool
+    keys    = [_chart_cache.make_key("pdf_chart", kind, data, fmt, PDF_CHART_DPI if fmt == "png" else None)
+               for kind, data in specs]
+    out     = [None] * len(specs)
+    missing = []
+    for i, key in enumerate(keys):
+        hit, chart = _chart_cache.lookup(key)
+        if hit:
+            out[i] = chart
+        else:
+            missing.append(i)
+    done = len(specs) - len(missing)
+    if progress:
+        progress(done, len(specs))
+    workers = min(workers or os.cpu_count() or 1, len(missing))
+    if workers > 1:
+        pool = None
+        try:
+            pool    = _get_chart_pool()
+            pending = iter(missing)
+            futs    = {}
+            while True:
+                for i in pending:
+                    futs[pool.submit(render_chart, *specs[i], fmt)] = i
+                    if len(futs) >= workers:
+                        break
+                if not futs:
+                    break
+                finished, _ = wait(futs, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    i = futs.pop(fut)
+                    out[i] = fut.result()
+                    _chart_cache.store(keys[i], out[i])
+                    done += 1
+                    if progress:
+                        progress(done, len(specs))
+            missing = []
+        except (BrokenProcessPool, OSError) as exc:
+            if isinstance(exc, BrokenProcessPool):
+                _discard_chart_pool(pool)
+            missing = [i for i in missing if out[i] is None]   # finish in-process
+    for i in missing:
+        out[i] = render_chart(*specs[i], fmt)
+        _chart_cache.store(keys[i], out[i])
+        done += 1
+        if progress:
+            progress(done, len(specs))
+    return out
+
+def report_chart_specs(metrics, groups, ctrl_m, best_m, segment_results=None):
+    """
+    Chart specs for the PDF's Charts page, in page order. Per-arm charts
+    show Control + the top CHART_MAX_ARMS − 1 variations by CR.
+    """
+    idx  = chart_arm_indices([m["cr"] for m in metrics])
+    sel  = [metrics[i] for i in idx]
+    arms = {"colors": [group_color(i) for i in idx], "n_total": len(metrics)}
+    specs = [
+        ("cr_bars",          {"names": [m["name"] for m in sel], "cr_pct": [m["cr_pct"] for m in sel], **arms}),
+        ("strategic_matrix", {"names": [m["name"] for m in sel], "cr_pct": [m["cr_pct"] for m in sel],
+                              "aov": [m["aov"] for m in sel], **arms}),
+        ("posteriors",       {"names": [groups[i]["name"] for i in idx], "conv": [groups[i]["conv"] for i in idx],
+                              "users": [groups[i]["users"] for i in idx], **arms}),
+        ("bootstrap",        {"users_c": ctrl_m["users"], "conv_c": ctrl_m["conv"],
+                              "users_v": best_m["users"], "conv_v": best_m["conv"], "name_v": best_m["name"]}),
+    ]
+    active = [s for s in (segment_results or []) if not s.get("skip")]
+    if active:
+        specs.append(("segments", {"seg_names": [s["name"] for s in active],
+                                   "ctrl_cr": [s["ctrl_cr"] * 100 for s in active],
+                                   "var_cr":  [s["var_cr"] * 100 for s in active],
+                                   "name_v":  best_m["name"]}))
+    return specs
+
+_CHART_TITLES = {
+    "cr_bars":          "Conversion Rate Comparison",
+    "strategic_matrix": "Strategic Matrix",
+    "posteriors":       "Bayesian Posteriors",
+    "bootstrap":        "Bootstrap Confidence Interval",
+    "segments":         "Segment Breakdown — CR",
+}
+
+
+# -----------------------------------------------
+# PDF ASSETS
+# -----------------------------------------------
+@functools.lru_cache(maxsize=None)
+def _pdf_assets():
+    """
+    Page geometry, palette, paragraph styles and table helper for every PDF
+    this process builds. Created once and shared — batch workers render
+    many reports without rebuilding them.
+    """
+    from types import SimpleNamespace
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.units import mm
+    from reportlab.lib import colors
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT
+
+    A = SimpleNamespace()
+    A.MARGIN = 18 * mm
+    A.USABLE = A4[0] - 2 * A.MARGIN
+
+    # ── Palette ──────────────────────────────────────────────────
+    A.C_RED   = colors.HexColor('#E73B37')
+    A.C_DARK  = colors.HexColor('#1a1d24')
+    A.C_LGRAY = colors.HexColor('#f5f5f5')
+    A.C_MGRAY = colors.HexColor('#cccccc')
+    A.C_GREEN = colors.HexColor('#2ca02c')
+    A.C_WARN  = colors.HexColor('#d97706')
+    A.C_BODY  = colors.HexColor('#333333')
+    A.C_MUTED = colors.HexColor('#888888')
+
+    def doc(buf, pagesize=A4):
+        return SimpleDocTemplate(buf, pagesize=pagesize,
+                                 leftMargin=A.MARGIN, rightMargin=A.MARGIN,
+                                 topMargin=A.MARGIN,  bottomMargin=A.MARGIN)
+
+    # ── Style factory ─────────────────────────────────────────────
+    def style(name, size, color=A.C_DARK, bold=False, align=TA_LEFT, sb=0, sa=4):
+        return ParagraphStyle(name, fontSize=size, textColor=color,
+                               fontName='Helvetica-Bold' if bold else 'Helvetica',
+                               alignment=align, spaceBefore=sb, spaceAfter=sa,
+                               leading=size * 1.45)
+
+    A.s_title = style('pt',  20, A.C_DARK,  True,  TA_CENTER, 0, 8)
+    A.s_h1    = style('ph1', 13, A.C_DARK,  True,  TA_LEFT,  12, 5)
+    A.s_h2    = style('ph2', 10, A.C_RED,   True,  TA_LEFT,   6, 3)
+    A.s_body  = style('pb',   9, A.C_BODY,  False, TA_LEFT,   0, 2)
+    A.s_small = style('ps',   7, A.C_MUTED, False, TA_LEFT,   0, 1)
+    A.s_win   = style('pw',  10, colors.white, True, TA_CENTER, 0, 0)
+
+    # ── Table helper ──────────────────────────────────────────────
+    base_table = [
+        ('BACKGROUND',    (0, 0), (-1,  0), A.C_DARK),
+        ('TEXTCOLOR',     (0, 0), (-1,  0), colors.white),
+        ('FONTNAME',      (0, 0), (-1,  0), 'Helvetica-Bold'),
+        ('FONTSIZE',      (0, 0), (-1, -1), 9),
+        ('ROWBACKGROUNDS',(0, 1), (-1, -1), [colors.white, A.C_LGRAY]),
+        ('GRID',          (0, 0), (-1, -1), 0.5, A.C_MGRAY),
+        ('PADDING',       (0, 0), (-1, -1), 5),
+        ('ALIGN',         (1, 0), (-1, -1), 'CENTER'),
+        ('VALIGN',        (0, 0), (-1, -1), 'MIDDLE'),
+    ]
+
+    def table(data, col_widths, extra=None, repeat_rows=0):
+        t = Table(data, colWidths=col_widths, repeatRows=repeat_rows)
+        t.setStyle(TableStyle(base_table + list(extra or [])))
+        return t
+
+    A.doc, A.style, A.table = doc, style, table
+    return A
+
+# ── Markdown → reportlab XML (handles **bold**) ───────────────
+def _md(text):
+    text = text.replace('&', '&amp;')
+    text = _re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', text)
+    return text
+
+
+# -----------------------------------------------
+# PDF REPORT GENERATOR
+# -----------------------------------------------
+def generate_pdf_report(mv, bayes, rev_sig, guardrail_results, duration_checks,
+                         p_srm, groups, days_run, confidence_level, primary_goal,
+                         ctrl_m, best_m, start_date=None, hypothesis="", smart_text="",
+                         ai_text="", segment_results=None, workers=None, progress=None,
+                         chart_format=PDF_CHART_FORMAT):
+    """
+    Build a PDF report from the current analysis state. Returns bytes.
+    Charts are rendered by render_charts (cached, process pool of `workers`)
+    as vector drawings, or as PNGs with chart_format="png";
+    progress(done, total) is reported per chart plus a final layout step.
+    Safe to call off the UI thread.
+    """
+    from reportlab.lib.units import mm
+    from reportlab.platypus import (Paragraph, Spacer, Table, TableStyle,
+                                     HRFlowable, PageBreak)
+    from reportlab.lib.enums import TA_LEFT
+
+    A      = _pdf_assets()
+    buf    = io.BytesIO()
+    doc    = A.doc(buf)
+
+    IMG_W   = A.USABLE
+    IMG_H   = 82 * mm
+    metrics = mv["metrics"]
+    elems   = []
+
+    # ── PAGE 1: HEADER & KEY METRICS ─────────────────────────────
+    elems.append(Paragraph("A/B Test Analysis Report", A.s_title))
+    elems.append(HRFlowable(width=A.USABLE, color=A.C_RED, thickness=2, spaceAfter=6))
+    if hypothesis:
+        elems.append(Paragraph(f"<i>Hypothesis: {_md(hypothesis)}</i>", A.s_body))
+        elems.append(Spacer(1, 4))
+
+    meta = [
+        ["Generated",     datetime.date.today().isoformat()],
+        ["Test Duration", f"{days_run} days" + (f"  (started {start_date})" if start_date else "")],
+        ["Confidence",    confidence_level],
+        ["Primary Goal",  primary_goal],
+        ["Groups",        ", ".join(g["name"] for g in groups)],
+    ]
+    elems.append(A.table(meta, [45 * mm, A.USABLE - 45 * mm]))
+    elems.append(Spacer(1, 10))
+
+    winner = mv["winner"]
+    if winner:
+        pw     = next((p for p in mv["pairwise"] if p["name"] == winner), {})
+        banner = (f"WINNER: {winner}   |   CR {pw.get('uplift_cr', 0):+.2f}%"
+                  f"   |   RPV {pw.get('uplift_rpv', 0):+.2f}%"
+                  f"   |   p = {pw.get('p_adjusted', 1):.4f}")
+        bg = A.C_GREEN
+    else:
+        banner = "No winner declared — test inconclusive or insufficient statistical power."
+        bg     = A.C_DARK
+    w_tbl = Table([[Paragraph(banner, A.s_win)]], colWidths=[A.USABLE])
+    w_tbl.setStyle(TableStyle([('BACKGROUND', (0,0), (-1,-1), bg),
+                                ('PADDING',    (0,0), (-1,-1), 10)]))
+    elems.append(w_tbl)
+    elems.append(Spacer(1, 12))
+
+    elems.append(Paragraph("Key Metrics", A.s_h1))
+    n   = len(metrics)
+    cw  = A.USABLE / (n + 1)
+    hdr = ["Metric"] + [m["name"] for m in metrics]
+    rows = [
+        ["Users"]       + [f"{m['users']:,}" for m in metrics],
+        ["Conversions"] + [f"{m['conv']:,}"  for m in metrics],
+        ["CR %"]        + [f"{m['cr_pct']:.2f}%" + (f" ({m['uplift_cr']:+.1f}%)" if i > 0 else "")
+                           for i, m in enumerate(metrics)],
+        ["AOV"]         + [f"${m['aov']:.2f}" + (f" ({m['uplift_aov']:+.1f}%)" if i > 0 else "")
+                           for i, m in enumerate(metrics)],
+        ["RPV"]         + [f"${m['rpv']:.4f}" + (f" ({m['uplift_rpv']:+.1f}%)" if i > 0 else "")
+                           for i, m in enumerate(metrics)],
+    ]
+    elems.append(A.table([hdr] + rows, [cw] * (n + 1)))
+    elems.append(Spacer(1, 12))
+
+    # ── STATISTICAL ANALYSIS ─────────────────────────────────────
+    elems.append(Paragraph("Statistical Analysis", A.s_h1))
+    pw_hdr  = ["Variation", "Z-Stat", "p (adj)", "Significant", "CR Uplift", "RPV Uplift"]
+    pw_rows = [[pw["name"], f"{pw['z_stat']:.3f}", f"{pw['p_adjusted']:.4f}",
+                "YES" if pw["significant"] else "No",
+                f"{pw['uplift_cr']:+.2f}%", f"{pw['uplift_rpv']:+.2f}%"]
+               for pw in mv["pairwise"]]
+    sig_ex  = [('TEXTCOLOR', (3, i+1), (3, i+1), A.C_GREEN if pw["significant"] else A.C_RED)
+               for i, pw in enumerate(mv["pairwise"])]
+    elems.append(A.table([pw_hdr] + pw_rows, [A.USABLE / 6] * 6, sig_ex))
+    elems.append(Spacer(1, 8))
+
+    elems.append(Paragraph("Bayesian Results", A.s_h2))
+    b_hdr  = ["Group", "P(Best)", "Expected Loss"]
+    b_rows = [[g, f"{bayes['prob_best'][g] * 100:.1f}%",
+               f"{bayes['expected_loss'][g] * 100:.4f}%"]
+              for g in bayes["prob_best"]]
+    elems.append(A.table([b_hdr] + b_rows, [A.USABLE / 3] * 3))
+    elems.append(Spacer(1, 8))
+
+    elems.append(Paragraph("Revenue Significance (Control vs Best Variation)", A.s_h2))
+    r_hdr  = ["Metric", "MW p-value", "Bootstrap p", "CI Low", "CI High", "Significant"]
+    r_rows = [
+        ["AOV", f"{rev_sig['aov']['mw_p']:.4f}", f"{rev_sig['aov']['boot_p']:.4f}",
+         f"${rev_sig['aov']['boot_ci_low']:.2f}", f"${rev_sig['aov']['boot_ci_high']:.2f}",
+         "YES" if rev_sig['aov']['sig'] else "No"],
+        ["RPV", f"{rev_sig['rpv']['mw_p']:.4f}", f"{rev_sig['rpv']['boot_p']:.4f}",
+         f"${rev_sig['rpv']['boot_ci_low']:.4f}", f"${rev_sig['rpv']['boot_ci_high']:.4f}",
+         "YES" if rev_sig['rpv']['sig'] else "No"],
+    ]
+    r_ex = [('TEXTCOLOR', (5, i+1), (5, i+1), A.C_GREEN if sig else A.C_DARK)
+            for i, sig in enumerate([rev_sig["aov"]["sig"], rev_sig["rpv"]["sig"]])]
+    elems.append(A.table([r_hdr] + r_rows, [A.USABLE / 6] * 6, r_ex))
+    elems.append(PageBreak())
+
+    # ── PAGE 2: HEALTH CHECKS ────────────────────────────────────
+    elems.append(Paragraph("Health Checks", A.s_h1))
+
+    elems.append(Paragraph("Sample Ratio Mismatch", A.s_h2))
+    srm_ok  = p_srm >= 0.01
+    srm_msg = (f"PASSED (p = {p_srm:.4f}) — Traffic split is even."
+               if srm_ok else
+               f"DETECTED (p = {p_srm:.4f}) — Traffic split is uneven. Results may be invalid.")
+    elems.append(Paragraph(srm_msg, A.style('srm', 9, A.C_GREEN if srm_ok else A.C_RED, True)))
+    elems.append(Spacer(1, 6))
+
+    elems.append(Paragraph("Duration Analysis", A.s_h2))
+    _LVL = {"pass": A.C_GREEN, "warning": A.C_WARN, "error": A.C_RED}
+    for chk in duration_checks:
+        col = _LVL.get(chk["level"], A.C_DARK)
+        elems.append(Paragraph(f"[{chk['label']}] {chk['msg']}",
+                                A.style(f'dc_{chk["id"]}', 9, col, chk["level"] != "pass")))
+    elems.append(Spacer(1, 6))
+
+    active_g = [r for r in guardrail_results if not r.get("skip")]
+    if active_g:
+        elems.append(Paragraph("Guardrail Metrics", A.s_h2))
+        g_hdr  = ["Metric", "Control", "Variation", "Change", "Threshold", "Status"]
+        g_rows = [[r["name"], f"{r['ctrl']:.2f}", f"{r['var']:.2f}",
+                   f"{r['delta_pct']:+.2f}%", f"±{r['threshold']:.1f}%",
+                   "VIOLATED" if r["violated"] else "PASS"]
+                  for r in active_g]
+        g_ex   = [('TEXTCOLOR', (5, i+1), (5, i+1), A.C_RED if r["violated"] else A.C_GREEN)
+                  for i, r in enumerate(active_g)]
+        elems.append(A.table([g_hdr] + g_rows, [A.USABLE / 6] * 6, g_ex))
+
+    active_pdf_segs = [s for s in (segment_results or []) if not s.get("skip")]
+    if active_pdf_segs:
+        elems.append(Spacer(1, 6))
+        elems.append(Paragraph("Segment Breakdown", A.s_h2))
+        sg_hdr  = ["Segment", "Ctrl CR", "Var CR", "CR Uplift", "Ctrl RPV", "Var RPV", "RPV Uplift", "p-value", "Sig"]
+        sg_rows = [[
+            s["name"],
+            f"{s['ctrl_cr']*100:.2f}%", f"{s['var_cr']*100:.2f}%",
+            f"{s['uplift_cr']:+.2f}%",
+            f"${s['ctrl_rpv']:.4f}", f"${s['var_rpv']:.4f}",
+            f"{s['uplift_rpv']:+.2f}%",
+            f"{s['p_value']:.4f}",
+            "YES" if s["significant"] else "No",
+        ] for s in active_pdf_segs]
+        sg_ex = [('TEXTCOLOR', (8, i+1), (8, i+1), A.C_GREEN if s["significant"] else A.C_DARK)
+                 for i, s in enumerate(active_pdf_segs)]
+        cw9 = A.USABLE / 9
+        elems.append(A.table([sg_hdr] + sg_rows, [cw9] * 9, sg_ex))
+
+    elems.append(PageBreak())
+
+    # ── PAGE 3: CHARTS ────────────────────────────────────────────
+    specs  = report_chart_specs(metrics, groups, ctrl_m, best_m, segment_results)
+    n_step = len(specs) + 1   # charts + layout
+    charts = render_charts(specs, workers,
+                           progress and (lambda done, total: progress(done, n_step)), chart_format)
+    elems.append(Paragraph("Charts", A.s_h1))
+    for i, ((kind, _), chart) in enumerate(zip(specs, charts)):
+        if i:
+            elems.append(Spacer(1, 8))
+        elems.append(Paragraph(_CHART_TITLES[kind], A.s_h2))
+        elems.append(chart_flowable(chart, IMG_W, IMG_H))
+
+    def _render_text_page(title, text):
+        elems.append(PageBreak())
+        elems.append(Paragraph(title, A.s_h1))
+        elems.append(HRFlowable(width=A.USABLE, color=A.C_RED, thickness=1, spaceAfter=6))
+        for line in text.split("\n"):
+            line = line.strip()
+            if not line:
+                elems.append(Spacer(1, 3))
+            elif line.startswith("### "):
+                elems.append(Paragraph(line[4:], A.s_h2))
+            elif line.startswith("## "):
+                elems.append(Paragraph(line[3:], A.style('sh1x', 11, A.C_DARK, True, TA_LEFT, 8, 3)))
+            elif line.startswith("# "):
+                elems.append(Paragraph(line[2:], A.s_h1))
+            elif line.startswith(("- ", "* ")):
+                elems.append(Paragraph("• " + _md(line[2:]), A.s_body))
+            else:
+                try:
+                    elems.append(Paragraph(_md(line), A.s_body))
+                except Exception:
+                    elems.append(Paragraph(line, A.s_body))
+
+    # ── PAGE 4+ (optional): SMART ANALYSIS & AI ANALYSIS TEXT ───
+    if smart_text:
+        _render_text_page("Smart Analysis Report", smart_text)
+    if ai_text:
+        _render_text_page("AI Analysis Report", ai_text)
+
+    # ── FOOTER ────────────────────────────────────────────────────
+    elems.append(Spacer(1, 14))
+    elems.append(HRFlowable(width=A.USABLE, color=A.C_MGRAY, thickness=0.5))
+    elems.append(Paragraph(
+        "Generated by Enterprise A/B Test Analyzer. "
+        "Results are directional signals — validate data integrity before making business decisions.",
+        A.s_small))
+
+    doc.build(elems)
+    if progress:
+        progress(n_step, n_step)
+    buf.seek(0)
+    return buf.getvalue()
+
+
+def generate_snapshot_report(res, hypothesis="", smart_text="", ai_text="", workers=1, progress=None,
+                             chart_format=PDF_CHART_FORMAT):
+    """PDF report for one ab_engine.analyze_snapshot() result."""
+    return generate_pdf_report(
+        res["mv"], res["bayes"], res["rev_sig"], res["guardrail_results"], res["duration_checks"],
+        res["p_srm"], res["groups"], res["days"], res["conf_level"], res["primary_goal"],
+        res["ctrl_m"], res["best_m"],
+        start_date=res["start_date"], hypothesis=hypothesis, smart_text=smart_text, ai_text=ai_text,
+        segment_results=res["segment_results"], workers=workers, progress=progress,
+        chart_format=chart_format,
+    )
+
+
+# -----------------------------------------------
+# PORTFOLIO SUMMARY REPORT
+# -----------------------------------------------
+def generate_portfolio_report(rows, failures=(), title="Experiment Portfolio Summary"):
+    """
+    One landscape PDF summarising many experiments, from ab_batch summary rows
+    (one row per variation vs control). failures: (path, error) pairs to list.
+    Returns bytes.
+    """
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Paragraph, Spacer, HRFlowable
+    from xml.sax.saxutils import escape
+
+    A      = _pdf_assets()
+    buf    = io.BytesIO()
+    doc    = A.doc(buf, pagesize=landscape(A4))
+    width  = landscape(A4)[0] - 2 * A.MARGIN
+    elems  = []
+    exps   = {}
+    for r in rows:
+        exps.setdefault((r.get("path"), r["experiment"]), r)   # one entry per snapshot, even if names repeat
+
+    elems.append(Paragraph(title, A.s_title))
+    elems.append(HRFlowable(width=width, color=A.C_RED, thickness=2, spaceAfter=6))
+    overview = [
+        ["Generated",            datetime.date.today().isoformat()],
+        ["Experiments",          f"{len(exps):,}"],
+        ["With a winner",        f"{sum(1 for r in exps.values() if r['winner']):,}"],
+        ["SRM detected",         f"{sum(1 for r in exps.values() if r['srm_detected']):,}"],
+        ["Guardrail violations", f"{sum(1 for r in exps.values() if r['guardrails_violated']):,}"],
+        ["Failed to analyse",    f"{len(failures):,}"],
+    ]
+    elems.append(A.table(overview, [50 * mm, width - 50 * mm]))
+    elems.append(Spacer(1, 10))
+
+    hdr  = ["Experiment", "Variation", "Users (C / V)", "CR C", "CR V", "CR Uplift",
+            "p (adj)", "Sig", "P(Best)", "SRM", "Guardrails"]
+    cw   = [0.20, 0.10, 0.13, 0.06, 0.06, 0.08, 0.08, 0.05, 0.08, 0.06, 0.10]
+    body = []
+    extra = []
+    for i, r in enumerate(sorted(rows, key=lambda r: (r["experiment"], r["variation"])), 1):
+        body.append([
+            Paragraph(escape(str(r["experiment"])), A.s_body),
+            r["variation"],
+            f"{r['users_c']:,} / {r['users_v']:,}",
+            f"{r['cr_c'] * 100:.2f}%", f"{r['cr_v'] * 100:.2f}%",
+            f"{r['uplift_cr']:+.2f}%",
+            f"{r['p_adjusted']:.4f}",
+            "YES" if r["significant"] else "No",
+            f"{r['prob_best'] * 100:.1f}%",
+            "FAIL" if r["srm_detected"] else "OK",
+            f"{r['guardrails_violated']}/{r['guardrails_checked']} violated",
+        ])
+        extra.append(('TEXTCOLOR', (7, i), (7, i), A.C_GREEN if r["significant"] else A.C_DARK))
+        extra.append(('TEXTCOLOR', (9, i), (9, i), A.C_RED if r["srm_detected"] else A.C_GREEN))
+        if r["guardrails_violated"]:
+            extra.append(('TEXTCOLOR', (10, i), (10, i), A.C_RED))
+    elems.append(Paragraph("Variations vs Control", A.s_h1))
+    elems.append(A.table([hdr] + body, [width * f for f in cw], extra, repeat_rows=1))
+
+    if failures:
+        elems.append(Spacer(1, 10))
+        elems.append(Paragraph("Failed Snapshots", A.s_h1))
+        for path, err in failures:
+            elems.append(Paragraph(f"{escape(str(path))}: {escape(str(err))}", A.s_body))
+
+    elems.append(Spacer(1, 14))
+    elems.append(HRFlowable(width=width, color=A.C_MGRAY, thickness=0.5))
+    elems.append(Paragraph(
+        "Generated by Enterprise A/B Test Analyzer. Per-experiment reports hold the full analysis.",
+        A.s_small))
+    doc.build(elems)
+    return buf.getvalue()
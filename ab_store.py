@@ -0,0 +1,244 @@
+"""
+Append-only history of experiment snapshots, keyed by experiment ID and date.
+
+Each saved snapshot is kept whole (so any day can be re-opened in the
+dashboard) together with one row of headline results per arm — uplift,
+p-values, the CR-difference confidence interval and P(best) — written once,
+when the snapshot is appended. Trend charts then come from one indexed query
+instead of re-analysing every day. Rows are never updated or deleted; saving
+the same experiment and day again adds a newer version that supersedes the
+older one in queries.
+
+    python ab_store.py history.db add snapshots/checkout_2024-05-07.json
+    python ab_store.py history.db add "exports/*.json" --experiment checkout --date 2024-05-14
+    python ab_store.py history.db list
+"""
+import argparse
+import contextlib
+import datetime
+import glob
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+
+from ab_engine import NumpyEncoder, analyze_snapshot
+
+
+HISTORY_DB = os.environ.get("AB_HISTORY_DB", "ab_history.db")   # dashboard default
+
+# Per-arm trend columns, in table order (Control rows carry NULL for the comparisons)
+TREND_COLUMNS = (
+    "arm", "users", "conv", "cr", "rpv",
+    "uplift_cr", "uplift_rpv", "diff_cr", "ci_low", "ci_high",
+    "z_stat", "p_raw", "p_adjusted", "significant", "prob_best", "expected_loss",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    experiment_id TEXT NOT NULL,
+    day           TEXT NOT NULL,            -- ISO date the data runs to
+    saved_at      TEXT NOT NULL,
+    alpha         REAL NOT NULL,
+    p_global      REAL,
+    p_srm         REAL,
+    winner        TEXT,
+    snapshot      TEXT NOT NULL             -- the SAVE_KEYS snapshot as JSON
+);
+CREATE INDEX IF NOT EXISTS snapshots_experiment_day ON snapshots (experiment_id, day, id);
+CREATE TABLE IF NOT EXISTS arm_trends (
+    snapshot_id   INTEGER NOT NULL REFERENCES snapshots (id),
+    arm_index     INTEGER NOT NULL,
+    arm           TEXT NOT NULL,
+    users         INTEGER, conv INTEGER, cr REAL, rpv REAL,
+    uplift_cr     REAL, uplift_rpv REAL, diff_cr REAL, ci_low REAL, ci_high REAL,
+    z_stat        REAL, p_raw REAL, p_adjusted REAL, significant INTEGER,
+    prob_best     REAL, expected_loss REAL,
+    PRIMARY KEY (snapshot_id, arm_index)
+);
+"""
+# Latest version of each day of one experiment
+_LATEST = ("SELECT MAX(id) AS id FROM snapshots WHERE experiment_id = ? "
+           "AND (? IS NULL OR day >= ?) GROUP BY day")
+
+_DATED_NAME = re.compile(r"^(?P<name>.*?)[_\- ]?(?P<day>\d{4}-\d{2}-\d{2})$")
+
+
+def _num(x):
+    """Finite float, or None for SQL NULL."""
+    return float(x) if x is not None and math.isfinite(x) else None
+
+
+def trend_rows(res):
+    """
+    Per-arm trend values from one analyze_snapshot() result, Control first.
+    CR and the CR difference are fractions; the CI is the unpooled normal
+    interval of the difference vs Control at the snapshot's own alpha.
+    """
+    from scipy.special import ndtri
+    mv, bayes = res["mv"], res["bayes"]
+    crit = ndtri(1 - res["alpha"] / 2)
+    ctrl = mv["metrics"][0]
+    rows = [{"arm": ctrl["name"], "users": ctrl["users"], "conv": ctrl["conv"], "cr": ctrl["cr"],
+             "rpv": ctrl["rpv"], "prob_best": bayes["prob_best"].get(ctrl["name"]),
+             "expected_loss": bayes["expected_loss"].get(ctrl["name"])}]
+    pc, nc = ctrl["cr"], max(ctrl["users"], 1)
+    for pw, m in zip(mv["pairwise"], mv["metrics"][1:]):
+        pv, nv = m["cr"], max(m["users"], 1)
+        diff   = pv - pc
+        half   = crit * math.sqrt(pc * (1 - pc) / nc + pv * (1 - pv) / nv)
+        rows.append({
+            "arm": m["name"], "users": m["users"], "conv": m["conv"], "cr": m["cr"], "rpv": m["rpv"],
+            "uplift_cr": pw["uplift_cr"], "uplift_rpv": pw["uplift_rpv"],
+            "diff_cr": diff, "ci_low": diff - half, "ci_high": diff + half,
+            "z_stat": pw["z_stat"], "p_raw": pw["p_raw"], "p_adjusted": pw["p_adjusted"],
+            "significant": bool(pw["significant"]),
+            "prob_best": bayes["prob_best"].get(m["name"]), "expected_loss": bayes["expected_loss"].get(m["name"]),
+        })
+    return rows
+
+
+class SnapshotStore:
+    """
+    SQLite-backed snapshot history. Every call opens its own short-lived
+    connection, so one store object can be shared across threads (the
+    dashboard keeps a single instance per server process).
+    """
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        with self._connect() as con:
+            con.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            with con:                 # one transaction, committed on success
+                yield con
+        finally:
+            con.close()
+
+    def append(self, experiment_id, day, snapshot, res=None):
+        """
+        Add one snapshot of experiment_id with data up to day (date or ISO
+        string). res is its analyze_snapshot() result, computed if not given.
+        Returns the new snapshot's row id.
+        """
+        if not experiment_id:
+            raise ValueError("experiment_id is required")
+        day = day.isoformat() if isinstance(day, datetime.date) else datetime.date.fromisoformat(day).isoformat()
+        res = res or analyze_snapshot(snapshot)
+        mv  = res["mv"]
+        with self._connect() as con:
+            cur = con.execute(
+                "INSERT INTO snapshots (experiment_id, day, saved_at, alpha, p_global, p_srm, winner, snapshot) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (experiment_id, day, datetime.datetime.now().isoformat(timespec="seconds"), res["alpha"],
+                 _num(mv["p_global"]), _num(res["p_srm"]), mv["winner"],
+                 json.dumps(snapshot, cls=NumpyEncoder)))
+            sid = cur.lastrowid
+            con.executemany(
+                f"INSERT INTO arm_trends (snapshot_id, arm_index, {', '.join(TREND_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * (len(TREND_COLUMNS) + 2))})",
+                [(sid, i, r["arm"], int(r["users"]), int(r["conv"]),
+                  *(_num(r.get(c)) for c in TREND_COLUMNS[3:13]),
+                  None if r.get("significant") is None else int(r["significant"]),
+                  *(_num(r.get(c)) for c in TREND_COLUMNS[14:]))
+                 for i, r in enumerate(trend_rows(res))])
+        return sid
+
+    def experiments(self):
+        """One row per experiment: (experiment_id, first day, last day, days saved), most recent first."""
+        with self._connect() as con:
+            return con.execute(
+                "SELECT experiment_id, MIN(day), MAX(day), COUNT(DISTINCT day) FROM snapshots "
+                "GROUP BY experiment_id ORDER BY MAX(day) DESC, experiment_id").fetchall()
+
+    def days(self, experiment_id):
+        """Saved days of one experiment, oldest first."""
+        with self._connect() as con:
+            return [d for (d,) in con.execute(
+                "SELECT DISTINCT day FROM snapshots WHERE experiment_id = ? ORDER BY day", (experiment_id,))]
+
+    def trend(self, experiment_id, since=None):
+        """
+        Columnar per-arm history of one experiment — {"day": [...], "arm_index":
+        [...], "arm": [...], ...TREND_COLUMNS, "p_global": [...]} ordered by day
+        then arm — using the latest version of each day, from since (ISO date)
+        on when given.
+        """
+        cols = ("day", "arm_index", *TREND_COLUMNS, "p_global")
+        with self._connect() as con:
+            rows = con.execute(
+                f"SELECT s.day, t.arm_index, {', '.join('t.' + c for c in TREND_COLUMNS)}, s.p_global "
+                f"FROM ({_LATEST}) latest JOIN snapshots s ON s.id = latest.id "
+                f"JOIN arm_trends t ON t.snapshot_id = s.id ORDER BY s.day, t.arm_index",
+                (experiment_id, since, since)).fetchall()
+        return {c: list(v) for c, v in zip(cols, zip(*rows))} if rows else {c: [] for c in cols}
+
+    def snapshot(self, experiment_id, day=None):
+        """The latest saved snapshot of one experiment for day (default: its most recent day), or None."""
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT snapshot FROM snapshots WHERE experiment_id = ? AND (? IS NULL OR day = ?) "
+                "ORDER BY day DESC, id DESC LIMIT 1", (experiment_id, day, day)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+# -----------------------------------------------
+# COMMAND LINE
+# -----------------------------------------------
+def experiment_and_day(path, snapshot, experiment=None, day=None):
+    """
+    Experiment ID and day for a snapshot file: explicit values first, then the
+    snapshot's own experiment_id, then the file name — "<id>_<YYYY-MM-DD>.json"
+    gives both. The day falls back to today.
+    """
+    stem  = os.path.splitext(os.path.basename(path))[0]
+    named = _DATED_NAME.match(stem)
+    experiment = experiment or snapshot.get("experiment_id") or (named.group("name") if named else stem)
+    day        = day or (named.group("day") if named else datetime.date.today().isoformat())
+    return experiment, day
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append A/B test snapshots to a history database.")
+    parser.add_argument("db", help="SQLite history file (created if missing).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="Analyse snapshot files and append them.")
+    add.add_argument("inputs", nargs="+", help="Snapshot files or glob patterns.")
+    add.add_argument("--experiment", help="Experiment ID (default: the snapshot's, else the file name).")
+    add.add_argument("--date", help="Day the data runs to, YYYY-MM-DD (default: from the file name, else today).")
+    sub.add_parser("list", help="List stored experiments.")
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore(args.db)
+    if args.command == "list":
+        for exp, first, last, n in store.experiments():
+            print(f"{exp:<40}{first} → {last}  ({n} day{'s' if n != 1 else ''})")
+        return 0
+    paths = sorted({p for pat in args.inputs for p in glob.glob(pat) if os.path.isfile(p)})
+    if not paths:
+        parser.error("no snapshot files matched")
+    failed = 0
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            if not isinstance(snapshot, dict):
+                raise ValueError("snapshot is not a JSON object")
+            exp, day = experiment_and_day(path, snapshot, args.experiment, args.date)
+            store.append(exp, day, snapshot)
+            print(f"{path}: {exp} @ {day}")
+        except Exception as e:
+            failed += 1
+            print(f"{path}: {type(e).__name__}: {e}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
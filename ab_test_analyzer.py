@@ -1,79 +1,34 @@
 import streamlit as st
 import numpy as np
 import json
-import io
 import datetime
-import re as _re
 import pandas as pd
-import matplotlib
-matplotlib.use("Agg")           # Must be set before importing pyplot
-import matplotlib.pyplot as plt
-
-# ── Global chart theme ───────────────────────────────────────────────────────
-# Match Streamlit's dark UI. Applied once at module level — all plot functions inherit.
-_BG      = "#0e1117"   # Streamlit dark background
-_BG_AX   = "#1a1d24"   # Slightly lighter for axes area
-_FG      = "#e0e0e0"   # Primary text / tick labels
-_GRID    = "#2e3140"   # Subtle grid lines
-_SPINE   = "#3a3f52"   # Axis border colour
-
-plt.rcParams.update({
-    # Figure & axes backgrounds
-    "figure.facecolor":     _BG,
-    "axes.facecolor":       _BG_AX,
-    "savefig.facecolor":    _BG,
-    # Text & labels
-    "text.color":           _FG,
-    "axes.labelcolor":      _FG,
-    "axes.titlecolor":      _FG,
-    "axes.titlesize":       13,
-    "axes.labelsize":       11,
-    "axes.titlepad":        14,
-    # Ticks
-    "xtick.color":          _FG,
-    "ytick.color":          _FG,
-    "xtick.labelsize":      10,
-    "ytick.labelsize":      10,
-    # Grid
-    "axes.grid":            True,
-    "grid.color":           _GRID,
-    "grid.linewidth":       0.7,
-    "grid.alpha":           1.0,
-    # Spines
-    "axes.edgecolor":       _SPINE,
-    "axes.linewidth":       0.8,
-    # Legend
-    "legend.facecolor":     _BG_AX,
-    "legend.edgecolor":     _SPINE,
-    "legend.labelcolor":    _FG,
-    "legend.fontsize":      10,
-    # Layout
-    "figure.dpi":           120,
-    "axes.spines.top":      False,
-    "axes.spines.right":    False,
-})
-from scipy.stats import beta, chisquare, mannwhitneyu, chi2_contingency
-from statsmodels.stats.proportion import proportions_ztest, proportion_confint, proportion_effectsize
-from statsmodels.stats.power import NormalIndPower, TTestIndPower
-from statsmodels.stats.multitest import multipletests
-import openai
+from scipy.stats import beta
 import plotly.graph_objects as go
-import plotly.figure_factory as ff
-
-# -----------------------------------------------
-# JSON HELPERS
-# -----------------------------------------------
-class NumpyEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, np.integer):
-            return int(o)
-        if isinstance(o, np.floating):
-            return float(o)
-        if isinstance(o, np.ndarray):
-            return o.tolist()
-        if isinstance(o, np.bool_):
-            return bool(o)
-        return super().default(o)
+from concurrent.futures import ThreadPoolExecutor
+
+from ab_engine import (
+    AnalysisCache,
+    CONF_ALPHA, CUPED_FIELDS, DEFAULT_INPUTS, SAVE_KEYS, SEQ_MODES, SEQ_SPENDING, VARIATION_FIELDS,
+    safe_divide,
+    perform_srm_test, analyze_test_duration, evaluate_guardrails, analyze_segments,
+    run_multivariate_analysis, run_all_pairs_analysis, all_pairs_table,
+    calculate_bayesian_multivariate, compare_revenue, compare_revenue_delta, compare_quantiles,
+    order_value_summary,
+    revenue_values_from_state, rev_sq_from_state,
+    check_simpsons_paradox, simulate_cr_bootstrap,
+    sequential_boundaries, evaluate_sequential,
+    always_valid_tau, always_valid_sync, always_valid_summary,
+    analyze_portfolio, cuped_from_state, run_cuped_analysis,
+    guardrail_inputs_from_state, segment_inputs_from_state, select_best_variation,
+    variations_from_state,
+    cohens_h, required_sample_size, power_grid, required_n_table,
+)
+# Report generators import openai / reportlab / matplotlib lazily — only when a report is built.
+from ab_store import HISTORY_DB, SnapshotStore
+from ab_portfolio import TABLE_FORMATS, read_table
+from ab_report import (group_color, chart_arm_indices, top_arms_note, revenue_source_note,
+                       get_ai_analysis, generate_smart_analysis, generate_pdf_report)
 
 # -----------------------------------------------
 # PAGE CONFIG
@@ -95,47 +50,17 @@ ICON_TROPHY    = """<svg viewBox="0 0 1024 1024" style="width:1.5em;height:1.5em
 # -----------------------------------------------
 # CONSTANTS
 # -----------------------------------------------
-BAYESIAN_SAMPLES  = 50_000
-BOOTSTRAP_SAMPLES = 10_000
-MAX_VARIATIONS    = 3   # max variation groups (so max total groups = 4: control + 3)
-# One colour per group: Control, Var A, Var B, Var C
-GROUP_COLORS = ["#1f77b4", "#2ca02c", "#ff7f0e", "#9467bd"]
+MAX_METRIC_COLUMNS = 4   # above this many groups, per-group metric cards become a table
+VARIATIONS_EDITOR  = "_variations_editor"   # widget key of the variations table
+CUPED_EDITOR       = "_cuped_editor"        # widget key prefix of the CUPED covariate table
+HEATMAP_MAX_ARMS   = 40  # all-pairs heatmap shows Control + the top arms by CR
 
 
 # -----------------------------------------------
 # STATE INITIALIZATION
 # -----------------------------------------------
 def initialize_state():
-    defaults = {
-        "num_variations": 1,
-        # Control
-        "users_c": 5000, "conv_c": 500, "rev_c": 25000.0, "prod_c": 750,
-        # Variation A
-        "users_v0": 5000, "conv_v0": 600, "rev_v0": 33000.0, "prod_v0": 1000,
-        # Variation B
-        "users_v1": 5000, "conv_v1": 560, "rev_v1": 30000.0, "prod_v1": 900,
-        # Variation C
-        "users_v2": 5000, "conv_v2": 540, "rev_v2": 28000.0, "prod_v2": 850,
-        "days": 14, "conf_level": "95%", "mc_method": "holm", "primary_goal": "Maximize CR",
-        "start_date": None,
-        "p_traffic": 50000, "p_base_cr": 2.5, "p_base_aov": 75.0,
-        "p_mde": 5.0, "p_vol": "Medium (Standard E-com)",
-        "s1_uc": 2000, "s1_cc": 100, "s1_uv": 2000, "s1_cv": 110,
-        "s2_uc": 3000, "s2_cc": 400, "s2_uv": 3000, "s2_cv": 420,
-        # Guardrail metrics
-        "num_guardrails": 1,
-        "g0_name": "Bounce Rate",       "g0_ctrl": 45.0, "g0_var": 0.0, "g0_threshold": 5.0, "g0_dir": "lower is better",
-        "g1_name": "Session Duration",  "g1_ctrl": 0.0,  "g1_var": 0.0, "g1_threshold": 5.0, "g1_dir": "higher is better",
-        "g2_name": "Add-to-Cart Rate",  "g2_ctrl": 0.0,  "g2_var": 0.0, "g2_threshold": 5.0, "g2_dir": "higher is better",
-        # Segment breakdown
-        "num_segments": 1,
-        "seg0_name": "Mobile",   "seg1_name": "Desktop",   "seg2_name": "Segment 3", "seg3_name": "Segment 4",
-        "seg0_uc": 0, "seg0_cc": 0, "seg0_rc": 0.0, "seg0_uv": 0, "seg0_cv": 0, "seg0_rv": 0.0,
-        "seg1_uc": 0, "seg1_cc": 0, "seg1_rc": 0.0, "seg1_uv": 0, "seg1_cv": 0, "seg1_rv": 0.0,
-        "seg2_uc": 0, "seg2_cc": 0, "seg2_rc": 0.0, "seg2_uv": 0, "seg2_cv": 0, "seg2_rv": 0.0,
-        "seg3_uc": 0, "seg3_cc": 0, "seg3_rc": 0.0, "seg3_uv": 0, "seg3_cv": 0, "seg3_rv": 0.0,
-    }
-    for k, v in defaults.items():
+    for k, v in DEFAULT_INPUTS.items():
         if k not in st.session_state:
             st.session_state[k] = v
 
@@ -146,30 +71,10 @@ if "_pending_load" in st.session_state:
     _staged = st.session_state.pop("_pending_load")
     for k, v in _staged.items():
         st.session_state[k] = v
-
-SAVE_KEYS = [
-    "num_variations",
-    "users_c","conv_c","rev_c","prod_c",
-    "users_v0","conv_v0","rev_v0","prod_v0",
-    "users_v1","conv_v1","rev_v1","prod_v1",
-    "users_v2","conv_v2","rev_v2","prod_v2",
-    "days","conf_level","mc_method","primary_goal",
-    # Sample-size calculator inputs (preserved in snapshots)
-    "p_traffic","p_base_cr","p_base_aov","p_mde","p_vol",
-    "s1_uc","s1_cc","s1_uv","s1_cv",
-    "s2_uc","s2_cc","s2_uv","s2_cv",
-    # Guardrail metrics
-    "num_guardrails",
-    "g0_name","g0_ctrl","g0_var","g0_threshold","g0_dir",
-    "g1_name","g1_ctrl","g1_var","g1_threshold","g1_dir",
-    "g2_name","g2_ctrl","g2_var","g2_threshold","g2_dir",
-    # Segment breakdown
-    "num_segments",
-    "seg0_name","seg0_uc","seg0_cc","seg0_rc","seg0_uv","seg0_cv","seg0_rv",
-    "seg1_name","seg1_uc","seg1_cc","seg1_rc","seg1_uv","seg1_cv","seg1_rv",
-    "seg2_name","seg2_uc","seg2_cc","seg2_rc","seg2_uv","seg2_cv","seg2_rv",
-    "seg3_name","seg3_uc","seg3_cc","seg3_rc","seg3_uv","seg3_cv","seg3_rv",
-]
+    # The variations and CUPED tables are rebuilt from the loaded rows, not the previous edits
+    st.session_state.pop(VARIATIONS_EDITOR, None)
+    for _k in [k for k in st.session_state if str(k).startswith(CUPED_EDITOR)]:
+        st.session_state.pop(_k)
 
 
 # -----------------------------------------------
@@ -182,1098 +87,6 @@ def render_header(svg, text, level=2):
         unsafe_allow_html=True,
     )
 
-def safe_divide(n, d, fallback=0.0):
-    return n / d if d != 0 else fallback
-
-def calculate_uplift(ctrl, var):
-    return safe_divide((var - ctrl) * 100, ctrl)
-
-
-# -----------------------------------------------
-# SRM TEST  (supports N groups)
-# -----------------------------------------------
-def perform_srm_test(observed, expected_split=None):
-    n = len(observed)
-    if expected_split is None:
-        expected_split = [1 / n] * n
-    total    = sum(observed)
-    expected = [total * p for p in expected_split]
-    stat, p  = chisquare(observed, f_exp=expected)
-    return stat, p
-
-
-# -----------------------------------------------
-# DURATION ANALYSIS
-# -----------------------------------------------
-def analyze_test_duration(days, start_date=None):
-    """
-    Runs multiple business-cycle checks on the test duration.
-    Returns a list of check dicts:
-      {"id": str, "level": "pass"|"warning"|"error", "label": str, "msg": str}
-    start_date: datetime.date or None. When provided, enables day-of-week bias detection.
-    """
-    _DOW = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-    full_weeks = days // 7
-    remainder  = days % 7
-    checks = []
-
-    # 1. Minimum duration / novelty
-    if days < 7:
-        checks.append({"id": "too_short", "level": "error",
-                        "label": "Too Short",
-                        "msg": f"{days} day{'s' if days != 1 else ''} is below the 7-day minimum — results are unreliable."})
-    elif days < 14:
-        checks.append({"id": "novelty", "level": "warning",
-                        "label": "Novelty Risk",
-                        "msg": f"{days} days — users may still be reacting to the change. Industry standard is 14+ days."})
-    else:
-        checks.append({"id": "duration_ok", "level": "pass",
-                        "label": "Duration OK",
-                        "msg": f"{days} days ({full_weeks} full week{'s' if full_weeks != 1 else ''})."})
-
-    # 2. Seasonality risk for very long tests
-    if days > 90:
-        checks.append({"id": "long_running", "level": "warning",
-                        "label": "Seasonality Risk",
-                        "msg": f"{days} days is a long test. Results may be contaminated by seasonal trends unrelated to the change."})
-
-    # 3. Business week integrity
-    if days >= 7 and remainder != 0:
-        checks.append({"id": "incomplete_weeks", "level": "warning",
-                        "label": "Incomplete Weeks",
-                        "msg": (f"{days} days = {full_weeks} full week{'s' if full_weeks != 1 else ''}"
-                                f" + {remainder} extra day{'s' if remainder != 1 else ''}."
-                                f" Partial weeks introduce day-of-week bias.")})
-    elif days >= 14:
-        checks.append({"id": "weeks_ok", "level": "pass",
-                        "label": "Full Weeks",
-                        "msg": f"{full_weeks} complete week{'s' if full_weeks != 1 else ''} — no day-of-week bias."})
-
-    # 4. Day-of-week alignment (only when start date is provided)
-    if start_date is not None:
-        end_date  = start_date + datetime.timedelta(days=days - 1)
-        start_dow = start_date.weekday()   # 0 = Monday
-        end_dow   = end_date.weekday()     # 6 = Sunday
-        if start_dow == 0 and end_dow == 6:
-            checks.append({"id": "dow_ok", "level": "pass",
-                            "label": "Week Alignment",
-                            "msg": f"Started {_DOW[start_dow]}, ended {_DOW[end_dow]} — perfect Mon→Sun alignment."})
-        else:
-            checks.append({"id": "dow_bias", "level": "warning",
-                            "label": "Day-of-Week Bias",
-                            "msg": (f"Test ran {_DOW[start_dow]} → {_DOW[end_dow]}. "
-                                    f"Ideal window is Mon → Sun. Partial week coverage may skew results.")})
-
-    return checks
-
-
-# -----------------------------------------------
-# GUARDRAIL METRICS ENGINE
-# -----------------------------------------------
-def evaluate_guardrails(guardrails):
-    """
-    guardrails: list of dicts — name, ctrl_val, var_val, threshold, direction.
-    direction: "lower is better" | "higher is better"
-    Returns list of result dicts with violated flag.
-    """
-    results = []
-    for g in guardrails:
-        ctrl = g["ctrl_val"]
-        var  = g["var_val"]
-        if ctrl == 0:
-            results.append({
-                "name": g["name"], "ctrl": ctrl, "var": var,
-                "delta_pct": 0.0, "violated": False, "skip": True,
-            })
-            continue
-        delta_pct = ((var - ctrl) / ctrl) * 100
-        if g["direction"] == "lower is better":
-            violated = delta_pct > g["threshold"]
-        else:
-            violated = delta_pct < -g["threshold"]
-        results.append({
-            "name":      g["name"],
-            "ctrl":      ctrl,
-            "var":       var,
-            "delta_pct": delta_pct,
-            "threshold": g["threshold"],
-            "direction": g["direction"],
-            "violated":  violated,
-            "skip":      False,
-        })
-    return results
-
-
-# -----------------------------------------------
-# SEGMENT BREAKDOWN ENGINE
-# -----------------------------------------------
-def analyze_segments(segments, alpha):
-    """
-    segments: list of dicts — name, uc, cc, rc, uv, cv, rv.
-    Returns one result dict per segment. No MCC — exploratory consistency check.
-    """
-    results = []
-    for s in segments:
-        uc, cc, rc = s["uc"], s["cc"], s["rc"]
-        uv, cv, rv = s["uv"], s["cv"], s["rv"]
-        if uc == 0 or uv == 0:
-            results.append({"name": s["name"], "skip": True})
-            continue
-        ctrl_cr  = min(safe_divide(cc, uc), 1.0)
-        var_cr   = min(safe_divide(cv, uv), 1.0)
-        ctrl_rpv = safe_divide(rc, uc)
-        var_rpv  = safe_divide(rv, uv)
-        try:
-            from statsmodels.stats.proportion import proportions_ztest
-            z_stat, p_val = proportions_ztest([cc, cv], [uc, uv])
-        except Exception:
-            z_stat, p_val = 0.0, 1.0
-        if not np.isfinite(p_val):
-            p_val = 1.0
-        results.append({
-            "name":        s["name"],
-            "ctrl_cr":     ctrl_cr,
-            "var_cr":      var_cr,
-            "ctrl_rpv":    ctrl_rpv,
-            "var_rpv":     var_rpv,
-            "uplift_cr":   calculate_uplift(ctrl_cr, var_cr),
-            "uplift_rpv":  calculate_uplift(ctrl_rpv, var_rpv),
-            "z_stat":      z_stat if np.isfinite(z_stat) else 0.0,
-            "p_value":     p_val,
-            "significant": p_val <= alpha,
-            "ctrl_users":  uc,
-            "var_users":   uv,
-            "ctrl_conv":   cc,
-            "var_conv":    cv,
-            "skip":        False,
-        })
-    return results
-
-
-# -----------------------------------------------
-# MULTI-VARIANT STATISTICAL ENGINE
-# -----------------------------------------------
-def run_multivariate_analysis(groups, alpha, mc_method, primary_goal="Maximize CR"):
-    """
-    groups: list of dicts — name, users, conv, rev, prod.
-    Returns omnibus chi-square, pairwise comparisons with MCC, per-group
-    metrics, and the name of the winner (if any).
-
-    Multiple comparison correction options:
-      holm       – Holm-Bonferroni  (controls FWER, recommended default)
-      bonferroni – Bonferroni        (most conservative)
-      fdr_bh     – Benjamini-Hochberg (controls FDR, best for exploratory)
-    """
-    ctrl = groups[0]
-    variations = groups[1:]
-
-    # --- Per-group metrics ---
-    ctrl_cr  = safe_divide(ctrl["conv"],  ctrl["users"])
-    ctrl_aov = safe_divide(ctrl["rev"],   ctrl["conv"])
-    ctrl_rpv = safe_divide(ctrl["rev"],   ctrl["users"])
-
-    metrics = []
-    for g in groups:
-        cr  = min(safe_divide(g["conv"],  g["users"]), 1.0)   # clamp: conv can't exceed users
-        aov = safe_divide(g["rev"],   g["conv"])
-        rpv = safe_divide(g["rev"],   g["users"])
-        apo = safe_divide(g["prod"],  g["conv"])
-        apu = safe_divide(g["prod"],  g["users"])
-        metrics.append({
-            "name": g["name"], "users": g["users"], "conv": g["conv"],
-            "cr": cr, "cr_pct": cr * 100, "aov": aov, "rpv": rpv, "apo": apo, "apu": apu,
-            "uplift_cr":  calculate_uplift(ctrl_cr,  cr),
-            "uplift_aov": calculate_uplift(ctrl_aov, aov),
-            "uplift_rpv": calculate_uplift(ctrl_rpv, rpv),
-        })
-
-    # --- Omnibus chi-square (all groups simultaneously) ---
-    conv_arr     = [g["conv"]                        for g in groups]
-    non_conv_arr = [g["users"] - g["conv"]           for g in groups]
-    try:
-        chi2_g, p_global, _, _ = chi2_contingency(
-            np.array([conv_arr, non_conv_arr]).T   # shape (n_groups, 2)
-        )
-    except Exception:
-        chi2_g, p_global = 0.0, 1.0
-
-    # --- Pairwise: each variation vs control ---
-    raw_p, z_stats, labels = [], [], []
-    for var in variations:
-        try:
-            z, p = proportions_ztest(
-                [ctrl["conv"], var["conv"]],
-                [ctrl["users"], var["users"]],
-            )
-        except Exception:
-            z, p = 0.0, 1.0
-        raw_p.append(p)
-        z_stats.append(z)
-        labels.append(var["name"])
-
-    # --- Multiple comparison correction ---
-    # Replace NaN/inf p-values (from degenerate inputs like conv > users) with 1.0
-    safe_p = [p if np.isfinite(p) else 1.0 for p in raw_p]
-    if len(safe_p) > 0:
-        reject, p_adj, _, _ = multipletests(safe_p, alpha=alpha, method=mc_method)
-    else:
-        reject, p_adj = np.array([]), np.array([])
-
-    ctrl_apo = metrics[0]["apo"]
-    pairwise = []
-    for i, var in enumerate(variations):
-        m = metrics[i + 1]
-        pairwise.append({
-            "name":        var["name"],
-            "z_stat":      z_stats[i],
-            "p_raw":       raw_p[i],
-            "p_adjusted":  float(p_adj[i]),
-            "significant": bool(reject[i]),
-            "uplift_cr":   m["uplift_cr"],
-            "uplift_aov":  m["uplift_aov"],
-            "uplift_rpv":  m["uplift_rpv"],
-            "uplift_apo":  calculate_uplift(ctrl_apo, m["apo"]),
-        })
-
-    # --- Winner selection — behaviour driven by primary_goal ---
-    #
-    # "Maximize CR":      Only variants with CR uplift > 0 qualify.
-    #                     Tiebreaker: RPV → AOV → lowest APO.
-    #
-    # "Maximize Revenue": Only variants with RPV uplift > 0 qualify.
-    #                     A lower-CR variant can win if it earns more per visitor.
-    #                     Tiebreaker: CR → AOV → lowest APO.
-    #
-    # "Balanced":         Composite score = 0.4 × uplift_cr + 0.6 × uplift_rpv.
-    #                     Variant must be significant and have positive composite score.
-    #                     Tiebreaker: AOV → lowest APO.
-
-    _composite = lambda x: 0.4 * x["uplift_cr"] + 0.6 * x["uplift_rpv"]
-
-    if primary_goal == "Maximize Revenue":
-        sig_winners   = [pw for pw in pairwise if pw["significant"] and pw["uplift_rpv"] > 0]
-        clean_winners = [pw for pw in sig_winners if pw["uplift_cr"] >= 0]
-        _winner_key   = lambda x: (x["uplift_rpv"], x["uplift_cr"], x["uplift_aov"], -x["uplift_apo"])
-    elif primary_goal == "Balanced":
-        sig_winners   = [pw for pw in pairwise if pw["significant"] and _composite(pw) > 0]
-        clean_winners = [pw for pw in sig_winners if pw["uplift_cr"] >= 0 and pw["uplift_rpv"] >= 0]
-        _winner_key   = lambda x: (_composite(x), x["uplift_aov"], -x["uplift_apo"])
-    else:  # "Maximize CR" (default)
-        sig_winners   = [pw for pw in pairwise if pw["significant"] and pw["uplift_cr"] > 0]
-        clean_winners = [pw for pw in sig_winners if pw["uplift_rpv"] >= 0]
-        _winner_key   = lambda x: (x["uplift_cr"], x["uplift_rpv"], x["uplift_aov"], -x["uplift_apo"])
-
-    winner = (
-        max(clean_winners, key=_winner_key)["name"]
-        if clean_winners
-        else (max(sig_winners, key=_winner_key)["name"] if sig_winners else None)
-    )
-    # Flag if winner was chosen despite the "other" metric being negative
-    winner_rpv_negative = (
-        winner is not None and not clean_winners and bool(sig_winners)
-    )
-
-    return {
-        "chi2_global": chi2_g, "p_global": p_global,
-        "pairwise": pairwise, "metrics": metrics,
-        "winner": winner, "winner_rpv_negative": winner_rpv_negative,
-        "correction": mc_method,
-        "n_comparisons": len(variations),
-    }
-
-
-# -----------------------------------------------
-# BAYESIAN  (supports N groups)
-# -----------------------------------------------
-def calculate_bayesian_multivariate(groups):
-    """
-    Monte Carlo Beta-posterior analysis for all groups simultaneously.
-    Returns prob_best and expected_loss per group.
-    """
-    rng = np.random.default_rng()
-    samples = {}
-    for g in groups:
-        a = g["conv"] + 1
-        b = max(g["users"] - g["conv"], 0) + 1
-        samples[g["name"]] = rng.beta(a, b, BAYESIAN_SAMPLES)
-
-    names = list(samples.keys())
-    arr   = np.stack([samples[n] for n in names], axis=1)   # (SAMPLES, n_groups)
-
-    best_idx   = np.argmax(arr, axis=1)
-    prob_best  = {n: float(np.mean(best_idx == i)) for i, n in enumerate(names)}
-    max_all    = arr.max(axis=1, keepdims=True)
-    exp_loss   = {
-        n: float(np.mean(np.maximum(max_all[:, 0] - arr[:, i], 0)))
-        for i, n in enumerate(names)
-    }
-    return {"prob_best": prob_best, "expected_loss": exp_loss}
-
-# Keep 2-group version for bootstrap tab
-def calculate_bayesian_risk(ac, bc, av, bv):
-    rng   = np.random.default_rng()
-    s_c   = rng.beta(ac, bc, BAYESIAN_SAMPLES)
-    s_v   = rng.beta(av, bv, BAYESIAN_SAMPLES)
-    p_win = float(np.mean(s_v > s_c))
-    lv    = float(np.mean(np.maximum(s_c - s_v, 0)))
-    lc    = float(np.mean(np.maximum(s_v - s_c, 0)))
-    return p_win, lv, lc
-
-
-# -----------------------------------------------
-# REVENUE SIGNIFICANCE
-# -----------------------------------------------
-def reconstruct_order_values(n_users, n_conv, total_rev, rng):
-    if n_conv <= 0 or total_rev <= 0:
-        return np.zeros(max(n_users, 1))
-    n_users = max(n_users, 1)
-    n_conv  = min(n_conv, n_users)   # conv can never exceed users — clamp defensively
-    aov   = total_rev / n_conv
-    sigma = 0.8
-    mu    = np.log(aov) - (sigma ** 2) / 2
-    vals  = rng.lognormal(mean=mu, sigma=sigma, size=n_conv)
-    vals  = vals * (total_rev / vals.sum())
-    arr   = np.zeros(n_users)
-    idx   = rng.choice(n_users, size=n_conv, replace=False)
-    arr[idx] = vals
-    return arr
-
-def test_revenue_significance(uc, cc, rc, uv, cv, rv, alpha=0.05, n_boot=2000):
-    rng = np.random.default_rng(seed=42)
-    aov_c = reconstruct_order_values(cc, cc, rc, rng) if cc > 0 else np.zeros(1)
-    aov_v = reconstruct_order_values(cv, cv, rv, rng) if cv > 0 else np.zeros(1)
-    rpv_c = reconstruct_order_values(uc, cc, rc, rng)
-    rpv_v = reconstruct_order_values(uv, cv, rv, rng)
-    results = {}
-    for label, ac, av in [("aov", aov_c, aov_v), ("rpv", rpv_c, rpv_v)]:
-        try:
-            _, mw_p = mannwhitneyu(ac, av, alternative="two-sided") if (ac.sum() + av.sum()) > 0 else (0, 1.0)
-        except ValueError:
-            mw_p = 1.0
-        lc, lv    = np.log1p(ac), np.log1p(av)
-        diffs     = np.array([
-            np.expm1(rng.choice(lv, len(lv), replace=True).mean()) -
-            np.expm1(rng.choice(lc, len(lc), replace=True).mean())
-            for _ in range(n_boot)
-        ])
-        ci_l  = float(np.percentile(diffs, alpha / 2 * 100))
-        ci_h  = float(np.percentile(diffs, (1 - alpha / 2) * 100))
-        od    = av.mean() - ac.mean()
-        bp    = min(float(np.mean(diffs <= 0) * 2) if od >= 0 else float(np.mean(diffs >= 0) * 2), 1.0)
-        results[label] = {
-            "mw_p": mw_p, "mw_sig": mw_p <= alpha,
-            "boot_p": bp, "boot_sig": bp <= alpha,
-            "boot_ci_low": ci_l, "boot_ci_high": ci_h,
-            "sig": (mw_p <= alpha) or (bp <= alpha),
-        }
-    return results
-
-
-# -----------------------------------------------
-# SIMPSON'S PARADOX
-# -----------------------------------------------
-def check_simpsons_paradox(seg1, seg2):
-    cr_c1  = safe_divide(seg1["conv_c"], seg1["users_c"])
-    cr_v1  = safe_divide(seg1["conv_v"], seg1["users_v"])
-    up1    = calculate_uplift(cr_c1, cr_v1)
-    cr_c2  = safe_divide(seg2["conv_c"], seg2["users_c"])
-    cr_v2  = safe_divide(seg2["conv_v"], seg2["users_v"])
-    up2    = calculate_uplift(cr_c2, cr_v2)
-    agg_cc = seg1["conv_c"]  + seg2["conv_c"]
-    agg_uc = seg1["users_c"] + seg2["users_c"]
-    agg_cv = seg1["conv_v"]  + seg2["conv_v"]
-    agg_uv = seg1["users_v"] + seg2["users_v"]
-    up_agg = calculate_uplift(safe_divide(agg_cc, agg_uc), safe_divide(agg_cv, agg_uv))
-    paradox = (up1 > 0 and up2 > 0 and up_agg < 0) or (up1 < 0 and up2 < 0 and up_agg > 0)
-    return paradox, up1, up2, up_agg
-
-
-# -----------------------------------------------
-# AI ANALYSIS
-# -----------------------------------------------
-def get_ai_analysis(api_key, hypothesis, metrics, provider="OpenAI", conf_level="95%", segment_results=None):
-    if not api_key:
-        return "Please enter a valid API Key to generate this analysis."
-    # Use None for OpenAI so the SDK uses its own default endpoint (future-proof)
-    base_url   = "https://api.deepseek.com" if provider == "DeepSeek" else None
-    model_name = "deepseek-reasoner"         if provider == "DeepSeek" else "gpt-4o"
-    prompt = f"""You are an expert CRO analyst writing a structured A/B/n test report for a business stakeholder.
-
-EXPERIMENT CONFIGURATION
-- Confidence Level: {conf_level}
-- Hypothesis: "{hypothesis}"
-
-EXPERIMENT DATA
-{json.dumps(metrics, indent=2, cls=NumpyEncoder)}
-
-INSTRUCTIONS
-Write in Markdown using exactly these sections. Do not restate the hypothesis as a heading — weave it into the Executive Summary opening sentence. If multiple variants are present, compare each vs control and identify a clear winner or explain why none qualifies.
-
-## Executive Summary
-One paragraph. State what was tested, whether any variant won, the best CR uplift, significance, and financial impact per visitor.
-
-## Trade-off Analysis
-CR vs AOV vs RPV across all variants. Identify clean wins, volume-vs-value trade-offs, or net negatives. Note whether MCC affected any conclusions.
-
-## Risk Assessment
-Bayesian probability and expected loss per variant. Factor in duration, SRM status, and number of variants tested.
-
-## Visual Insights
-
-### Strategic Matrix
-Where each variant sits on CR vs AOV quadrant and what it means strategically.
-
-### Product Metrics
-Basket size trends (APO, APU) across all groups and behavioural implications.
-
-### Revenue Charts
-RPV and AOV side by side — what the combination tells us about revenue quality per variant.
-
-### CR Comparison
-Contextualise each variant's uplift given sample size and base rate.
-
-### Bayesian Posterior
-Overlapping Beta distributions — overlap degree, certainty, and probability each variant is best.
-
-### Bootstrap Distribution
-Histogram of resampled CR differences — centre, CI bounds, zero-crossing implications.
-
-### Box Plot
-Median, IQR spread, and stability across groups.
-
-## Recommendation
-One paragraph. Ship / do not ship / run longer for each variant. Name a winner if one exists. End with one concrete next step."""
-
-    active_segs = [s for s in (segment_results or []) if not s.get("skip")]
-    if active_segs:
-        seg_lines = "\n".join(
-            f"  - {s['name']}: Ctrl CR {s['ctrl_cr']*100:.2f}% → Var CR {s['var_cr']*100:.2f}% "
-            f"(CR {s['uplift_cr']:+.2f}%, RPV {s['uplift_rpv']:+.2f}%, p={s['p_value']:.4f})"
-            for s in active_segs
-        )
-        prompt += f"""
-
-## Segment Breakdown
-For each segment below, comment on whether the result holds, whether there are meaningful differences across audiences, and any risk of the aggregate result masking a losing segment.
-
-Segment data (Control vs Best Variation):
-{seg_lines}"""
-
-    try:
-        client   = openai.OpenAI(api_key=api_key, base_url=base_url)
-        response = client.chat.completions.create(
-            model=model_name,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"**Error connecting to AI provider:** {e}"
-
-
-# -----------------------------------------------
-# SMART ANALYSIS  (rule-based)
-# -----------------------------------------------
-def generate_smart_analysis(hypothesis, mv_results, bayes_mv, metrics_payload, alpha_val, segment_results=None):
-    report = []
-    conf_pct = f"{(1 - alpha_val) * 100:.0f}%"
-
-    # ── CRITICAL: SRM blocks all further analysis ──────────────────────────
-    if metrics_payload["p_srm"] < 0.01:
-        report.append("### CRITICAL — Sample Ratio Mismatch")
-        report.append(
-            f"SRM p = **{metrics_payload['p_srm']:.4f}**. Traffic split is uneven — "
-            "**all results below are unreliable.** Fix randomisation before drawing any conclusions."
-        )
-        return "\n\n".join(report)
-
-    n_vars       = mv_results["n_comparisons"]
-    winner       = mv_results["winner"]
-    p_glob       = mv_results["p_global"]
-    primary_goal = metrics_payload.get("primary_goal", "Maximize CR")
-    rev_sig      = metrics_payload.get("rev_sig", {})
-    guardrails   = metrics_payload.get("guardrail_results", [])
-    all_metrics  = metrics_payload.get("metrics", [])
-
-    # ── HEADLINE ────────────────────────────────────────────────────────────
-    if n_vars == 1:
-        pw = mv_results["pairwise"][0]
-        p_display = f"{pw['p_adjusted']:.4f}" if np.isfinite(pw['p_adjusted']) else "—"
-        if pw["significant"] and pw["uplift_cr"] > 0:
-            headline = "WINNER — Statistically Significant Positive Result"
-            summary  = f"Variation outperforms Control at {conf_pct} confidence (p_adj = {p_display})."
-        elif pw["significant"] and pw["uplift_cr"] < 0:
-            headline = "LOSER — Statistically Significant Negative Result"
-            summary  = f"Variation is significantly worse than Control (p_adj = {p_display}). Do not ship."
-        else:
-            headline = "INCONCLUSIVE — No Clear Winner"
-            summary  = f"Cannot reject the null hypothesis (p_adj = {p_display}). More data needed."
-    else:
-        if winner:
-            headline = f"MULTI-VARIANT WINNER — {winner}"
-            summary  = (
-                f"Omnibus test confirms a significant difference (χ² p = {p_glob:.4f}). "
-                f"**{winner}** is the strongest performer after {mv_results['correction'].upper()} correction."
-            )
-        elif p_glob <= alpha_val:
-            headline = "SIGNIFICANT DIFFERENCE — No Positive Winner"
-            summary  = (
-                f"Omnibus test significant (p = {p_glob:.4f}) but no variant shows a "
-                "significant positive uplift after correction."
-            )
-        else:
-            headline = "MULTI-VARIANT INCONCLUSIVE"
-            summary  = f"No significant overall difference (omnibus p = {p_glob:.4f})."
-
-    report.append(f"### {headline}")
-    report.append(summary)
-    if hypothesis:
-        report.append(f"**Hypothesis:** _{hypothesis}_")
-    report.append(f"_Optimisation goal: **{primary_goal}** · Confidence level: **{conf_pct}**_")
-
-    # ── DATA HEALTH ─────────────────────────────────────────────────────────
-    report.append("### Data Health & Validity")
-    days = metrics_payload["days"]
-    dur_status = "WARNING:" if days < 14 else "PASS:"
-    dur_note   = f"Only {days} days — too short for reliable results." if days < 7 else \
-                 f"{days} days — watch for novelty effects." if days < 14 else \
-                 f"{days} days — healthy duration."
-    report.append(f"- **{dur_status}** Duration: {dur_note}")
-    report.append(f"- **PASS:** SRM test (p = {metrics_payload['p_srm']:.4f}) — traffic split is even.")
-    if n_vars > 1:
-        report.append(
-            f"- **INFO:** {mv_results['correction'].upper()} multiple comparison correction "
-            f"applied across {n_vars} pairwise comparisons."
-        )
-
-    # ── PAIRWISE RESULTS ────────────────────────────────────────────────────
-    report.append("### Pairwise Results vs Control")
-    for pw in mv_results["pairwise"]:
-        sig   = "Significant" if pw["significant"] else "Not Significant"
-        cr_d  = "▲" if pw["uplift_cr"]  >= 0 else "▼"
-        rpv_d = "▲" if pw["uplift_rpv"] >= 0 else "▼"
-        aov_d = "▲" if pw["uplift_aov"] >= 0 else "▼"
-        p_display = f"{pw['p_adjusted']:.4f}" if np.isfinite(pw['p_adjusted']) else "—"
-        report.append(
-            f"- **{pw['name']}** [{sig}] — "
-            f"CR {cr_d}{pw['uplift_cr']:+.2f}% | "
-            f"RPV {rpv_d}{pw['uplift_rpv']:+.2f}% | "
-            f"AOV {aov_d}{pw['uplift_aov']:+.2f}% | "
-            f"p_adj = {p_display}"
-        )
-
-    # ── PRODUCT VELOCITY ────────────────────────────────────────────────────
-    if len(all_metrics) > 1:
-        report.append("### Product Velocity")
-        for m in all_metrics[1:]:
-            apo_d = "▲" if m.get("uplift_apo", 0) >= 0 else "▼"
-            note  = ""
-            if abs(m.get("uplift_apo", 0)) > 10:
-                if m["uplift_apo"] < 0 and m["uplift_rpv"] >= 0:
-                    note = " — fewer items, same or higher revenue: better per-item margin."
-                elif m["uplift_apo"] > 0 and m["uplift_rpv"] >= 0:
-                    note = " — more items per order with higher revenue: basket expansion."
-                elif m["uplift_apo"] > 0 and m["uplift_rpv"] < 0:
-                    note = " — more items per order but lower revenue: possible discounting risk."
-            apo_val = m.get("uplift_apo", 0)
-            report.append(
-                f"- **{m['name']}**: {m['apo']:.2f} items/order "
-                f"({apo_d}{apo_val:+.1f}% vs Control){note}"
-            )
-
-    # ── REVENUE SIGNALS ─────────────────────────────────────────────────────
-    if rev_sig:
-        report.append("### Revenue Signals")
-        report.append(
-            "_Based on reconstructed order distributions — treat as directional signals, not precise p-values._"
-        )
-        for label, display in [("rpv", "Revenue Per Visitor"), ("aov", "Average Order Value")]:
-            r = rev_sig.get(label, {})
-            if not r:
-                continue
-            overall = "Significant" if r.get("sig") else "Not significant"
-            mw_p    = f"{r['mw_p']:.4f}" if np.isfinite(r.get("mw_p", float("nan"))) else "—"
-            ci_l    = r.get("boot_ci_low",  0)
-            ci_h    = r.get("boot_ci_high", 0)
-            ci_note = "CI entirely positive — gain is consistent." if ci_l > 0 else \
-                      "CI entirely negative — loss is consistent." if ci_h < 0 else \
-                      "CI crosses zero — result is uncertain."
-            report.append(
-                f"- **{display}:** {overall} (Mann-Whitney p = {mw_p}) · "
-                f"Bootstrap CI: ${ci_l:.3f} to ${ci_h:.3f} · {ci_note}"
-            )
-
-    # ── BAYESIAN ASSESSMENT ─────────────────────────────────────────────────
-    report.append("### Bayesian Assessment")
-    best_bayes = max(bayes_mv["prob_best"], key=bayes_mv["prob_best"].get)
-    for name, prob in bayes_mv["prob_best"].items():
-        loss = bayes_mv["expected_loss"].get(name, 0)
-        tag  = " ← highest probability" if name == best_bayes else ""
-        interp = ""
-        if prob >= 0.95:
-            interp = "Strong Bayesian evidence."
-        elif prob >= 0.80:
-            interp = "Moderate evidence — worth monitoring."
-        elif prob >= 0.60:
-            interp = "Weak signal — inconclusive."
-        else:
-            interp = "No meaningful advantage."
-        report.append(
-            f"- **{name}**: {prob*100:.1f}% P(best) | "
-            f"Expected loss if wrong: {loss*100:.4f}%{tag} — {interp}"
-        )
-
-    # ── GUARDRAIL STATUS ────────────────────────────────────────────────────
-    active_guards = [g for g in guardrails if not g.get("skip")]
-    if active_guards:
-        report.append("### Guardrail Metrics")
-        any_violated = any(g["violated"] for g in active_guards)
-        if any_violated:
-            report.append("**WARNING: One or more guardrail metrics are violated.**")
-        else:
-            report.append("All guardrail metrics are within acceptable thresholds.")
-        for g in active_guards:
-            status = "VIOLATED" if g["violated"] else "PASS"
-            d = "▲" if g["delta_pct"] > 0 else "▼"
-            report.append(
-                f"- **{g['name']}** [{status}]: {d}{abs(g['delta_pct']):.1f}% change "
-                f"(limit ±{g['threshold']}%, {g['direction']})"
-            )
-
-    # ── SEGMENT BREAKDOWN ────────────────────────────────────────────────────
-    active_segs = [s for s in (segment_results or []) if not s.get("skip")]
-    if active_segs:
-        report.append("### Segment Breakdown")
-        wins  = sum(1 for s in active_segs if s["uplift_cr"] > 0)
-        total = len(active_segs)
-        if wins > total / 2:
-            report.append(f"Variation leads in **{wins}/{total}** segments — result is consistent.")
-        elif wins == total / 2:
-            report.append(f"Variation leads in **{wins}/{total}** segments — mixed result.")
-        else:
-            report.append(
-                f"Variation leads in only **{wins}/{total}** segments — "
-                "aggregate uplift may not generalise across all audiences."
-            )
-        for s in active_segs:
-            sig_tag = " [Sig]" if s["significant"] else ""
-            cr_d  = "▲" if s["uplift_cr"]  >= 0 else "▼"
-            rpv_d = "▲" if s["uplift_rpv"] >= 0 else "▼"
-            report.append(
-                f"- **{s['name']}**{sig_tag}: "
-                f"CR {cr_d}{s['uplift_cr']:+.2f}% | "
-                f"RPV {rpv_d}{s['uplift_rpv']:+.2f}% | "
-                f"p = {s['p_value']:.4f}"
-            )
-
-    # ── STRATEGIC CONCLUSION ────────────────────────────────────────────────
-    report.append("### Strategic Conclusion")
-    if winner:
-        pw_w         = next(p for p in mv_results["pairwise"] if p["name"] == winner)
-        cr_up        = pw_w["uplift_cr"]
-        rpv_up       = pw_w["uplift_rpv"]
-        aov_up       = pw_w["uplift_aov"]
-        guards_ok    = not any(g["violated"] for g in active_guards) if active_guards else True
-        guard_note   = " Guardrail check: PASS." if guards_ok and active_guards else \
-                       " **Guardrail check: FAILED — review secondary metrics before shipping.**" if active_guards else ""
-
-        if cr_up > 0 and rpv_up > 0 and aov_up >= 0:
-            verdict = f"**[SHIP] {winner} — Growth Engine.** CR, RPV, and AOV all positive."
-        elif cr_up > 0 and rpv_up > 0 and aov_up < 0:
-            verdict = f"**[SHIP WITH CAUTION] {winner} — Volume Play.** CR and RPV up, but AOV down — higher conversion from lower-value orders."
-        elif cr_up <= 0 and rpv_up > 0:
-            verdict = f"**[REVIEW] {winner} — Quality Play.** Lower CR but higher RPV — fewer, higher-value conversions. Consistent with '{primary_goal}' goal."
-        elif cr_up > 0 and rpv_up < 0:
-            verdict = f"**[REVIEW] {winner} — Volume Play.** CR up but RPV down — watch margin impact before shipping."
-        else:
-            verdict = f"**[REVIEW] {winner} — Mixed Signals.** Review all metrics before deciding."
-        report.append(verdict + guard_note)
-    else:
-        report.append(
-            "**[DO NOT SHIP]** No variant qualifies on current data. "
-            "Consider running longer to accumulate statistical power, or revisit the hypothesis."
-        )
-
-    return "\n\n".join(report)
-
-
-# -----------------------------------------------
-# PDF REPORT GENERATOR
-# -----------------------------------------------
-def generate_pdf_report(mv, bayes, rev_sig, guardrail_results, duration_checks,
-                         p_srm, groups, days_run, confidence_level, primary_goal,
-                         ctrl_m, best_m, hypothesis="", smart_text="",
-                         ai_text="", segment_results=None):
-    """Build a PDF report from the current analysis state. Returns bytes."""
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import ParagraphStyle
-    from reportlab.lib.units import mm
-    from reportlab.lib import colors
-    from reportlab.platypus import (SimpleDocTemplate, Paragraph, Spacer, Table,
-                                     TableStyle, HRFlowable, Image, PageBreak)
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT
-
-    buf    = io.BytesIO()
-    MARGIN = 18 * mm
-    USABLE = A4[0] - 2 * MARGIN
-    doc    = SimpleDocTemplate(buf, pagesize=A4,
-                                leftMargin=MARGIN, rightMargin=MARGIN,
-                                topMargin=MARGIN,  bottomMargin=MARGIN)
-
-    # ── Palette ──────────────────────────────────────────────────
-    C_RED   = colors.HexColor('#E73B37')
-    C_DARK  = colors.HexColor('#1a1d24')
-    C_LGRAY = colors.HexColor('#f5f5f5')
-    C_MGRAY = colors.HexColor('#cccccc')
-    C_GREEN = colors.HexColor('#2ca02c')
-    C_WARN  = colors.HexColor('#d97706')
-    C_BODY  = colors.HexColor('#333333')
-    C_MUTED = colors.HexColor('#888888')
-
-    # ── Style factory ─────────────────────────────────────────────
-    def _s(name, size, color=C_DARK, bold=False, align=TA_LEFT, sb=0, sa=4):
-        return ParagraphStyle(name, fontSize=size, textColor=color,
-                               fontName='Helvetica-Bold' if bold else 'Helvetica',
-                               alignment=align, spaceBefore=sb, spaceAfter=sa,
-                               leading=size * 1.45)
-
-    s_title = _s('pt',  20, C_DARK,  True,  TA_CENTER, 0, 8)
-    s_h1    = _s('ph1', 13, C_DARK,  True,  TA_LEFT,  12, 5)
-    s_h2    = _s('ph2', 10, C_RED,   True,  TA_LEFT,   6, 3)
-    s_body  = _s('pb',   9, C_BODY,  False, TA_LEFT,   0, 2)
-    s_small = _s('ps',   7, C_MUTED, False, TA_LEFT,   0, 1)
-    s_win   = _s('pw',  10, colors.white, True, TA_CENTER, 0, 0)
-
-    # ── Table helper ──────────────────────────────────────────────
-    def _tbl(data, col_widths, extra=None):
-        t  = Table(data, colWidths=col_widths)
-        ts = TableStyle([
-            ('BACKGROUND',    (0, 0), (-1,  0), C_DARK),
-            ('TEXTCOLOR',     (0, 0), (-1,  0), colors.white),
-            ('FONTNAME',      (0, 0), (-1,  0), 'Helvetica-Bold'),
-            ('FONTSIZE',      (0, 0), (-1, -1), 9),
-            ('ROWBACKGROUNDS',(0, 1), (-1, -1), [colors.white, C_LGRAY]),
-            ('GRID',          (0, 0), (-1, -1), 0.5, C_MGRAY),
-            ('PADDING',       (0, 0), (-1, -1), 5),
-            ('ALIGN',         (1, 0), (-1, -1), 'CENTER'),
-            ('VALIGN',        (0, 0), (-1, -1), 'MIDDLE'),
-        ])
-        for cmd in (extra or []):
-            ts.add(*cmd)
-        t.setStyle(ts)
-        return t
-
-    # ── Markdown → reportlab XML (handles **bold**) ───────────────
-    def _md(text):
-        text = text.replace('&', '&amp;')
-        text = _re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', text)
-        return text
-
-    # ── Figure → in-memory PNG bytes ─────────────────────────────
-    def _fig_bytes(fig):
-        b = io.BytesIO()
-        fig.savefig(b, format='png', bbox_inches='tight', dpi=110)
-        b.seek(0)
-        plt.close(fig)
-        return b
-
-    # Light rcParams for PDF charts (overrides global dark theme)
-    _PDF_RC = {
-        'figure.facecolor': 'white',   'axes.facecolor':  '#f8f8f8',
-        'savefig.facecolor': 'white',  'text.color':      '#1a1d24',
-        'axes.labelcolor':  '#1a1d24', 'axes.titlecolor': '#1a1d24',
-        'xtick.color':      '#1a1d24', 'ytick.color':     '#1a1d24',
-        'grid.color':       '#dddddd', 'axes.edgecolor':  '#cccccc',
-        'legend.facecolor': 'white',   'legend.edgecolor':'#cccccc',
-        'legend.labelcolor':'#1a1d24',
-    }
-
-    IMG_W   = USABLE
-    IMG_H   = 82 * mm
-    metrics = mv["metrics"]
-    elems   = []
-
-    # ── PAGE 1: HEADER & KEY METRICS ─────────────────────────────
-    elems.append(Paragraph("A/B Test Analysis Report", s_title))
-    elems.append(HRFlowable(width=USABLE, color=C_RED, thickness=2, spaceAfter=6))
-    if hypothesis:
-        elems.append(Paragraph(f"<i>Hypothesis: {_md(hypothesis)}</i>", s_body))
-        elems.append(Spacer(1, 4))
-
-    start_date = st.session_state.get("start_date")
-    meta = [
-        ["Generated",     datetime.date.today().isoformat()],
-        ["Test Duration", f"{days_run} days" + (f"  (started {start_date})" if start_date else "")],
-        ["Confidence",    confidence_level],
-        ["Primary Goal",  primary_goal],
-        ["Groups",        ", ".join(g["name"] for g in groups)],
-    ]
-    elems.append(_tbl(meta, [45 * mm, USABLE - 45 * mm]))
-    elems.append(Spacer(1, 10))
-
-    winner = mv["winner"]
-    if winner:
-        pw     = next((p for p in mv["pairwise"] if p["name"] == winner), {})
-        banner = (f"WINNER: {winner}   |   CR {pw.get('uplift_cr', 0):+.2f}%"
-                  f"   |   RPV {pw.get('uplift_rpv', 0):+.2f}%"
-                  f"   |   p = {pw.get('p_adjusted', 1):.4f}")
-        bg = C_GREEN
-    else:
-        banner = "No winner declared — test inconclusive or insufficient statistical power."
-        bg     = C_DARK
-    w_tbl = Table([[Paragraph(banner, s_win)]], colWidths=[USABLE])
-    w_tbl.setStyle(TableStyle([('BACKGROUND', (0,0), (-1,-1), bg),
-                                ('PADDING',    (0,0), (-1,-1), 10)]))
-    elems.append(w_tbl)
-    elems.append(Spacer(1, 12))
-
-    elems.append(Paragraph("Key Metrics", s_h1))
-    n   = len(metrics)
-    cw  = USABLE / (n + 1)
-    hdr = ["Metric"] + [m["name"] for m in metrics]
-    rows = [
-        ["Users"]       + [f"{m['users']:,}" for m in metrics],
-        ["Conversions"] + [f"{m['conv']:,}"  for m in metrics],
-        ["CR %"]        + [f"{m['cr_pct']:.2f}%" + (f" ({m['uplift_cr']:+.1f}%)" if i > 0 else "")
-                           for i, m in enumerate(metrics)],
-        ["AOV"]         + [f"${m['aov']:.2f}" + (f" ({m['uplift_aov']:+.1f}%)" if i > 0 else "")
-                           for i, m in enumerate(metrics)],
-        ["RPV"]         + [f"${m['rpv']:.4f}" + (f" ({m['uplift_rpv']:+.1f}%)" if i > 0 else "")
-                           for i, m in enumerate(metrics)],
-    ]
-    elems.append(_tbl([hdr] + rows, [cw] * (n + 1)))
-    elems.append(Spacer(1, 12))
-
-    # ── STATISTICAL ANALYSIS ─────────────────────────────────────
-    elems.append(Paragraph("Statistical Analysis", s_h1))
-    pw_hdr  = ["Variation", "Z-Stat", "p (adj)", "Significant", "CR Uplift", "RPV Uplift"]
-    pw_rows = [[pw["name"], f"{pw['z_stat']:.3f}", f"{pw['p_adjusted']:.4f}",
-                "YES" if pw["significant"] else "No",
-                f"{pw['uplift_cr']:+.2f}%", f"{pw['uplift_rpv']:+.2f}%"]
-               for pw in mv["pairwise"]]
-    sig_ex  = [('TEXTCOLOR', (3, i+1), (3, i+1), C_GREEN if pw["significant"] else C_RED)
-               for i, pw in enumerate(mv["pairwise"])]
-    elems.append(_tbl([pw_hdr] + pw_rows, [USABLE / 6] * 6, sig_ex))
-    elems.append(Spacer(1, 8))
-
-    elems.append(Paragraph("Bayesian Results", s_h2))
-    b_hdr  = ["Group", "P(Best)", "Expected Loss"]
-    b_rows = [[g, f"{bayes['prob_best'][g] * 100:.1f}%",
-               f"{bayes['expected_loss'][g] * 100:.4f}%"]
-              for g in bayes["prob_best"]]
-    elems.append(_tbl([b_hdr] + b_rows, [USABLE / 3] * 3))
-    elems.append(Spacer(1, 8))
-
-    elems.append(Paragraph("Revenue Significance (Control vs Best Variation)", s_h2))
-    r_hdr  = ["Metric", "MW p-value", "Bootstrap p", "CI Low", "CI High", "Significant"]
-    r_rows = [
-        ["AOV", f"{rev_sig['aov']['mw_p']:.4f}", f"{rev_sig['aov']['boot_p']:.4f}",
-         f"${rev_sig['aov']['boot_ci_low']:.2f}", f"${rev_sig['aov']['boot_ci_high']:.2f}",
-         "YES" if rev_sig['aov']['sig'] else "No"],
-        ["RPV", f"{rev_sig['rpv']['mw_p']:.4f}", f"{rev_sig['rpv']['boot_p']:.4f}",
-         f"${rev_sig['rpv']['boot_ci_low']:.4f}", f"${rev_sig['rpv']['boot_ci_high']:.4f}",
-         "YES" if rev_sig['rpv']['sig'] else "No"],
-    ]
-    r_ex = [('TEXTCOLOR', (5, i+1), (5, i+1), C_GREEN if sig else C_DARK)
-            for i, sig in enumerate([rev_sig["aov"]["sig"], rev_sig["rpv"]["sig"]])]
-    elems.append(_tbl([r_hdr] + r_rows, [USABLE / 6] * 6, r_ex))
-    elems.append(PageBreak())
-
-    # ── PAGE 2: HEALTH CHECKS ────────────────────────────────────
-    elems.append(Paragraph("Health Checks", s_h1))
-
-    elems.append(Paragraph("Sample Ratio Mismatch", s_h2))
-    srm_ok  = p_srm >= 0.01
-    srm_msg = (f"PASSED (p = {p_srm:.4f}) — Traffic split is even."
-               if srm_ok else
-               f"DETECTED (p = {p_srm:.4f}) — Traffic split is uneven. Results may be invalid.")
-    elems.append(Paragraph(srm_msg, _s('srm', 9, C_GREEN if srm_ok else C_RED, True)))
-    elems.append(Spacer(1, 6))
-
-    elems.append(Paragraph("Duration Analysis", s_h2))
-    _LVL = {"pass": C_GREEN, "warning": C_WARN, "error": C_RED}
-    for chk in duration_checks:
-        col = _LVL.get(chk["level"], C_DARK)
-        elems.append(Paragraph(f"[{chk['label']}] {chk['msg']}",
-                                _s(f'dc_{chk["id"]}', 9, col, chk["level"] != "pass")))
-    elems.append(Spacer(1, 6))
-
-    active_g = [r for r in guardrail_results if not r.get("skip")]
-    if active_g:
-        elems.append(Paragraph("Guardrail Metrics", s_h2))
-        g_hdr  = ["Metric", "Control", "Variation", "Change", "Threshold", "Status"]
-        g_rows = [[r["name"], f"{r['ctrl']:.2f}", f"{r['var']:.2f}",
-                   f"{r['delta_pct']:+.2f}%", f"±{r['threshold']:.1f}%",
-                   "VIOLATED" if r["violated"] else "PASS"]
-                  for r in active_g]
-        g_ex   = [('TEXTCOLOR', (5, i+1), (5, i+1), C_RED if r["violated"] else C_GREEN)
-                  for i, r in enumerate(active_g)]
-        elems.append(_tbl([g_hdr] + g_rows, [USABLE / 6] * 6, g_ex))
-
-    active_pdf_segs = [s for s in (segment_results or []) if not s.get("skip")]
-    if active_pdf_segs:
-        elems.append(Spacer(1, 6))
-        elems.append(Paragraph("Segment Breakdown", s_h2))
-        sg_hdr  = ["Segment", "Ctrl CR", "Var CR", "CR Uplift", "Ctrl RPV", "Var RPV", "RPV Uplift", "p-value", "Sig"]
-        sg_rows = [[
-            s["name"],
-            f"{s['ctrl_cr']*100:.2f}%", f"{s['var_cr']*100:.2f}%",
-            f"{s['uplift_cr']:+.2f}%",
-            f"${s['ctrl_rpv']:.4f}", f"${s['var_rpv']:.4f}",
-            f"{s['uplift_rpv']:+.2f}%",
-            f"{s['p_value']:.4f}",
-            "YES" if s["significant"] else "No",
-        ] for s in active_pdf_segs]
-        sg_ex = [('TEXTCOLOR', (8, i+1), (8, i+1), C_GREEN if s["significant"] else C_DARK)
-                 for i, s in enumerate(active_pdf_segs)]
-        cw9 = USABLE / 9
-        elems.append(_tbl([sg_hdr] + sg_rows, [cw9] * 9, sg_ex))
-
-    elems.append(PageBreak())
-
-    # ── PAGE 3: CHARTS ────────────────────────────────────────────
-    elems.append(Paragraph("Charts", s_h1))
-    with plt.rc_context(_PDF_RC):
-        # CR Comparison
-        cr_vals    = [m["cr_pct"] for m in metrics]
-        cr_labels  = [m["name"]   for m in metrics]
-        fig, ax    = plt.subplots(figsize=(10, 4))
-        ctrl_val   = cr_vals[0]
-        bar_colors = [GROUP_COLORS[i] if (i == 0 or v >= ctrl_val) else "#d62728"
-                      for i, v in enumerate(cr_vals)]
-        bars = ax.bar(cr_labels, cr_vals, color=bar_colors, alpha=0.85)
-        mx   = max(cr_vals) if max(cr_vals) > 0 else 1
-        ax.set_ylim(0, mx * 1.18)
-        ax.set_title("Conversion Rate by Group")
-        ax.set_ylabel("CR %")
-        for bar, v in zip(bars, cr_vals):
-            ax.text(bar.get_x() + bar.get_width() / 2, v + mx * 0.01,
-                    f"{v:.2f}%", ha="center", va="bottom", fontweight="bold", fontsize=9)
-        elems.append(Paragraph("Conversion Rate Comparison", s_h2))
-        elems.append(Image(_fig_bytes(fig), width=IMG_W, height=IMG_H))
-        elems.append(Spacer(1, 8))
-
-        # Strategic Matrix
-        fig, ax  = plt.subplots(figsize=(9, 5))
-        ctrl_m0  = metrics[0]
-        for i, m in enumerate(metrics):
-            ax.scatter(m["cr_pct"], m["aov"], color=GROUP_COLORS[i], s=180,
-                       label=m["name"], zorder=5)
-            if i > 0:
-                ax.annotate("", xy=(m["cr_pct"], m["aov"]),
-                            xytext=(ctrl_m0["cr_pct"], ctrl_m0["aov"]),
-                            arrowprops=dict(arrowstyle="->", color=GROUP_COLORS[i], lw=1.5, ls="--"))
-        ax.axvline(ctrl_m0["cr_pct"], color="#888", ls=":", alpha=0.4)
-        ax.axhline(ctrl_m0["aov"],    color="#888", ls=":", alpha=0.4)
-        ax.set_title("Strategic Matrix: CR vs AOV")
-        ax.set_xlabel("Conversion Rate (%)")
-        ax.set_ylabel("Average Order Value ($)")
-        ax.legend()
-        elems.append(Paragraph("Strategic Matrix", s_h2))
-        elems.append(Image(_fig_bytes(fig), width=IMG_W, height=IMG_H))
-        elems.append(Spacer(1, 8))
-
-        # Bayesian PDFs
-        fig, ax = plt.subplots(figsize=(11, 4))
-        for i, g in enumerate(groups):
-            a_  = g["conv"] + 1
-            b_  = max(g["users"] - g["conv"], 0) + 1
-            d_  = beta(a_, b_)
-            x_  = np.linspace(d_.ppf(0.001), d_.ppf(0.999), 1000)
-            ax.plot(x_, d_.pdf(x_), label=g["name"], color=GROUP_COLORS[i], lw=2)
-            ax.fill_between(x_, d_.pdf(x_), 0, alpha=0.15, color=GROUP_COLORS[i])
-        ax.set_title("Bayesian Posterior Distributions")
-        ax.set_xlabel("Conversion Rate")
-        ax.set_ylabel("Probability Density")
-        ax.legend()
-        elems.append(Paragraph("Bayesian Posteriors", s_h2))
-        elems.append(Image(_fig_bytes(fig), width=IMG_W, height=IMG_H))
-        elems.append(Spacer(1, 8))
-
-        # Bootstrap CI
-        _rng  = np.random.default_rng(42)
-        _pc   = float(np.clip(safe_divide(ctrl_m["conv"], ctrl_m["users"]), 0.0, 1.0))
-        _pv   = float(np.clip(safe_divide(best_m["conv"], best_m["users"]), 0.0, 1.0))
-        _sc   = _rng.binomial(ctrl_m["users"], _pc, BOOTSTRAP_SAMPLES) / ctrl_m["users"]
-        _sv   = _rng.binomial(best_m["users"], _pv, BOOTSTRAP_SAMPLES) / best_m["users"]
-        diffs = _sv - _sc
-        ci_l  = float(np.percentile(diffs, 2.5))
-        ci_h  = float(np.percentile(diffs, 97.5))
-        fig, ax = plt.subplots(figsize=(10, 4))
-        ax.hist(diffs, bins=60, color="#ff7f0e", edgecolor="#cccccc", alpha=0.85)
-        ax.axvline(ci_l, color="#E73B37", ls="--", lw=1.5, label="95% CI")
-        ax.axvline(ci_h, color="#E73B37", ls="--", lw=1.5)
-        ax.axvline(0,    color="#555555", lw=1.2, ls=":",  label="No effect")
-        ax.set_title(f"Bootstrap CR Difference ({best_m['name']} − Control)")
-        ax.set_xlabel("Difference in Conversion Rate")
-        ax.set_ylabel("Frequency")
-        ax.legend()
-        elems.append(Paragraph("Bootstrap Confidence Interval", s_h2))
-        elems.append(Image(_fig_bytes(fig), width=IMG_W, height=IMG_H))
-
-        # Segment CR chart (if data present)
-        if active_pdf_segs:
-            seg_names  = [s["name"]        for s in active_pdf_segs]
-            ctrl_cr_v  = [s["ctrl_cr"]*100 for s in active_pdf_segs]
-            var_cr_v   = [s["var_cr"]*100  for s in active_pdf_segs]
-            x = np.arange(len(seg_names))
-            w = 0.35
-            fig, ax = plt.subplots(figsize=(max(6, len(seg_names) * 1.8), 4))
-            ax.bar(x - w/2, ctrl_cr_v, w, label="Control", color=GROUP_COLORS[0])
-            var_col = [GROUP_COLORS[1] if v >= c else "#d62728"
-                       for v, c in zip(var_cr_v, ctrl_cr_v)]
-            for xi, (val, col) in enumerate(zip(var_cr_v, var_col)):
-                ax.bar(xi + w/2, val, w, color=col)
-            ax.bar([], [], color=GROUP_COLORS[1], label=best_m["name"])
-            ax.set_xticks(x)
-            ax.set_xticklabels(seg_names)
-            ax.set_title("Segment Breakdown — Conversion Rate")
-            ax.set_ylabel("CR (%)")
-            ax.legend(fontsize=8)
-            elems.append(Spacer(1, 8))
-            elems.append(Paragraph("Segment Breakdown — CR", s_h2))
-            elems.append(Image(_fig_bytes(fig), width=IMG_W, height=IMG_H))
-
-    def _render_text_page(title, text):
-        elems.append(PageBreak())
-        elems.append(Paragraph(title, s_h1))
-        elems.append(HRFlowable(width=USABLE, color=C_RED, thickness=1, spaceAfter=6))
-        for line in text.split("\n"):
-            line = line.strip()
-            if not line:
-                elems.append(Spacer(1, 3))
-            elif line.startswith("### "):
-                elems.append(Paragraph(line[4:], s_h2))
-            elif line.startswith("## "):
-                elems.append(Paragraph(line[3:], _s('sh1x', 11, C_DARK, True, TA_LEFT, 8, 3)))
-            elif line.startswith("# "):
-                elems.append(Paragraph(line[2:], s_h1))
-            elif line.startswith(("- ", "* ")):
-                elems.append(Paragraph("• " + _md(line[2:]), s_body))
-            else:
-                try:
-                    elems.append(Paragraph(_md(line), s_body))
-                except Exception:
-                    elems.append(Paragraph(line, s_body))
-
-    # ── PAGE 4+ (optional): SMART ANALYSIS & AI ANALYSIS TEXT ───
-    if smart_text:
-        _render_text_page("Smart Analysis Report", smart_text)
-    if ai_text:
-        _render_text_page("AI Analysis Report", ai_text)
-
-    # ── FOOTER ────────────────────────────────────────────────────
-    elems.append(Spacer(1, 14))
-    elems.append(HRFlowable(width=USABLE, color=C_MGRAY, thickness=0.5))
-    elems.append(Paragraph(
-        "Generated by Enterprise A/B Test Analyzer. "
-        "Results are directional signals — validate data integrity before making business decisions.",
-        s_small))
-
-    doc.build(elems)
-    buf.seek(0)
-    return buf.getvalue()
-
 
 # -----------------------------------------------
 # PLOTTING
@@ -1281,7 +94,7 @@ def generate_pdf_report(mv, bayes, rev_sig, guardrail_results, duration_checks,
 def plot_multivariant_bar(title, values, labels, unit=""):
     ctrl_val = values[0]
     colors   = [
-        GROUP_COLORS[i] if (i == 0 or v >= ctrl_val) else "#d62728"
+        group_color(i) if (i == 0 or v >= ctrl_val) else "#d62728"
         for i, v in enumerate(values)
     ]
     hover = [f"{unit}{v:.4f}" for v in values]
@@ -1310,6 +123,8 @@ def plot_multivariant_bar(title, values, labels, unit=""):
 def plot_strategic_matrix(metrics_list):
     ctrl = metrics_list[0]
     cx, cy = ctrl["cr_pct"], ctrl["aov"]
+    # Many arms: one point per arm in a single trace; arrows and labels only for the top ones
+    labelled = set(chart_arm_indices([m["cr"] for m in metrics_list]))
 
     fig = go.Figure()
 
@@ -1330,7 +145,7 @@ def plot_strategic_matrix(metrics_list):
 
     # Arrows from control to each variation
     for i, m in enumerate(metrics_list):
-        if i == 0:
+        if i == 0 or i not in labelled:
             continue
         fig.add_annotation(
             x=m["cr_pct"], y=m["aov"],
@@ -1338,16 +153,27 @@ def plot_strategic_matrix(metrics_list):
             xref="x", yref="y", axref="x", ayref="y",
             showarrow=True,
             arrowhead=2, arrowsize=1.2, arrowwidth=1.5,
-            arrowcolor=GROUP_COLORS[i],
+            arrowcolor=group_color(i),
             opacity=0.7,
         )
 
     # Scatter points
-    for i, m in enumerate(metrics_list):
+    rest = [i for i in range(len(metrics_list)) if i not in labelled]
+    if rest:
+        fig.add_trace(go.Scatter(
+            x=[metrics_list[i]["cr_pct"] for i in rest], y=[metrics_list[i]["aov"] for i in rest],
+            mode="markers",
+            marker=dict(color=[group_color(i) for i in rest], size=8, opacity=0.6),
+            text=[metrics_list[i]["name"] for i in rest],
+            name=f"Other variations ({len(rest)})",
+            hovertemplate="<b>%{text}</b><br>CR: %{x:.2f}%<br>AOV: $%{y:.2f}<extra></extra>",
+        ))
+    for i in sorted(labelled):
+        m = metrics_list[i]
         fig.add_trace(go.Scatter(
             x=[m["cr_pct"]], y=[m["aov"]],
             mode="markers+text",
-            marker=dict(color=GROUP_COLORS[i], size=14, line=dict(width=1.5, color="#e0e0e0")),
+            marker=dict(color=group_color(i), size=14, line=dict(width=1.5, color="#e0e0e0")),
             text=[m["name"]], textposition="top center",
             name=m["name"],
             hovertemplate=f"<b>{m['name']}</b><br>CR: {m['cr_pct']:.2f}%<br>AOV: ${m['aov']:.2f}<extra></extra>",
@@ -1377,15 +203,19 @@ def _hex_to_rgba(hex_color, alpha=0.12):
     r, g, b = int(h[0:2], 16), int(h[2:4], 16), int(h[4:6], 16)
     return f"rgba({r},{g},{b},{alpha})"
 
-def plot_bayesian_pdfs(groups):
+def plot_bayesian_pdfs(groups, prob_best=None):
+    # Control + the arms most likely to be best; hundreds of overlapping curves say nothing
+    score = [prob_best.get(g["name"], 0.0) for g in groups] if prob_best else [g["conv"] / max(g["users"], 1) for g in groups]
+    shown = chart_arm_indices(score)
     fig = go.Figure()
-    for i, g in enumerate(groups):
+    for i in shown:
+        g = groups[i]
         a = g["conv"] + 1
         b = max(g["users"] - g["conv"], 0) + 1
         d = beta(a, b)
         x = np.linspace(d.ppf(0.001), d.ppf(0.999), 500)
         y = d.pdf(x)
-        col = GROUP_COLORS[i]
+        col = group_color(i)
         fig.add_trace(go.Scatter(
             x=x, y=y,
             mode="lines",
@@ -1396,7 +226,7 @@ def plot_bayesian_pdfs(groups):
             hovertemplate="CR: %{x:.4f}<br>Density: %{y:.2f}<extra>" + g["name"] + "</extra>",
         ))
     fig.update_layout(
-        title="Bayesian Posterior Distributions",
+        title="Bayesian Posterior Distributions" + top_arms_note(len(shown), len(groups)),
         xaxis_title="Conversion Rate",
         yaxis_title="Probability Density",
         plot_bgcolor="#1a1d24",
@@ -1411,12 +241,74 @@ def plot_bayesian_pdfs(groups):
     )
     st.plotly_chart(fig, use_container_width=True)
 
-def run_bootstrap_and_plot(uc, cc, uv, cv, alpha_val=0.05, label_v="Variation"):
-    rng   = np.random.default_rng()
-    pc    = float(np.clip(safe_divide(cc, uc), 0.0, 1.0))
-    pv    = float(np.clip(safe_divide(cv, uv), 0.0, 1.0))
-    sim_c = rng.binomial(uc, pc, BOOTSTRAP_SAMPLES) / uc
-    sim_v = rng.binomial(uv, pv, BOOTSTRAP_SAMPLES) / uv
+def plot_all_pairs_heatmap(all_pairs, metrics_list):
+    # Cell [row, column] = row arm vs column arm; ★ marks pairs significant after correction
+    shown = chart_arm_indices([m["cr"] for m in metrics_list], HEATMAP_MAX_ARMS)
+    sub   = np.ix_(shown, shown)
+    names = [all_pairs["names"][i] for i in shown]
+    fig = go.Figure(go.Heatmap(
+        z=all_pairs["uplift_cr"][sub],
+        x=names, y=names,
+        customdata=np.dstack([all_pairs["p_adjusted"][sub], all_pairs["p_raw"][sub]]),
+        text=np.where(all_pairs["significant"][sub], "★", ""),
+        texttemplate="%{text}",
+        colorscale=[[0.0, "#d62728"], [0.5, "#1a1d24"], [1.0, "#2ca02c"]],
+        zmid=0,
+        colorbar=dict(title="CR uplift %"),
+        hovertemplate=("%{y} vs %{x}<br>CR uplift: %{z:+.2f}%<br>"
+                       "p (adjusted): %{customdata[0]:.4f}<br>p (raw): %{customdata[1]:.4f}<extra></extra>"),
+    ))
+    fig.update_layout(
+        title="All-Pairs CR Uplift (row vs column)" + top_arms_note(len(shown), len(metrics_list)),
+        plot_bgcolor="#1a1d24",
+        paper_bgcolor="#0e1117",
+        font_color="#e0e0e0",
+        title_font_size=15,
+        xaxis=dict(showgrid=False, tickangle=-45 if len(shown) > 6 else 0),
+        yaxis=dict(showgrid=False, autorange="reversed"),
+        height=max(420, 22 * len(shown) + 160),
+        margin=dict(t=60, b=60, l=60, r=20),
+        hoverlabel=dict(bgcolor="#1a1d24", font_color="#e0e0e0"),
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+def plot_sequential_boundaries(seq, groups):
+    # Boundaries at the looks taken so far, with each variation's z at the current look
+    design = seq["design"]
+    x      = [t * 100 for t in design["fraction"]]
+    ub     = [min(b, 8.0) for b in design["z_bound"]]
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=x, y=ub, mode="lines+markers", name="Efficacy boundary",
+                             line=dict(color="#2ca02c", dash="dash")))
+    fig.add_trace(go.Scatter(x=x, y=[-b for b in ub], mode="lines+markers", name="Harm boundary",
+                             line=dict(color="#d62728", dash="dash")))
+    z     = [r["z_stat"] for r in seq["arms"]]
+    shown = chart_arm_indices([0.0] + [abs(v) for v in z])[1:]
+    for i in shown:
+        r = seq["arms"][i - 1]
+        fig.add_trace(go.Scatter(
+            x=[seq["fraction"] * 100], y=[r["z_stat"]], mode="markers", name=r["name"],
+            marker=dict(color=group_color(i), size=11, line=dict(color="#e0e0e0", width=1)),
+            hovertemplate=f"{r['name']}<br>z = %{{y:.2f}}<extra></extra>",
+        ))
+    fig.update_layout(
+        title="Sequential Boundaries (z vs Control)" + top_arms_note(len(shown) + 1, len(groups)),
+        xaxis_title="Information (%)",
+        yaxis_title="z",
+        plot_bgcolor="#1a1d24",
+        paper_bgcolor="#0e1117",
+        font_color="#e0e0e0",
+        title_font_size=15,
+        xaxis=dict(gridcolor="#2e3140", range=[0, 105]),
+        yaxis=dict(gridcolor="#2e3140"),
+        legend=dict(bgcolor="#1a1d24", bordercolor="#3a3f52"),
+        margin=dict(t=60, b=50, l=60, r=20),
+        hoverlabel=dict(bgcolor="#1a1d24", font_color="#e0e0e0"),
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+def run_bootstrap_and_plot(uc, cc, uv, cv, alpha_val=0.05, label_v="Variation", samples=None):
+    sim_c, sim_v = samples if samples is not None else simulate_cr_bootstrap(uc, cc, uv, cv)
     diffs = sim_v - sim_c
     ci_l  = float(np.percentile(diffs, alpha_val / 2 * 100))
     ci_h  = float(np.percentile(diffs, (1 - alpha_val / 2) * 100))
@@ -1461,11 +353,81 @@ def run_bootstrap_and_plot(uc, cc, uv, cv, alpha_val=0.05, label_v="Variation"):
     st.plotly_chart(fig, use_container_width=True)
     return sim_c * 100, sim_v * 100, ci_l * 100, ci_h * 100
 
+def plot_history_trend(trend, column, title, y_title, scale=1.0, band=None, hline=None, control=False):
+    # One line per arm over the saved days; band = (low, high) columns drawn as a shaded interval
+    df     = pd.DataFrame(trend)
+    last   = df[df["day"] == df["day"].max()].sort_values("arm_index")
+    shown  = chart_arm_indices(last["cr"].tolist())
+    arms   = last["arm_index"].tolist()
+    fig = go.Figure()
+    for i in shown if control else shown[1:]:
+        a   = df[df["arm_index"] == arms[i]]
+        col = group_color(arms[i])
+        if band is not None:
+            fig.add_trace(go.Scatter(
+                x=list(a["day"]) + list(a["day"])[::-1],
+                y=list(a[band[1]] * scale) + list(a[band[0]] * scale)[::-1],
+                fill="toself", fillcolor=col, opacity=0.18, line=dict(width=0),
+                hoverinfo="skip", showlegend=False,
+            ))
+        fig.add_trace(go.Scatter(x=a["day"], y=a[column] * scale, mode="lines+markers", name=a["arm"].iloc[-1],
+                                 line=dict(color=col)))
+    if hline is not None:
+        fig.add_hline(y=hline, line_dash="dot", line_color="#888888")
+    fig.update_layout(
+        title=title + top_arms_note(len(shown), len(arms)),
+        yaxis_title=y_title,
+        plot_bgcolor="#1a1d24",
+        paper_bgcolor="#0e1117",
+        font_color="#e0e0e0",
+        title_font_size=15,
+        xaxis=dict(gridcolor="#2e3140"),
+        yaxis=dict(gridcolor="#2e3140"),
+        legend=dict(bgcolor="#1a1d24", bordercolor="#3a3f52"),
+        margin=dict(t=60, b=50, l=60, r=20),
+        hoverlabel=dict(bgcolor="#1a1d24", font_color="#e0e0e0"),
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+def plot_portfolio_volcano(result):
+    # Every comparison in the portfolio: CR uplift vs -log10(portfolio-adjusted p); green = significant after BH
+    c   = result["comparisons"]
+    sig = np.asarray(c["significant_portfolio"], dtype=bool)
+    y   = -np.log10(np.maximum(np.asarray(c["p_portfolio"], dtype=float), 1e-300))
+    fig = go.Figure()
+    for mask, name, color in [(~sig, "Not significant", "#888888"), (sig, "Significant", "#2ca02c")]:
+        fig.add_trace(go.Scattergl(
+            x=np.asarray(c["uplift_cr"])[mask], y=y[mask], mode="markers", name=name,
+            marker=dict(color=color, size=7, opacity=0.75),
+            customdata=np.column_stack([np.asarray(c["experiment"], dtype=object)[mask],
+                                        np.asarray(c["arm"], dtype=object)[mask],
+                                        np.asarray(c["p_portfolio"])[mask]]),
+            hovertemplate=("<b>%{customdata[0]}</b> — %{customdata[1]}<br>CR uplift: %{x:+.2f}%<br>"
+                           "p (portfolio): %{customdata[2]:.4f}<extra></extra>"),
+        ))
+    fig.add_hline(y=-np.log10(result["alpha"]), line_dash="dot", line_color="#888888")
+    fig.add_vline(x=0, line_dash="dot", line_color="#888888")
+    fig.update_layout(
+        title=f"Portfolio: {result['n_comparisons']:,} Comparisons",
+        xaxis_title="CR uplift vs own Control (%)",
+        yaxis_title="-log10 p (portfolio BH)",
+        plot_bgcolor="#1a1d24",
+        paper_bgcolor="#0e1117",
+        font_color="#e0e0e0",
+        title_font_size=15,
+        xaxis=dict(gridcolor="#2e3140"),
+        yaxis=dict(gridcolor="#2e3140"),
+        legend=dict(bgcolor="#1a1d24", bordercolor="#3a3f52"),
+        margin=dict(t=60, b=50, l=60, r=20),
+        hoverlabel=dict(bgcolor="#1a1d24", font_color="#e0e0e0"),
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
 def plot_box_plots(samples_c, samples_v, label_v="Best Variation"):
     fig = go.Figure()
     for label, samples, color in [
-        ("Control", samples_c, GROUP_COLORS[0]),
-        (label_v,   samples_v, GROUP_COLORS[1]),
+        ("Control", samples_c, group_color(0)),
+        (label_v,   samples_v, group_color(1)),
     ]:
         fig.add_trace(go.Box(
             y=samples,
@@ -1496,19 +458,48 @@ def plot_box_plots(samples_c, samples_v, label_v="Best Variation"):
     )
     st.plotly_chart(fig, use_container_width=True)
 
-def plot_power_curve(base_cr, mdes, alpha, max_n):
-    sample_sizes = np.linspace(100, max_n, 120)
+def plot_order_value_boxes(summaries):
+    """Box plots of converters' order values from precomputed (name, order_value_summary) pairs."""
+    fig = go.Figure()
+    for i, (label, s) in enumerate(summaries):
+        color = group_color(i)
+        fig.add_trace(go.Box(
+            x=[label], q1=[s["q1"]], median=[s["median"]], q3=[s["q3"]],
+            lowerfence=[s["lower"]], upperfence=[s["upper"]], mean=[s["mean"]],
+            name=label,
+            marker_color=color,
+            line_color=color,
+            fillcolor=_hex_to_rgba(color, 0.25),
+            hovertemplate=(
+                f"<b>{label}</b> ({s['n']:,} converters)<br>"
+                f"Median: ${s['median']:.2f}<br>"
+                f"Q1: ${s['q1']:.2f}<br>"
+                f"Q3: ${s['q3']:.2f}<br>"
+                f"Mean: ${s['mean']:.2f}<extra></extra>"
+            ),
+        ))
+    fig.update_layout(
+        title="Box Plot: Revenue per Converter",
+        yaxis_title="Revenue per converter ($)",
+        plot_bgcolor="#1a1d24",
+        paper_bgcolor="#0e1117",
+        font_color="#e0e0e0",
+        title_font_size=15,
+        yaxis=dict(gridcolor="#2e3140", type="log"),
+        xaxis=dict(showgrid=False),
+        showlegend=False,
+        margin=dict(t=60, b=40, l=60, r=20),
+        hoverlabel=dict(bgcolor="#1a1d24", font_color="#e0e0e0"),
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+def plot_power_curve(base_cr, mdes, alpha, max_n, n_points=120, variance_reduction=0.0):
+    sample_sizes = np.linspace(100, max_n, n_points)
+    power        = power_grid(base_cr, mdes, sample_sizes, alpha, variance_reduction)   # (n_mdes, n_points)
     fig = go.Figure()
 
-    for i, mde in enumerate(mdes):
-        p1 = base_cr / 100.0
-        p2 = p1 * (1 + mde / 100.0)
-        es = proportion_effectsize(p1, p2)
-        powers = [
-            NormalIndPower().solve_power(effect_size=es, nobs1=n, alpha=alpha, ratio=1)
-            for n in sample_sizes
-        ]
-        color = GROUP_COLORS[i % len(GROUP_COLORS)]
+    for i, (mde, powers) in enumerate(zip(mdes, power)):
+        color = group_color(i)
         fig.add_trace(go.Scatter(
             x=sample_sizes, y=powers,
             mode="lines", name=f"MDE: {mde}%",
@@ -1552,13 +543,13 @@ def plot_segment_bars(title, segments, metric_key, label_v="Variation", unit="")
         fmt = ".4f"
         suffix = ""
 
-    var_colors = [GROUP_COLORS[1] if v >= c else "#d62728" for v, c in zip(var_vals, ctrl_vals)]
+    var_colors = [group_color(1) if v >= c else "#d62728" for v, c in zip(var_vals, ctrl_vals)]
 
     fig = go.Figure()
     fig.add_trace(go.Bar(
         name="Control",
         x=names, y=ctrl_vals,
-        marker_color=GROUP_COLORS[0],
+        marker_color=group_color(0),
         hovertemplate=f"Control<br>%{{x}}: %{{y:{fmt}}}{suffix}<extra></extra>",
     ))
     fig.add_trace(go.Bar(
@@ -1602,22 +593,26 @@ with st.sidebar.expander("Sample Size Calculator", expanded=False):
     volatility    = st.selectbox("Revenue Variance",
         ["Low (Subscription)", "Medium (Standard E-com)", "High (Whales/B2B)"],
         index=1, key="p_vol")
+    plan_var_red  = st.number_input(
+        "Expected Variance Reduction (%)", min_value=0.0, max_value=95.0, step=5.0, key="p_var_red",
+        help="Share of metric variance CUPED removes with a pre-experiment covariate (its squared correlation "
+             "with the metric). Take it from the CUPED tab of an earlier test on the same traffic; 0 = no CUPED.")
     sd_mult = {"Low": 1.0, "Medium": 2.0, "High": 3.0}[volatility.split()[0]]
     _conf_for_plan = st.session_state.get("conf_level", "95%")
-    _alpha_for_plan = {"90%": 0.10, "95%": 0.05, "99%": 0.01}[_conf_for_plan]
+    _alpha_for_plan = CONF_ALPHA[_conf_for_plan]
     if st.button("Calculate Duration"):
-        if plan_base_cr <= 0 or plan_base_aov <= 0 or plan_traffic <= 0:
-            st.error("Traffic, Baseline CR, and AOV must all be > 0.")
+        if plan_base_cr <= 0 or plan_base_aov <= 0 or plan_traffic <= 0 or plan_mde == 0:
+            st.error("Traffic, Baseline CR, AOV, and MDE must all be > 0.")
         else:
             daily   = plan_traffic / 28
             p1      = plan_base_cr / 100
             p2      = p1 * (1 + plan_mde / 100)
-            es_cr   = proportion_effectsize(p1, p2)
-            n_cr    = NormalIndPower().solve_power(effect_size=es_cr, alpha=_alpha_for_plan, power=0.8, ratio=1)
+            vr      = plan_var_red / 100
+            n_cr    = float(required_sample_size(cohens_h(p1, p2), _alpha_for_plan, power=0.8, variance_reduction=vr))
             est_sd  = plan_base_aov * sd_mult
             es_rpv  = safe_divide(plan_base_aov * plan_mde / 100, est_sd)
             if es_rpv > 0:
-                n_rpv     = TTestIndPower().solve_power(effect_size=es_rpv, alpha=_alpha_for_plan, power=0.8, ratio=1)
+                n_rpv     = float(required_sample_size(es_rpv, _alpha_for_plan, power=0.8, variance_reduction=vr))
                 n_rpv_vis = safe_divide(n_rpv, p1)
                 days_rpv  = safe_divide(n_rpv_vis * 2, daily)
             else:
@@ -1628,6 +623,10 @@ with st.sidebar.expander("Sample Size Calculator", expanded=False):
             st.info(f"**CR:** {int(days_cr)} days ({int(n_cr):,} users/group)")
             (st.error if days_rpv > 60 else st.warning)(
                 f"**RPV:** {int(days_rpv)} days ({int(n_rpv_vis):,} users/group)")
+            if vr > 0:
+                st.caption(f"With CUPED removing {plan_var_red:g}% of the variance — "
+                           f"{safe_divide(1, 1 - vr):.2f}× the effective traffic. Without it: "
+                           f"CR {int(days_cr / (1 - vr))} days, RPV {int(days_rpv / (1 - vr))} days.")
 
 st.sidebar.markdown("---")
 
@@ -1650,7 +649,7 @@ confidence_level = st.sidebar.selectbox(
     "Confidence Level", ["95%", "90%", "99%"], index=0, key="conf_level",
     help="90% — Fast decisions  |  95% — Standard  |  99% — High-stakes",
 )
-alpha = {"90%": 0.10, "95%": 0.05, "99%": 0.01}[confidence_level]
+alpha = CONF_ALPHA[confidence_level]
 
 st.sidebar.selectbox(
     "Primary Goal",
@@ -1696,7 +695,14 @@ with st.sidebar.expander("Segment Breakdown", expanded=False):
         if _si < int(num_segments) - 1:
             st.markdown("---")
 
-if int(st.session_state.get("num_variations", 1)) > 1:
+def _variation_count():
+    # Rows in the variations table including this rerun's pending edits —
+    # the editor itself renders further down the sidebar
+    edits = st.session_state.get(VARIATIONS_EDITOR) or {}
+    return (len(st.session_state["variations"]["users"])
+            + len(edits.get("added_rows", [])) - len(edits.get("deleted_rows", [])))
+
+if _variation_count() > 1:
     st.sidebar.selectbox(
         "Multiple Comparison Correction",
         options=["holm", "bonferroni", "fdr_bh"],
@@ -1712,7 +718,14 @@ if int(st.session_state.get("num_variations", 1)) > 1:
             "FDR (B-H): Controls false discovery rate — best for exploratory multi-variant tests."
         ),
     )
+    st.sidebar.checkbox(
+        "All-pairs comparisons",
+        key="all_pairs",
+        help=("Also compare every arm against every other arm, not only against Control. "
+              "The correction above is applied across all pairs. Results in the All Pairs tab."),
+    )
 mc_method = st.session_state.get("mc_method", "holm")
+all_pairs_on = bool(st.session_state.get("all_pairs", False))
 
 st.sidebar.markdown("---")
 
@@ -1723,29 +736,71 @@ st.sidebar.markdown(
     unsafe_allow_html=True,
 )
 
-num_variations = st.sidebar.number_input(
-    "Number of Variation Groups", min_value=1, max_value=MAX_VARIATIONS, key="num_variations",
-    help="1 = classic A/B. Add up to 3 variations for A/B/n testing.",
-)
-
 st.sidebar.subheader("Control Group")
 users_c = st.sidebar.number_input("Users",         min_value=1,   key="users_c")
 conv_c  = st.sidebar.number_input("Conversions",   min_value=0,   key="conv_c")
 rev_c   = st.sidebar.number_input("Revenue ($)",   min_value=0.0, key="rev_c")
 prod_c  = st.sidebar.number_input("Products Sold", min_value=0,   key="prod_c")
+rev_sq_c = st.sidebar.number_input("Revenue² Sum (optional)", min_value=0.0, format="%.2f", key="rev_sq_c",
+                                   help="Σ of each user's revenue squared. Enables exact analytic (delta-method) "
+                                        "revenue intervals; 0 = estimate it from the aggregates.")
 
-VAR_LABELS = ["Variation A", "Variation B", "Variation C"]
-var_inputs = []
-for i in range(int(num_variations)):
-    st.sidebar.markdown("---")
-    st.sidebar.subheader(VAR_LABELS[i])
-    var_inputs.append({
-        "name":  VAR_LABELS[i],
-        "users": st.sidebar.number_input("Users",         min_value=1,   key=f"users_v{i}"),
-        "conv":  st.sidebar.number_input("Conversions",   min_value=0,   key=f"conv_v{i}"),
-        "rev":   st.sidebar.number_input("Revenue ($)",   min_value=0.0, key=f"rev_v{i}"),
-        "prod":  st.sidebar.number_input("Products Sold", min_value=0,   key=f"prod_v{i}"),
-    })
+st.sidebar.markdown("---")
+st.sidebar.subheader("Variations")
+st.sidebar.caption("One row per variation — add rows for A/B/n tests with any number of arms.")
+_var_table = st.sidebar.data_editor(
+    pd.DataFrame(st.session_state["variations"], columns=["name", *VARIATION_FIELDS, "rev_sq"]),
+    key=VARIATIONS_EDITOR,
+    num_rows="dynamic",
+    hide_index=True,
+    use_container_width=True,
+    column_config={
+        "name":  st.column_config.TextColumn("Name", help="Blank names become Variation A, B, …"),
+        "users": st.column_config.NumberColumn("Users", min_value=1, step=1, default=5000),
+        "conv":  st.column_config.NumberColumn("Conv.", min_value=0, step=1, default=0),
+        "rev":   st.column_config.NumberColumn("Revenue ($)", min_value=0.0, format="%.2f", default=0.0),
+        "prod":  st.column_config.NumberColumn("Products", min_value=0, step=1, default=0),
+        "rev_sq": st.column_config.NumberColumn("Revenue² Sum", min_value=0.0, format="%.2f", default=0.0,
+                                                help="Optional Σ revenue² per user, as for Control."),
+    },
+)
+_var_table = _var_table.dropna(subset=["users"])
+if _var_table.empty:
+    st.sidebar.error("Add at least one variation.")
+    st.stop()
+variations = variations_from_state({"variations": {
+    "name":  _var_table["name"].where(_var_table["name"].notna(), None).tolist(),
+    "users": _var_table["users"].astype(int).tolist(),
+    "conv":  _var_table["conv"].fillna(0).astype(int).tolist(),
+    "rev":   _var_table["rev"].fillna(0.0).astype(float).tolist(),
+    "prod":  _var_table["prod"].fillna(0).astype(int).tolist(),
+    "rev_sq": _var_table["rev_sq"].fillna(0.0).astype(float).tolist(),
+}})
+num_variations = len(variations["name"])
+var_inputs = [dict(zip(["name", *VARIATION_FIELDS], row))
+              for row in zip(variations["name"], *(variations[f] for f in VARIATION_FIELDS))]
+
+with st.sidebar.expander("Pre-Experiment Covariate (CUPED)", expanded=False):
+    st.caption("Optional. For one pre-experiment metric x per user (e.g. revenue in the 4 weeks before the test), "
+               "the sums over each arm's users: Σx, Σx², Σx over converters, and Σx·revenue. "
+               "Results in the CUPED tab.")
+    _cuped_arms = ["Control"] + variations["name"]
+    _cuped_raw  = st.session_state.get("cuped") or {}
+    _cuped_table = st.data_editor(
+        pd.DataFrame({f: (list(_cuped_raw.get(f) or []) + [0.0] * len(_cuped_arms))[:len(_cuped_arms)]
+                      for f in CUPED_FIELDS}, index=pd.Index(_cuped_arms, name="Arm")),
+        key=f"{CUPED_EDITOR}_{len(_cuped_arms)}",
+        num_rows="fixed",
+        use_container_width=True,
+        column_config={
+            "pre_sum":        st.column_config.NumberColumn("Σx", min_value=0.0, format="%.2f"),
+            "pre_sum_sq":     st.column_config.NumberColumn("Σx²", min_value=0.0, format="%.2f"),
+            "pre_cross_conv": st.column_config.NumberColumn("Σx (conv.)", min_value=0.0, format="%.2f"),
+            "pre_cross_rev":  st.column_config.NumberColumn("Σx·rev", min_value=0.0, format="%.2f"),
+        },
+    )
+_cuped_cols = {f: _cuped_table[f].fillna(0.0).astype(float).tolist() for f in CUPED_FIELDS}
+st.session_state["cuped"] = _cuped_cols if any(_cuped_cols["pre_sum_sq"]) else None
 
 st.sidebar.markdown("---")
 
@@ -1755,17 +810,39 @@ st.sidebar.markdown(
     '<h2 style="display:inline;font-size:1.5rem;margin-left:5px;">Save & Load Analysis</h2></div>',
     unsafe_allow_html=True,
 )
-st.sidebar.info("Snapshot your experiment. Download Day 7, re-upload Day 14 to track evolution.")
+st.sidebar.info("Snapshot your experiment. Save each day to the history to track evolution in the History tab, "
+                "or download the inputs and load them later.")
+st.sidebar.text_input("Experiment ID", key="experiment_id",
+                      help="Key of this experiment in the snapshot history, e.g. checkout_redesign.")
+_experiment_id = (st.session_state.get("experiment_id") or "").strip()
 snapshot = {k: st.session_state.get(k) for k in SAVE_KEYS}
+snapshot.update(num_variations=num_variations, variations=variations)
+for _k in ("revenue_values", "revenue_sketch"):
+    if st.session_state.get(_k):
+        snapshot[_k] = st.session_state[_k]
 st.sidebar.download_button("Download Inputs (.json)", json.dumps(snapshot, indent=2),
                    "experiment_snapshot.json", "application/json")
+_history_day = (st.session_state["start_date"] + datetime.timedelta(days=int(st.session_state["days"]) - 1)
+                if st.session_state.get("start_date") else datetime.date.today())
+_history_save = st.sidebar.button(
+    f"Save to History ({_history_day:%Y-%m-%d})", disabled=not _experiment_id,
+    help="Appends this snapshot to the history under the Experiment ID. The date is the last day of data "
+         "(start date + days ran − 1), or today without a start date.")
 _pdf_requested = st.sidebar.button("Prepare PDF Report", key="_pdf_btn",
                                     help="Builds a full PDF report with tables, charts, and analysis.")
 uploaded = st.sidebar.file_uploader("Load Snapshot", type=["json"])
+
+def _stage_snapshot(loaded):
+    st.session_state["_pending_load"] = {k: loaded[k] for k in SAVE_KEYS if k in loaded}
+    # Older snapshots hold variations in flat users_v0 … prod_v2 keys
+    st.session_state["_pending_load"]["variations"] = variations_from_state(loaded)
+    # Observed per-user revenue and its sketch (from ab_ingest.py) — not widgets, carried as-is
+    st.session_state["_pending_load"]["revenue_values"] = loaded.get("revenue_values")
+    st.session_state["_pending_load"]["revenue_sketch"] = loaded.get("revenue_sketch")
+
 if uploaded is not None:
     try:
-        loaded = json.load(uploaded)
-        st.session_state["_pending_load"] = {k: loaded[k] for k in SAVE_KEYS if k in loaded}
+        _stage_snapshot(json.load(uploaded))
         st.rerun()
     except (json.JSONDecodeError, KeyError, TypeError) as e:
         st.sidebar.error(f"Could not load file: {e}")
@@ -1781,66 +858,104 @@ for _g in groups:
     if _g["conv"] > _g["users"]:
         st.sidebar.error(f"⚠ {_g['name']}: Conversions ({_g['conv']:,}) exceed Users ({_g['users']:,}). Conversions will be clamped.")
 
-mv      = run_multivariate_analysis(groups, alpha, mc_method, primary_goal)
-bayes   = calculate_bayesian_multivariate(groups)
-srm_stat, p_srm = perform_srm_test([g["users"] for g in groups])
+@st.cache_resource
+def _get_analysis_cache():
+    # One cache per server process — survives reruns and is shared across sessions.
+    return AnalysisCache()
+
+_cache  = _get_analysis_cache()
+mv      = _cache.get_or_compute("mv", run_multivariate_analysis, groups, alpha, mc_method, primary_goal)
+bayes   = _cache.get_or_compute("bayes", calculate_bayesian_multivariate, groups)
+all_pairs = (_cache.get_or_compute("all_pairs", run_all_pairs_analysis, groups, alpha, mc_method)
+             if all_pairs_on and len(groups) > 2 else None)
+srm_stat, p_srm = _cache.get_or_compute("srm", perform_srm_test, [g["users"] for g in groups])
 
 ctrl_m  = mv["metrics"][0]
 # Prefer the declared winner for bootstrap/revenue analysis;
 # fall back to highest-CR variation so the tab always has something to show.
-if mv["winner"]:
-    best_m = next(m for m in mv["metrics"] if m["name"] == mv["winner"])
-elif len(mv["metrics"]) > 1:
-    best_m = max(mv["metrics"][1:], key=lambda m: m["cr"])
-else:
-    best_m = ctrl_m
+best_m  = select_best_variation(mv)
 best_g  = next(g for g in groups if g["name"] == best_m["name"])
 
-rev_sig = test_revenue_significance(
-    users_c, conv_c, rev_c,
-    best_g["users"], best_g["conv"], best_g["rev"],
-    alpha=alpha,
+# Observed revenue is used only while it still matches the typed aggregates
+_revenue_values = revenue_values_from_state(st.session_state, groups)
+rev_sig = _cache.get_or_compute(
+    "rev_sig", compare_revenue, groups[0], best_g, alpha,
+    {k: v for k, v in _revenue_values.items() if k in (groups[0]["name"], best_g["name"])},
+)
+rev_qte = _cache.get_or_compute(
+    "rev_qte", compare_quantiles, groups[0], best_g, alpha,
+    {k: v for k, v in _revenue_values.items() if k in (groups[0]["name"], best_g["name"])},
 )
+_rev_sq   = rev_sq_from_state({"rev_sq_c": rev_sq_c, "variations": variations}, groups)
+rev_delta = _cache.get_or_compute("rev_delta", compare_revenue_delta, groups, alpha, _revenue_values, _rev_sq)
 
-_guardrail_inputs = [
-    {
-        "name":      st.session_state[f"g{i}_name"],
-        "ctrl_val":  float(st.session_state[f"g{i}_ctrl"]),
-        "var_val":   float(st.session_state[f"g{i}_var"]),
-        "threshold": float(st.session_state[f"g{i}_threshold"]),
-        "direction": st.session_state[f"g{i}_dir"],
-    }
-    for i in range(int(st.session_state.get("num_guardrails", 1)))
-]
+_cuped_covariates = cuped_from_state(st.session_state, len(groups))
+cuped = (_cache.get_or_compute("cuped", run_cuped_analysis, groups, _cuped_covariates, alpha, mc_method,
+                               _revenue_values, _rev_sq)
+         if _cuped_covariates is not None else None)
+
+_guardrail_inputs = guardrail_inputs_from_state(st.session_state)
 guardrail_results = evaluate_guardrails(_guardrail_inputs)
 
-_segment_inputs = [
-    {
-        "name": st.session_state[f"seg{i}_name"],
-        "uc":   int(st.session_state[f"seg{i}_uc"]),
-        "cc":   int(st.session_state[f"seg{i}_cc"]),
-        "rc":   float(st.session_state[f"seg{i}_rc"]),
-        "uv":   int(st.session_state[f"seg{i}_uv"]),
-        "cv":   int(st.session_state[f"seg{i}_cv"]),
-        "rv":   float(st.session_state[f"seg{i}_rv"]),
-    }
-    for i in range(int(st.session_state.get("num_segments", 1)))
-]
-segment_results = analyze_segments(_segment_inputs, alpha)
+_segment_inputs = segment_inputs_from_state(st.session_state)
+segment_results = _cache.get_or_compute("segments", analyze_segments, _segment_inputs, alpha)
 
 duration_checks   = analyze_test_duration(days_run, st.session_state.get("start_date"))
 
+# ---- Snapshot history (append-only SQLite store, see ab_store.py) ----
+@st.cache_resource
+def _get_history_store():
+    return SnapshotStore(HISTORY_DB)
+
+_history = _get_history_store()
+if _history_save:
+    _history.append(_experiment_id, _history_day, snapshot, {"alpha": alpha, "mv": mv, "bayes": bayes, "p_srm": p_srm})
+    st.sidebar.success(f"Saved {_experiment_id} @ {_history_day:%Y-%m-%d} to history.")
+
 # ---- PDF generation (triggered by sidebar button, runs after all data is ready) ----
+@st.cache_resource
+def _get_report_executor():
+    # Reports are built off the script thread; charts fan out to a process pool inside.
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf-report")
+
 if _pdf_requested:
-    st.session_state["_pdf_bytes"] = generate_pdf_report(
+    _pdf_job = {"done": 0, "total": 1}
+    _pdf_job["future"] = _get_report_executor().submit(
+        generate_pdf_report,
         mv, bayes, rev_sig, guardrail_results, duration_checks,
         p_srm, groups, days_run, confidence_level, primary_goal,
         ctrl_m, best_m,
+        start_date=st.session_state.get("start_date"),
         hypothesis=st.session_state.get("hyp_smart", ""),
         smart_text=st.session_state.get("_smart_report_text", ""),
         ai_text=st.session_state.get("_ai_report_text", ""),
         segment_results=segment_results,
+        progress=lambda done, total: _pdf_job.update(done=done, total=total),
     )
+    st.session_state["_pdf_job"] = _pdf_job
+    st.session_state.pop("_pdf_bytes", None)
+
+@st.fragment(run_every=0.5)
+def _pdf_progress():
+    job = st.session_state.get("_pdf_job")
+    if job is None:
+        return
+    if not job["future"].done():
+        st.progress(job["done"] / max(job["total"], 1),
+                    text=f"Building PDF report… {job['done']}/{job['total']}")
+        return
+    del st.session_state["_pdf_job"]
+    try:
+        st.session_state["_pdf_bytes"] = job["future"].result()
+    except Exception as e:
+        st.session_state["_pdf_error"] = f"PDF report failed: {e}"
+    st.rerun(scope="app")
+
+if "_pdf_job" in st.session_state:
+    with st.sidebar:
+        _pdf_progress()
+if st.session_state.get("_pdf_error"):
+    st.sidebar.error(st.session_state.pop("_pdf_error"))
 if st.session_state.get("_pdf_bytes"):
     st.sidebar.download_button(
         "Download PDF Report",
@@ -1852,11 +967,17 @@ if st.session_state.get("_pdf_bytes"):
 
 # ---- Pre-compute bootstrap samples at top level so both Tab 9 & Tab 10
 #      can share the same data without cross-tab session-state coupling. ----
-_boot_rng   = np.random.default_rng()
-_boot_pc    = float(np.clip(safe_divide(ctrl_m["conv"], ctrl_m["users"]), 0.0, 1.0))
-_boot_pv    = float(np.clip(safe_divide(best_m["conv"], best_m["users"]), 0.0, 1.0))
-_boot_sc    = _boot_rng.binomial(ctrl_m["users"], _boot_pc, BOOTSTRAP_SAMPLES) / ctrl_m["users"] * 100
-_boot_sv    = _boot_rng.binomial(best_m["users"], _boot_pv, BOOTSTRAP_SAMPLES) / best_m["users"] * 100
+_boot_samples = _cache.get_or_compute(
+    "cr_bootstrap", simulate_cr_bootstrap,
+    ctrl_m["users"], ctrl_m["conv"], best_m["users"], best_m["conv"],
+)
+_boot_sc    = _boot_samples[0] * 100
+_boot_sv    = _boot_samples[1] * 100
+_cache_stats = _cache.stats()
+st.sidebar.caption(
+    f"Analysis cache: {_cache_stats['hits']} hits · {_cache_stats['misses']} misses · "
+    f"{_cache_stats['size']}/{_cache_stats['maxsize']} entries"
+)
 
 
 # ============================================================
@@ -1942,8 +1063,7 @@ st.write(f"**Financial Impact ({best_m['name']}):** ${abs(rpv_delta):.2f} {direc
 with st.expander(f"Revenue Significance — Control vs {best_m['name']}", expanded=False):
     st.caption(
         "Revenue is skewed by large orders — z-tests are unreliable. "
-        "Uses Mann-Whitney U and log-transformed bootstrap. "
-        "Distributions are reconstructed from aggregates — treat as directional signals."
+        "Uses Mann-Whitney U and log-transformed bootstrap. " + revenue_source_note(rev_sig.get("source"))
     )
     st.markdown("---")
     rc1, rc2 = st.columns(2)
@@ -1975,6 +1095,56 @@ with st.expander(f"Revenue Significance — Control vs {best_m['name']}", expand
             if cl > 0:   st.success("CI entirely positive — gain is consistent.")
             elif ch < 0: st.error("CI entirely negative — loss is consistent.")
             else:        st.warning("CI crosses zero — result is uncertain.")
+            dm = rev_delta[key][rev_delta["names"].index(best_m["name"]) - 1] if best_m["name"] != "Control" else None
+            if dm is not None:
+                st.markdown(f"**Delta method (analytic):** p = {dm['p']:.4f}, "
+                            f"{int((1-alpha)*100)}% CI ${dm['ci_low']:.3f} to ${dm['ci_high']:.3f}")
+    if rev_qte is not None:
+        st.markdown("---")
+        st.markdown("#### Revenue per converter by quantile")
+        st.dataframe(pd.DataFrame({
+            "Quantile":         [f"P{round(q * 100)}" for q in rev_qte["quantile"]],
+            "Control":          rev_qte["control"],
+            best_m["name"]:     rev_qte["variation"],
+            "Δ":                rev_qte["diff"],
+            "Uplift (%)":       rev_qte["uplift"],
+            "CI low":           rev_qte["ci_low"],
+            "CI high":          rev_qte["ci_high"],
+            "p-value":          rev_qte["p"],
+        }), use_container_width=True, hide_index=True,
+            column_config={**{c: st.column_config.NumberColumn(format="$%.2f") for c in ("Control", best_m["name"])},
+                           **{c: st.column_config.NumberColumn(format="$%+.2f") for c in ("Δ", "CI low", "CI high")},
+                           "Uplift (%)": st.column_config.NumberColumn(format="%+.2f"),
+                           "p-value":    st.column_config.NumberColumn(format="%.4f")})
+        st.caption("Quantile treatment effects: the difference in each quantile of revenue per converter, with "
+                   f"{int((1-alpha)*100)}% bootstrap CIs, from a log-bucket sketch of the order values "
+                   "(each value within 1%, so differences move in steps of about 2%).")
+    if len(rev_delta["names"]) > 2:
+        st.markdown("---")
+        st.markdown("#### Delta method — every variation")
+        st.dataframe(pd.DataFrame([{
+            "Variation":     name,
+            "RPV Δ":         r["diff"],
+            "RPV CI low":    r["ci_low"],
+            "RPV CI high":   r["ci_high"],
+            "RPV p":         r["p"],
+            "AOV Δ":         a["diff"],
+            "AOV CI low":    a["ci_low"],
+            "AOV CI high":   a["ci_high"],
+            "AOV p":         a["p"],
+        } for name, r, a in zip(rev_delta["names"][1:], rev_delta["rpv"], rev_delta["aov"])]),
+            use_container_width=True, hide_index=True,
+            column_config={**{c: st.column_config.NumberColumn(format="$%+.3f")
+                              for c in ("RPV Δ", "RPV CI low", "RPV CI high", "AOV Δ", "AOV CI low", "AOV CI high")},
+                           "RPV p": st.column_config.NumberColumn(format="%.4f"),
+                           "AOV p": st.column_config.NumberColumn(format="%.4f")})
+    st.caption(
+        "Delta method: normal intervals on the mean difference from per-arm sums and sums of squares, no "
+        "resampling. " + ("Σ revenue² is entered or observed for every arm."
+                          if rev_delta["source"] == "sums" else
+                          "Σ revenue² is estimated from the reconstruction for arms without one — enter "
+                          "Revenue² Sum in the sidebar for exact intervals.")
+    )
 
 # --- Health Checks ---
 st.subheader("4. Health Checks")
@@ -2099,11 +1269,11 @@ st.markdown("---")
 # ============================================================
 render_header(ICON_BRAIN, "Deep Dive Analysis")
 
-tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8, tab9, tab10, tab11, tab12 = st.tabs([
+tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8, tab9, tab10, tab11, tab12, tab13, tab14, tab15, tab16 = st.tabs([
     "Smart Analysis", "AI Analysis", "Stopping & Sequential",
     "Strategic Matrix", "Product Metrics", "Revenue Charts",
     "CR Comparison", "Bayesian", "Bootstrap", "Box Plot", "Power Curves",
-    "Segment Breakdown"
+    "Segment Breakdown", "All Pairs", "History", "Portfolio", "CUPED"
 ])
 
 # ---- TAB 1: SMART ANALYSIS ----
@@ -2167,28 +1337,177 @@ with tab2:
 # ---- TAB 3: STOPPING & SEQUENTIAL ----
 with tab3:
     st.markdown("### Bayesian Stopping Rules")
-    prob_cols = st.columns(len(groups))
-    for i, g in enumerate(groups):
-        prob  = bayes["prob_best"].get(g["name"], 0)
-        loss  = bayes["expected_loss"].get(g["name"], 0)
-        prob_cols[i].metric(f"{g['name']} — P(Best)", f"{prob*100:.1f}%")
-        prob_cols[i].caption(f"Expected loss: {loss*100:.5f}%")
+    if len(groups) <= MAX_METRIC_COLUMNS:
+        prob_cols = st.columns(len(groups))
+        for i, g in enumerate(groups):
+            prob  = bayes["prob_best"].get(g["name"], 0)
+            loss  = bayes["expected_loss"].get(g["name"], 0)
+            prob_cols[i].metric(f"{g['name']} — P(Best)", f"{prob*100:.1f}%")
+            prob_cols[i].caption(f"Expected loss: {loss*100:.5f}%")
+    else:
+        st.dataframe(pd.DataFrame({
+            "Group":         [g["name"] for g in groups],
+            "P(Best)":       [bayes["prob_best"].get(g["name"], 0) * 100 for g in groups],
+            "Expected Loss": [bayes["expected_loss"].get(g["name"], 0) * 100 for g in groups],
+        }).sort_values("P(Best)", ascending=False), use_container_width=True, hide_index=True,
+            column_config={"P(Best)":       st.column_config.NumberColumn(format="%.1f%%"),
+                           "Expected Loss": st.column_config.NumberColumn(format="%.5f%%")})
 
     st.markdown("---")
-    st.subheader("Sequential Testing / Peeking Penalty")
-    st.caption(
-        "Repeated checks inflate the false positive rate. "
-        "This log-based approximation adjusts your alpha threshold. "
-        "For production use, consider O'Brien-Fleming or Pocock alpha-spending."
-    )
-    peeks = st.number_input("How many times have you checked results?", min_value=1, value=1)
-    adj_alpha = alpha * np.log(1 + (np.e - 1) / peeks)
-    st.write(f"Standard: **{alpha}** → Adjusted: **{adj_alpha:.5f}**")
-    for pw in mv["pairwise"]:
-        if pw["p_raw"] < adj_alpha:
-            st.success(f"✅ {pw['name']}: Significant after penalty (p={pw['p_raw']:.4f})")
+    st.radio("Monitoring", list(SEQ_MODES), format_func=SEQ_MODES.get, key="seq_mode", horizontal=True,
+             help=("Group-sequential: a fixed number of planned looks, each with its own boundary.\n"
+                   "Always-valid: look as often as you like — daily or continuously."))
+    if st.session_state["seq_mode"] == "group_sequential":
+        st.subheader("Group-Sequential Monitoring")
+        st.caption(
+            "Lan-DeMets alpha spending: every look at the data spends part of alpha, so a test can stop early "
+            "without inflating the false positive rate. Record a look each time you check the results — "
+            "the look history is saved with the snapshot."
+        )
+        sq1, sq2, sq3 = st.columns(3)
+        sq1.selectbox("Spending function", list(SEQ_SPENDING), format_func=SEQ_SPENDING.get, key="seq_spending",
+                      help=("O'Brien-Fleming: very strict at early looks, close to the fixed-sample test at the end.\n"
+                            "Pocock: about the same threshold at every look."))
+        sq2.number_input("Planned looks", min_value=1, max_value=50, step=1, key="seq_looks")
+        sq3.number_input("Max users per arm", min_value=0, step=1000, key="seq_max_users",
+                         help="Planned users per arm at the final look — e.g. from the Sample Size Calculator.")
+        _seq_history = list(st.session_state.get("seq_history") or [])
+        _seq_now     = float(np.mean([g["users"] for g in groups]))
+        seq = _cache.get_or_compute("sequential", evaluate_sequential, groups, _seq_history,
+                                    st.session_state["seq_max_users"], alpha, st.session_state["seq_spending"])
+
+        sb1, sb2, _ = st.columns([1, 1, 3])
+        if sb1.button("Record this look", disabled=seq is None or bool(_seq_history and _seq_now <= _seq_history[-1])):
+            st.session_state["seq_history"] = _seq_history + [_seq_now]
+            st.rerun()
+        if sb2.button("Clear looks", disabled=not _seq_history):
+            st.session_state["seq_history"] = []
+            st.rerun()
+
+        if seq is None:
+            st.info("Set **Max users per arm** to the planned sample size to monitor this test sequentially.")
         else:
-            st.error(f"❌ {pw['name']}: Not significant after penalty (p={pw['p_raw']:.4f})")
+            _planned = max(int(st.session_state["seq_looks"]), seq["look"])
+            sm1, sm2, sm3, sm4 = st.columns(4)
+            sm1.metric("Look", f"{seq['look']} of {_planned}")
+            sm2.metric("Information", f"{seq['fraction']:.0%}")
+            sm3.metric("Boundary |z|", f"{seq['z_bound']:.3f}")
+            sm4.metric("Nominal p to stop", f"{seq['nominal_p']:.5f}")
+            st.caption(
+                f"{len(_seq_history)} look{'s' if len(_seq_history) != 1 else ''} recorded; the current data is look "
+                f"{seq['look']}. Alpha per comparison: {seq['alpha_per_arm']:.4f}"
+                + (" (split evenly over the variations)." if len(groups) > 2 else ".")
+            )
+            _seq_msg = {
+                "stop_efficacy": (st.success, "✅ {name}: Stop — crosses the efficacy boundary (z = {z:.2f} ≥ {b:.2f})"),
+                "stop_harm":     (st.error,   "❌ {name}: Stop — crosses the harm boundary (z = {z:.2f} ≤ −{b:.2f})"),
+                "stop_final":    (st.warning, "⏹ {name}: Stop — full information reached without crossing (z = {z:.2f})"),
+                "continue":      (st.info,    "⏳ {name}: Continue — z = {z:.2f}, needs |z| ≥ {b:.2f}"),
+            }
+            if len(groups) <= MAX_METRIC_COLUMNS:
+                for r in seq["arms"]:
+                    show, msg = _seq_msg[r["decision"]]
+                    show(msg.format(name=r["name"], z=r["z_stat"], b=seq["z_bound"]))
+            else:
+                st.dataframe(pd.DataFrame({
+                    "Variation": [r["name"] for r in seq["arms"]],
+                    "z":         [r["z_stat"] for r in seq["arms"]],
+                    "Decision":  [r["decision"].replace("_", " ").capitalize() for r in seq["arms"]],
+                }).sort_values("z", ascending=False), use_container_width=True, hide_index=True,
+                    column_config={"z": st.column_config.NumberColumn(format="%.2f")})
+            plot_sequential_boundaries(seq, groups)
+
+        with st.expander("Planned boundaries"):
+            _alpha_arm = alpha / max(len(groups) - 1, 1)
+            _plan_n    = int(st.session_state["seq_looks"])
+            _plan      = sequential_boundaries([(k + 1) / _plan_n for k in range(_plan_n)],
+                                               _alpha_arm, st.session_state["seq_spending"])
+            st.dataframe(pd.DataFrame({
+                "Look":             range(1, _plan_n + 1),
+                "Information":      [t * 100 for t in _plan["fraction"]],
+                "Users per arm":    [t * st.session_state["seq_max_users"] for t in _plan["fraction"]],
+                "Boundary |z|":     _plan["z_bound"],
+                "Nominal p":        _plan["nominal_p"],
+                "Cumulative alpha": _plan["alpha_spent"],
+            }), use_container_width=True, hide_index=True,
+                column_config={"Information":      st.column_config.NumberColumn(format="%.0f%%"),
+                               "Users per arm":    st.column_config.NumberColumn(format="%d"),
+                               "Boundary |z|":     st.column_config.NumberColumn(format="%.3f"),
+                               "Nominal p":        st.column_config.NumberColumn(format="%.5f"),
+                               "Cumulative alpha": st.column_config.NumberColumn(format="%.5f")})
+            st.caption("Equally spaced looks. Looks taken at other times get boundaries recomputed for their actual "
+                       "information fractions, so the overall false positive rate stays at alpha.")
+    else:
+        st.subheader("Always-Valid Monitoring")
+        st.caption(
+            "Mixture SPRT: p-values and confidence sequences that stay valid however often you look, so the test "
+            "can stop the first time a variation is significant. Record a look after each check — the running "
+            "p-values and intervals are saved with the snapshot and updated from the new data only."
+        )
+        _avi_saved = st.session_state.get("avi_state")
+        _avi_tau   = always_valid_tau(st.session_state["p_base_cr"], st.session_state["p_base_aov"],
+                                      st.session_state["p_mde"])
+        avi = _cache.get_or_compute("always_valid", always_valid_sync, _avi_saved, groups, alpha, *_avi_tau,
+                                    _revenue_values, _rev_sq)
+
+        ab1, ab2, _ = st.columns([1, 1, 3])
+        if ab1.button("Record this look", key="avi_record",
+                      disabled=bool(_avi_saved and avi["stats"] == _avi_saved["stats"])):
+            st.session_state["avi_state"] = avi
+            st.rerun()
+        if ab2.button("Reset monitoring", key="avi_reset", disabled=not _avi_saved):
+            st.session_state["avi_state"] = None
+            st.rerun()
+
+        _avi_rows = always_valid_summary(avi, alpha)
+        am1, am2, am3 = st.columns(3)
+        am1.metric("Look", avi["looks"])
+        am2.metric("Mixing scale τ (CR)", f"{avi['tau']['cr'] * 100:.3f} pp")
+        am3.metric("Mixing scale τ (RPV)", f"${avi['tau']['rpv']:.3f}")
+        st.caption(
+            f"{(_avi_saved or {}).get('looks', 0)} look(s) recorded; the current data is look {avi['looks']}. "
+            f"τ comes from the Sample Size Calculator (baseline × MDE) when monitoring starts and then stays fixed — "
+            f"a poor τ costs power, not validity. Alpha per comparison: {alpha / max(len(groups) - 1, 1):.4f}"
+            + (" (split evenly over the variations)." if len(groups) > 2 else ".")
+        )
+
+        def _avi_decision(r):
+            for metric, label in (("cr", "CR"), ("rpv", "RPV")):
+                if r[f"{metric}_sig"]:
+                    return ("stop_win" if r[f"{metric}_diff"] > 0 else "stop_loss"), label
+            return "continue", None
+
+        _avi_msg = {
+            "stop_win":  (st.success, "✅ {name}: Stop — {metric} better than Control (p = {p:.4f})"),
+            "stop_loss": (st.error,   "❌ {name}: Stop — {metric} worse than Control (p = {p:.4f})"),
+            "continue":  (st.info,    "⏳ {name}: Continue — always-valid p = {p:.4f} (CR), {p_rpv:.4f} (RPV)"),
+        }
+        if len(groups) <= MAX_METRIC_COLUMNS:
+            for r in _avi_rows:
+                decision, metric = _avi_decision(r)
+                show, msg = _avi_msg[decision]
+                show(msg.format(name=r["name"], metric=metric,
+                                p=r[f"{(metric or 'CR').lower()}_p"], p_rpv=r["rpv_p"]))
+
+        def _cs(lo, hi, scale, fmt):
+            return f"[{'−∞' if lo is None else format(lo * scale, fmt)}, {'∞' if hi is None else format(hi * scale, fmt)}]"
+
+        st.dataframe(pd.DataFrame({
+            "Variation":      [r["name"] for r in _avi_rows],
+            "Δ CR (pp)":      [r["cr_diff"] * 100 for r in _avi_rows],
+            "CR sequence":    [_cs(r["cr_lo"], r["cr_hi"], 100, "+.3f") for r in _avi_rows],
+            "p (CR)":         [r["cr_p"] for r in _avi_rows],
+            "Δ RPV ($)":      [r["rpv_diff"] for r in _avi_rows],
+            "RPV sequence":   [_cs(r["rpv_lo"], r["rpv_hi"], 1, "+.3f") for r in _avi_rows],
+            "p (RPV)":        [r["rpv_p"] for r in _avi_rows],
+            "Decision":       [_avi_decision(r)[0].replace("_", " ").capitalize() for r in _avi_rows],
+        }), use_container_width=True, hide_index=True,
+            column_config={"Δ CR (pp)": st.column_config.NumberColumn(format="%+.3f"),
+                           "p (CR)":    st.column_config.NumberColumn(format="%.4f"),
+                           "Δ RPV ($)": st.column_config.NumberColumn(format="%+.3f"),
+                           "p (RPV)":   st.column_config.NumberColumn(format="%.4f")})
+        st.caption("Confidence sequences are the running intersection of every look's interval, so they only "
+                   "ever narrow; the p-values are the running minimum. Both hold simultaneously over all looks.")
 
 # ---- TAB 4: STRATEGIC MATRIX ----
 with tab4:
@@ -2219,17 +1538,17 @@ with tab7:
 
 # ---- TAB 8: BAYESIAN PDFs ----
 with tab8:
-    plot_bayesian_pdfs(groups)
+    plot_bayesian_pdfs(groups, bayes["prob_best"])
 
 # ---- TAB 9 & 10: BOOTSTRAP + BOX PLOT (Control vs best variation) ----
-# Both tabs use pre-computed top-level bootstrap samples (_boot_sc / _boot_sv)
+# Both tabs use the pre-computed top-level bootstrap samples (_boot_samples)
 # so visiting Tab 10 never requires visiting Tab 9 first.
 with tab9:
     st.markdown(f"### Bootstrap CI — Control vs {best_m['name']}")
     samps_c, samps_v, bci_l, bci_h = run_bootstrap_and_plot(
         ctrl_m["users"], ctrl_m["conv"],
         best_m["users"], best_m["conv"],
-        alpha_val=alpha, label_v=best_m["name"],
+        alpha_val=alpha, label_v=best_m["name"], samples=_boot_samples,
     )
     st.write(
         f"**{confidence_level} CI on CR Difference ({best_m['name']} − Control):** "
@@ -2239,6 +1558,16 @@ with tab9:
 with tab10:
     st.markdown("### Box Plot: Bootstrap Distributions")
     plot_box_plots(_boot_sc, _boot_sv, label_v=best_m["name"])
+    _ov_names = [n for n in (groups[0]["name"], best_m["name"]) if n in _revenue_values]
+    if len(_ov_names) == 2 and _ov_names[0] != _ov_names[1]:
+        _ov = [(n, _cache.get_or_compute("order_value_summary", order_value_summary, _revenue_values[n]))
+               for n in _ov_names]
+        if all(s is not None for _, s in _ov):
+            plot_order_value_boxes(_ov)
+            st.caption("Quartiles and whiskers come from the order-value sketch (each value within 1%), so they "
+                       "cost the same at any number of orders.")
+    else:
+        st.caption("Load a snapshot with observed revenue (`ab_ingest.py`) to see revenue-per-converter box plots.")
 
 # ---- TAB 11: POWER CURVES ----
 with tab11:
@@ -2260,7 +1589,21 @@ with tab11:
         elif base_cr_pc <= 0:
             st.warning("Baseline CR must be greater than 0.")
         else:
-            plot_power_curve(base_cr_pc, mdes, alpha, max_sample)
+            _vr_pc = plan_var_red / 100
+            plot_power_curve(base_cr_pc, mdes, alpha, max_sample, variance_reduction=_vr_pc)
+            st.markdown("#### Required Sample Size per MDE (80% power)")
+            if _vr_pc > 0:
+                st.caption(f"Assumes CUPED removes {plan_var_red:g}% of the variance "
+                           "(Expected Variance Reduction in the Sample Size Calculator).")
+            _daily_pc = plan_traffic / 28 if plan_traffic > 0 else None
+            _n_rows   = required_n_table(base_cr_pc, mdes, alpha, power=0.8, daily_traffic=_daily_pc,
+                                         variance_reduction=_vr_pc)
+            st.dataframe(pd.DataFrame([{
+                "MDE":             f"{r['mde']:g}%",
+                "Users / Group":   f"{r['users_per_group']:,.0f}" if np.isfinite(r["users_per_group"]) else "—",
+                "Total Users":     f"{r['users_per_group'] * 2:,.0f}" if np.isfinite(r["users_per_group"]) else "—",
+                "Est. Days":       (f"{r['days']:,.0f}" if np.isfinite(r["days"]) else "—") if "days" in r else "—",
+            } for r in _n_rows]), use_container_width=True, hide_index=True)
     except ValueError:
         st.error("Invalid MDE format. Please use comma-separated numbers (e.g., 2, 5.5, 10).")
 
@@ -2326,3 +1669,160 @@ with tab12:
                 plot_segment_bars("Revenue Per Visitor", active_segs, "rpv", label_v=best_m["name"], unit="RPV ($)")
         else:
             plot_segment_bars("Conversion Rate", active_segs, "cr", label_v=best_m["name"], unit="CR (%)")
+
+# ---- TAB 13: ALL PAIRS ----
+with tab13:
+    st.markdown("### All-Pairs Comparison")
+    if len(groups) < 3:
+        st.info("All-pairs comparisons need at least two variations — with one, the Control comparison above is the only pair.")
+    elif all_pairs is None:
+        st.info("Turn on **All-pairs comparisons** in the sidebar (under Settings) to compare every arm against every other arm.")
+    else:
+        st.caption(
+            f"{all_pairs['n_comparisons']:,} pairwise z-tests, {mc_method.upper()} correction applied across all of them. "
+            "The winner above is still chosen against Control only."
+        )
+        plot_all_pairs_heatmap(all_pairs, mv["metrics"])
+        _sig_pairs = all_pairs_table(all_pairs)
+        if not _sig_pairs:
+            st.warning("No pair of arms differs significantly after correction.")
+        else:
+            st.markdown(f"#### Significant pairs ({len(_sig_pairs):,})")
+            st.dataframe(pd.DataFrame([{
+                "Better":       r["better"],
+                "Worse":        r["worse"],
+                "CR Uplift":    r["uplift_cr"],
+                "z":            r["z_stat"],
+                "p (raw)":      r["p_raw"],
+                "p (adjusted)": r["p_adjusted"],
+            } for r in _sig_pairs]), use_container_width=True, hide_index=True,
+                column_config={"CR Uplift":    st.column_config.NumberColumn(format="%+.2f%%"),
+                               "z":            st.column_config.NumberColumn(format="%.2f"),
+                               "p (raw)":      st.column_config.NumberColumn(format="%.4f"),
+                               "p (adjusted)": st.column_config.NumberColumn(format="%.4f")})
+
+# ---- TAB 14: HISTORY ----
+with tab14:
+    st.markdown("### Experiment History")
+    _hist_exps = _history.experiments()
+    if not _hist_exps:
+        st.info("No saved history yet. Set an **Experiment ID** in the sidebar and click **Save to History** "
+                "once a day, or backfill snapshot files with `python ab_store.py "
+                f"{HISTORY_DB} add <files>`.")
+    else:
+        _hist_ids = [e[0] for e in _hist_exps]
+        _hist_id  = st.selectbox(
+            "Experiment", _hist_ids, index=_hist_ids.index(_experiment_id) if _experiment_id in _hist_ids else 0,
+            format_func=lambda e: next(f"{e}  ({first} → {last}, {n} days)" for x, first, last, n in _hist_exps
+                                       if x == e))
+        trend = _history.trend(_hist_id)
+        _n_days = len(set(trend["day"]))
+        st.caption(f"{_n_days} saved day{'s' if _n_days != 1 else ''}; the latest save of each day is shown. "
+                   "CR difference bands are each day's confidence interval at that snapshot's confidence level.")
+        plot_history_trend(trend, "diff_cr", "CR Difference vs Control", "CR difference (pp)", scale=100,
+                           band=("ci_low", "ci_high"), hline=0)
+        hc1, hc2 = st.columns(2)
+        with hc1:
+            plot_history_trend(trend, "uplift_cr", "CR Uplift", "Uplift (%)", hline=0)
+        with hc2:
+            plot_history_trend(trend, "uplift_rpv", "RPV Uplift", "Uplift (%)", hline=0)
+        hc3, hc4 = st.columns(2)
+        with hc3:
+            plot_history_trend(trend, "p_adjusted", "Adjusted p-value", "p", hline=alpha)
+        with hc4:
+            plot_history_trend(trend, "prob_best", "P(Best)", "P(best) (%)", scale=100, control=True)
+
+        _hist_days = _history.days(_hist_id)
+        hl1, hl2, _ = st.columns([2, 1, 2])
+        _load_day = hl1.selectbox("Saved day", _hist_days[::-1], key="_history_day")
+        if hl2.button("Load into dashboard", key="_history_load"):
+            _stage_snapshot(_history.snapshot(_hist_id, _load_day))
+            st.rerun()
+
+# ---- TAB 15: PORTFOLIO ----
+with tab15:
+    st.markdown("### Experiment Portfolio")
+    st.caption("Upload one table with a row per arm of every running experiment — columns `experiment`, `arm`, "
+               "`users`, `conv`, `rev`, optional `prod` and `shared_control` (the experiment whose Control this "
+               "one reuses). Each experiment gets the same tests as above; Benjamini-Hochberg then controls "
+               "the false discovery rate across every comparison in the portfolio.")
+    _port_file = st.file_uploader("Portfolio table", type=[ext.lstrip(".") for ext in TABLE_FORMATS],
+                                  key="_portfolio_file")
+    if _port_file is not None:
+        try:
+            _port_table = read_table(_port_file)
+            _portfolio  = analyze_portfolio(_port_table, alpha, mc_method)
+        except (KeyError, ValueError) as e:
+            st.error(f"Could not analyse the portfolio table: {e}")
+            _portfolio = None
+        if _portfolio is not None:
+            _pc    = _portfolio["comparisons"]
+            _n_sig = int(sum(_pc["significant_portfolio"]))
+            pm1, pm2, pm3 = st.columns(3)
+            pm1.metric("Experiments", f"{len(_portfolio['experiments']['experiment']):,}")
+            pm2.metric("Comparisons", f"{_portfolio['n_comparisons']:,}")
+            pm3.metric(f"Significant (FDR {alpha:g})", f"{_n_sig:,}")
+            plot_portfolio_volcano(_portfolio)
+            st.markdown("#### Ranked variations")
+            st.dataframe(pd.DataFrame({
+                "Rank":            _pc["rank"],
+                "Experiment":      _pc["experiment"],
+                "Variation":       _pc["arm"],
+                "Users":           _pc["users"],
+                "CR Uplift":       _pc["uplift_cr"],
+                "RPV Uplift":      _pc["uplift_rpv"],
+                "p (experiment)":  _pc["p_adjusted"],
+                "p (portfolio)":   _pc["p_portfolio"],
+                "Significant":     _pc["significant_portfolio"],
+            }), use_container_width=True, hide_index=True,
+                column_config={"Users":          st.column_config.NumberColumn(format="%d"),
+                               "CR Uplift":      st.column_config.NumberColumn(format="%+.2f%%"),
+                               "RPV Uplift":     st.column_config.NumberColumn(format="%+.2f%%"),
+                               "p (experiment)": st.column_config.NumberColumn(format="%.4f"),
+                               "p (portfolio)":  st.column_config.NumberColumn(format="%.4f")})
+
+# ---- TAB 16: CUPED ----
+with tab16:
+    st.markdown("### CUPED Variance Reduction")
+    if cuped is None:
+        st.info("Enter pre-experiment covariate sums per arm in the sidebar under **Pre-Experiment Covariate "
+                "(CUPED)** — for example, each user's revenue in the weeks before the test. The estimates here "
+                "are regression-adjusted for it, which narrows the intervals without biasing the effect.")
+    else:
+        st.caption(
+            "Each arm's mean is adjusted by θ × (its pre-experiment mean − the overall one), with θ the pooled "
+            f"within-arm regression slope. Intervals are {confidence_level} normal intervals; p-values are "
+            f"{mc_method.upper()}-corrected across variations. Revenue² per user comes from observed values when "
+            "loaded, otherwise from the same reconstruction the revenue tests use."
+        )
+        cm1, cm2, cm3, cm4 = st.columns(4)
+        for col, metric, label in ((cm1, "cr", "CR"), (cm2, "rpv", "RPV")):
+            col.metric(f"{label} variance reduction", f"{cuped[metric]['variance_reduction'] * 100:.1f}%")
+        for col, metric, label in ((cm3, "cr", "CR"), (cm4, "rpv", "RPV")):
+            col.metric(f"{label} effective traffic",
+                       f"{safe_divide(1, 1 - cuped[metric]['variance_reduction'], float('inf')):.2f}×")
+        for metric, label, scale, unit in (("cr", "Conversion Rate", 100, "pp"), ("rpv", "Revenue per Visitor", 1, "$")):
+            c = cuped[metric]
+            st.markdown(f"#### {label}")
+            st.dataframe(pd.DataFrame({
+                "Variation":          cuped["names"][1:],
+                "Diff (raw)":         np.asarray(c["diff_raw"]) * scale,
+                "Diff (CUPED)":       np.asarray(c["diff"]) * scale,
+                "CI low":             np.asarray(c["ci_low"]) * scale,
+                "CI high":            np.asarray(c["ci_high"]) * scale,
+                "Uplift (CUPED)":     c["uplift"],
+                "SE change":          [safe_divide(a - b, b) * 100 for a, b in zip(c["se"], c["se_raw"])],
+                "p (z-test)":         [pw["p_adjusted"] for pw in mv["pairwise"]] if metric == "cr" else None,
+                "p (CUPED)":          c["p_adjusted"],
+                "Significant":        c["significant"],
+            }).dropna(axis=1, how="all"), use_container_width=True, hide_index=True,
+                column_config={
+                    "Diff (raw)":     st.column_config.NumberColumn(format=f"%+.4f {unit}"),
+                    "Diff (CUPED)":   st.column_config.NumberColumn(format=f"%+.4f {unit}"),
+                    "CI low":         st.column_config.NumberColumn(format=f"%+.4f {unit}"),
+                    "CI high":        st.column_config.NumberColumn(format=f"%+.4f {unit}"),
+                    "Uplift (CUPED)": st.column_config.NumberColumn(format="%+.2f%%"),
+                    "SE change":      st.column_config.NumberColumn(format="%+.1f%%"),
+                    "p (z-test)":     st.column_config.NumberColumn(format="%.4f"),
+                    "p (CUPED)":      st.column_config.NumberColumn(format="%.4f"),
+                })
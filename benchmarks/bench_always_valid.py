@@ -0,0 +1,149 @@
+"""
+Always-valid monitoring (mixture SPRT): error control and cost.
+
+Error control: simulated A/B tests checked after every day. Under H0 the
+always-valid p-value must stay below alpha on no more than alpha of the
+paths, where a naive z-test repeated daily rejects far more often. With a
+true effect, the confidence sequence must cover it at every look — the
+running intersection covering the truth at the end means exactly that.
+
+Cost: one more day folded into the saved state (always_valid_update) vs
+replaying every day from scratch, as a stateless monitor would have to.
+
+    python benchmarks/bench_always_valid.py
+    python benchmarks/bench_always_valid.py --sims 4000 --days 90 --json always_valid.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ab_engine import always_valid_init, always_valid_update   # noqa: E402
+
+ALPHA     = 0.05
+BASE_CR   = 0.10
+AOV       = 50.0
+SIGMA     = 0.8          # log-normal order values, as in reconstruct_revenue
+DAILY     = 1000         # users per arm per day
+TAU_CR    = BASE_CR * 0.05
+TAU_RPV   = TAU_CR * AOV
+
+
+def daily_deltas(rng, days, cr_v, aov_v=AOV):
+    """Per-day sufficient statistics (users / conv / rev / rev_sq) for Control and one variation."""
+    users = np.full((days, 2), DAILY, dtype=float)
+    conv  = rng.binomial(DAILY, [BASE_CR, cr_v], (days, 2)).astype(float)
+    rev, rev_sq = np.zeros((days, 2)), np.zeros((days, 2))
+    for arm, aov in enumerate((AOV, aov_v)):
+        n_orders = int(conv[:, arm].sum())
+        orders   = rng.lognormal(np.log(aov) - SIGMA ** 2 / 2, SIGMA, n_orders)
+        day      = np.repeat(np.arange(days), conv[:, arm].astype(int))
+        rev[:, arm]    = np.bincount(day, weights=orders, minlength=days)
+        rev_sq[:, arm] = np.bincount(day, weights=orders ** 2, minlength=days)
+    return [{"users": u, "conv": c, "rev": r, "rev_sq": q} for u, c, r, q in zip(users, conv, rev, rev_sq)]
+
+
+def monitor(deltas):
+    state = always_valid_init(["Control", "Variation"], TAU_CR, TAU_RPV)
+    for d in deltas:
+        state = always_valid_update(state, d, ALPHA)
+    return state
+
+
+def naive_rejects(deltas):
+    """Whether a fixed-sample two-proportion z-test rejects at any daily look."""
+    from scipy.special import ndtri
+    users = np.cumsum([d["users"] for d in deltas], axis=0)
+    conv  = np.cumsum([d["conv"] for d in deltas], axis=0)
+    p     = conv.sum(axis=1) / users.sum(axis=1)
+    se    = np.sqrt(p * (1 - p) * (1 / users[:, 0] + 1 / users[:, 1]))
+    z     = (conv[:, 1] / users[:, 1] - conv[:, 0] / users[:, 0]) / se
+    return bool(np.any(np.abs(z) >= ndtri(1 - ALPHA / 2)))
+
+
+def error_control(sims, days, seed=0):
+    rng = np.random.default_rng(seed)
+    h0 = {"avi_cr": 0, "avi_rpv": 0, "naive_cr": 0}
+    for _ in range(sims):
+        deltas = daily_deltas(rng, days, BASE_CR)
+        state  = monitor(deltas)
+        h0["avi_cr"]   += state["cr"]["p"][0] <= ALPHA
+        h0["avi_rpv"]  += state["rpv"]["p"][0] <= ALPHA
+        h0["naive_cr"] += naive_rejects(deltas)
+    cr_v, aov_v = BASE_CR * 1.05, AOV * 1.03
+    truth = {"cr": cr_v - BASE_CR, "rpv": cr_v * aov_v - BASE_CR * AOV}
+    cover = {"cr": 0, "rpv": 0}
+    for _ in range(sims):
+        state = monitor(daily_deltas(rng, days, cr_v, aov_v))
+        for metric in cover:
+            lo, hi = state[metric]["lo"][0], state[metric]["hi"][0]
+            cover[metric] += (lo is None or lo <= truth[metric]) and (hi is None or truth[metric] <= hi)
+    return {"type_one_error": {k: v / sims for k, v in h0.items()},
+            "coverage": {k: v / sims for k, v in cover.items()}}
+
+
+def time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return statistics.median(samples) * 1e3
+
+
+def bench(days_list, repeat):
+    rng  = np.random.default_rng(1)
+    rows = []
+    for days in days_list:
+        deltas = daily_deltas(rng, days, BASE_CR)
+        state  = monitor(deltas[:-1])
+        rows.append({"days": days,
+                     "incremental_ms": time_ms(lambda: always_valid_update(state, deltas[-1], ALPHA), repeat * 20),
+                     "replay_ms":      time_ms(lambda: monitor(deltas), repeat)})
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sims", type=int, default=1000, help="Simulated experiments per error check.")
+    parser.add_argument("--days", type=int, default=60, help="Daily looks per simulated experiment.")
+    parser.add_argument("--timing-days", type=int, nargs="+", default=[30, 90, 365],
+                        help="History lengths for the timing comparison.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per timing.")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    errors = error_control(args.sims, args.days)
+    rows   = bench(args.timing_days, args.repeat)
+    se     = np.sqrt(ALPHA * (1 - ALPHA) / args.sims)
+    failed = (any(v > ALPHA + 3 * se for k, v in errors["type_one_error"].items() if k.startswith("avi"))
+              or any(v < 1 - ALPHA - 3 * se for v in errors["coverage"].values()))
+
+    print(f"{args.sims} simulated tests x {args.days} daily looks, alpha = {ALPHA}")
+    t1 = errors["type_one_error"]
+    print(f"  type I error   always-valid CR {t1['avi_cr']:.3f}   RPV {t1['avi_rpv']:.3f}   "
+          f"naive daily z-test CR {t1['naive_cr']:.3f}")
+    cov = errors["coverage"]
+    print(f"  CS coverage    CR {cov['cr']:.3f}   RPV {cov['rpv']:.3f}   (at every look)"
+          + ("   FAILED" if failed else ""))
+    print(f"\n{'days':>6}{'incremental (ms)':>19}{'replay (ms)':>14}{'speedup':>10}")
+    for r in rows:
+        print(f"{r['days']:>6}{r['incremental_ms']:>19.3f}{r['replay_ms']:>14.2f}"
+              f"{r['replay_ms'] / r['incremental_ms']:>9.0f}x")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "alpha": ALPHA, "sims": args.sims, "days": args.days,
+                       **errors, "timing": rows}, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+A/B/n scaling with the number of arms (Control + N−1 variations).
+
+Per arm count: the full analysis pipeline (analyze_snapshot), the frequentist
+pass alone (run_multivariate_analysis), exact and Monte Carlo Bayesian P(best),
+and the PDF charts page (chart specs + vector render of the per-arm charts).
+
+    python benchmarks/bench_arms.py
+    python benchmarks/bench_arms.py --arms 10 100 1000 --repeat 5 --json arms.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ab_report                                         # noqa: E402
+from ab_engine import (CONF_ALPHA, DEFAULT_INPUTS, analyze_snapshot, arms_from_state,   # noqa: E402
+                       calculate_bayesian_multivariate, run_multivariate_analysis)
+
+
+def arms_state(n_arms, seed=0):
+    """Snapshot with n_arms groups of similar size and CR around 12%."""
+    rng   = np.random.default_rng(seed)
+    n_var = n_arms - 1
+    users = rng.integers(4500, 5500, n_var)
+    conv  = rng.binomial(users, rng.uniform(0.10, 0.14, n_var))
+    rev   = conv * rng.uniform(45.0, 65.0, n_var)
+    variations = {"name": [None] * n_var, "users": users.tolist(), "conv": conv.tolist(),
+                  "rev": rev.round(2).tolist(), "prod": (conv * 2).tolist()}
+    return dict(DEFAULT_INPUTS, num_variations=n_var, variations=variations)
+
+
+def time_median(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return statistics.median(samples) * 1e3
+
+
+def bench(n_arms, repeat):
+    state = arms_state(n_arms)
+    arms  = arms_from_state(state)
+    alpha = CONF_ALPHA[state["conf_level"]]
+    res   = analyze_snapshot(state)
+
+    def charts():
+        ab_report._chart_cache.clear()
+        specs = ab_report.report_chart_specs(res["mv"]["metrics"], res["groups"], res["ctrl_m"], res["best_m"])
+        ab_report.render_charts(specs[:3], workers=1)
+
+    return {
+        "analyze_snapshot":  time_median(lambda: analyze_snapshot(state), repeat),
+        "multivariate":      time_median(lambda: run_multivariate_analysis(arms, alpha, state["mc_method"]), repeat),
+        "bayes_exact":       time_median(lambda: calculate_bayesian_multivariate(arms, "exact"), repeat),
+        "bayes_monte_carlo": time_median(lambda: calculate_bayesian_multivariate(arms, "monte_carlo"), repeat),
+        "pdf_charts":        time_median(charts, repeat),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--arms", type=int, nargs="+", default=[10, 100, 1000], help="Arm counts (incl. Control).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement.")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    bench(3, 1)   # warm-up: SciPy / statsmodels / matplotlib imports are one-off costs
+
+    results = {n: bench(n, args.repeat) for n in args.arms}
+    cols    = list(next(iter(results.values())))
+    print(f"{'arms':>6}" + "".join(f"{c:>19}" for c in cols) + "   (median ms)")
+    for n, r in results.items():
+        print(f"{n:>6}" + "".join(f"{r[c]:>19.1f}" for c in cols))
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "repeat": args.repeat,
+                       "results": {str(n): r for n, r in results.items()}}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Bulk PDF throughput of the batch runner (reports per minute).
+
+Writes N synthetic snapshots to a temp directory and runs
+ab_batch.run_batch(..., pdf_dir=...) once per worker count.
+
+    python benchmarks/bench_batch_reports.py
+    python benchmarks/bench_batch_reports.py --experiments 48 --workers 1 4 8 --json batch_pdf.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ab_batch import run_batch             # noqa: E402
+from ab_engine import DEFAULT_INPUTS       # noqa: E402
+
+
+def write_snapshots(folder, n, seed=0):
+    rng   = np.random.default_rng(seed)
+    paths = []
+    for i in range(n):
+        n_var = int(rng.integers(1, 4))
+        state = dict(DEFAULT_INPUTS, num_variations=n_var, hyp_smart=f"Experiment {i}")
+        state["users_c"] = int(rng.integers(5_000, 50_000))
+        state["conv_c"]  = int(state["users_c"] * rng.uniform(0.02, 0.08))
+        state["rev_c"]   = float(state["conv_c"] * rng.uniform(30, 80))
+        state["prod_c"]  = int(state["conv_c"] * rng.uniform(1, 2))
+        for v in range(n_var):
+            users = int(state["users_c"] * rng.uniform(0.95, 1.05))
+            conv  = int(users * state["conv_c"] / state["users_c"] * rng.uniform(0.9, 1.2))
+            state[f"users_v{v}"] = users
+            state[f"conv_v{v}"]  = conv
+            state[f"rev_v{v}"]   = float(conv * rng.uniform(30, 80))
+            state[f"prod_v{v}"]  = int(conv * rng.uniform(1, 2))
+        path = os.path.join(folder, f"exp_{i:04d}.json")
+        with open(path, "w") as f:
+            json.dump(state, f)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--experiments", type=int, default=24, help="Synthetic snapshots to report on.")
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="Worker counts to compare (default: 1 and all cores).")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file.")
+    args = parser.parse_args(argv)
+    workers = args.workers or sorted({1, os.cpu_count() or 1})
+
+    tmp = tempfile.mkdtemp(prefix="ab_bench_batch_")
+    try:
+        os.makedirs(os.path.join(tmp, "snapshots"))
+        paths   = write_snapshots(os.path.join(tmp, "snapshots"), args.experiments)
+        # Warm-up: in-process imports and font cache are one-off costs, not per report
+        run_batch(paths[:1], workers=1, progress=False, pdf_dir=os.path.join(tmp, "warmup"))
+        results = {}
+        for w in workers:
+            pdf_dir = os.path.join(tmp, f"pdf_w{w}")
+            t = time.perf_counter()
+            rows, _, _ = run_batch(paths, workers=w, progress=False, pdf_dir=pdf_dir)
+            elapsed = time.perf_counter() - t
+            n_ok = len({r["pdf_report"] for r in rows} - {None})
+            results[w] = {"seconds": elapsed, "reports": n_ok, "reports_per_min": n_ok / elapsed * 60}
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    base = results[workers[0]]["reports_per_min"]
+    print(f"{'workers':>8}{'reports':>9}{'seconds':>10}{'reports/min':>13}{'vs ' + str(workers[0]):>9}")
+    for w, r in results.items():
+        print(f"{w:>8}{r['reports']:>9}{r['seconds']:>10.2f}{r['reports_per_min']:>13.1f}"
+              f"{r['reports_per_min'] / base:>8.1f}x")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "cpu_count": os.cpu_count(),
+                       "experiments": args.experiments,
+                       "results": {str(w): r for w, r in results.items()}}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
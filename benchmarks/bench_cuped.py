@@ -0,0 +1,130 @@
+"""
+CUPED: error control, variance reduction and cost.
+
+Simulated A/B tests where each user has a pre-experiment revenue x that
+predicts both conversion and revenue during the test. From the per-arm sums
+alone, run_cuped_analysis must:
+  - keep the type I error at alpha under H0 (CR and RPV),
+  - cover the true difference (zero) at 1 − alpha with its intervals,
+  - shrink the standard error by sqrt(1 − variance_reduction) relative to
+    the unadjusted difference.
+Cost is timed at 1k to 10M users per arm: it works from O(arms) sums, so it
+does not grow with traffic.
+
+    python benchmarks/bench_cuped.py
+    python benchmarks/bench_cuped.py --sims 4000 --json cuped.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ab_engine import ArmTable, run_cuped_analysis   # noqa: E402
+
+ALPHA   = 0.05
+BASE_CR = 0.05
+AOV     = 50.0
+SIGMA   = 0.8          # log-normal order values, as in reconstruct_revenue
+
+
+def simulate_arm(rng, n):
+    """Aggregates (users, conv, rev), converters' order values and covariate sums of one arm of n users."""
+    x    = rng.gamma(0.5, 40.0, n)                  # pre-experiment revenue, mean 20
+    p    = np.clip(BASE_CR * x / 20.0, 0, 1)  # heavier past spenders convert more
+    conv = rng.random(n) < p
+    rev  = np.where(conv, (0.5 + x / 40.0) * rng.lognormal(np.log(AOV) - SIGMA ** 2 / 2, SIGMA, n), 0.0)
+    return {"users": n, "conv": int(conv.sum()), "rev": float(rev.sum()),
+            "values": rev[conv], "pre_sum": float(x.sum()), "pre_sum_sq": float(x @ x),
+            "pre_cross_conv": float(x[conv].sum()), "pre_cross_rev": float(x @ rev)}
+
+
+def analyse(arms):
+    table = ArmTable(["Control", "Variation"], *([a[f] for a in arms] for f in ("users", "conv", "rev", "conv")))
+    cov   = {f: [a[f] for a in arms] for f in ("pre_sum", "pre_sum_sq", "pre_cross_conv", "pre_cross_rev")}
+    revenue_values = {name: {"values": a["values"], "counts": np.ones(len(a["values"]))}
+                      for name, a in zip(table.names, arms)}
+    return run_cuped_analysis(table, cov, ALPHA, revenue_values=revenue_values)
+
+
+def error_control(sims, n, seed=0):
+    rng = np.random.default_rng(seed)
+    out = {"type_one_error": {"cr": 0, "rpv": 0}, "coverage": {"cr": 0, "rpv": 0},
+           "variance_reduction": {"cr": [], "rpv": []}, "se_ratio": {"cr": [], "rpv": []}}
+    for _ in range(sims):
+        res = analyse([simulate_arm(rng, n), simulate_arm(rng, n)])
+        for m in ("cr", "rpv"):
+            r = res[m]
+            out["type_one_error"][m] += r["p_raw"][0] <= ALPHA
+            out["coverage"][m]       += r["ci_low"][0] <= 0 <= r["ci_high"][0]
+            out["variance_reduction"][m].append(r["variance_reduction"])
+            out["se_ratio"][m].append(r["se"][0] / r["se_raw"][0])
+    for m in ("cr", "rpv"):
+        out["type_one_error"][m] /= sims
+        out["coverage"][m]       /= sims
+        out["variance_reduction"][m] = float(np.mean(out["variance_reduction"][m]))
+        out["se_ratio"][m]           = float(np.mean(out["se_ratio"][m]))
+    return out
+
+
+def cost(sizes, repeat):
+    rng  = np.random.default_rng(1)
+    rows = []
+    for n in sizes:
+        # Sums scaled up from a 100k-user sample: the analysis only ever sees the sums
+        arms  = [simulate_arm(rng, 100_000) for _ in range(2)]
+        scale = n / 100_000
+        table = ArmTable(["Control", "Variation"], [n, n], [round(a["conv"] * scale) for a in arms],
+                         [a["rev"] * scale for a in arms], [round(a["conv"] * scale) for a in arms])
+        cov   = {f: [a[f] * scale for a in arms] for f in ("pre_sum", "pre_sum_sq", "pre_cross_conv", "pre_cross_rev")}
+        samples = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            run_cuped_analysis(table, cov, ALPHA)
+            samples.append(time.perf_counter() - t)
+        rows.append({"users_per_arm": n, "ms": statistics.median(samples) * 1e3})
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sims", type=int, default=1000, help="Simulated A/A tests.")
+    parser.add_argument("--users", type=int, default=20_000, help="Users per arm in each simulated test.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000, 10_000_000],
+                        help="Users per arm for the timing.")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per timing (median reported).")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    cost([1_000], 1)   # warm-up: SciPy imports
+    errors = error_control(args.sims, args.users)
+    rows   = cost(args.sizes, args.repeat)
+    se     = np.sqrt(ALPHA * (1 - ALPHA) / args.sims)
+    failed = (any(v > ALPHA + 3 * se for v in errors["type_one_error"].values())
+              or any(v < 1 - ALPHA - 3 * se for v in errors["coverage"].values()))
+
+    print(f"{args.sims} simulated A/A tests, {args.users:,} users per arm, alpha = {ALPHA}")
+    for m in ("cr", "rpv"):
+        vr = errors["variance_reduction"][m]
+        print(f"  {m.upper():<4} type I error {errors['type_one_error'][m]:.3f}   CI coverage {errors['coverage'][m]:.3f}   "
+              f"variance reduction {vr * 100:.1f}%   SE ratio {errors['se_ratio'][m]:.3f} "
+              f"(expected {np.sqrt(1 - vr):.3f})" + ("   FAILED" if failed else ""))
+    print(f"\n{'users/arm':>12}{'time (ms)':>12}")
+    for r in rows:
+        print(f"{r['users_per_arm']:>12,}{r['ms']:>12.3f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "alpha": ALPHA, "sims": args.sims,
+                       "users": args.users, **errors, "timing": rows}, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
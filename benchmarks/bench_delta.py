@@ -0,0 +1,142 @@
+"""
+Delta-method revenue intervals vs the bootstrap: coverage and cost.
+
+Simulated tests with log-normal order values of known mean, so the true RPV
+and AOV differences are known. For each, the 1 − alpha interval on the
+difference in means from
+  delta      — test_revenue_significance_delta, from per-arm sums and sums
+               of squares only
+  bootstrap  — percentile bootstrap of the same mean difference
+               (bootstrap_sparse_means, 2,000 resamples per arm)
+is checked for covering the truth, and the delta method's type I error is
+checked under H0. Heavier-tailed order values (--sigma) and fewer users
+are where a normal interval on a skewed mean is most likely to fall short.
+
+Cost: one delta-method call vs the dashboard's Mann-Whitney + bootstrap
+(test_revenue_significance_sparse) on the same data.
+
+    python benchmarks/bench_delta.py
+    python benchmarks/bench_delta.py --sims 2000 --users 1000 10000 --sigma 0.8 1.2 --json delta.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ab_engine import (bootstrap_sparse_means, sparse_revenue, test_revenue_significance_delta,   # noqa: E402
+                       test_revenue_significance_sparse, _nonzero_part)
+
+ALPHA  = 0.05
+CR     = (0.05, 0.055)
+AOV    = (50.0, 52.0)
+N_BOOT = 2000
+
+
+def simulate(rng, n, sigma, cr=CR, aov=AOV):
+    """Sparse per-user revenue for Control and the variation (log-normal order values with mean aov)."""
+    out = []
+    for p, a in zip(cr, aov):
+        k = rng.binomial(n, p)
+        out.append(sparse_revenue(rng.lognormal(np.log(a) - sigma ** 2 / 2, sigma, k), n))
+    return out
+
+
+def sums(sp):
+    v = sp["values"]
+    return len(v) + sp["n_zero"], len(v), float(v.sum()), float(v @ v)
+
+
+def delta_result(ctrl, var):
+    return test_revenue_significance_delta(*sums(ctrl), *sums(var), alpha=ALPHA)
+
+
+def boot_ci(ctrl, var, rng):
+    diffs = bootstrap_sparse_means(var, N_BOOT, rng) - bootstrap_sparse_means(ctrl, N_BOOT, rng)
+    return np.percentile(diffs, [ALPHA / 2 * 100, (1 - ALPHA / 2) * 100])
+
+
+def coverage(sims, n, sigma, seed=0):
+    rng   = np.random.default_rng(seed)
+    truth = {"rpv": CR[1] * AOV[1] - CR[0] * AOV[0], "aov": AOV[1] - AOV[0]}
+    hits  = {f"{m}_{k}": 0 for m in truth for k in ("delta", "bootstrap")}
+    width = {k: [] for k in hits}
+    h0    = {"rpv": 0, "aov": 0}
+    for _ in range(sims):
+        ctrl, var = simulate(rng, n, sigma)
+        d = delta_result(ctrl, var)
+        for m, (c, v) in (("rpv", (ctrl, var)), ("aov", (_nonzero_part(ctrl), _nonzero_part(var)))):
+            lo, hi = boot_ci(c, v, rng)
+            for k, (l, h) in (("delta", (d[m]["ci_low"], d[m]["ci_high"])), ("bootstrap", (lo, hi))):
+                hits[f"{m}_{k}"]  += l <= truth[m] <= h
+                width[f"{m}_{k}"].append(h - l)
+        a0, a1 = simulate(rng, n, sigma, cr=(CR[0], CR[0]), aov=(AOV[0], AOV[0]))
+        d0 = delta_result(a0, a1)
+        for m in h0:
+            h0[m] += d0[m]["p"] <= ALPHA
+    return {"users": n, "sigma": sigma,
+            "coverage": {k: v / sims for k, v in hits.items()},
+            "mean_width": {k: float(np.mean(v)) for k, v in width.items()},
+            "type_one_error": {m: v / sims for m, v in h0.items()}}
+
+
+def timing(n, sigma, repeat):
+    ctrl, var = simulate(np.random.default_rng(1), n, sigma)
+    args = (*sums(ctrl), *sums(var))
+    test_revenue_significance_delta(*args)
+    t = time.perf_counter()
+    for _ in range(repeat * 100):
+        test_revenue_significance_delta(*args)
+    delta_us = (time.perf_counter() - t) / (repeat * 100) * 1e6
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        test_revenue_significance_sparse(ctrl, var, ALPHA, N_BOOT)
+        samples.append(time.perf_counter() - t)
+    return {"users": n, "delta_us": delta_us, "bootstrap_ms": statistics.median(samples) * 1e3}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sims", type=int, default=300, help="Simulated tests per setting.")
+    parser.add_argument("--users", type=int, nargs="+", default=[2_000, 20_000], help="Users per arm.")
+    parser.add_argument("--sigma", type=float, nargs="+", default=[0.8, 1.5],
+                        help="Log-normal sigma of order values (0.8 is what reconstruct_revenue assumes).")
+    parser.add_argument("--timing-users", type=int, nargs="+", default=[10_000, 1_000_000],
+                        help="Users per arm for the cost comparison.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per timing.")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    test_revenue_significance_delta(2, 1, 1.0, 1.0, 2, 1, 1.0, 1.0)   # warm-up: SciPy imports
+    rows = [coverage(args.sims, n, s) for s in args.sigma for n in args.users]
+    cost = [timing(n, args.sigma[0], args.repeat) for n in args.timing_users]
+
+    print(f"{args.sims} simulated tests per row, {int((1 - ALPHA) * 100)}% intervals on the difference in means")
+    print(f"{'users/arm':>10}{'sigma':>7}   {'RPV delta':>9}{'RPV boot':>10}{'AOV delta':>11}{'AOV boot':>10}"
+          f"   {'RPV width δ/boot':>16}   {'type I (RPV / AOV)':>18}")
+    for r in rows:
+        c, w = r["coverage"], r["mean_width"]
+        print(f"{r['users']:>10,}{r['sigma']:>7.1f}   {c['rpv_delta']:>9.3f}{c['rpv_bootstrap']:>10.3f}"
+              f"{c['aov_delta']:>11.3f}{c['aov_bootstrap']:>10.3f}"
+              f"   {w['rpv_delta'] / w['rpv_bootstrap']:>16.3f}"
+              f"   {r['type_one_error']['rpv']:>8.3f} / {r['type_one_error']['aov']:.3f}")
+    print(f"\n{'users/arm':>10}{'delta (µs)':>12}{'MW + bootstrap (ms)':>22}{'speedup':>11}")
+    for r in cost:
+        print(f"{r['users']:>10,}{r['delta_us']:>12.1f}{r['bootstrap_ms']:>22.1f}"
+              f"{r['bootstrap_ms'] * 1e3 / r['delta_us']:>10,.0f}x")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "alpha": ALPHA, "sims": args.sims, "n_boot": N_BOOT,
+                       "coverage": rows, "timing": cost}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Cold-start import time of the analysis modules.
+
+Each measurement runs in a fresh interpreter so nothing is cached in
+sys.modules. "monolith (pre-split)" imports the same third-party stack the
+original single-file app loaded at module top, which any reuse of its
+functions had to pay.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --repeat 10 --json import_times.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    "ab_engine": "import ab_engine",
+    "ab_report": "import ab_report",
+    "ab_batch":  "import ab_batch",
+    "monolith (pre-split)": (
+        "import streamlit, numpy, pandas, matplotlib.pyplot, openai, "
+        "plotly.graph_objects, plotly.figure_factory, scipy.stats, "
+        "statsmodels.stats.proportion, statsmodels.stats.power, statsmodels.stats.multitest"
+    ),
+}
+
+_SNIPPET = "import time; t = time.perf_counter(); {stmt}; print(time.perf_counter() - t)"
+
+
+def time_import(stmt, repeat):
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _SNIPPET.format(stmt=stmt)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per target.")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, stmt in TARGETS.items():
+        samples = time_import(stmt, args.repeat)
+        results[name] = {"min_ms": min(samples) * 1e3, "median_ms": statistics.median(samples) * 1e3}
+
+    base = results["monolith (pre-split)"]["median_ms"]
+    print(f"{'module':<24}{'min (ms)':>10}{'median (ms)':>13}{'vs monolith':>13}")
+    for name, r in results.items():
+        print(f"{name:<24}{r['min_ms']:>10.1f}{r['median_ms']:>13.1f}{base / r['median_ms']:>12.1f}x")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "repeat": args.repeat, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Incremental daily updates vs full recomputation over a long-running test.
+
+Simulates --days days of traffic with observed order values. At checkpoint
+days it times what a daily refresh costs:
+  full         — z-tests + MCC, Bayesian P(best) and the revenue tests
+                 (Mann-Whitney + bootstrap) on all data so far
+  incremental  — incremental_update with the day's data + incremental_results
+and, on the last day, how far the incremental revenue results are from the
+full ones (sketch Mann-Whitney and Poisson bootstrap vs exact values).
+
+    python benchmarks/bench_incremental.py
+    python benchmarks/bench_incremental.py --days 90 --users 50000 --json incremental.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ab_engine import (ArmTable, NumpyEncoder, calculate_bayesian_multivariate,   # noqa: E402
+                       incremental_init, incremental_results, incremental_update,
+                       run_multivariate_analysis, select_best_variation, sketch_order_values,
+                       sparse_revenue, test_revenue_significance_sparse)
+
+NAMES = ["Control", "Variation A", "Variation B", "Variation C"]
+CR    = [0.100, 0.103, 0.100, 0.098]
+AOV   = [50.0, 50.0, 52.0, 50.0]
+SIGMA = 0.8
+
+
+def full_refresh(users, conv, rev, orders):
+    arms   = ArmTable(NAMES, users, conv, rev, conv)
+    mv     = run_multivariate_analysis(arms, 0.05, "holm")
+    calculate_bayesian_multivariate(arms)
+    best   = NAMES.index(select_best_variation(mv)["name"])
+    ctrl_v = np.concatenate(orders[0])
+    best_v = np.concatenate(orders[best])
+    return test_revenue_significance_sparse(sparse_revenue(ctrl_v, users[0]), sparse_revenue(best_v, users[best]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=60, help="Days of traffic.")
+    parser.add_argument("--users", type=int, default=10_000, help="New users per arm per day.")
+    parser.add_argument("--checkpoints", type=int, nargs="+", default=[1, 7, 30, 60],
+                        help="Days at which the full recomputation is timed.")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file.")
+    args = parser.parse_args(argv)
+    checkpoints = sorted({min(d, args.days) for d in args.checkpoints})
+
+    rng    = np.random.default_rng(0)
+    k      = len(NAMES)
+    users  = np.zeros(k, dtype=np.int64)
+    conv   = np.zeros(k, dtype=np.int64)
+    rev    = np.zeros(k)
+    orders = [[] for _ in range(k)]
+    state  = incremental_init(NAMES)
+    incremental_results(incremental_update(state, {f: np.ones(k) for f in ("users", "conv", "rev", "prod")}))  # warm-up
+    rows = []
+    for day in range(1, args.days + 1):
+        u = rng.binomial(2 * args.users, 0.5, k)
+        c = rng.binomial(u, CR)
+        new = [rng.lognormal(np.log(a) - SIGMA ** 2 / 2, SIGMA, n) for a, n in zip(AOV, c)]
+        users += u
+        conv  += c
+        rev   += [o.sum() for o in new]
+        for i, o in enumerate(new):
+            orders[i].append(o)
+
+        t = time.perf_counter()
+        state = incremental_update(state, {"users": u, "conv": c, "rev": [o.sum() for o in new], "prod": c},
+                                   [sketch_order_values(o) for o in new])
+        inc = incremental_results(state)
+        inc_ms = (time.perf_counter() - t) * 1e3
+
+        if day in checkpoints:
+            t = time.perf_counter()
+            full = full_refresh(users, conv, rev, orders)
+            rows.append({"day": day, "users_per_arm": int(users.mean()), "full_ms": (time.perf_counter() - t) * 1e3,
+                         "incremental_ms": inc_ms})
+
+    accuracy = {m: {"mw_p_full": full[m]["mw_p"], "mw_p_incremental": inc["rev_sig"][m]["mw_p"],
+                    "ci_full": [full[m]["boot_ci_low"], full[m]["boot_ci_high"]],
+                    "ci_incremental": [inc["rev_sig"][m]["boot_ci_low"], inc["rev_sig"][m]["boot_ci_high"]]}
+                for m in ("rpv", "aov")}
+    state_kb = len(json.dumps(state, cls=NumpyEncoder)) / 1e3
+
+    print(f"{'day':>5}{'users/arm':>12}{'full (ms)':>12}{'incremental (ms)':>19}{'speedup':>10}")
+    for r in rows:
+        print(f"{r['day']:>5}{r['users_per_arm']:>12,}{r['full_ms']:>12.1f}{r['incremental_ms']:>19.1f}"
+              f"{r['full_ms'] / r['incremental_ms']:>9.1f}x")
+    print(f"\nday {args.days}, best variation vs Control ({len(NAMES)} arms, state {state_kb:.0f} kB as JSON):")
+    for m, a in accuracy.items():
+        print(f"  {m.upper():<4} Mann-Whitney p  full {a['mw_p_full']:.4g}   incremental {a['mw_p_incremental']:.4g}")
+        print(f"       bootstrap CI    full [{a['ci_full'][0]:+.4f}, {a['ci_full'][1]:+.4f}]   "
+              f"incremental [{a['ci_incremental'][0]:+.4f}, {a['ci_incremental'][1]:+.4f}]")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "days": args.days, "users_per_day": args.users,
+                       "arms": k, "state_kb": state_kb, "timing": rows, "accuracy": accuracy}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+PDF report generation time for A/B and A/B/n snapshots.
+
+Scenarios per group count:
+  serial  — charts rendered one after another in-process (workers=1), empty chart cache
+  pool    — charts spread over a warm process pool, empty chart cache
+  cached  — same inputs again: every chart comes from the chart cache
+
+    python benchmarks/bench_pdf.py
+    python benchmarks/bench_pdf.py --repeat 5 --workers 4 --json pdf_times.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ab_report                                   # noqa: E402
+from ab_engine import DEFAULT_INPUTS, analyze_snapshot   # noqa: E402
+
+
+VARIATIONS = {"name": ["Variation A", "Variation B", "Variation C"], "users": [5000, 5000, 5000],
+              "conv": [600, 560, 540], "rev": [33000.0, 30000.0, 28000.0], "prod": [1000, 900, 850]}
+
+
+def report_args(num_variations):
+    variations = {k: v[:num_variations] for k, v in VARIATIONS.items()}
+    state = dict(DEFAULT_INPUTS, num_variations=num_variations, variations=variations, num_segments=2,
+                 seg0_uc=2500, seg0_cc=240, seg0_rc=12000.0, seg0_uv=2500, seg0_cv=300, seg0_rv=16000.0,
+                 seg1_uc=2500, seg1_cc=260, seg1_rc=13000.0, seg1_uv=2500, seg1_cv=300, seg1_rv=17000.0)
+    res = analyze_snapshot(state)
+    return (
+        (res["mv"], res["bayes"], res["rev_sig"], res["guardrail_results"], res["duration_checks"],
+         res["p_srm"], res["groups"], state["days"], state["conf_level"], state["primary_goal"],
+         res["ctrl_m"], res["best_m"]),
+        {"segment_results": res["segment_results"]},
+    )
+
+
+def time_report(args, kwargs, workers, clear_cache, repeat):
+    samples = []
+    for _ in range(repeat):
+        if clear_cache:
+            ab_report._chart_cache.clear()
+        t = time.perf_counter()
+        ab_report.generate_pdf_report(*args, workers=workers, **kwargs)
+        samples.append(time.perf_counter() - t)
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Reports per scenario.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Chart worker processes.")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    # Warm-up: imports, font cache and pool start-up are one-off costs, not per report
+    warm_args, warm_kwargs = report_args(1)
+    ab_report.generate_pdf_report(*warm_args, workers=1, **warm_kwargs)
+    if args.workers > 1:
+        ab_report._chart_cache.clear()
+        ab_report.generate_pdf_report(*warm_args, workers=args.workers, **warm_kwargs)
+
+    results = {}
+    for n_var in (1, 3):
+        rargs, rkwargs = report_args(n_var)
+        label = f"{n_var + 1} groups"
+        results[label] = {}
+        for scenario, workers, clear in (("serial", 1, True), ("pool", args.workers, True), ("cached", 1, False)):
+            samples = time_report(rargs, rkwargs, workers, clear, args.repeat)
+            results[label][scenario] = {"min_ms": min(samples) * 1e3, "median_ms": statistics.median(samples) * 1e3}
+
+    print(f"{'report':<10}{'scenario':<10}{'min (ms)':>10}{'median (ms)':>13}{'vs serial':>11}")
+    for label, scen in results.items():
+        base = scen["serial"]["median_ms"]
+        for name, r in scen.items():
+            print(f"{label:<10}{name:<10}{r['min_ms']:>10.1f}{r['median_ms']:>13.1f}{base / r['median_ms']:>10.1f}x")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "workers": args.workers,
+                       "repeat": args.repeat, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+PDF chart formats: vector drawings vs PNG rasters.
+
+Per chart: render time (empty chart cache) and embedded size — PNG bytes vs
+the same chart as a one-page vector PDF. Per report: generation time and
+PDF file size with each format.
+
+    python benchmarks/bench_pdf_charts.py
+    python benchmarks/bench_pdf_charts.py --repeat 5 --json chart_formats.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ab_report                      # noqa: E402
+from bench_pdf import report_args     # noqa: E402
+
+FORMATS = ("png", "vector")
+
+
+def chart_bytes(chart):
+    if isinstance(chart, bytes):
+        return len(chart)
+    from reportlab.graphics import renderPDF
+    return len(renderPDF.drawToString(chart))
+
+
+def time_median(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        samples.append(time.perf_counter() - t)
+    return statistics.median(samples) * 1e3, out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Renders per chart / reports per format.")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    rargs, rkwargs = report_args(3)
+    mv, groups, ctrl_m, best_m = rargs[0], rargs[6], rargs[10], rargs[11]
+    specs = ab_report.report_chart_specs(mv["metrics"], groups, ctrl_m, best_m, rkwargs["segment_results"])
+    for fmt in FORMATS:      # warm-up: imports and font caches
+        ab_report.render_chart(*specs[0], fmt)
+
+    charts = {}
+    for kind, data in specs:
+        charts[kind] = {}
+        for fmt in FORMATS:
+            ms, chart = time_median(lambda: ab_report.render_chart(kind, data, fmt), args.repeat)
+            charts[kind][fmt] = {"median_ms": ms, "bytes": chart_bytes(chart)}
+
+    reports = {}
+    for fmt in FORMATS:
+        def build():
+            ab_report._chart_cache.clear()
+            return ab_report.generate_pdf_report(*rargs, workers=1, chart_format=fmt, **rkwargs)
+        ms, pdf = time_median(build, args.repeat)
+        reports[fmt] = {"median_ms": ms, "bytes": len(pdf)}
+
+    print(f"{'chart':<18}{'png (ms)':>10}{'vector (ms)':>13}{'png (KB)':>10}{'vector (KB)':>13}")
+    for kind, r in list(charts.items()) + [("full report", reports)]:
+        print(f"{kind:<18}{r['png']['median_ms']:>10.1f}{r['vector']['median_ms']:>13.1f}"
+              f"{r['png']['bytes'] / 1024:>10.1f}{r['vector']['bytes'] / 1024:>13.1f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "repeat": args.repeat, "png_dpi": ab_report.PDF_CHART_DPI,
+                       "charts": charts, "report": reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Portfolio analysis: many concurrent experiments in one stacked pass.
+
+Builds a portfolio of --experiments experiments with 2-6 arms each, a share
+of them reusing another experiment's control, and times:
+  stacked     — analyze_portfolio on the whole table (z-tests, chi-square and
+                per-experiment correction per arm-count bucket, then BH across
+                every comparison)
+  sequential  — run_multivariate_analysis once per experiment, as opening
+                each one in the dashboard would, plus the same BH step
+and checks that both give the same per-experiment p-values.
+
+    python benchmarks/bench_portfolio.py
+    python benchmarks/bench_portfolio.py --experiments 500 2000 5000 --json portfolio.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ab_engine import ArmTable, analyze_portfolio, p_adjust, run_multivariate_analysis   # noqa: E402
+
+ALPHA       = 0.05
+SHARED_FRAC = 0.2        # experiments that reuse another experiment's control
+
+
+def make_portfolio(n_experiments, seed=0):
+    """Columnar one-row-per-arm table; shared-control experiments list only their variations."""
+    rng   = np.random.default_rng(seed)
+    table = {k: [] for k in ("experiment", "arm", "users", "conv", "rev", "prod", "shared_control")}
+    owners = []
+    for e in range(n_experiments):
+        name   = f"exp_{e:05d}"
+        shared = owners[rng.integers(len(owners))] if owners and rng.random() < SHARED_FRAC else ""
+        k      = int(rng.integers(2, 7))
+        base   = rng.uniform(0.02, 0.15)
+        arms   = [f"Variation {chr(65 + i)}" for i in range(k - 1)] if shared else \
+                 ["Control"] + [f"Variation {chr(65 + i)}" for i in range(k - 1)]
+        for arm in arms:
+            users = int(rng.integers(5_000, 200_000))
+            cr    = base * (1 if arm == "Control" else rng.normal(1.0, 0.05))
+            conv  = int(rng.binomial(users, min(max(cr, 1e-4), 1)))
+            table["experiment"].append(name)
+            table["arm"].append(arm)
+            table["users"].append(users)
+            table["conv"].append(conv)
+            table["rev"].append(conv * rng.uniform(30, 80))
+            table["prod"].append(conv)
+            table["shared_control"].append(shared)
+        if not shared:
+            owners.append(name)
+    return table
+
+
+def sequential(table, mc_method="holm"):
+    """One run_multivariate_analysis per experiment, then BH over all comparisons."""
+    rows_of = {}
+    for i, e in enumerate(table["experiment"]):
+        rows_of.setdefault(e, []).append(i)
+    ctrl = {e: rows[0] for e, rows in rows_of.items() if not table["shared_control"][rows[0]]}
+    p_adj, p_raw = {}, []
+    for e, rows in rows_of.items():
+        ref  = table["shared_control"][rows[0]]
+        rows = [ctrl[ref]] + rows if ref else rows
+        arms = ArmTable([table["arm"][i] for i in rows], *([table[f][i] for i in rows]
+                                                            for f in ("users", "conv", "rev", "prod")))
+        mv   = run_multivariate_analysis(arms, ALPHA, mc_method)
+        for pw in mv["pairwise"]:
+            p_adj[(e, pw["name"])] = pw["p_adjusted"]
+            p_raw.append(pw["p_raw"])
+    p_adjust(np.asarray(p_raw), ALPHA, "fdr_bh")
+    return p_adj
+
+
+def time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return statistics.median(samples) * 1e3
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--experiments", type=int, nargs="+", default=[50, 500, 2000],
+                        help="Portfolio sizes to time.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per timing (median reported).")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    analyze_portfolio(make_portfolio(5), ALPHA)   # warm-up: SciPy imports
+    rows, failed = [], 0
+    for n in args.experiments:
+        table  = make_portfolio(n)
+        result = analyze_portfolio(table, ALPHA)
+        c      = result["comparisons"]
+        ref    = sequential(table)
+        err    = max(abs(p - ref[(e, a)]) for e, a, p in zip(c["experiment"], c["arm"], c["p_adjusted"]))
+        failed += err > 1e-9
+        rows.append({"experiments": n, "comparisons": result["n_comparisons"],
+                     "significant": int(sum(c["significant_portfolio"])),
+                     "stacked_ms": time_ms(lambda: analyze_portfolio(table, ALPHA), args.repeat),
+                     "sequential_ms": time_ms(lambda: sequential(table), max(1, args.repeat // 2)),
+                     "max_abs_p_diff": err})
+
+    print(f"{'experiments':>12}{'comparisons':>13}{'sig. (BH)':>11}{'stacked (ms)':>14}{'sequential (ms)':>17}"
+          f"{'speedup':>10}{'max |Δp|':>11}")
+    for r in rows:
+        print(f"{r['experiments']:>12,}{r['comparisons']:>13,}{r['significant']:>11,}{r['stacked_ms']:>14.1f}"
+              f"{r['sequential_ms']:>17.1f}{r['sequential_ms'] / r['stacked_ms']:>9.1f}x{r['max_abs_p_diff']:>11.1e}"
+              + ("   MISMATCH" if r["max_abs_p_diff"] > 1e-9 else ""))
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "alpha": ALPHA, "timing": rows}, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Group-sequential boundaries: accuracy and cost.
+
+Accuracy: Lan-DeMets boundaries for equally spaced looks against the
+published two-sided α = 0.05 values (gsDesign / ldbounds), and the overall
+type I error of each design from simulated Brownian paths under H0.
+
+Cost per design: cold (empty cache), one more look on a cached design (what
+a daily check costs), and a repeated look (cache hit).
+
+    python benchmarks/bench_sequential.py
+    python benchmarks/bench_sequential.py --paths 2000000 --json sequential.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ab_engine                                 # noqa: E402
+from ab_engine import sequential_boundaries      # noqa: E402
+
+ALPHA = 0.05
+# Two-sided α = 0.05, equally spaced looks (gsDesign sfLDOF / sfLDPocock, test.type = 2)
+PUBLISHED = {
+    ("obrien_fleming", 4): [4.3326, 2.9631, 2.3590, 2.0141],
+    ("obrien_fleming", 5): [4.8769, 3.3569, 2.6803, 2.2898, 2.0310],
+    ("pocock", 4):         [2.3680, 2.3675, 2.3582, 2.3500],
+    ("pocock", 5):         [2.4380, 2.4268, 2.4101, 2.3966, 2.3859],
+}
+TOL = 2e-3
+
+
+def equal_looks(k):
+    return [(i + 1) / k for i in range(k)]
+
+
+def type_one_error(bounds, fractions, n_paths, seed=0):
+    """Share of H0 Brownian paths that cross a boundary at any look."""
+    rng = np.random.default_rng(seed)
+    t   = np.asarray(fractions)
+    inc = rng.standard_normal((n_paths, len(t))) * np.sqrt(np.diff(t, prepend=0.0))
+    z   = np.cumsum(inc, axis=1) / np.sqrt(t)
+    return float(np.mean((np.abs(z) >= np.asarray(bounds)).any(axis=1)))
+
+
+def time_ms(fn):
+    t = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t) * 1e3
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--paths", type=int, default=400_000, help="Simulated paths per type I error check.")
+    parser.add_argument("--looks", type=int, nargs="+", default=[2, 5, 10, 20], help="Look counts to time.")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    sequential_boundaries([0.5, 1.0], ALPHA)   # warm-up: SciPy imports
+    accuracy, failed = [], 0
+    for (spending, k), expected in PUBLISHED.items():
+        got   = sequential_boundaries(equal_looks(k), ALPHA, spending)["z_bound"]
+        err   = max(abs(a - b) for a, b in zip(got, expected))
+        alpha = type_one_error(got, equal_looks(k), args.paths)
+        se    = np.sqrt(ALPHA * (1 - ALPHA) / args.paths)
+        ok    = err < TOL and abs(alpha - ALPHA) < 4 * se
+        failed += not ok
+        accuracy.append({"spending": spending, "looks": k, "z_bound": got, "max_abs_error": err,
+                         "simulated_alpha": alpha, "ok": ok})
+
+    timing = []
+    for spending in ab_engine.SEQ_SPENDING:
+        for k in args.looks:
+            fr = equal_looks(k)
+            ab_engine._sequential_design.cache_clear()
+            cold = time_ms(lambda: sequential_boundaries(fr, ALPHA, spending))
+            ab_engine._sequential_design.cache_clear()
+            if k > 1:
+                sequential_boundaries(fr[:-1], ALPHA, spending)
+            step = time_ms(lambda: sequential_boundaries(fr, ALPHA, spending))
+            hits = [time_ms(lambda: sequential_boundaries(fr, ALPHA, spending)) for _ in range(20)]
+            timing.append({"spending": spending, "looks": k, "cold_ms": cold, "next_look_ms": step,
+                           "cached_ms": statistics.median(hits)})
+
+    print(f"{'design':<22}{'max |Δz|':>10}{'sim. alpha':>12}   boundaries")
+    for a in accuracy:
+        print(f"{a['spending'] + ' x' + str(a['looks']):<22}{a['max_abs_error']:>10.5f}{a['simulated_alpha']:>12.4f}   "
+              + " ".join(f"{b:.4f}" for b in a["z_bound"]) + ("" if a["ok"] else "   MISMATCH"))
+    print(f"\n{'design':<22}{'cold (ms)':>11}{'next look (ms)':>16}{'cached (ms)':>13}")
+    for r in timing:
+        print(f"{r['spending'] + ' x' + str(r['looks']):<22}{r['cold_ms']:>11.2f}{r['next_look_ms']:>16.2f}"
+              f"{r['cached_ms']:>13.3f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "alpha": ALPHA, "paths": args.paths,
+                       "accuracy": accuracy, "timing": timing}, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
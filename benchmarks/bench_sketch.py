@@ -0,0 +1,107 @@
+"""
+Order-value sketches vs raw per-user revenue: size, merging and accuracy.
+
+For each --orders size, one simulated test (log-normal order values,
+20 visitors per converter) is analysed twice, once from
+  raw     — every converter's revenue (the "revenue_values" snapshot block)
+  sketch  — the per-arm log-bucket sketch (the "revenue_sketch" block)
+and compares snapshot size, Mann-Whitney p-values (RPV and AOV), the
+order-value quantiles against np.quantile on the raw values, and the cost
+of the quantile treatment effects. The sketch is also built from --days
+daily partitions with merge_sketches and checked to be identical.
+
+    python benchmarks/bench_sketch.py
+    python benchmarks/bench_sketch.py --orders 10000 1000000 10000000 --json sketch.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ab_engine import (QTE_QUANTILES, NumpyEncoder, merge_sketches, quantile_treatment_effects,   # noqa: E402
+                       sketch_order_values, sketch_quantiles, sketch_sparse, sparse_revenue,
+                       test_revenue_significance_sparse)
+
+AOV   = (50.0, 51.0)
+SIGMA = 0.8
+VISITORS_PER_CONVERTER = 20
+
+
+def simulate(rng, n_orders):
+    """Per-arm order values (log-normal, mean AOV) for Control and the variation."""
+    return [rng.lognormal(np.log(a) - SIGMA ** 2 / 2, SIGMA, n_orders) for a in AOV]
+
+
+def json_kb(obj):
+    return len(json.dumps(obj, cls=NumpyEncoder, separators=(",", ":"))) / 1e3
+
+
+def run(n_orders, days, seed=0):
+    rng    = np.random.default_rng(seed)
+    values = simulate(rng, n_orders)
+    users  = n_orders * VISITORS_PER_CONVERTER
+
+    t = time.perf_counter()
+    sketches = [sketch_order_values(v) for v in values]
+    build_ms = (time.perf_counter() - t) * 1e3 / 2
+    merged = []
+    for v in values:
+        acc = {"index": [], "count": []}
+        for day in np.array_split(v, days):
+            acc = merge_sketches(acc, sketch_order_values(day))
+        merged.append(acc)
+
+    raw = [sparse_revenue(v, users) for v in values]
+    sk  = [sketch_sparse(s, users) for s in sketches]
+    mw  = {label: test_revenue_significance_sparse(*samples, n_boot=200)
+           for label, samples in (("raw", raw), ("sketch", sk))}
+    exact  = np.quantile(values[0], QTE_QUANTILES)
+    approx = sketch_quantiles(sketches[0], QTE_QUANTILES)
+    quantile_treatment_effects(*sk[:2], n_boot=20)   # warm-up
+    t = time.perf_counter()
+    qte = quantile_treatment_effects(*sk)
+    qte_ms = (time.perf_counter() - t) * 1e3
+    return {"orders_per_arm": n_orders,
+            "raw_kb_per_arm": json_kb(values[0].tolist()), "sketch_kb_per_arm": json_kb(sketches[0]),
+            "buckets": len(sketches[0]["index"]), "sketch_build_ms": build_ms,
+            "daily_merge_identical": all(m == s for m, s in zip(merged, sketches)),
+            "max_quantile_rel_error": float(np.max(np.abs(approx / exact - 1))),
+            "mw_p": {m: {k: mw[k][m]["mw_p"] for k in mw} for m in ("rpv", "aov")},
+            "qte_ms": qte_ms, "median_diff": qte["diff"][QTE_QUANTILES.index(0.5)],
+            "median_diff_exact": float(np.median(values[1]) - np.median(values[0]))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="Converters per arm.")
+    parser.add_argument("--days", type=int, default=30, help="Daily partitions merged into one sketch.")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    rows   = [run(n, args.days) for n in args.orders]
+    failed = not all(r["daily_merge_identical"] for r in rows)
+
+    print(f"{'orders/arm':>11}{'raw (kB)':>11}{'sketch (kB)':>13}{'buckets':>9}{'build (ms)':>12}"
+          f"{'max q err':>11}{'QTE (ms)':>10}   {'AOV MW p raw / sketch':>24}   merge")
+    for r in rows:
+        p = r["mw_p"]["aov"]
+        print(f"{r['orders_per_arm']:>11,}{r['raw_kb_per_arm']:>11,.0f}{r['sketch_kb_per_arm']:>13.1f}"
+              f"{r['buckets']:>9}{r['sketch_build_ms']:>12.1f}{r['max_quantile_rel_error'] * 100:>10.2f}%"
+              f"{r['qte_ms']:>10.0f}   {p['raw']:>11.3g} / {p['sketch']:<11.3g}   "
+              f"{'ok' if r['daily_merge_identical'] else 'MISMATCH'}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "days": args.days, "results": rows}, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
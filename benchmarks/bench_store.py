@@ -0,0 +1,112 @@
+"""
+Snapshot history: opening an experiment's trend vs re-analysing its snapshots.
+
+Builds a history of --days daily snapshots per experiment (several
+experiments, so the index has work to do), then times:
+  append  — analysing and storing one more day
+  trend   — the indexed per-arm trend query behind the History tab
+  replay  — what the same trend cost before: analyze_snapshot on every day,
+            estimated from a sample of days (the revenue bootstrap makes a
+            full replay take minutes)
+
+    python benchmarks/bench_store.py
+    python benchmarks/bench_store.py --days 180 --arms 8 --json store.json
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ab_engine import DEFAULT_INPUTS, analyze_snapshot   # noqa: E402
+from ab_store import SnapshotStore                       # noqa: E402
+
+START = datetime.date(2024, 1, 1)
+REPLAY_SAMPLE = 6      # days actually re-analysed for the replay estimate
+
+
+def daily_snapshots(days, n_arms, seed=0):
+    """Cumulative snapshots of one experiment, one per day."""
+    rng   = np.random.default_rng(seed)
+    cr    = rng.uniform(0.10, 0.13, n_arms)
+    users = np.zeros(n_arms, dtype=int)
+    conv  = np.zeros(n_arms, dtype=int)
+    out   = []
+    for day in range(days):
+        u = rng.integers(900, 1100, n_arms)
+        users += u
+        conv  += rng.binomial(u, cr)
+        rev    = conv * 55.0
+        out.append(dict(DEFAULT_INPUTS, days=day + 1, users_c=int(users[0]), conv_c=int(conv[0]),
+                        rev_c=float(rev[0]), prod_c=int(conv[0]), num_variations=n_arms - 1,
+                        variations={"name": [None] * (n_arms - 1), "users": users[1:].tolist(),
+                                    "conv": conv[1:].tolist(), "rev": rev[1:].tolist(),
+                                    "prod": conv[1:].tolist()}))
+    return out
+
+
+def time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return statistics.median(samples) * 1e3
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=90, help="Saved days per experiment.")
+    parser.add_argument("--arms", type=int, default=4, help="Arms per experiment (incl. Control).")
+    parser.add_argument("--experiments", type=int, default=20, help="Experiments in the history.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per timing.")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    snaps  = daily_snapshots(args.days, args.arms)
+    sample = list(range(0, args.days, max(1, args.days // REPLAY_SAMPLE)))
+    t = time.perf_counter()
+    sampled = {i: analyze_snapshot(snaps[i]) for i in sample}
+    per_day = (time.perf_counter() - t) * 1e3 / len(sample)
+    # Stored results: each day gets the analysis of the nearest sampled day at or before it
+    res = [sampled[max(j for j in sample if j <= i)] for i in range(args.days)]
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SnapshotStore(os.path.join(tmp, "history.db"))
+        t = time.perf_counter()
+        for e in range(args.experiments):
+            for day, (s, r) in enumerate(zip(snaps, res)):
+                store.append(f"exp_{e:03d}", START + datetime.timedelta(days=day), s, r)
+        fill = (time.perf_counter() - t) * 1e3 / (args.experiments * args.days)
+        results = {
+            "append_ms":        time_ms(lambda: store.append("exp_000", START, snaps[-1]), args.repeat),
+            "store_only_ms":    fill,
+            "trend_ms":         time_ms(lambda: store.trend("exp_007"), args.repeat),
+            "replay_ms":        per_day * args.days,
+            "db_bytes":         os.path.getsize(store.path),
+        }
+        assert len(store.trend("exp_007")["day"]) == args.days * args.arms
+
+    print(f"{args.experiments} experiments x {args.days} days x {args.arms} arms")
+    print(f"  append one day (analyse + store)   {results['append_ms']:9.2f} ms")
+    print(f"  store one analysed day             {results['store_only_ms']:9.2f} ms")
+    print(f"  open {args.days}-day trend (query)       {results['trend_ms']:9.2f} ms")
+    print(f"  re-analyse {args.days} snapshots (est.)   {results['replay_ms']:9.1f} ms   "
+          f"({results['replay_ms'] / results['trend_ms']:.0f}x slower)")
+    print(f"  database size                      {results['db_bytes'] / 1e6:9.2f} MB")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "days": args.days, "arms": args.arms,
+                       "experiments": args.experiments, "repeat": args.repeat, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
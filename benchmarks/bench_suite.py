@@ -0,0 +1,191 @@
+"""
+Hot-path benchmark suite: time and peak memory of every core computation.
+
+Each case runs over the parts of the grid it depends on — users per arm
+(--users, default 1k to 10M) and arms including Control (--arms, default
+2 to 30). Cases that only see two arms run on the users axis alone, and
+the PDF report on the arms axis alone:
+
+  multivariate       run_multivariate_analysis (z-tests, chi-square, MCC)
+  bayes_multivariate calculate_bayesian_multivariate (exact P(best), loss)
+  bayes_risk         calculate_bayesian_risk, Control vs one variation
+  revenue_tests      test_revenue_significance (reconstruction, MW, bootstrap)
+  reconstruct        reconstruct_revenue
+  cr_bootstrap       the dashboard's bootstrap tab: simulate_cr_bootstrap
+                     plus the CI percentiles and histogram
+  power_solver       the power-curve tab: power_grid over 120 sample sizes
+                     × 3 MDEs, and required_n_table
+  pdf_report         generate_pdf_report (serial charts, empty chart cache)
+
+Time is the median of --repeat runs after a warm-up. Peak memory is a
+separate run under tracemalloc (NumPy buffers included). Everything is
+seeded, so two versions of the code see identical inputs. With --compare,
+each result is set against an earlier --json file on its fastest run (less
+noisy than the median for sub-millisecond cases), and the script exits
+non-zero when a case got slower than --threshold times its old time.
+
+    python benchmarks/bench_suite.py --json before.json
+    python benchmarks/bench_suite.py --compare before.json --json after.json
+    python benchmarks/bench_suite.py --cases multivariate bayes_multivariate --users 1000 10000000 --arms 2 30
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ab_report                                          # noqa: E402
+from ab_engine import (ArmTable, DEFAULT_INPUTS, analyze_snapshot, calculate_bayesian_multivariate,   # noqa: E402
+                       calculate_bayesian_risk, power_grid, reconstruct_revenue, required_n_table,
+                       run_multivariate_analysis, simulate_cr_bootstrap, test_revenue_significance)
+
+ALPHA    = 0.05
+BASE_CR  = 0.05
+AOV      = 50.0
+PDF_USERS = 10_000   # users per arm of the PDF case (its cost depends on arms, not traffic)
+
+
+def make_arms(users, n_arms, seed=0):
+    """ArmTable of n_arms arms with `users` users each, CR around BASE_CR and AOV around AOV."""
+    rng  = np.random.default_rng(seed)
+    cr   = BASE_CR * rng.uniform(0.95, 1.05, n_arms)
+    conv = rng.binomial(users, cr)
+    rev  = conv * AOV * rng.uniform(0.97, 1.03, n_arms)
+    return ArmTable(["Control"] + [f"Variation {i}" for i in range(1, n_arms)],
+                    np.full(n_arms, users), conv, rev, conv)
+
+
+def _bootstrap_tab(uc, cc, uv, cv):
+    sim_c, sim_v = simulate_cr_bootstrap(uc, cc, uv, cv)
+    diffs = sim_v - sim_c
+    np.percentile(diffs, [ALPHA / 2 * 100, (1 - ALPHA / 2) * 100])
+    np.histogram(diffs, bins=80)
+
+
+def _power_tab(users):
+    mdes = [2.0, 5.0, 10.0]
+    power_grid(BASE_CR * 100, mdes, np.linspace(100, users, 120), ALPHA)
+    required_n_table(BASE_CR * 100, mdes, ALPHA, power=0.8, daily_traffic=users)
+
+
+def _pdf(n_arms):
+    arms  = make_arms(PDF_USERS, n_arms)
+    state = dict(DEFAULT_INPUTS, num_variations=n_arms - 1,
+                 variations={"name": arms.names[1:], **{f: getattr(arms, f)[1:].tolist()
+                                                        for f in ("users", "conv", "rev", "prod")}},
+                 **{f"{f}_c": getattr(arms, f)[0].item() for f in ("users", "conv", "rev", "prod")})
+    res   = analyze_snapshot(state)
+
+    def run():
+        ab_report._chart_cache.clear()
+        ab_report.generate_snapshot_report(res, workers=1)
+    return run
+
+
+# name -> (axes, setup(users, arms) returning the zero-argument call to measure)
+CASES = {
+    "multivariate":       (("users", "arms"),
+                           lambda u, k: (lambda a=make_arms(u, k): run_multivariate_analysis(a, ALPHA, "holm"))),
+    "bayes_multivariate": (("users", "arms"),
+                           lambda u, k: (lambda a=make_arms(u, k): calculate_bayesian_multivariate(a))),
+    "bayes_risk":         (("users",),
+                           lambda u, k: (lambda a=make_arms(u, 2): calculate_bayesian_risk(
+                               a.conv[0] + 1, a.users[0] - a.conv[0] + 1, a.conv[1] + 1, a.users[1] - a.conv[1] + 1))),
+    "revenue_tests":      (("users",),
+                           lambda u, k: (lambda a=make_arms(u, 2): test_revenue_significance(
+                               a.users[0], a.conv[0], a.rev[0], a.users[1], a.conv[1], a.rev[1], ALPHA))),
+    "reconstruct":        (("users",),
+                           lambda u, k: (lambda a=make_arms(u, 2): reconstruct_revenue(a.users[0], a.conv[0], a.rev[0]))),
+    "cr_bootstrap":       (("users",),
+                           lambda u, k: (lambda a=make_arms(u, 2): _bootstrap_tab(a.users[0], a.conv[0],
+                                                                                  a.users[1], a.conv[1]))),
+    "power_solver":       (("users",), lambda u, k: (lambda: _power_tab(u))),
+    "pdf_report":         (("arms",),  lambda u, k: _pdf(k)),
+}
+
+
+def measure(fn, repeat):
+    """(median ms, min ms, peak kB) of fn: timed runs after a warm-up, then one run under tracemalloc."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return statistics.median(samples) * 1e3, min(samples) * 1e3, peak / 1e3
+
+
+def grid(axes, users, arms):
+    """(users, arms) points a case runs on: only the axes it depends on vary."""
+    return [(u, k) for u in (users if "users" in axes else [PDF_USERS])
+            for k in (arms if "arms" in axes else [2])]
+
+
+def compare(rows, baseline_path, threshold):
+    """Print each case against a baseline JSON; returns how many got slower than threshold × old."""
+    with open(baseline_path) as f:
+        old = {(r["case"], r["users_per_arm"], r["arms"]): r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path}:")
+    print(f"{'case':<20}{'users/arm':>12}{'arms':>6}{'old min (ms)':>14}{'new min (ms)':>14}{'ratio':>8}"
+          f"{'peak ratio':>12}")
+    slower = 0
+    for r in rows:
+        o = old.get((r["case"], r["users_per_arm"], r["arms"]))
+        if o is None:
+            continue
+        ratio = r["min_ms"] / o["min_ms"] if o["min_ms"] > 0 else float("inf")
+        flag  = ratio > threshold
+        slower += flag
+        print(f"{r['case']:<20}{r['users_per_arm']:>12,}{r['arms']:>6}{o['min_ms']:>14.3f}{r['min_ms']:>14.3f}"
+              f"{ratio:>7.2f}x{r['peak_kb'] / max(o['peak_kb'], 1e-9):>11.2f}x" + ("   SLOWER" if flag else ""))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES), help="Cases to run.")
+    parser.add_argument("--users", type=int, nargs="+", default=[1_000, 100_000, 10_000_000],
+                        help="Users per arm.")
+    parser.add_argument("--arms", type=int, nargs="+", default=[2, 10, 30], help="Arms, including Control.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per point (median reported).")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file.")
+    parser.add_argument("--compare", help="Earlier --json output to compare against.")
+    parser.add_argument("--threshold", type=float, default=1.5,
+                        help="With --compare, fail when a case is slower than this multiple of its old time.")
+    args = parser.parse_args(argv)
+
+    rows = []
+    print(f"{'case':<20}{'users/arm':>12}{'arms':>6}{'median (ms)':>14}{'min (ms)':>11}{'peak (kB)':>12}")
+    for name in args.cases:
+        axes, setup = CASES[name]
+        for users, arms in grid(axes, args.users, args.arms):
+            median_ms, min_ms, peak_kb = measure(setup(users, arms), args.repeat if name != "pdf_report"
+                                                 else max(1, args.repeat // 2))
+            rows.append({"case": name, "users_per_arm": users, "arms": arms,
+                         "median_ms": median_ms, "min_ms": min_ms, "peak_kb": peak_kb})
+            print(f"{name:<20}{users:>12,}{arms:>6}{median_ms:>14.3f}{min_ms:>11.3f}{peak_kb:>12,.0f}")
+
+    slower = compare(rows, args.compare, args.threshold) if args.compare else 0
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "numpy": np.__version__, "platform": platform.platform(),
+                       "cpus": os.cpu_count(), "repeat": args.repeat, "results": rows}, f, indent=2)
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
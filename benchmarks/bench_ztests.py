@@ -0,0 +1,214 @@
+"""
+NumPy multi-arm tests vs the statsmodels / SciPy calls they replace.
+
+Validation: on random experiments (2–30 arms, incl. degenerate ones with
+empty arms or conv > users) and for each MCC method, the NumPy path must
+reproduce proportions_ztest per pair, chi2_contingency and multipletests —
+z, raw / adjusted p-values, reject flags, chi-square and its p-value. Stacked
+(experiments × arms) results must equal the per-experiment ones.
+
+All-pairs mode is checked the same way: run_all_pairs_analysis against
+proportions_ztest for every pair and multipletests across all of them.
+
+Speed: the per-pair statsmodels loop vs multivariate_arrays for one
+experiment at growing arm counts, and for a stack of many 4-arm experiments
+analysed in one call; then every-arm-vs-every-arm at 10–100 arms. Most of the statsmodels time per experiment is the
+gc.collect() multipletests runs on every call.
+
+    python benchmarks/bench_ztests.py
+    python benchmarks/bench_ztests.py --cases 2000 --repeat 5 --json ztests.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import warnings
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ab_engine import ArmTable, multivariate_arrays, run_all_pairs_analysis   # noqa: E402
+
+METHODS = ("holm", "bonferroni", "fdr_bh")
+ALPHA   = 0.05
+RTOL    = 1e-9
+
+
+def reference(users, conv, alpha, method):
+    """One experiment through statsmodels / SciPy, one call per variation."""
+    from scipy.stats import chi2_contingency
+    from statsmodels.stats.multitest import multipletests
+    from statsmodels.stats.proportion import proportions_ztest
+    try:
+        chi2, p_global, _, _ = chi2_contingency(np.column_stack([conv, users - conv]))
+    except Exception:
+        chi2, p_global = 0.0, 1.0
+    z, p = [], []
+    for i in range(1, len(users)):
+        try:
+            zi, pi = proportions_ztest([conv[0], conv[i]], [users[0], users[i]])
+        except Exception:
+            zi, pi = np.nan, np.nan
+        z.append(zi)
+        p.append(pi)
+    p = np.array(p, dtype=float)
+    reject, p_adj, _, _ = multipletests(np.where(np.isfinite(p), p, 1.0), alpha=alpha, method=method)
+    return {"z_stat": np.array(z, dtype=float), "p_raw": p, "p_adjusted": p_adj,
+            "significant": reject, "chi2_global": chi2, "p_global": p_global}
+
+
+def reference_all_pairs(users, conv, alpha, method):
+    """Every pair through proportions_ztest, corrected together by multipletests."""
+    from statsmodels.stats.multitest import multipletests
+    from statsmodels.stats.proportion import proportions_ztest
+    k = len(users)
+    z = np.full((k, k), np.nan)
+    p = np.full((k, k), np.nan)
+    for i in range(k):
+        for j in range(i + 1, k):
+            z[i, j], p[i, j] = proportions_ztest([conv[i], conv[j]], [users[i], users[j]])
+            z[j, i], p[j, i] = -z[i, j], p[i, j]
+    iu = np.triu_indices(k, 1)
+    reject, p_adj, _, _ = multipletests(np.where(np.isfinite(p[iu]), p[iu], 1.0), alpha=alpha, method=method)
+    return {"z_stat": z[iu], "p_raw": p[iu], "p_adjusted": p_adj, "significant": reject}
+
+
+def random_experiment(rng, n_arms, degenerate=False):
+    users = rng.integers(1, 20000, n_arms)
+    conv  = rng.binomial(users, rng.uniform(0.01, 0.3, n_arms))
+    if degenerate:
+        kind = rng.integers(3)
+        i    = rng.integers(n_arms)
+        if kind == 0:
+            users[i] = conv[i] = 0            # empty arm
+        elif kind == 1:
+            conv[i] = users[i] + 5            # conv > users
+        else:
+            conv[:] = 0                       # nobody converted
+    return users, conv
+
+
+def _close(a, b):
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    both_nan = np.isnan(a) & np.isnan(b)
+    return bool(np.all(both_nan | np.isclose(a, b, rtol=RTOL, atol=1e-300)))
+
+
+def validate(n_cases, seed=0):
+    rng    = np.random.default_rng(seed)
+    errors = []
+    for case in range(n_cases):
+        n_arms = int(rng.integers(2, 31))
+        users, conv = random_experiment(rng, n_arms, degenerate=case % 10 == 0)
+        zeros = np.zeros(n_arms)
+        for method in METHODS:
+            ref = reference(users, conv, ALPHA, method)
+            got = multivariate_arrays(users, conv, zeros, zeros, ALPHA, method)
+            for key, val in ref.items():
+                ok = np.array_equal(val, got[key]) if key == "significant" else _close(val, got[key])
+                if not ok:
+                    errors.append(f"case {case} ({n_arms} arms, {method}): {key} differs")
+
+    for case in range(n_cases // 10):
+        n_arms = int(rng.integers(3, 16))
+        users, conv = random_experiment(rng, n_arms, degenerate=case % 10 == 0)
+        for method in METHODS:
+            ref = reference_all_pairs(users, conv, ALPHA, method)
+            got = run_all_pairs_analysis(ArmTable(range(n_arms), users, conv, np.zeros(n_arms), np.zeros(n_arms)),
+                                         ALPHA, method)
+            iu  = np.triu_indices(n_arms, 1)
+            for key, val in ref.items():
+                ok = np.array_equal(val, got[key][iu]) if key == "significant" else _close(val, got[key][iu])
+                if not ok:
+                    errors.append(f"all-pairs case {case} ({n_arms} arms, {method}): {key} differs")
+
+    # Stacked experiments must match experiment-by-experiment results exactly
+    users = rng.integers(1, 20000, (200, 5))
+    conv  = rng.binomial(users, 0.1)
+    zeros = np.zeros(users.shape)
+    for method in METHODS:
+        stacked = multivariate_arrays(users, conv, zeros, zeros, ALPHA, method)
+        for e in range(len(users)):
+            single = multivariate_arrays(users[e], conv[e], zeros[e], zeros[e], ALPHA, method)
+            for key, val in single.items():
+                if not np.array_equal(val, stacked[key][e], equal_nan=key != "significant"):
+                    errors.append(f"stacked row {e} ({method}): {key} differs")
+    return errors
+
+
+def time_median(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return statistics.median(samples) * 1e3
+
+
+def bench(repeat, arm_counts, n_stacked, all_pairs_arms):
+    rng  = np.random.default_rng(1)
+    rows = []
+    for n_arms in arm_counts:
+        users, conv = random_experiment(rng, n_arms)
+        zeros = np.zeros(n_arms)
+        ref = time_median(lambda: reference(users, conv, ALPHA, "holm"), repeat)
+        new = time_median(lambda: multivariate_arrays(users, conv, zeros, zeros, ALPHA, "holm"), repeat)
+        rows.append({"workload": f"1 experiment x {n_arms} arms", "statsmodels_ms": ref, "numpy_ms": new})
+
+    users = rng.integers(1000, 20000, (n_stacked, 4))
+    conv  = rng.binomial(users, 0.1)
+    zeros = np.zeros(users.shape)
+    ref = time_median(lambda: [reference(u, c, ALPHA, "holm") for u, c in zip(users, conv)], max(1, repeat // 3))
+    new = time_median(lambda: multivariate_arrays(users, conv, zeros, zeros, ALPHA, "holm"), repeat)
+    rows.append({"workload": f"{n_stacked} experiments x 4 arms", "statsmodels_ms": ref, "numpy_ms": new})
+
+    for n_arms in all_pairs_arms:
+        users, conv = random_experiment(rng, n_arms)
+        arms = ArmTable(range(n_arms), users, conv, np.zeros(n_arms), np.zeros(n_arms))
+        ref = time_median(lambda: reference_all_pairs(users, conv, ALPHA, "holm"), max(1, repeat // 3))
+        new = time_median(lambda: run_all_pairs_analysis(arms, ALPHA, "holm"), repeat)
+        rows.append({"workload": f"all pairs, {n_arms} arms", "statsmodels_ms": ref, "numpy_ms": new})
+    for r in rows:
+        r["speedup"] = r["statsmodels_ms"] / r["numpy_ms"]
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", type=int, default=500, help="Random experiments to validate.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per timing.")
+    parser.add_argument("--arms", type=int, nargs="+", default=[2, 4, 10, 30, 100, 1000],
+                        help="Arm counts for the single-experiment timings.")
+    parser.add_argument("--stacked", type=int, default=200, help="Experiments in the stacked timing.")
+    parser.add_argument("--all-pairs-arms", type=int, nargs="+", default=[10, 30, 100],
+                        help="Arm counts for the all-pairs timings.")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")   # degenerate cases warn in statsmodels
+        errors = validate(args.cases)
+        reference(*random_experiment(np.random.default_rng(), 3), ALPHA, "holm")   # warm-up imports
+        rows = bench(args.repeat, args.arms, args.stacked, args.all_pairs_arms)
+
+    print(f"validation: {args.cases} experiments x {len(METHODS)} MCC methods, all pairs, stacked — "
+          + ("OK" if not errors else f"{len(errors)} mismatches"))
+    for e in errors[:20]:
+        print("  " + e)
+    print(f"\n{'workload':<30}{'statsmodels (ms)':>18}{'numpy (ms)':>13}{'speedup':>10}")
+    for r in rows:
+        print(f"{r['workload']:<30}{r['statsmodels_ms']:>18.2f}{r['numpy_ms']:>13.2f}{r['speedup']:>9.0f}x")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "repeat": args.repeat, "validated_cases": args.cases,
+                       "mismatches": errors, "results": rows}, f, indent=2)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())